@@ -0,0 +1,202 @@
+"""
+Per-user daily usage aggregates (``daily_aggregates``).
+
+A day is compacted as ``DAILY_USAGE_PARTITIONS`` independent partitions, and
+a user belongs to partition ``crc32(user_id) % partitions``. The day's users
+are listed once (``day_users``) and split with ``partition_users``; each
+partition then does the following for its slice:
+
+- reads its users' hour rollups for the day (at most 24 documents per user);
+- covers any hours before ``rollup_state.since`` from raw request events;
+- writes the totals plus the top collections and endpoints with one
+  ``bulk_write``.
+
+Documents are replaced with ``$set``, so compacting a day again is
+idempotent. The hourly task recompacts the day of the hour that just closed,
+so a day's aggregate is final from 00:05 the next day.
+
+``backfill_daily_usage`` compacts a range of days in order. It records the
+last finished day in ``daily_usage_backfill``, so an interrupted backfill
+resumes from the next day.
+"""
+
+from __future__ import annotations
+
+import logging
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+from pymongo import UpdateOne
+
+from analytics.request_events import REQUEST_EVENTS
+from analytics.rollups import (
+    _RAW_FIELDS,
+    HOUR_COLLECTION,
+    STATE_COLLECTION,
+    fold_event,
+    merge_counters,
+    top,
+    unescape_key,
+)
+
+logger = logging.getLogger(__name__)
+
+DAILY_AGGREGATES = "daily_aggregates"
+PROGRESS_COLLECTION = "daily_usage_backfill"
+TOP_LIMIT = 10
+_SKIPPED_COLLECTIONS = {"", "system", "unknown"}
+
+
+def partition_count() -> int:
+    return max(1, getattr(settings, "DAILY_USAGE_PARTITIONS", 16))
+
+
+def partition_of(user_id, partitions: int) -> int:
+    return zlib.crc32(str(user_id).encode()) % partitions
+
+
+def day_bounds(day: date) -> tuple[datetime, datetime]:
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def _rollups_since(db) -> Optional[datetime]:
+    doc = db[STATE_COLLECTION].find_one({"_id": "rollups"})
+    if not doc or not doc.get("since"):
+        return None
+    since = doc["since"]
+    return since.replace(tzinfo=timezone.utc) if since.tzinfo is None else since
+
+
+def _split(db, start: datetime, end: datetime) -> datetime:
+    """Hours from the returned time on are read from rollups, earlier ones from raw events."""
+    since = _rollups_since(db)
+    if since is None:
+        return end
+    return min(max(start, since), end)
+
+
+def day_users(db, start: datetime, end: datetime) -> set:
+    split = _split(db, start, end)
+    users = set()
+    if split < end:
+        users.update(db[HOUR_COLLECTION].distinct("user_id", {"bucket": {"$gte": split, "$lt": end}}))
+    if start < split:
+        users.update(db[REQUEST_EVENTS].distinct("user_id", {"timestamp": {"$gte": start, "$lt": split}}))
+    users.discard(None)
+    return users
+
+
+def day_counters(db, user_ids: Iterable, start: datetime, end: datetime) -> dict[str, dict]:
+    """Rollup-shaped counters per user for ``[start, end)``."""
+    user_ids = list(user_ids)
+    counters: dict[str, dict] = {}
+    split = _split(db, start, end)
+    if split < end:
+        cursor = db[HOUR_COLLECTION].find(
+            {"user_id": {"$in": user_ids}, "bucket": {"$gte": split, "$lt": end}},
+            {"_id": 0, "bucket": 0, "latency": 0},
+        )
+        for doc in cursor:
+            merge_counters(counters.setdefault(doc.pop("user_id"), {}), doc)
+    if start < split:
+        cursor = db[REQUEST_EVENTS].find(
+            {"user_id": {"$in": user_ids}, "timestamp": {"$gte": start, "$lt": split}},
+            {**_RAW_FIELDS, "user_id": 1},
+        )
+        for event in cursor:
+            fold_event(counters.setdefault(event["user_id"], {}), event)
+    return counters
+
+
+def daily_payload(user_id: str, day: str, counters: dict) -> dict:
+    total = int(counters.get("requests", 0))
+    collections: dict[str, int] = {}
+    for db_counters in (counters.get("dbs") or {}).values():
+        for name, count in (db_counters.get("collections") or {}).items():
+            name = unescape_key(name)
+            if name not in _SKIPPED_COLLECTIONS:
+                collections[name] = collections.get(name, 0) + count
+    endpoints = {unescape_key(key): value for key, value in (counters.get("endpoints") or {}).items()}
+    return {
+        "user_id": user_id,
+        "date": day,
+        "total_requests": total,
+        "avg_duration_ms": float(counters.get("duration_ms_sum", 0)) / total if total else 0.0,
+        "error_rate": int(counters.get("errors", 0)) / total if total else 0.0,
+        "top_collections": [
+            {"collection": name, "operations": count} for name, count in top(collections, TOP_LIMIT)
+        ],
+        "top_endpoints": [{"endpoint": name, "requests": count} for name, count in top(endpoints, TOP_LIMIT)],
+    }
+
+
+def partition_users(users: Iterable, partitions: int) -> list[list]:
+    """Split ``users`` into ``partitions`` slices by ``partition_of``."""
+    slices: list[list] = [[] for _ in range(partitions)]
+    for user in users:
+        slices[partition_of(user, partitions)].append(user)
+    return slices
+
+
+def compact_users(db, day: date, users: list) -> int:
+    """Recompute ``daily_aggregates`` of ``day`` for ``users``; returns users written."""
+    if not users:
+        return 0
+    start, end = day_bounds(day)
+    now = datetime.now(timezone.utc)
+    date_str = day.isoformat()
+    ops = [
+        UpdateOne(
+            {"user_id": user_id, "date": date_str},
+            {"$set": {**daily_payload(user_id, date_str, counters), "updated_at": now}},
+            upsert=True,
+        )
+        for user_id, counters in day_counters(db, users, start, end).items()
+    ]
+    if ops:
+        db[DAILY_AGGREGATES].bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def compact_partition(db, day: date, partition: int, partitions: int) -> int:
+    """Compact one partition of ``day``, listing the day's users itself (see ``compact_users``)."""
+    start, end = day_bounds(day)
+    return compact_users(db, day, partition_users(day_users(db, start, end), partitions)[partition])
+
+
+def compact_day(db, day: date, partitions: Optional[int] = None) -> int:
+    partitions = partitions or partition_count()
+    start, end = day_bounds(day)
+    return sum(compact_users(db, day, users) for users in partition_users(day_users(db, start, end), partitions))
+
+
+def backfill_daily_usage(
+    db,
+    first: date,
+    last: date,
+    *,
+    restart: bool = False,
+    progress: Optional[Callable[[date, int], None]] = None,
+) -> int:
+    """Compact every day in ``[first, last]``; returns the number of days compacted in this run."""
+    state_id = f"{first.isoformat()}:{last.isoformat()}"
+    state = None if restart else db[PROGRESS_COLLECTION].find_one({"_id": state_id})
+    day = first
+    if state and state.get("last_day"):
+        day = date.fromisoformat(state["last_day"]) + timedelta(days=1)
+    done = 0
+    while day <= last:
+        users = compact_day(db, day)
+        db[PROGRESS_COLLECTION].update_one(
+            {"_id": state_id},
+            {"$set": {"last_day": day.isoformat(), "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        if progress is not None:
+            progress(day, users)
+        done += 1
+        day += timedelta(days=1)
+    return done
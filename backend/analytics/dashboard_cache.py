@@ -0,0 +1,152 @@
+"""
+Stale-while-revalidate cache for assembled dashboard payloads.
+
+Entries live in the default Django cache (Redis when ``REDIS_CACHE_URL`` is
+set), keyed by user and period, and carry the time they were built:
+
+- younger than ``DASHBOARD_CACHE_FRESH_SECONDS``: served as is;
+- younger than fresh + ``DASHBOARD_CACHE_STALE_SECONDS``: served as is while
+  one background task rebuilds it on the process event loop
+  (``project.event_loop``), since the request's own loop may be closed, and
+  its tasks cancelled, as soon as the response is returned;
+- older, or missing: the caller waits for a rebuild.
+
+Rebuilds are coalesced twice. In a process, concurrent callers for a key await
+the same task. Across processes, the rebuilding process holds a short
+``cache.add`` lock. The others serve the stale entry, or on a cold miss wait up
+to ``DASHBOARD_CACHE_LOCK_SECONDS`` for the entry to appear before building it
+themselves. A burst of dashboard loads therefore costs one rebuild. A cache
+outage degrades to building on every request.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional, Union
+
+from django.conf import settings
+from django.core.cache import cache
+
+from project.event_loop import PROCESS_LOOP
+
+logger = logging.getLogger(__name__)
+
+_POLL_SECONDS = 0.05
+_MISSING = object()
+
+
+class StaleWhileRevalidateCache:
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        # Foreground rebuilds are tasks on the caller's loop; background ones are
+        # futures from the process loop. Done callbacks run on either thread.
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Union[asyncio.Task, concurrent.futures.Future]] = {}
+
+    @property
+    def fresh_seconds(self) -> float:
+        return getattr(settings, "DASHBOARD_CACHE_FRESH_SECONDS", 30)
+
+    @property
+    def stale_seconds(self) -> float:
+        return getattr(settings, "DASHBOARD_CACHE_STALE_SECONDS", 300)
+
+    @property
+    def lock_seconds(self) -> float:
+        return getattr(settings, "DASHBOARD_CACHE_LOCK_SECONDS", 10)
+
+    def key(self, *parts: Any) -> str:
+        return ":".join((self.prefix, *(str(part) for part in parts)))
+
+    async def _read(self, key: str) -> dict | None:
+        try:
+            return await cache.aget(key)
+        except Exception:
+            logger.warning("Dashboard cache read failed for %s", key, exc_info=True)
+            return None
+
+    async def _acquire(self, key: str) -> bool:
+        try:
+            return bool(await cache.aadd(f"{key}:lock", 1, self.lock_seconds))
+        except Exception:
+            return True  # no shared cache to coordinate through; build here
+
+    async def _release(self, key: str) -> None:
+        try:
+            await cache.adelete(f"{key}:lock")
+        except Exception:
+            pass
+
+    async def _refresh(self, key: str, build: Callable[[], Awaitable[Any]], *, wait: bool) -> Any:
+        if not await self._acquire(key):
+            # Another process is rebuilding this key.
+            if not wait:
+                return _MISSING
+            deadline = time.monotonic() + self.lock_seconds
+            while time.monotonic() < deadline:
+                await asyncio.sleep(_POLL_SECONDS)
+                entry = await self._read(key)
+                if entry and time.time() - entry["built_at"] < self.fresh_seconds + self.stale_seconds:
+                    return entry["value"]
+            return await self._store(key, await build())
+        try:
+            return await self._store(key, await build())
+        finally:
+            await self._release(key)
+
+    async def _store(self, key: str, value: Any) -> Any:
+        try:
+            await cache.aset(key, {"built_at": time.time(), "value": value}, self.fresh_seconds + self.stale_seconds)
+        except Exception:
+            logger.warning("Dashboard cache write failed for %s", key, exc_info=True)
+        return value
+
+    def _task(self, key: str, build: Callable[[], Awaitable[Any]], *, wait: bool) -> Optional[asyncio.Future]:
+        """Join or start the rebuild of ``key``; returns an awaitable only when ``wait``."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            running = self._inflight.get(key)
+            if running is not None and running.done():
+                running = None
+            if isinstance(running, asyncio.Task) and running.get_loop() is not loop:
+                running = None  # a task on another loop cannot be awaited here
+            started = running is None
+            if started:
+                if wait:
+                    running = loop.create_task(self._refresh(key, build, wait=True))
+                else:
+                    running = PROCESS_LOOP.submit(self._refresh(key, build, wait=False))
+                self._inflight[key] = running
+        if started:
+            running.add_done_callback(lambda done, key=key: self._forget(key, done))
+        if not wait:
+            return None
+        return asyncio.wrap_future(running) if isinstance(running, concurrent.futures.Future) else running
+
+    def _forget(self, key: str, task: Union[asyncio.Task, concurrent.futures.Future]) -> None:
+        with self._lock:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Dashboard rebuild for %s failed: %s", key, task.exception())
+
+    async def get_or_build(self, key: str, build: Callable[[], Awaitable[Any]]) -> Any:
+        entry = await self._read(key)
+        age = time.time() - entry["built_at"] if entry else None
+        if age is not None and age < self.fresh_seconds:
+            return entry["value"]
+        if age is not None and age < self.fresh_seconds + self.stale_seconds:
+            self._task(key, build, wait=False)
+            return entry["value"]
+        value = await asyncio.shield(self._task(key, build, wait=True))
+        if value is _MISSING:
+            # Joined a background refresh that deferred to another process.
+            value = await self._refresh(key, build, wait=True)
+        return value
+
+
+dashboard_cache = StaleWhileRevalidateCache("analytics:dashboard")
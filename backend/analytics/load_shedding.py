@@ -0,0 +1,156 @@
+"""
+Adaptive load shedding for the telemetry buffer.
+
+When the analytics Mongo (or the broker, with ``TELEMETRY_SINK = "celery"``)
+slows down, batches take longer to write and the buffer's queues grow. The
+flusher feeds the ``LoadShedder`` the time each batch write took and the
+fullest queue's depth (a fraction of ``TELEMETRY_BUFFER_CAPACITY``). Once
+either signal crosses a level's threshold, ``TelemetryBuffer.add`` sheds the
+lowest-priority telemetry first:
+
+1. ``client_info``: the ``client`` and ``sizes`` parts of request events, and
+   ``mongo_details`` events;
+2. ``performance``: also the ``timing`` part and ``slow_queries`` events;
+3. ``http``: also successful request events. Errors are still written.
+
+Escalation is immediate, and producers escalate on queue depth themselves, so
+a flusher stuck in a slow write cannot hold shedding back. Stepping down has
+hysteresis. Both signals must stay below ``TELEMETRY_SHED_RECOVERY_FACTOR``
+times the current level's thresholds for ``TELEMETRY_SHED_COOLDOWN_SECONDS``,
+then the shedder drops one level and the timer restarts. Per-class counters
+record every event that was trimmed or dropped.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import time
+from typing import Any, Optional
+
+from django.conf import settings
+
+from analytics.request_events import REQUEST_EVENTS
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ("client_info", "performance", "http")
+_EWMA_ALPHA = 0.3
+
+# Fields trimmed from request events, and whole collections dropped, from each level up.
+_TRIMMED_FIELDS = {1: ("client", "sizes"), 2: ("timing",)}
+_DROPPED_COLLECTIONS = {"mongo_details": 1, "slow_queries": 2}
+
+
+def _thresholds(name: str, default: tuple[float, ...]) -> tuple[float, ...]:
+    values = tuple(getattr(settings, name, default))
+    return values if len(values) == len(LEVELS) else default
+
+
+class LoadShedder:
+    """Shedding level (0 = off, up to ``len(LEVELS)``) from write latency and queue depth."""
+
+    def __init__(self):
+        self.level = 0
+        self.write_ms = 0.0  # EWMA of batch write latency
+        self.depth = 0.0
+        # Bumped from producer threads; ``next()`` on ``itertools.count`` is atomic under the GIL.
+        self._shed_counts = {name: itertools.count(1) for name in LEVELS}
+        self.shed = {name: 0 for name in LEVELS}
+        self.transitions = 0
+        self._calm_since: Optional[float] = None
+
+    @property
+    def write_ms_thresholds(self) -> tuple[float, ...]:
+        return _thresholds("TELEMETRY_SHED_WRITE_MS", (250.0, 1000.0, 5000.0))
+
+    @property
+    def depth_thresholds(self) -> tuple[float, ...]:
+        return _thresholds("TELEMETRY_SHED_QUEUE_FRACTION", (0.5, 0.7, 0.9))
+
+    @property
+    def recovery_factor(self) -> float:
+        return getattr(settings, "TELEMETRY_SHED_RECOVERY_FACTOR", 0.5)
+
+    @property
+    def cooldown(self) -> float:
+        return getattr(settings, "TELEMETRY_SHED_COOLDOWN_SECONDS", 30.0)
+
+    def _level_for(self, write_ms: float, depth: float, factor: float = 1.0) -> int:
+        level = 0
+        for n, (ms, fraction) in enumerate(zip(self.write_ms_thresholds, self.depth_thresholds), start=1):
+            if write_ms >= ms * factor or depth >= fraction * factor:
+                level = n
+        return level
+
+    def observe(self, write_ms: Optional[float], depth: float, now: Optional[float] = None) -> int:
+        """Fold in one flush cycle (``write_ms`` None when nothing was written); returns the level."""
+        now = time.monotonic() if now is None else now
+        self.write_ms += _EWMA_ALPHA * ((write_ms or 0.0) - self.write_ms)
+        self.depth = depth
+        target = self._level_for(self.write_ms, depth)
+        if target > self.level:
+            self._set(target)
+            self._calm_since = None
+        elif self.level and self._level_for(self.write_ms, depth, self.recovery_factor) < self.level:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.cooldown:
+                self._set(self.level - 1)
+                self._calm_since = now
+        else:
+            self._calm_since = None
+        return self.level
+
+    def escalate_for_depth(self, depth: float) -> None:
+        """Producer-side check: raise the level as soon as a queue fills (never lowers it)."""
+        target = self._level_for(0.0, depth)
+        if target > self.level:
+            self.depth = depth
+            self._set(target)
+            self._calm_since = None
+
+    def _set(self, level: int) -> None:
+        logger.warning(
+            "Telemetry load shedding %s -> %s (write %.0f ms, queue %.0f%% full)",
+            self._name(self.level), self._name(level), self.write_ms, self.depth * 100,
+        )
+        self.level = level
+        self.transitions += 1
+
+    @staticmethod
+    def _name(level: int) -> str:
+        return LEVELS[level - 1] if level else "off"
+
+    def apply(self, collection: str, event: dict) -> Optional[dict]:
+        """The event trimmed for the current level, or None when it is shed entirely."""
+        level = self.level
+        if not level:
+            return event
+        dropped_from = _DROPPED_COLLECTIONS.get(collection)
+        if dropped_from is not None and level >= dropped_from:
+            self._count(LEVELS[dropped_from - 1])
+            return None
+        if collection != REQUEST_EVENTS:
+            return event
+        if level >= 3 and event.get("error") is None and event.get("method"):
+            self._count("http")
+            return None
+        for from_level, fields in _TRIMMED_FIELDS.items():
+            if level >= from_level and any(event.get(field) is not None for field in fields):
+                for field in fields:
+                    event.pop(field, None)
+                self._count(LEVELS[from_level - 1])
+        return event
+
+    def _count(self, name: str) -> None:
+        self.shed[name] = next(self._shed_counts[name])
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "level": self._name(self.level),
+            "write_ms": round(self.write_ms, 2),
+            "queue_fraction": round(self.depth, 3),
+            "transitions": self.transitions,
+            "shed": dict(self.shed),
+        }
@@ -0,0 +1,36 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.daily_usage import backfill_daily_usage
+
+
+class Command(BaseCommand):
+    help = "Recompute daily_aggregates for a range of UTC days (idempotent, resumes after interruption)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="first", required=True, help="First day, YYYY-MM-DD.")
+        parser.add_argument("--to", dest="last", required=True, help="Last day (inclusive), YYYY-MM-DD.")
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore recorded progress for this range and start again from --from.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            first, last = date.fromisoformat(options["first"]), date.fromisoformat(options["last"])
+        except ValueError as exc:
+            raise CommandError(f"Invalid date: {exc}") from exc
+        if first > last:
+            raise CommandError("--from must not be after --to")
+        db = settings.SYNC_MONGODB_CLIENT["datacube_analytics"]
+        days = backfill_daily_usage(
+            db,
+            first,
+            last,
+            restart=options["restart"],
+            progress=lambda day, users: self.stdout.write(f"{day.isoformat()}: {users} users"),
+        )
+        self.stdout.write(f"Compacted {days} day(s)")
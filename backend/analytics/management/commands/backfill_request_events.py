@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from analytics.request_events import backfill_request_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the legacy http_requests, client_info, performance_metrics, errors and "
+        "db_operations collections into request_events and replace them with views."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--no-swap",
+            action="store_true",
+            help="Only copy; keep the legacy collections under their names (re-run later to swap).",
+        )
+
+    def handle(self, *args, **options):
+        db = settings.SYNC_MONGODB_CLIENT["datacube_analytics"]
+        copied = backfill_request_events(db, batch_size=options["batch_size"], swap=not options["no_swap"])
+        if not copied:
+            self.stdout.write("No legacy telemetry collections left to backfill.")
+        for source, count in copied.items():
+            self.stdout.write(f"{source}: {count} events")
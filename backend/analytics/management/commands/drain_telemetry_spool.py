@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from analytics.telemetry import telemetry_buffer
+
+
+class Command(BaseCommand):
+    help = "Replay telemetry batches spooled to disk while the sink was unavailable."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-segments",
+            type=int,
+            default=None,
+            help="Stop after this many segments (default: all).",
+        )
+
+    def handle(self, *args, **options):
+        replayed = telemetry_buffer.replay_spool(max_segments=options["max_segments"])
+        stats = telemetry_buffer.spool.stats()
+        self.stdout.write(f"Replayed {replayed} event(s); {stats['segments']} segment(s) left")
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from analytics.timeseries import (
+    PRE_TS_SUFFIX,
+    TIMESERIES_COLLECTIONS,
+    collection_kind,
+    migrate_to_timeseries,
+)
+
+
+class Command(BaseCommand):
+    help = "Convert the raw telemetry collections into MongoDB time-series collections."
+
+    def add_arguments(self, parser):
+        parser.add_argument("collections", nargs="*", default=list(TIMESERIES_COLLECTIONS))
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--drop-source",
+            action="store_true",
+            help="Drop the <name>_pre_ts staging collection once every document has been copied.",
+        )
+
+    def handle(self, *args, **options):
+        db = settings.SYNC_MONGODB_CLIENT["datacube_analytics"]
+        for name in options["collections"]:
+            if collection_kind(db, name) == "timeseries" and collection_kind(db, f"{name}{PRE_TS_SUFFIX}") is None:
+                self.stdout.write(f"{name}: already a time-series collection")
+                continue
+            copied = migrate_to_timeseries(
+                db, name, batch_size=options["batch_size"], drop_source=options["drop_source"]
+            )
+            self.stdout.write(f"{name}: copied {copied} documents")
@@ -2,31 +2,31 @@ import os
 import time
 import json
 import logging
-from datetime import datetime, timezone
-
-from django.http import RawPostDataException
 
+from analytics.sampling import categorize_endpoint, sample_weight
 from analytics.thresholds import get_slow_threshold_ms
-from .tasks import (
-    log_http_request_task,
-    log_db_operation_task,
-    log_performance_task,
-    log_client_info_task,
-    log_error_task,
-    log_mongo_detail_task,
-    log_slow_query_task,
+from project.middleware import HybridMiddleware, resolve_lazy_user
+from project.mongo_monitoring import start_request_accounting, stop_request_accounting
+from .telemetry import (
+    begin_request_event,
+    end_request_event,
+    record_mongo_detail,
+    record_request_event,
+    record_slow_query,
+    request_event_fields,
 )
 
 logger = logging.getLogger(__name__)
 
 
-class DatacubeObservabilityMiddleware:
+class DatacubeObservabilityMiddleware(HybridMiddleware):
     """
     High-performance middleware for Datacube MongoDB API.
     Captures latency, request/response metrics, and database operations.
+    Runs natively under both WSGI and ASGI.
     """
     def __init__(self, get_response):
-        self.get_response = get_response
+        super().__init__(get_response)
         self.is_production = os.getenv('DJANGO_ENV') == 'production'
         
         # Define sensitive fields that should be redacted in production
@@ -37,34 +37,7 @@ class DatacubeObservabilityMiddleware:
 
     def _categorize_endpoint(self, path, method):
         """Map request path + method to an operation family (for thresholds and metrics)."""
-        path_l = path or ""
-        m = (method or "GET").upper()
-        rules = [
-            ("create_database", "POST", "database_creation"),
-            ("add_collection", "POST", "collection_creation"),
-            ("list_databases", "GET", "database_listing"),
-            ("list_collections", "GET", "collection_listing"),
-            ("get_metadata", "GET", "metadata_retrieval"),
-            ("drop_database", "DELETE", "database_deletion"),
-            ("drop_collections", "DELETE", "collection_deletion"),
-            ("import_data", "POST", "data_import"),
-            ("health_check", "GET", "health_check"),
-        ]
-        for segment, want_method, category in rules:
-            if m != want_method:
-                continue
-            if segment in path_l:
-                return category
-        if path_l.rstrip("/").endswith("/crud") or "/crud/" in path_l:
-            if m == "POST":
-                return "document_creation"
-            if m == "PUT":
-                return "document_update"
-            if m == "DELETE":
-                return "document_deletion"
-            if m == "GET":
-                return "document_query"
-        return "other"
+        return categorize_endpoint(path, method)
 
     def _redact_sensitive_data(self, data):
         """Redact sensitive data from logs in production."""
@@ -158,7 +131,43 @@ class DatacubeObservabilityMiddleware:
         
         return max_depth
 
-    def __call__(self, request):
+    def process(self, request):
+        start_time = self._capture_request(request)
+        db_stats, token = start_request_accounting()
+        event, event_token = begin_request_event(request)
+        try:
+            response = self.get_response(request)
+            self._add_server_timing(response, db_stats, start_time)
+            response["X-Request-ID"] = event["request_id"]
+            self._record(request, response, start_time, db_stats, event)
+        finally:
+            end_request_event(event_token)
+            stop_request_accounting(token)
+        return response
+
+    async def __acall__(self, request):
+        start_time = self._capture_request(request)
+        db_stats, token = start_request_accounting()
+        event, event_token = begin_request_event(request)
+        try:
+            response = await self.get_response(request)
+            self._add_server_timing(response, db_stats, start_time)
+            response["X-Request-ID"] = event["request_id"]
+            await resolve_lazy_user(request)
+            self._record(request, response, start_time, db_stats, event)
+        finally:
+            end_request_event(event_token)
+            stop_request_accounting(token)
+        return response
+
+    @staticmethod
+    def _add_server_timing(response, db_stats, start_time):
+        # Streaming bodies keep querying after this point; the header covers time to first byte.
+        total_ms = (time.perf_counter() - start_time) * 1000
+        response["Server-Timing"] = db_stats.server_timing(total_ms)
+
+    def _capture_request(self, request):
+        """Start the timer and parse the JSON body once; returns the start time."""
         # 1. High-precision start timer
         start_time = time.perf_counter()
 
@@ -174,10 +183,10 @@ class DatacubeObservabilityMiddleware:
             except (UnicodeDecodeError, json.JSONDecodeError) as e:
                 logger.debug(f"Could not decode JSON body: {e}")
                 raw_body = None # If decoding fails, we won't have the raw body for logging, but we can still proceed with an empty dict for parsed_json.
+        return start_time
 
-        # 3. Process request
-        response = self.get_response(request)
-
+    def _record(self, request, response, start_time, db_stats, event):
+        """Emit the request's event (plus mongo detail and slow query records)."""
         # 4. Capture response data if available
         response_data = {}
         try:
@@ -200,7 +209,7 @@ class DatacubeObservabilityMiddleware:
 
             # Avoid feedback loop: browsing analytics should not log more analytics.
             if path.startswith("/analytics/"):
-                return response
+                return
 
             api_v2_path = path.startswith("/api/v2/")
             request_body = {}
@@ -222,11 +231,6 @@ class DatacubeObservabilityMiddleware:
                 request.POST.get('collection_name', 'system')
             )
 
-            # --- Request/Response sizes ---
-            try:
-                request_size = len(request.body) if request.body else 0
-            except RawPostDataException:
-                request_size = int(request.META.get('CONTENT_LENGTH', 0))
             response_size = len(response.content) if hasattr(response, 'content') else 0
 
             # --- MongoDB-specific metrics ---
@@ -240,71 +244,44 @@ class DatacubeObservabilityMiddleware:
                 response_data = self._redact_sensitive_data(response_data)
 
             user_id = str(request.user.id)
-            status_code = response.status_code
             duration_ms = round(duration, 2)
-            timestamp = int(time.time() * 1000)
-            success = 200 <= status_code < 300
 
-            # 1. HTTP Request
-            http_data = {
-                "user_id": user_id,
-                "method": method,
-                "path": path,
-                "status_code": status_code,
-                "duration_ms": duration_ms,
-                "timestamp": datetime.fromtimestamp(timestamp/1000, tz=timezone.utc),
-                "success": success,
-            }
-            log_http_request_task.delay(http_data) # type: ignore
+            # 1. Request event: status, timing, sizes, client and error in one document
+            event.update(request_event_fields(
+                request,
+                user_id=user_id,
+                status_code=response.status_code,
+                duration_ms=duration,
+                response_size=response_size,
+                db_fields=db_stats.as_telemetry() if db_stats is not None else None,
+                error_message=event.pop("error_message", None),
+            ))
 
-            # 2. Database context (views on /api/v2/ log richer db_operations)
+            # 2. Database context (views on /api/v2/ attach richer db_operations)
             if (db_id or coll_name != "system") and not api_v2_path:
-                db_data = {
-                    "user_id": user_id,
+                event["db_operations"].append({
                     "db_id": db_id,
                     "collection": coll_name,
                     "operation_type": mongo_metrics.get('operation_type', 'unknown'),
                     "document_count": mongo_metrics.get('document_count', 0),
                     "query_complexity": mongo_metrics.get('query_complexity', 'simple'),
-                }
-                log_db_operation_task.delay(db_data) # type: ignore
-
-            # 3. Performance metrics
-            throughput = round((response_size / (duration/1000)) if duration>0 else 0, 2)
-            warning = None
-            if duration > 1000: warning = 'slow_request'
-            elif request_size > 1024*1024: warning = 'large_request'
-            perf_data = {
-                "user_id": user_id,
-                "request_size_bytes": request_size,
-                "response_size_bytes": response_size,
-                "throughput_bytes_per_sec": throughput,
-                "warning": warning,
-            }
-            log_performance_task.delay(perf_data) # type: ignore
-
-            # 4. Client info
-            client_data = {
-                "user_id": user_id,
-                "client_ip": request.META.get('REMOTE_ADDR', ''),
-                "user_agent": request.META.get('HTTP_USER_AGENT', '')[:200],
-                "content_type": request.content_type,
-            }
-            log_client_info_task.delay(client_data) # type: ignore
-
-            # 5. Error (if 4xx/5xx)
-            if status_code >= 400:
-                error_data = {
-                    "user_id": user_id,
-                    "status_code": status_code,
-                    "error_type": 'server_error' if status_code >= 500 else 'client_error',
-                    "error_message": None,  # could extract from response
-                }
-                log_error_task.delay(error_data) # type: ignore
+                })
+            weight = sample_weight(
+                request_id=event["request_id"],
+                user_id=user_id,
+                operation_type=self._categorize_endpoint(path, method),
+                status_code=response.status_code,
+                duration_ms=duration,
+                error=event.get("error") is not None,
+            )
+            if weight:
+                event["sample_weight"] = weight
+                record_request_event(event)
 
-            # 6. MongoDB details (if any counts)
+            # 3. MongoDB details (if any counts) for kept requests
             if (
-                not api_v2_path
+                weight
+                and not api_v2_path
                 and any(
                     k in mongo_metrics
                     for k in (
@@ -317,18 +294,20 @@ class DatacubeObservabilityMiddleware:
             ):
                 detail_data = {
                     "user_id": user_id,
+                    "request_id": event["request_id"],
                     "inserted_count": mongo_metrics.get('inserted_count'),
                     "modified_count": mongo_metrics.get('modified_count'),
                     "deleted_count": mongo_metrics.get('deleted_count'),
                     "returned_documents": mongo_metrics.get('returned_documents'),
                 }
-                log_mongo_detail_task.delay(detail_data) # type: ignore
+                record_mongo_detail(detail_data) # type: ignore
 
-            # 7. Slow query (views on /api/v2/ log accurate slow_queries)
+            # 4. Slow query (views on /api/v2/ log accurate slow_queries)
             threshold = get_slow_threshold_ms(mongo_metrics.get("operation_type", "unknown"))
             if duration > threshold and not api_v2_path:
                 slow_data = {
                     "user_id": user_id,
+                    "request_id": event["request_id"],
                     "query_details": {
                         "method": method,
                         "path": path,
@@ -339,6 +318,4 @@ class DatacubeObservabilityMiddleware:
                     "collection": coll_name,
                     "db_id": db_id,
                 }
-                log_slow_query_task.delay(slow_data) # type: ignore
-
-        return response
+                record_slow_query(slow_data) # type: ignore
@@ -0,0 +1,220 @@
+"""
+Wide per-request telemetry.
+
+Each request writes one ``datacube_analytics.request_events`` document. It
+holds a request id, the status and timing breakdown, request and response
+sizes, client info, the error (if any) and every database operation the view
+performed. This replaces five documents spread over ``http_requests``,
+``client_info``, ``performance_metrics``, ``errors`` and ``db_operations``
+that shared no key.
+
+The analytics read paths still query those five names. They are now
+read-only views over ``request_events`` (``COMPAT_VIEWS``) that project each
+event back into the legacy document shape. ``backfill_request_events`` (the
+``backfill_request_events`` management command) copies a legacy collection
+into ``request_events``, renames it to ``<name>_legacy`` and creates the view
+in its place. Legacy documents never carried a request id, so each becomes
+its own event holding only the part it recorded, tagged with ``source``.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import uuid
+from typing import Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+REQUEST_EVENTS = "request_events"
+LEGACY_SUFFIX = "_legacy"
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{8,64}$")
+
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """The client's ``X-Request-ID`` when it looks sane, else a fresh id."""
+    if incoming and _REQUEST_ID.match(incoming):
+        return incoming
+    return uuid.uuid4().hex
+
+
+def _present(field: str) -> dict:
+    return {"$match": {field: {"$exists": True, "$ne": None}}}
+
+
+COMPAT_VIEWS: dict[str, list[dict]] = {
+    "http_requests": [
+        _present("method"),
+        {"$project": {
+            "request_id": 1, "user_id": 1, "timestamp": 1, "method": 1, "path": 1,
+            "status_code": 1, "duration_ms": 1, "success": 1, "sample_weight": 1,
+            "db_commands": "$timing.db_commands",
+            "db_failed_commands": "$timing.db_failed_commands",
+            "db_time_ms": "$timing.db_ms",
+            "db_pool_wait_ms": "$timing.db_pool_wait_ms",
+        }},
+    ],
+    "performance_metrics": [
+        _present("sizes"),
+        {"$project": {
+            "request_id": 1, "user_id": 1, "timestamp": 1,
+            "request_size_bytes": "$sizes.request_bytes",
+            "response_size_bytes": "$sizes.response_bytes",
+            "throughput_bytes_per_sec": "$sizes.throughput_bytes_per_sec",
+            "warning": "$sizes.warning",
+        }},
+    ],
+    "client_info": [
+        _present("client"),
+        {"$project": {
+            "request_id": 1, "user_id": 1, "timestamp": 1,
+            "client_ip": "$client.ip",
+            "user_agent": "$client.user_agent",
+            "content_type": "$client.content_type",
+        }},
+    ],
+    "errors": [
+        _present("error"),
+        {"$project": {
+            "request_id": 1, "user_id": 1, "timestamp": 1, "status_code": 1,
+            "error_type": "$error.type",
+            "error_message": "$error.message",
+        }},
+    ],
+    "db_operations": [
+        {"$match": {"db_operations.0": {"$exists": True}}},
+        {"$unwind": "$db_operations"},
+        {"$project": {
+            "request_id": 1, "user_id": 1, "timestamp": 1, "sample_weight": 1,
+            "db_id": "$db_operations.db_id",
+            "collection": "$db_operations.collection",
+            "operation_type": "$db_operations.operation_type",
+            "document_count": "$db_operations.document_count",
+            "query_complexity": "$db_operations.query_complexity",
+        }},
+    ],
+}
+
+
+def _pick(doc: dict, *fields: str) -> dict:
+    return {field: doc[field] for field in fields if field in doc}
+
+
+def legacy_to_event(source: str, doc: dict) -> dict:
+    """Convert one legacy telemetry document into a (partial) request event."""
+    event: dict[str, Any] = {
+        "request_id": doc.get("request_id") or f"{source}:{doc.get('_id', uuid.uuid4().hex)}",
+        "source": source,
+        "db_operations": [],
+        **_pick(doc, "user_id", "timestamp"),
+    }
+    if source == "http_requests":
+        event.update(_pick(doc, "method", "path", "status_code", "duration_ms", "success"))
+        timing = {
+            "db_ms": doc.get("db_time_ms"),
+            "db_pool_wait_ms": doc.get("db_pool_wait_ms"),
+            "db_commands": doc.get("db_commands"),
+            "db_failed_commands": doc.get("db_failed_commands"),
+        }
+        if any(value is not None for value in timing.values()):
+            event["timing"] = timing
+    elif source == "performance_metrics":
+        event["sizes"] = {
+            "request_bytes": doc.get("request_size_bytes", 0),
+            "response_bytes": doc.get("response_size_bytes", 0),
+            "throughput_bytes_per_sec": doc.get("throughput_bytes_per_sec", 0.0),
+            "warning": doc.get("warning"),
+        }
+    elif source == "client_info":
+        event["client"] = {
+            "ip": doc.get("client_ip", ""),
+            "user_agent": doc.get("user_agent", ""),
+            "content_type": doc.get("content_type"),
+        }
+    elif source == "errors":
+        event["status_code"] = doc.get("status_code")
+        event["error"] = {"type": doc.get("error_type"), "message": doc.get("error_message")}
+    elif source == "db_operations":
+        event["db_operations"] = [
+            _pick(doc, "db_id", "collection", "operation_type", "document_count", "query_complexity")
+        ]
+    else:
+        raise ValueError(f"Unknown legacy telemetry collection: {source}")
+    return event
+
+
+def _collection_types(db) -> dict[str, str]:
+    return {info["name"]: info.get("type", "collection") for info in db.list_collections()}
+
+
+def ensure_compat_views(db) -> list[str]:
+    """Create the compatibility views whose names are free; returns the names created.
+
+    A name still held by a legacy collection is left alone until it is backfilled.
+    """
+    existing = _collection_types(db)
+    created = []
+    for name, pipeline in COMPAT_VIEWS.items():
+        kind = existing.get(name)
+        if kind is None:
+            db.create_collection(name, viewOn=REQUEST_EVENTS, pipeline=pipeline)
+            created.append(name)
+        elif kind == "view":
+            db.command({"collMod": name, "viewOn": REQUEST_EVENTS, "pipeline": pipeline})
+    return created
+
+
+def _batches(cursor: Iterable[dict], size: int):
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def backfill_collection(db, source: str, *, batch_size: int = 1000) -> int:
+    """Copy every document of ``source`` into ``request_events``; safe to re-run.
+
+    Events already copied (same request id) are skipped. ``request_events`` may
+    be a time-series collection, which supports neither upserts nor a unique
+    index, hence the lookup.
+    """
+    copied = 0
+    for batch in _batches(db[source].find({}, batch_size=batch_size), batch_size):
+        events = [{"_id": doc["_id"], **legacy_to_event(source, doc)} for doc in batch]
+        done = {
+            doc["request_id"]
+            for doc in db[REQUEST_EVENTS].find(
+                {"request_id": {"$in": [event["request_id"] for event in events]}}, {"request_id": 1}
+            )
+        }
+        fresh = [event for event in events if event["request_id"] not in done]
+        if fresh:
+            db[REQUEST_EVENTS].insert_many(fresh, ordered=False)
+        copied += len(fresh)
+    return copied
+
+
+def backfill_request_events(db, *, batch_size: int = 1000, swap: bool = True) -> dict[str, int]:
+    """Copy each legacy collection into ``request_events``.
+
+    With ``swap`` the legacy collection is then renamed to ``<name>_legacy`` and
+    the compatibility view takes its name. Run it once every web and worker
+    process writes ``request_events``, so nothing lands in a legacy collection
+    after it has been copied.
+    """
+    copied: dict[str, int] = {}
+    for source in COMPAT_VIEWS:
+        if _collection_types(db).get(source) != "collection":
+            continue
+        copied[source] = backfill_collection(db, source, batch_size=batch_size)
+        logger.info("Backfilled %s events from %s", copied[source], source)
+        if swap:
+            db[source].rename(f"{source}{LEGACY_SUFFIX}")
+    if swap:
+        ensure_compat_views(db)
+    return copied
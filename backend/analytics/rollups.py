@@ -0,0 +1,331 @@
+"""
+Incremental rollups of request events for the analytics dashboards.
+
+When a batch of request events is written (``AnalyticsService.insert_batch``),
+the batch is folded into per-user counters. Those counters are applied with
+``$inc`` upserts to one document per (user, hour) in ``rollups_hour`` and one
+per (user, minute) in ``rollups_minute``. Each bucket holds:
+
+- request, error and duration-sum totals;
+- method, status code and endpoint breakdowns, plus endpoints with status >= 400;
+- error types;
+- database operations: by type, and per database by collection and type;
+- a latency sketch per endpoint family (``analytics.sketches``), so window
+  percentiles come from merging bucket sketches instead of raw durations.
+
+Minute buckets are kept for ``ROLLUP_MINUTE_RETENTION_HOURS`` and hour buckets
+for ``ROLLUP_HOUR_RETENTION_DAYS``, both through TTL indexes.
+
+``rollup_window`` answers a dashboard window from these buckets. It uses hour
+buckets for the whole hours inside the window. The edges use minute buckets
+while they are still retained, and raw events for the sub-minute remainder,
+so totals match the raw aggregation exactly. It returns None, and callers keep
+their raw pipelines, when:
+
+- the window is shorter than ``ROLLUP_RAW_MAX_MINUTES``; or
+- the window starts before rollups began (``rollup_state.since``).
+
+Sampled events (``analytics.sampling``) count ``sample_weight`` times, so
+bucket counters estimate the full traffic.
+
+Endpoint keys collapse id-like path segments (``/files/<id>/`` →
+``/files/{id}/``) so a bucket's endpoint map stays bounded.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from pymongo import ASCENDING, UpdateOne
+
+from analytics import sketches
+from analytics.request_events import REQUEST_EVENTS
+
+logger = logging.getLogger(__name__)
+
+MINUTE_COLLECTION = "rollups_minute"
+HOUR_COLLECTION = "rollups_hour"
+STATE_COLLECTION = "rollup_state"
+MINUTE = timedelta(minutes=1)
+HOUR = timedelta(hours=1)
+
+# Path segments collapsed to ``{id}`` in endpoint keys (ObjectId, UUID, integer).
+ID_PATTERN = r"[0-9a-fA-F]{24}|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+"
+_ID_SEGMENT = re.compile(rf"/(?:{ID_PATTERN})(?=/|$)")
+_RAW_FIELDS = {
+    "timestamp": 1, "method": 1, "path": 1, "status_code": 1, "success": 1,
+    "duration_ms": 1, "error": 1, "db_operations": 1, "sample_weight": 1,
+}
+
+
+def rollups_enabled() -> bool:
+    return getattr(settings, "ROLLUPS_ENABLED", True)
+
+
+def minute_retention() -> timedelta:
+    return timedelta(hours=getattr(settings, "ROLLUP_MINUTE_RETENTION_HOURS", 48))
+
+
+def hour_retention() -> timedelta:
+    return timedelta(days=getattr(settings, "ROLLUP_HOUR_RETENTION_DAYS", 400))
+
+
+def escape_key(value) -> str:
+    """Make ``value`` usable as a document field name (no dots, no leading ``$``)."""
+    key = str(value).replace(".", "\u2024")
+    return "\uff04" + key[1:] if key.startswith("$") else key
+
+
+def unescape_key(key: str) -> str:
+    key = key.replace("\u2024", ".")
+    return "$" + key[1:] if key.startswith("\uff04") else key
+
+
+def endpoint_key(path: Optional[str]) -> str:
+    return escape_key(_ID_SEGMENT.sub("/{id}", path or "") or "/")
+
+
+def endpoint_family(path: Optional[str]) -> str:
+    """First three segments of the endpoint key (``/api/v2/crud``), the latency sketch grouping."""
+    segments = [part for part in _ID_SEGMENT.sub("/{id}", path or "").split("/") if part]
+    return escape_key("/" + "/".join(segments[:3]))
+
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def floor_time(value: datetime, step: timedelta) -> datetime:
+    value = _utc(value)
+    if step == HOUR:
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(second=0, microsecond=0)
+
+
+def ceil_time(value: datetime, step: timedelta) -> datetime:
+    floored = floor_time(value, step)
+    return floored if floored == _utc(value) else floored + step
+
+
+def _bump(counters: dict, path: tuple, amount=1) -> None:
+    node = counters
+    for part in path[:-1]:
+        node = node.setdefault(part, {})
+    node[path[-1]] = node.get(path[-1], 0) + amount
+
+
+def merge_counters(into: dict, counters: dict) -> dict:
+    for key, value in counters.items():
+        if isinstance(value, dict):
+            merge_counters(into.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)):
+            into[key] = into.get(key, 0) + value
+    return into
+
+
+def fold_event(counters: dict, event: dict) -> dict:
+    """Add one request event, counted ``sample_weight`` times, to ``counters`` (nested dict of numbers)."""
+    weight = event.get("sample_weight") or 1
+    if event.get("method"):
+        status_code = event.get("status_code") or 0
+        duration_ms = float(event.get("duration_ms") or 0)
+        _bump(counters, ("requests",), weight)
+        _bump(counters, ("duration_ms_sum",), duration_ms * weight)
+        _bump(counters, ("latency", endpoint_family(event.get("path")), sketches.bucket_key(duration_ms)), weight)
+        _bump(counters, ("methods", escape_key(event["method"])), weight)
+        _bump(counters, ("status", str(status_code)), weight)
+        endpoint = endpoint_key(event.get("path"))
+        _bump(counters, ("endpoints", endpoint), weight)
+        if event.get("success") is False:
+            _bump(counters, ("errors",), weight)
+        if status_code >= 400:
+            _bump(counters, ("error_endpoints", endpoint), weight)
+    error = event.get("error")
+    if error and error.get("type"):
+        _bump(counters, ("error_types", escape_key(error["type"])), weight)
+    for op in event.get("db_operations") or ():
+        operation = escape_key(op.get("operation_type") or "unknown")
+        _bump(counters, ("operations", operation), weight)
+        if op.get("db_id"):
+            db = escape_key(op["db_id"])
+            _bump(counters, ("dbs", db, "total"), weight)
+            _bump(counters, ("dbs", db, "collections", escape_key(op.get("collection") or "system")), weight)
+            _bump(counters, ("dbs", db, "operations", operation), weight)
+    return counters
+
+
+def _flatten(counters: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in counters.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def rollup_updates(events: Iterable[dict], now: Optional[datetime] = None) -> dict[str, list[UpdateOne]]:
+    """``$inc`` upserts per rollup collection for a batch of request events."""
+    now = _utc(now or datetime.now(timezone.utc))
+    minute_floor = now - minute_retention()
+    buckets: dict[tuple[str, str, datetime], dict] = {}
+    for event in events:
+        user_id, timestamp = event.get("user_id"), event.get("timestamp")
+        if not user_id or not isinstance(timestamp, datetime):
+            continue
+        targets = [(HOUR_COLLECTION, floor_time(timestamp, HOUR))]
+        if _utc(timestamp) >= minute_floor:
+            targets.append((MINUTE_COLLECTION, floor_time(timestamp, MINUTE)))
+        for collection, bucket in targets:
+            fold_event(buckets.setdefault((collection, user_id, bucket), {}), event)
+    updates: dict[str, list[UpdateOne]] = {MINUTE_COLLECTION: [], HOUR_COLLECTION: []}
+    for (collection, user_id, bucket), counters in buckets.items():
+        if not counters:
+            continue
+        updates[collection].append(
+            UpdateOne({"user_id": user_id, "bucket": bucket}, {"$inc": _flatten(counters)}, upsert=True)
+        )
+    return updates
+
+
+def ensure_rollup_indexes(db) -> None:
+    db[MINUTE_COLLECTION].create_index([("user_id", ASCENDING), ("bucket", ASCENDING)], unique=True)
+    db[HOUR_COLLECTION].create_index([("user_id", ASCENDING), ("bucket", ASCENDING)], unique=True)
+    # Expire a bucket an hour after it leaves the window the query layer reads.
+    for collection, retention in ((MINUTE_COLLECTION, minute_retention()), (HOUR_COLLECTION, hour_retention())):
+        try:
+            db[collection].create_index(
+                [("bucket", ASCENDING)],
+                expireAfterSeconds=int((retention + HOUR).total_seconds()),
+                name=f"ttl_bucket_{collection}",
+            )
+        except Exception as exc:
+            logger.warning("TTL index on %s not created or already differs: %s", collection, exc)
+
+
+def apply_rollups(db, events: list[dict]) -> int:
+    """Fold freshly written request events into the rollups; returns buckets touched."""
+    if not rollups_enabled() or not events:
+        return 0
+    now = datetime.now(timezone.utc)
+    # Rollups cover events from the next full hour on; earlier windows stay on raw events
+    # (processes still running older code may be writing raw events without rollups).
+    db[STATE_COLLECTION].update_one(
+        {"_id": "rollups"}, {"$setOnInsert": {"since": ceil_time(now, HOUR)}}, upsert=True
+    )
+    touched = 0
+    for collection, ops in rollup_updates(events, now).items():
+        if ops:
+            db[collection].bulk_write(ops, ordered=False)
+            touched += len(ops)
+    return touched
+
+
+@dataclass
+class WindowCounters:
+    """Counters for a window: ``totals`` plus one entry per UTC day in ``daily``.
+
+    Latency sketches are kept per bucket in ``latency`` and merged in one
+    NumPy pass when percentiles are read.
+    """
+
+    totals: dict = field(default_factory=dict)
+    daily: dict[str, dict] = field(default_factory=dict)
+    granularity: set[str] = field(default_factory=set)
+    latency: list[dict] = field(default_factory=list)
+
+    def add(self, day: str, counters: dict) -> None:
+        latency = counters.pop("latency", None)
+        if latency:
+            self.latency.append(latency)
+        merge_counters(self.totals, counters)
+        merge_counters(self.daily.setdefault(day, {}), counters)
+
+    def percentiles_ms(self, family: Optional[str] = None) -> dict:
+        """p50/p90/p95/p99 for the window, for all endpoints or one family."""
+        if family is None:
+            parts = [sketch for bucket in self.latency for sketch in bucket.values()]
+        else:
+            key = escape_key(family)
+            parts = [bucket[key] for bucket in self.latency if key in bucket]
+        return sketches.percentiles_ms(parts)
+
+    def latency_families(self) -> list[str]:
+        return sorted({unescape_key(key) for bucket in self.latency for key in bucket})
+
+    def breakdown(self, name: str) -> dict[str, int]:
+        return {unescape_key(key): value for key, value in (self.totals.get(name) or {}).items()}
+
+
+_since_cache: tuple[float, Optional[datetime]] = (0.0, None)
+
+
+async def rollups_since(db) -> Optional[datetime]:
+    """Start of the period fully covered by rollups (cached for a minute)."""
+    global _since_cache
+    cached_at, since = _since_cache
+    if time.monotonic() - cached_at < 60:
+        return since
+    doc = await db[STATE_COLLECTION].find_one({"_id": "rollups"})
+    since = _utc(doc["since"]) if doc and doc.get("since") else None
+    _since_cache = (time.monotonic(), since)
+    return since
+
+
+async def _fold_buckets(acc: WindowCounters, db, collection: str, user_id: str, start, end) -> None:
+    cursor = db[collection].find({"user_id": user_id, "bucket": {"$gte": start, "$lt": end}}, {"_id": 0, "user_id": 0})
+    for doc in await cursor.to_list(length=None):
+        bucket = _utc(doc.pop("bucket"))
+        acc.add(bucket.strftime("%Y-%m-%d"), doc)
+    acc.granularity.add(collection.rsplit("_", 1)[1])
+
+
+async def _fold_raw(acc: WindowCounters, db, user_id: str, start, end, include_end: bool) -> None:
+    if start > end or (start == end and not include_end):
+        return
+    window = {"$gte": start, "$lte" if include_end else "$lt": end}
+    cursor = db[REQUEST_EVENTS].find({"user_id": user_id, "timestamp": window}, _RAW_FIELDS)
+    for event in await cursor.to_list(length=None):
+        acc.add(_utc(event["timestamp"]).strftime("%Y-%m-%d"), fold_event({}, event))
+    acc.granularity.add("raw")
+
+
+async def _collect(acc: WindowCounters, db, user_id: str, start, end, now, include_end: bool) -> None:
+    for step, collection in ((HOUR, HOUR_COLLECTION), (MINUTE, MINUTE_COLLECTION)):
+        inner_start, inner_end = ceil_time(start, step), floor_time(end, step)
+        if collection == MINUTE_COLLECTION and inner_start < now - minute_retention():
+            continue
+        if inner_start < inner_end:
+            await _fold_buckets(acc, db, collection, user_id, inner_start, inner_end)
+            await _collect(acc, db, user_id, start, inner_start, now, include_end=False)
+            await _collect(acc, db, user_id, inner_end, end, now, include_end=include_end)
+            return
+    await _fold_raw(acc, db, user_id, start, end, include_end)
+
+
+async def rollup_window(
+    db, user_id: str, start: datetime, end: datetime, *, now: Optional[datetime] = None
+) -> Optional[WindowCounters]:
+    """Counters for ``[start, end]`` from the rollups, or None to use the raw pipelines."""
+    if not rollups_enabled():
+        return None
+    start, end = _utc(start), _utc(end)
+    if end - start <= timedelta(minutes=getattr(settings, "ROLLUP_RAW_MAX_MINUTES", 15)):
+        return None
+    since = await rollups_since(db)
+    if since is None or start < since:
+        return None
+    acc = WindowCounters()
+    await _collect(acc, db, user_id, start, end, _utc(now or datetime.now(timezone.utc)), include_end=True)
+    return acc
+
+
+def top(counts: dict[str, Any], limit: int) -> list[tuple[str, Any]]:
+    return sorted(counts.items(), key=lambda item: item[1], reverse=True)[:limit]
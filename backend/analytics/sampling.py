@@ -0,0 +1,107 @@
+"""
+Telemetry sampling policy.
+
+A request event is kept with probability ``1 / N``, where ``N`` comes from
+the first setting that applies:
+
+- the tenant's rate in ``TELEMETRY_SAMPLE_RATES_BY_TENANT``;
+- the operation type's rate in ``TELEMETRY_SAMPLE_RATES_BY_OPERATION``
+  (families from ``categorize_endpoint``);
+- ``TELEMETRY_SAMPLE_RATE``.
+
+A rate ``r`` becomes ``N = round(1 / r)``, so kept events carry an integer
+``sample_weight = N`` and rollup counters stay integers. Errors (status >= 400)
+and slow requests (over ``get_slow_threshold_ms`` for their operation) are
+always kept, with weight 1. Every event is therefore kept with a known
+probability ``1 / weight``. Summing weights, which rollups and the analytics
+queries do, gives unbiased counts, and weighted duration sums give unbiased
+averages and percentiles.
+
+The decision is a keyed hash of the request id rather than a random draw. The
+middleware and ``BaseAPIView._track`` agree on it, and a request id is sampled
+the same way on every hop. The key is server-side (``SECRET_KEY``), so a client
+choosing its ``X-Request-ID`` cannot pick one that is always kept or always
+dropped. Both recorders pass the ``categorize_endpoint`` family as the
+operation type.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Optional
+
+from django.conf import settings
+
+from analytics.thresholds import get_slow_threshold_ms
+
+
+def categorize_endpoint(path: Optional[str], method: Optional[str]) -> str:
+    """Map request path + method to an operation family (for thresholds, sampling and metrics)."""
+    path_l = path or ""
+    m = (method or "GET").upper()
+    rules = [
+        ("create_database", "POST", "database_creation"),
+        ("add_collection", "POST", "collection_creation"),
+        ("list_databases", "GET", "database_listing"),
+        ("list_collections", "GET", "collection_listing"),
+        ("get_metadata", "GET", "metadata_retrieval"),
+        ("drop_database", "DELETE", "database_deletion"),
+        ("drop_collections", "DELETE", "collection_deletion"),
+        ("import_data", "POST", "data_import"),
+        ("health_check", "GET", "health_check"),
+    ]
+    for segment, want_method, category in rules:
+        if m != want_method:
+            continue
+        if segment in path_l:
+            return category
+    if path_l.rstrip("/").endswith("/crud") or "/crud/" in path_l:
+        if m == "POST":
+            return "document_creation"
+        if m == "PUT":
+            return "document_update"
+        if m == "DELETE":
+            return "document_deletion"
+        if m == "GET":
+            return "document_query"
+    return "other"
+
+
+def sample_every(user_id: Optional[str], operation_type: Optional[str]) -> int:
+    """``N`` for 1-in-N sampling of this tenant's requests of this operation type."""
+    rate = getattr(settings, "TELEMETRY_SAMPLE_RATES_BY_TENANT", {}).get(str(user_id))
+    if rate is None:
+        rate = getattr(settings, "TELEMETRY_SAMPLE_RATES_BY_OPERATION", {}).get(operation_type or "other")
+    if rate is None:
+        rate = getattr(settings, "TELEMETRY_SAMPLE_RATE", 1.0)
+    if rate >= 1:
+        return 1
+    if rate <= 0:
+        return 0  # never sampled; errors and slow requests are still kept
+    return max(1, round(1 / rate))
+
+
+def _bucket(request_id: str, every: int) -> int:
+    key = settings.SECRET_KEY.encode()[:64]  # blake2b keys are at most 64 bytes
+    digest = hashlib.blake2b(request_id.encode(), key=key, digest_size=8).digest()
+    return int.from_bytes(digest, "big") % every
+
+
+def sample_weight(
+    *,
+    request_id: str,
+    user_id: Optional[str],
+    operation_type: Optional[str],
+    status_code: int,
+    duration_ms: float,
+    error: bool = False,
+) -> int:
+    """Weight to store on the event, or 0 when the event is sampled out."""
+    if error or status_code >= 400 or duration_ms > get_slow_threshold_ms(operation_type or "unknown"):
+        return 1
+    every = sample_every(user_id, operation_type)
+    if every == 1:
+        return 1
+    if every == 0:
+        return 0
+    return every if _bucket(request_id, every) == 0 else 0
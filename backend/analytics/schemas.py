@@ -4,6 +4,9 @@ from typing import Optional
 from pydantic import BaseModel, Field, field_validator
 
 
+HTTP_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS")
+
+
 def utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
@@ -16,12 +19,16 @@ class HttpRequestSchema(BaseModel):
     duration_ms: float
     timestamp: datetime = Field(default_factory=utc_now)
     success: bool
+    # Driver-level MongoDB accounting for the request (project.mongo_monitoring).
+    db_commands: Optional[int] = None
+    db_failed_commands: Optional[int] = None
+    db_time_ms: Optional[float] = None
+    db_pool_wait_ms: Optional[float] = None
 
     @field_validator("method")
     @classmethod
     def valid_method(cls, v: str) -> str:
-        allowed = ("GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS")
-        if v not in allowed:
+        if v not in HTTP_METHODS:
             raise ValueError("Invalid HTTP method")
         return v
 
@@ -63,6 +70,7 @@ class ErrorSchema(BaseModel):
 
 class MongoDetailSchema(BaseModel):
     user_id: str
+    request_id: Optional[str] = None
     inserted_count: Optional[int] = None
     modified_count: Optional[int] = None
     deleted_count: Optional[int] = None
@@ -72,6 +80,7 @@ class MongoDetailSchema(BaseModel):
 
 class SlowQuerySchema(BaseModel):
     user_id: str
+    request_id: Optional[str] = None
     query_details: dict
     duration_ms: float
     threshold_ms: int
@@ -80,6 +89,69 @@ class SlowQuerySchema(BaseModel):
     timestamp: datetime = Field(default_factory=utc_now)
 
 
+class RequestTimingSchema(BaseModel):
+    db_ms: Optional[float] = None
+    db_pool_wait_ms: Optional[float] = None
+    app_ms: Optional[float] = None
+    db_commands: Optional[int] = None
+    db_failed_commands: Optional[int] = None
+
+
+class RequestSizesSchema(BaseModel):
+    request_bytes: int = 0
+    response_bytes: int = 0
+    throughput_bytes_per_sec: float = 0.0
+    warning: Optional[str] = None
+
+
+class RequestClientSchema(BaseModel):
+    ip: str = ""
+    user_agent: str = ""
+    content_type: Optional[str] = None
+
+
+class RequestErrorSchema(BaseModel):
+    type: str
+    message: Optional[str] = None
+
+
+class DbOperationSchema(BaseModel):
+    db_id: Optional[str] = None
+    collection: str = "system"
+    operation_type: str = "unknown"
+    document_count: int = 0
+    query_complexity: str = "simple"
+
+
+class RequestEventSchema(BaseModel):
+    """One document per request in ``request_events`` (see analytics.request_events)."""
+
+    request_id: str
+    user_id: str
+    timestamp: datetime = Field(default_factory=utc_now)
+    method: Optional[str] = None
+    path: Optional[str] = None
+    status_code: Optional[int] = None
+    success: Optional[bool] = None
+    duration_ms: Optional[float] = None
+    timing: Optional[RequestTimingSchema] = None
+    sizes: Optional[RequestSizesSchema] = None
+    client: Optional[RequestClientSchema] = None
+    error: Optional[RequestErrorSchema] = None
+    db_operations: list[DbOperationSchema] = Field(default_factory=list)
+    # 1-in-N sampling weight (analytics.sampling); counts are sums of weights.
+    sample_weight: int = Field(default=1, ge=1)
+    # Legacy collection a backfilled event was converted from.
+    source: Optional[str] = None
+
+    @field_validator("method")
+    @classmethod
+    def valid_method(cls, v: Optional[str]) -> Optional[str]:
+        if v is not None and v not in HTTP_METHODS:
+            raise ValueError("Invalid HTTP method")
+        return v
+
+
 class DailyAggregateSchema(BaseModel):
     user_id: str
     date: str
@@ -1,92 +1,129 @@
 import logging
 import os
+import threading
 from typing import Dict, Any
 
 from django.conf import settings
 
 from pymongo import ASCENDING, DESCENDING
-
+from pymongo.errors import BulkWriteError
+
+from ..request_events import REQUEST_EVENTS, ensure_compat_views, legacy_to_event
+from ..rollups import apply_rollups, ensure_rollup_indexes
+from ..timeseries import (
+    TIMESERIES_COLLECTIONS,
+    ensure_timeseries_collection,
+    retention_seconds,
+    timeseries_enabled,
+)
+from ..telemetry import PartialBatchError
 from ..schemas import (
     HttpRequestSchema, DatabaseContextSchema, PerformanceMetricsSchema,
-    ClientInfoSchema, ErrorSchema, MongoDetailSchema, SlowQuerySchema
+    ClientInfoSchema, ErrorSchema, MongoDetailSchema, SlowQuerySchema,
+    RequestEventSchema,
 )
 
 logger = logging.getLogger(__name__)
 
+_DUPLICATE_KEY = 11000
+
+# create_index is a server round trip even when the index exists: once per process.
+_indexes_lock = threading.Lock()
+_indexes_ready_pid = None
+
 
 class AnalyticsService:
     def __init__(self):
         # Use a separate connection for analytics (optional, but recommended)
         self.client = settings.SYNC_MONGODB_CLIENT
         self.db = self.client["datacube_analytics"]
-        self._ensure_indexes()
+        self.ensure_indexes_once()
+
+    def ensure_indexes_once(self) -> None:
+        global _indexes_ready_pid
+        if _indexes_ready_pid == os.getpid():
+            return
+        with _indexes_lock:
+            if _indexes_ready_pid == os.getpid():
+                return
+            self._ensure_indexes()
+            _indexes_ready_pid = os.getpid()
 
     def _ensure_indexes(self):
-        """Create indexes for optimal querying (idempotent)."""
-        # http_requests
-        self.db["http_requests"].create_index([("user_id", ASCENDING), ("timestamp", DESCENDING)])
-        self.db["http_requests"].create_index([("timestamp", DESCENDING)])
-        # db_operations
-        self.db["db_operations"].create_index([("user_id", ASCENDING), ("timestamp", DESCENDING)])
-        self.db["db_operations"].create_index([("db_id", ASCENDING)])
-        # performance_metrics
-        self.db["performance_metrics"].create_index([("user_id", ASCENDING), ("timestamp", DESCENDING)])
-        # client_info
-        self.db["client_info"].create_index([("user_id", ASCENDING), ("timestamp", DESCENDING)])
-        # errors
-        self.db["errors"].create_index([("user_id", ASCENDING), ("timestamp", DESCENDING)])
-        self.db["errors"].create_index([("status_code", ASCENDING)])
+        """Create collections and indexes for optimal querying (idempotent)."""
+        kinds = {}
+        if timeseries_enabled():
+            for name in TIMESERIES_COLLECTIONS:
+                try:
+                    kinds[name] = ensure_timeseries_collection(self.db, name)
+                except Exception as exc:
+                    logger.warning("Time-series collection %s not created: %s", name, exc)
+        # request_events (http_requests, client_info, performance_metrics, errors
+        # and db_operations are views over it)
+        self._create_index(REQUEST_EVENTS, [("user_id", ASCENDING), ("timestamp", DESCENDING)])
+        self._create_index(REQUEST_EVENTS, [("timestamp", DESCENDING)])
+        self._create_index(REQUEST_EVENTS, [("request_id", ASCENDING)])
+        self._create_index(REQUEST_EVENTS, [("status_code", ASCENDING)])
+        self._create_index(REQUEST_EVENTS, [("db_operations.db_id", ASCENDING)])
+        try:
+            ensure_compat_views(self.db)
+        except Exception as exc:
+            logger.warning("Request event compatibility views not created: %s", exc)
         # mongo_details
-        self.db["mongo_details"].create_index([("user_id", ASCENDING), ("timestamp", DESCENDING)])
+        self._create_index("mongo_details", [("user_id", ASCENDING), ("timestamp", DESCENDING)])
         # slow_queries
-        self.db["slow_queries"].create_index([("user_id", ASCENDING), ("timestamp", DESCENDING)])
+        self._create_index("slow_queries", [("user_id", ASCENDING), ("timestamp", DESCENDING)])
         self.db["daily_aggregates"].create_index([("user_id", ASCENDING), ("date", DESCENDING)])
-        self._ensure_ttl_indexes()
+        ensure_rollup_indexes(self.db)
+        if kinds.get(REQUEST_EVENTS) != "timeseries":
+            self._ensure_ttl_indexes()
+
+    def _create_index(self, name: str, keys: list) -> None:
+        # Time-series collections reject some index shapes on older servers.
+        try:
+            self.db[name].create_index(keys)
+        except Exception as exc:
+            logger.warning("Index %s on %s not created: %s", keys, name, exc)
 
     def _ensure_ttl_indexes(self) -> None:
         """
-        Optional TTL on high-volume telemetry (MongoDB deletes documents automatically).
-        Set ANALYTICS_TTL_DAYS_TELEMETRY=0 to disable. Default 90 days.
+        TTL on request_events while it is still a regular collection (time-series
+        collections expire through expireAfterSeconds instead).
+        TELEMETRY_RETENTION_DAYS=0 disables it.
         """
-        raw = os.getenv("ANALYTICS_TTL_DAYS_TELEMETRY", "90").strip()
-        try:
-            days = int(raw)
-        except ValueError:
-            days = 90
-        if days <= 0:
+        expire_after = retention_seconds()
+        if expire_after is None:
             return
-        expire_after = days * 86400
-        for coll in ("http_requests", "client_info", "performance_metrics"):
-            name = f"ttl_timestamp_{coll}"
-            try:
-                self.db[coll].create_index(
-                    [("timestamp", ASCENDING)],
-                    expireAfterSeconds=expire_after,
-                    name=name,
-                )
-            except Exception as exc:
-                logger.warning("TTL index on %s not created or already differs: %s", coll, exc)
+        try:
+            self.db[REQUEST_EVENTS].create_index(
+                [("timestamp", ASCENDING)],
+                expireAfterSeconds=expire_after,
+                name=f"ttl_timestamp_{REQUEST_EVENTS}",
+            )
+        except Exception as exc:
+            logger.warning("TTL index on %s not created or already differs: %s", REQUEST_EVENTS, exc)
+
+    # The single-event writers serve Celery messages queued before request
+    # events; each legacy record becomes a partial event.
+    def _log_legacy(self, source: str, schema, data: Dict[str, Any]):
+        event = legacy_to_event(source, schema(**data).model_dump())
+        self.insert_batch(REQUEST_EVENTS, [RequestEventSchema(**event).model_dump()])
 
     def log_http_request(self, data: Dict[str, Any]):
         """Insert one HTTP request log."""
-        schema_instance = HttpRequestSchema(**data)
-        self.db["http_requests"].insert_one(schema_instance.model_dump())
+        self._log_legacy("http_requests", HttpRequestSchema, data)
 
     def log_db_operation(self, data: Dict[str, Any]):
-        schema_instance = DatabaseContextSchema(**data)
-        self.db["db_operations"].insert_one(schema_instance.model_dump())
+        self._log_legacy("db_operations", DatabaseContextSchema, data)
 
     def log_performance_metrics(self, data: Dict[str, Any]):
-        schema_instance = PerformanceMetricsSchema(**data)
-        self.db["performance_metrics"].insert_one(schema_instance.model_dump())
+        self._log_legacy("performance_metrics", PerformanceMetricsSchema, data)
 
     def log_client_info(self, data: Dict[str, Any]):
-        schema_instance = ClientInfoSchema(**data)
-        self.db["client_info"].insert_one(schema_instance.model_dump())
+        self._log_legacy("client_info", ClientInfoSchema, data)
 
     def log_error(self, data: Dict[str, Any]):
-        schema_instance = ErrorSchema(**data)
-        self.db["errors"].insert_one(schema_instance.model_dump())
+        self._log_legacy("errors", ErrorSchema, data)
 
     def log_mongo_detail(self, data: Dict[str, Any]):
         schema_instance = MongoDetailSchema(**data)
@@ -99,4 +136,50 @@ class AnalyticsService:
     # Bulk insertion for high throughput (optional)
     def bulk_log_http_requests(self, docs: list):
         if docs:
-            self.db["http_requests"].insert_many(docs)
+            self.db[REQUEST_EVENTS].insert_many([legacy_to_event("http_requests", doc) for doc in docs])
+
+    def insert_batch(self, collection: str, docs: list, *, skip_stored: bool = False):
+        """Insert validated telemetry documents in one round trip (analytics.telemetry).
+
+        Request events are then folded into the minute/hour rollups. A rollup
+        failure is logged rather than raised: the events are stored, and a retry
+        would insert them twice. When only part of the batch is stored,
+        ``PartialBatchError`` carries the rest. With ``skip_stored`` (spool
+        replays), request events whose ``request_id`` is already stored are
+        dropped first, since a failed write may have stored them anyway.
+        """
+        if skip_stored and collection == REQUEST_EVENTS:
+            docs = self._unstored_request_events(docs)
+        if not docs:
+            return
+        try:
+            self.db[collection].insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            errors = {error["index"]: error.get("code") for error in exc.details.get("writeErrors", [])}
+            # Duplicate-key rejects were stored by an earlier attempt.
+            failed = [doc for i, doc in enumerate(docs) if i in errors and errors[i] != _DUPLICATE_KEY]
+            self._apply_rollups(collection, [doc for i, doc in enumerate(docs) if i not in errors])
+            if failed:
+                for doc in failed:
+                    doc.pop("_id", None)  # assigned by insert_many; a retry inserts afresh
+                raise PartialBatchError(failed) from exc
+            return
+        self._apply_rollups(collection, docs)
+
+    def _apply_rollups(self, collection: str, docs: list) -> None:
+        if collection != REQUEST_EVENTS or not docs:
+            return
+        try:
+            apply_rollups(self.db, docs)
+        except Exception as exc:
+            logger.warning("Rollup update for %s request events failed: %s", len(docs), exc)
+
+    def _unstored_request_events(self, docs: list) -> list:
+        ids = [doc["request_id"] for doc in docs if doc.get("request_id")]
+        if not ids:
+            return docs
+        stored = {
+            doc["request_id"]
+            for doc in self.db[REQUEST_EVENTS].find({"request_id": {"$in": ids}}, {"request_id": 1})
+        }
+        return [doc for doc in docs if doc.get("request_id") not in stored]
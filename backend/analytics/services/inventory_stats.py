@@ -7,8 +7,10 @@ from __future__ import annotations
 from datetime import datetime, timezone
 from typing import Any, Optional
 
+from analytics.services.query import db_operations_metrics, run_metrics
 from api.application.metadata_service import MetadataService
 from api.domain.metadata_models import serialize_metadata_doc
+from api.infrastructure.read_routing import routed
 from django.conf import settings
 
 
@@ -35,69 +37,10 @@ async def aggregate_db_operations(
       by_db: { db_id: { total, by_collection: { name: count }, by_operation: { op: count } } }
       daily_by_db: { db_id: [ { date, count } ] }
     """
-    coll = settings.MONGODB_CLIENT["datacube_analytics"]["db_operations"]
-    match: dict[str, Any] = {
-        "user_id": user_id,
-        "timestamp": {"$gte": start, "$lte": end},
-        "db_id": {"$exists": True, "$nin": [None, ""]},
-    }
-    if db_id:
-        match["db_id"] = db_id
-
-    pipeline_totals = [
-        {"$match": match},
-        {
-            "$group": {
-                "_id": {
-                    "db_id": "$db_id",
-                    "collection": {"$ifNull": ["$collection", "system"]},
-                    "operation_type": "$operation_type",
-                },
-                "count": {"$sum": 1},
-            }
-        },
-    ]
-    cursor = await coll.aggregate(pipeline_totals)
-    rows = await cursor.to_list(length=10_000)
-
-    by_db: dict[str, dict[str, Any]] = {}
-    for row in rows:
-        key = row["_id"]
-        did = key.get("db_id") or "unknown"
-        cname = key.get("collection") or "system"
-        op = key.get("operation_type") or "unknown"
-        cnt = int(row["count"])
-        bucket = by_db.setdefault(
-            did,
-            {"total": 0, "by_collection": {}, "by_operation": {}},
-        )
-        bucket["total"] += cnt
-        bucket["by_collection"][cname] = bucket["by_collection"].get(cname, 0) + cnt
-        bucket["by_operation"][op] = bucket["by_operation"].get(op, 0) + cnt
-
-    pipeline_daily = [
-        {"$match": match},
-        {
-            "$group": {
-                "_id": {
-                    "db_id": "$db_id",
-                    "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
-                },
-                "count": {"$sum": 1},
-            }
-        },
-        {"$sort": {"_id.date": 1}},
-    ]
-    cursor2 = await coll.aggregate(pipeline_daily)
-    daily_rows = await cursor2.to_list(length=5000)
-    daily_by_db: dict[str, list[dict[str, Any]]] = {}
-    for row in daily_rows:
-        did = row["_id"]["db_id"]
-        daily_by_db.setdefault(did, []).append(
-            {"date": row["_id"]["date"], "api_calls": int(row["count"])}
-        )
-
-    return {"by_db": by_db, "daily_by_db": daily_by_db}
+    analytics_db = routed(settings.MONGODB_CLIENT["datacube_analytics"])
+    totals, daily = db_operations_metrics(db_id)
+    result = await run_metrics(analytics_db, user_id, start, end, (totals, daily))
+    return {"by_db": result[totals.name], "daily_by_db": result[daily.name]}
 
 
 async def build_inventory(
@@ -155,7 +98,7 @@ async def build_inventory(
             live_count = cached
             try:
                 internal = doc["dbName"]
-                live_count = await settings.MONGODB_CLIENT[internal][name].estimated_document_count()
+                live_count = await routed(settings.MONGODB_CLIENT[internal][name]).estimated_document_count()
             except Exception:
                 live_count = cached
             doc_count_db += live_count
@@ -2,6 +2,7 @@
 Read-side aggregations across metadata DB and auth user documents.
 
 Used by analytics dashboard endpoints (not written to datacube_analytics).
+All reads use the routed read preference (secondaries when available).
 """
 
 from __future__ import annotations
@@ -12,6 +13,18 @@ from typing import Any, Optional
 from bson import ObjectId
 from django.conf import settings
 
+from analytics.services.query import (
+    ENDPOINT_VOLUME,
+    ERROR_TYPES,
+    ERRORS_BY_STATUS,
+    HTTP_DAILY,
+    HTTP_METHODS,
+    HTTP_TOTALS,
+    OPERATION_BREAKDOWN,
+    TOP_ERROR_ENDPOINTS,
+    run_metrics,
+)
+from api.infrastructure.read_routing import routed
 from core.infrastructure.managers import user_manager
 
 
@@ -19,9 +32,17 @@ def _user_oid(user_id: str) -> ObjectId:
     return ObjectId(user_id)
 
 
+def _analytics_db():
+    return routed(settings.MONGODB_CLIENT["datacube_analytics"])
+
+
+def _telemetry(name: str):
+    return _analytics_db()[name]
+
+
 async def aggregate_file_storage(user_id: str) -> dict[str, Any]:
     """Total bytes and file count from METADATA_DB.file_metadata."""
-    coll = settings.FILE_METADATA_COLLECTION
+    coll = routed(settings.FILE_METADATA_COLLECTION)
     pipeline = [
         {"$match": {"user_id": _user_oid(user_id)}},
         {
@@ -44,7 +65,7 @@ async def aggregate_file_storage(user_id: str) -> dict[str, Any]:
 
 async def aggregate_metadata_counts(user_id: str) -> dict[str, int]:
     """Logical database and collection counts for the user."""
-    coll = settings.METADATA_COLLECTION
+    coll = routed(settings.METADATA_COLLECTION)
     uid = _user_oid(user_id)
     database_count = await coll.count_documents({"user_id": uid})
     cursor = await coll.aggregate(
@@ -68,7 +89,7 @@ async def aggregate_metadata_counts(user_id: str) -> dict[str, int]:
 
 async def aggregate_metadata_storage_totals(user_id: str) -> dict[str, int]:
     """Sum cached storage_bytes_total across user databases."""
-    coll = settings.METADATA_COLLECTION
+    coll = routed(settings.METADATA_COLLECTION)
     pipeline = [
         {"$match": {"user_id": _user_oid(user_id)}},
         {
@@ -92,7 +113,7 @@ async def file_storage_trend(
     end: datetime,
 ) -> list[dict[str, Any]]:
     """Daily uploaded bytes (from file metadata uploaded_at)."""
-    coll = settings.FILE_METADATA_COLLECTION
+    coll = routed(settings.FILE_METADATA_COLLECTION)
     pipeline = [
         {
             "$match": {
@@ -129,14 +150,12 @@ async def aggregate_http_methods(
     end: datetime,
 ) -> dict[str, int]:
     """HTTP request counts by method."""
-    coll = settings.MONGODB_CLIENT["datacube_analytics"]["http_requests"]
-    pipeline = [
-        {"$match": {"user_id": user_id, "timestamp": {"$gte": start, "$lte": end}}},
-        {"$group": {"_id": "$method", "count": {"$sum": 1}}},
-    ]
-    cursor = await coll.aggregate(pipeline)
-    rows = await cursor.to_list(length=20)
-    return {row["_id"]: int(row["count"]) for row in rows}
+    result = await run_metrics(_analytics_db(), user_id, start, end, (HTTP_METHODS,))
+    return result[HTTP_METHODS.name]
+
+
+def _http_summary(result: dict[str, Any]) -> dict[str, Any]:
+    return {**result[HTTP_TOTALS.name], "daily_requests": result[HTTP_DAILY.name]}
 
 
 async def aggregate_http_summary(
@@ -146,53 +165,36 @@ async def aggregate_http_summary(
     end: datetime,
 ) -> dict[str, Any]:
     """Totals and daily series for HTTP traffic in the period."""
-    coll = settings.MONGODB_CLIENT["datacube_analytics"]["http_requests"]
-    match = {"user_id": user_id, "timestamp": {"$gte": start, "$lte": end}}
+    result = await run_metrics(_analytics_db(), user_id, start, end, (HTTP_TOTALS, HTTP_DAILY))
+    return _http_summary(result)
 
-    pipeline_totals = [
-        {"$match": match},
-        {
-            "$group": {
-                "_id": None,
-                "total_requests": {"$sum": 1},
-                "avg_duration_ms": {"$avg": "$duration_ms"},
-                "error_count": {
-                    "$sum": {"$cond": [{"$eq": ["$success", False]}, 1, 0]}
-                },
-            }
-        },
-    ]
-    cursor = await coll.aggregate(pipeline_totals)
-    rows = await cursor.to_list(length=1)
-    total_requests = int(rows[0]["total_requests"]) if rows else 0
-    avg_duration = round(float(rows[0]["avg_duration_ms"] or 0), 2) if rows else 0
-    error_count = int(rows[0]["error_count"]) if rows else 0
-    error_rate = round((error_count / total_requests) * 100, 2) if total_requests else 0
 
-    pipeline_daily = [
-        {"$match": match},
-        {
-            "$group": {
-                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
-                "count": {"$sum": 1},
-                "avg_duration": {"$avg": "$duration_ms"},
-            }
-        },
-        {"$sort": {"_id": 1}},
-    ]
-    cursor2 = await coll.aggregate(pipeline_daily)
-    daily_data = await cursor2.to_list(length=100)
+async def aggregate_http_overview(
+    user_id: str,
+    *,
+    start: datetime,
+    end: datetime,
+) -> tuple[dict[str, Any], dict[str, int]]:
+    """``aggregate_http_summary`` and ``aggregate_http_methods`` from one scan."""
+    result = await run_metrics(_analytics_db(), user_id, start, end, (HTTP_TOTALS, HTTP_DAILY, HTTP_METHODS))
+    return _http_summary(result), result[HTTP_METHODS.name]
 
-    return {
-        "total_requests": total_requests,
-        "avg_response_time_ms": avg_duration,
-        "error_rate_percent": error_rate,
-        "daily_requests": {
-            "dates": [d["_id"] for d in daily_data],
-            "counts": [int(d["count"]) for d in daily_data],
-            "avg_durations_ms": [round(float(d["avg_duration"] or 0), 2) for d in daily_data],
-        },
-    }
+
+async def aggregate_errors(user_id: str, *, start: datetime, end: datetime) -> dict[str, Any]:
+    """Errors by status code, top failing endpoints and error types."""
+    return await run_metrics(
+        _analytics_db(), user_id, start, end, (ERRORS_BY_STATUS, TOP_ERROR_ENDPOINTS, ERROR_TYPES)
+    )
+
+
+async def aggregate_endpoint_volume(user_id: str, *, start: datetime, end: datetime) -> list[dict[str, Any]]:
+    result = await run_metrics(_analytics_db(), user_id, start, end, (ENDPOINT_VOLUME,))
+    return result[ENDPOINT_VOLUME.name]
+
+
+async def aggregate_operation_breakdown(user_id: str, *, start: datetime, end: datetime) -> dict[str, int]:
+    result = await run_metrics(_analytics_db(), user_id, start, end, (OPERATION_BREAKDOWN,))
+    return result[OPERATION_BREAKDOWN.name]
 
 
 async def count_slow_queries(
@@ -201,7 +203,7 @@ async def count_slow_queries(
     start: datetime,
     end: datetime,
 ) -> int:
-    coll = settings.MONGODB_CLIENT["datacube_analytics"]["slow_queries"]
+    coll = _telemetry("slow_queries")
     return await coll.count_documents(
         {"user_id": user_id, "timestamp": {"$gte": start, "$lte": end}}
     )
@@ -230,7 +232,7 @@ async def aggregate_top_collections_scoped(
     limit: int = 10,
 ) -> list[dict[str, Any]]:
     """Top collections by operation count, including db_id."""
-    coll = settings.MONGODB_CLIENT["datacube_analytics"]["db_operations"]
+    coll = _telemetry("db_operations")
     pipeline = [
         {
             "$match": {
@@ -242,7 +244,7 @@ async def aggregate_top_collections_scoped(
         {
             "$group": {
                 "_id": {"db_id": "$db_id", "collection": "$collection"},
-                "count": {"$sum": 1},
+                "count": {"$sum": {"$ifNull": ["$sample_weight", 1]}},
             }
         },
         {"$sort": {"count": -1}},
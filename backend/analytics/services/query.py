@@ -0,0 +1,346 @@
+"""
+Single-scan analytics queries.
+
+A ``Metric`` declares one dashboard figure twice:
+
+- as a ``$facet`` branch over ``request_events``; the branch starts after the
+  shared ``{user_id, timestamp}`` match;
+- as a reader over rollup counters (``analytics.rollups.WindowCounters``).
+
+``run_metrics`` answers every metric an endpoint needs with one rollup read
+when the window is covered. Otherwise it runs one aggregation: a single
+``$match`` feeding a ``$facet`` with one branch per metric. Either way the
+user's events are scanned once, not once per metric.
+
+The raw branches read the wide request events directly, so figures that used
+to come from different legacy collections (HTTP status and error types, for
+example) share that scan. They group endpoints by ``_ENDPOINT``, the
+aggregation form of ``analytics.rollups.endpoint_key``, so both sources report
+``/api/v2/files/{id}`` rather than one row per id. Legacy history is in ``request_events`` once
+``backfill_request_events`` has run.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Iterable, Optional
+
+from analytics import sketches
+from analytics.request_events import REQUEST_EVENTS
+from analytics.rollups import ID_PATTERN, WindowCounters, rollup_window, top, unescape_key
+
+_HTTP_ONLY = {"$match": {"method": {"$exists": True, "$ne": None}}}
+# Sampled events stand for ``sample_weight`` requests (analytics.sampling).
+_WEIGHT = {"$ifNull": ["$sample_weight", 1]}
+_COUNT = {"$sum": _WEIGHT}
+_DURATION = {"$ifNull": ["$duration_ms", 0]}
+_WEIGHTED_DURATION = {"$sum": {"$multiply": [_DURATION, _WEIGHT]}}
+_DAY = {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}
+# endpoint_key() in the pipeline: id-like path segments become "{id}", an empty path "/".
+_ENDPOINT = {
+    "$let": {
+        "vars": {
+            "segments": {
+                "$map": {
+                    "input": {"$split": [{"$ifNull": ["$path", ""]}, "/"]},
+                    "in": {
+                        "$cond": [
+                            {"$regexMatch": {"input": "$$this", "regex": f"^(?:{ID_PATTERN})$"}},
+                            "{id}",
+                            "$$this",
+                        ]
+                    },
+                }
+            }
+        },
+        "in": {
+            "$let": {
+                "vars": {
+                    "joined": {
+                        "$reduce": {
+                            "input": {"$slice": ["$$segments", 1, {"$size": "$$segments"}]},
+                            "initialValue": {"$arrayElemAt": ["$$segments", 0]},
+                            "in": {"$concat": ["$$value", "/", "$$this"]},
+                        }
+                    }
+                },
+                "in": {"$cond": [{"$eq": ["$$joined", ""]}, "/", "$$joined"]},
+            }
+        },
+    }
+}
+
+
+@dataclass(frozen=True)
+class Metric:
+    name: str
+    stages: tuple[dict, ...]
+    from_rows: Callable[[list[dict]], Any]
+    from_rollups: Callable[[WindowCounters], Any]
+
+
+def facet_pipeline(user_id: str, start: datetime, end: datetime, metrics: Iterable[Metric]) -> list[dict]:
+    return [
+        {"$match": {"user_id": user_id, "timestamp": {"$gte": start, "$lte": end}}},
+        {"$facet": {metric.name: list(metric.stages) for metric in metrics}},
+    ]
+
+
+async def run_metrics(db, user_id: str, start: datetime, end: datetime, metrics: Iterable[Metric]) -> dict[str, Any]:
+    """``{metric.name: value}`` from one rollup read or one ``$facet`` aggregation."""
+    metrics = tuple(metrics)
+    counters = await rollup_window(db, user_id, start, end)
+    if counters is not None:
+        return {metric.name: metric.from_rollups(counters) for metric in metrics}
+    cursor = await db[REQUEST_EVENTS].aggregate(facet_pipeline(user_id, start, end, metrics))
+    rows = await cursor.to_list(length=1)
+    facets = rows[0] if rows else {}
+    return {metric.name: metric.from_rows(facets.get(metric.name) or []) for metric in metrics}
+
+
+def _rate(errors, total) -> float:
+    return round((errors / total) * 100, 2) if total else 0
+
+
+def _http_totals_rows(rows: list[dict]) -> dict[str, Any]:
+    row = rows[0] if rows else {}
+    total = int(row.get("total_requests", 0))
+    return {
+        "total_requests": total,
+        "avg_response_time_ms": round(float(row.get("duration_ms_sum") or 0) / total, 2) if total else 0,
+        "error_rate_percent": _rate(int(row.get("error_count", 0)), total),
+    }
+
+
+def _http_totals_rollups(counters: WindowCounters) -> dict[str, Any]:
+    totals = counters.totals
+    total = int(totals.get("requests", 0))
+    return {
+        "total_requests": total,
+        "avg_response_time_ms": round(totals.get("duration_ms_sum", 0) / total, 2) if total else 0,
+        "error_rate_percent": _rate(totals.get("errors", 0), total),
+    }
+
+
+def _http_daily_rollups(counters: WindowCounters) -> dict[str, list]:
+    days = [(day, c) for day, c in sorted(counters.daily.items()) if c.get("requests")]
+    return {
+        "dates": [day for day, _ in days],
+        "counts": [int(c["requests"]) for _, c in days],
+        "avg_durations_ms": [round(c.get("duration_ms_sum", 0) / c["requests"], 2) for _, c in days],
+    }
+
+
+HTTP_TOTALS = Metric(
+    "http_totals",
+    (
+        _HTTP_ONLY,
+        {
+            "$group": {
+                "_id": None,
+                "total_requests": _COUNT,
+                "duration_ms_sum": _WEIGHTED_DURATION,
+                "error_count": {"$sum": {"$cond": [{"$eq": ["$success", False]}, _WEIGHT, 0]}},
+            }
+        },
+    ),
+    _http_totals_rows,
+    _http_totals_rollups,
+)
+
+HTTP_DAILY = Metric(
+    "http_daily",
+    (
+        _HTTP_ONLY,
+        {"$group": {"_id": _DAY, "count": _COUNT, "duration_ms_sum": _WEIGHTED_DURATION}},
+        {"$sort": {"_id": 1}},
+    ),
+    lambda rows: {
+        "dates": [row["_id"] for row in rows],
+        "counts": [int(row["count"]) for row in rows],
+        "avg_durations_ms": [round(float(row["duration_ms_sum"] or 0) / row["count"], 2) for row in rows],
+    },
+    _http_daily_rollups,
+)
+
+HTTP_METHODS = Metric(
+    "http_methods",
+    (_HTTP_ONLY, {"$group": {"_id": "$method", "count": _COUNT}}),
+    lambda rows: {row["_id"]: int(row["count"]) for row in rows},
+    lambda counters: counters.breakdown("methods"),
+)
+
+ENDPOINT_VOLUME = Metric(
+    "endpoint_volume",
+    (
+        _HTTP_ONLY,
+        {"$group": {"_id": _ENDPOINT, "count": _COUNT}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": 15},
+    ),
+    lambda rows: [{"endpoint": row["_id"], "requests": row["count"]} for row in rows],
+    lambda counters: [
+        {"endpoint": path, "requests": count} for path, count in top(counters.breakdown("endpoints"), 15)
+    ],
+)
+
+ERRORS_BY_STATUS = Metric(
+    "errors_by_status_code",
+    (
+        {"$match": {"status_code": {"$gte": 400}}},
+        {"$group": {"_id": "$status_code", "count": _COUNT}},
+        {"$sort": {"_id": 1}},
+    ),
+    lambda rows: {str(row["_id"]): row["count"] for row in rows},
+    lambda counters: {
+        code: count
+        for code, count in sorted(counters.breakdown("status").items(), key=lambda item: int(item[0]))
+        if int(code) >= 400
+    },
+)
+
+TOP_ERROR_ENDPOINTS = Metric(
+    "top_error_endpoints",
+    (
+        {"$match": {"status_code": {"$gte": 400}}},
+        {"$group": {"_id": _ENDPOINT, "count": _COUNT}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": 5},
+    ),
+    lambda rows: [{"path": row["_id"], "errors": row["count"]} for row in rows],
+    lambda counters: [
+        {"path": path, "errors": count} for path, count in top(counters.breakdown("error_endpoints"), 5)
+    ],
+)
+
+ERROR_TYPES = Metric(
+    "error_types",
+    (
+        {"$match": {"error.type": {"$exists": True, "$nin": [None, ""]}}},
+        # Unbounded, like the rollup breakdown: error types are a short, fixed list.
+        {"$group": {"_id": "$error.type", "count": _COUNT}},
+    ),
+    lambda rows: {row["_id"]: row["count"] for row in rows},
+    lambda counters: counters.breakdown("error_types"),
+)
+
+OPERATION_BREAKDOWN = Metric(
+    "operation_breakdown",
+    (
+        {"$unwind": "$db_operations"},
+        {"$group": {"_id": {"$ifNull": ["$db_operations.operation_type", "unknown"]}, "count": _COUNT}},
+    ),
+    lambda rows: {row["_id"]: row["count"] for row in rows},
+    lambda counters: counters.breakdown("operations"),
+)
+
+
+LATENCY_PERCENTILES = Metric(
+    # (percentiles, percentiles by endpoint family); the per-family split only comes from rollups.
+    "latency_percentiles",
+    (
+        _HTTP_ONLY,
+        {
+            "$group": {
+                "_id": {
+                    "$cond": [
+                        {"$gt": [_DURATION, sketches.MIN_VALUE_MS]},
+                        {"$toString": {"$toLong": {"$ceil": {"$divide": [{"$ln": _DURATION}, sketches.LOG_GAMMA]}}}},
+                        sketches.ZERO_KEY,
+                    ]
+                },
+                "count": _COUNT,
+            }
+        },
+    ),
+    lambda rows: (sketches.percentiles_ms([{row["_id"]: row["count"] for row in rows}]), None),
+    lambda counters: (
+        counters.percentiles_ms(),
+        {family: counters.percentiles_ms(family) for family in counters.latency_families()},
+    ),
+)
+
+
+def _db_operation_rows(rows: list[dict]) -> dict[str, dict[str, Any]]:
+    by_db: dict[str, dict[str, Any]] = {}
+    for row in rows:
+        key = row["_id"]
+        did = key.get("db_id") or "unknown"
+        cname = key.get("collection") or "system"
+        op = key.get("operation_type") or "unknown"
+        cnt = int(row["count"])
+        bucket = by_db.setdefault(did, {"total": 0, "by_collection": {}, "by_operation": {}})
+        bucket["total"] += cnt
+        bucket["by_collection"][cname] = bucket["by_collection"].get(cname, 0) + cnt
+        bucket["by_operation"][op] = bucket["by_operation"].get(op, 0) + cnt
+    return by_db
+
+
+def _db_daily_rows(rows: list[dict]) -> dict[str, list[dict[str, Any]]]:
+    daily_by_db: dict[str, list[dict[str, Any]]] = {}
+    for row in rows:
+        daily_by_db.setdefault(row["_id"]["db_id"], []).append(
+            {"date": row["_id"]["date"], "api_calls": int(row["count"])}
+        )
+    return daily_by_db
+
+
+def _rollup_dbs(counts: dict, db_id: Optional[str]):
+    for key, db_counts in (counts.get("dbs") or {}).items():
+        did = unescape_key(key)
+        if not db_id or did == db_id:
+            yield did, db_counts
+
+
+def db_operations_metrics(db_id: Optional[str] = None) -> tuple[Metric, Metric]:
+    """Per-database totals (``db_operations``) and daily series (``db_operations_daily``)."""
+    base = (
+        {"$unwind": "$db_operations"},
+        {"$match": {"db_operations.db_id": db_id or {"$exists": True, "$nin": [None, ""]}}},
+    )
+    totals = Metric(
+        "db_operations",
+        (
+            *base,
+            {
+                "$group": {
+                    "_id": {
+                        "db_id": "$db_operations.db_id",
+                        "collection": {"$ifNull": ["$db_operations.collection", "system"]},
+                        "operation_type": "$db_operations.operation_type",
+                    },
+                    "count": _COUNT,
+                }
+            },
+        ),
+        _db_operation_rows,
+        lambda counters: {
+            did: {
+                "total": int(db_counts.get("total", 0)),
+                "by_collection": {unescape_key(k): int(v) for k, v in (db_counts.get("collections") or {}).items()},
+                "by_operation": {unescape_key(k): int(v) for k, v in (db_counts.get("operations") or {}).items()},
+            }
+            for did, db_counts in _rollup_dbs(counters.totals, db_id)
+        },
+    )
+    daily = Metric(
+        "db_operations_daily",
+        (
+            *base,
+            {"$group": {"_id": {"db_id": "$db_operations.db_id", "date": _DAY}, "count": _COUNT}},
+            {"$sort": {"_id.date": 1}},
+        ),
+        _db_daily_rows,
+        lambda counters: _db_daily_rollups(counters, db_id),
+    )
+    return totals, daily
+
+
+def _db_daily_rollups(counters: WindowCounters, db_id: Optional[str]) -> dict[str, list[dict[str, Any]]]:
+    daily_by_db: dict[str, list[dict[str, Any]]] = {}
+    for day, day_counts in sorted(counters.daily.items()):
+        for did, db_counts in _rollup_dbs(day_counts, db_id):
+            if db_counts.get("total"):
+                daily_by_db.setdefault(did, []).append({"date": day, "api_calls": int(db_counts["total"])})
+    return daily_by_db
@@ -0,0 +1,236 @@
+"""
+Disk spool for telemetry batches the sink could not take.
+
+When ``TelemetryBuffer`` fails to write a batch (the broker is unreachable
+with ``TELEMETRY_SINK = "celery"``, or the analytics Mongo with the direct
+sink), the batch is appended to a local spool instead of being lost. The
+flusher replays the spool once writes succeed again. Run
+``manage.py drain_telemetry_spool`` to replay what a process left behind.
+
+The spool is a directory of append-only segments, one open segment per
+process (``<pid>-<seq>.open``), written with buffered I/O and flushed once
+per batch. Each line is one batch in Extended JSON, so datetimes and
+ObjectIds round-trip. A segment is sealed (renamed to ``.seg``) once it
+reaches ``TELEMETRY_SPOOL_SEGMENT_BYTES``, or when a drain starts. Draining
+claims sealed segments oldest first with an atomic rename, so processes
+sharing the directory never replay a segment twice. A segment is deleted
+only after all of its batches were written; otherwise it goes back for the
+next drain, so replay is at least once. Segments left open or claimed by
+dead processes are sealed again. When the spool grows past
+``TELEMETRY_SPOOL_MAX_BYTES``, the oldest sealed segments are evicted.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from datetime import timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from bson import json_util
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_JSON_OPTIONS = json_util.JSONOptions(tz_aware=True, tzinfo=timezone.utc)
+_OPEN, _SEALED, _CLAIMED = ".open", ".seg", ".claimed"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _owner(path: Path) -> int:
+    # "<pid>-<seq>.open", "<pid>-<seq>.seg" or "<pid>-<seq>.seg.<claimer pid>.claimed"
+    if path.name.endswith(_CLAIMED):
+        return int(path.name[: -len(_CLAIMED)].rsplit(".", 1)[1])
+    return int(path.name.split("-", 1)[0])
+
+
+class TelemetrySpool:
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._file = None
+        self._path: Optional[Path] = None
+        self._pid: Optional[int] = None
+        self._seq = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.evicted_segments = 0
+        self.evicted_bytes = 0
+
+    @property
+    def directory(self) -> Optional[Path]:
+        directory = self._directory if self._directory is not None else getattr(settings, "TELEMETRY_SPOOL_DIR", "")
+        return Path(directory) if directory else None
+
+    @property
+    def segment_bytes(self) -> int:
+        return getattr(settings, "TELEMETRY_SPOOL_SEGMENT_BYTES", 4 * 1024 * 1024)
+
+    @property
+    def max_bytes(self) -> int:
+        return getattr(settings, "TELEMETRY_SPOOL_MAX_BYTES", 256 * 1024 * 1024)
+
+    def append(self, collection: str, events: list[dict]) -> bool:
+        """Spool one batch; False when spooling is disabled or the disk write failed."""
+        directory = self.directory
+        if directory is None:
+            return False
+        line = json_util.dumps({"collection": collection, "events": events}, json_options=_JSON_OPTIONS) + "\n"
+        try:
+            with self._lock:
+                handle = self._open_segment(directory)
+                handle.write(line.encode())
+                handle.flush()
+                if handle.tell() >= self.segment_bytes:
+                    self._seal()
+            self.spooled += len(events)
+            self._enforce_cap(directory)
+        except OSError:
+            logger.warning("Could not spool %s telemetry events to %s", len(events), directory, exc_info=True)
+            return False
+        return True
+
+    def _open_segment(self, directory: Path):
+        # A forked child must not share its parent's open segment.
+        if self._file is not None and self._pid == os.getpid():
+            return self._file
+        directory.mkdir(parents=True, exist_ok=True)
+        self._pid = os.getpid()
+        self._seq += 1
+        self._path = directory / f"{self._pid}-{self._seq:08d}{_OPEN}"
+        self._file = open(self._path, "ab")
+        return self._file
+
+    def _seal(self) -> None:
+        if self._file is None or self._pid != os.getpid():
+            self._file = None
+            return
+        self._file.close()
+        if self._path.stat().st_size:
+            os.replace(self._path, self._path.with_suffix(_SEALED))
+        else:
+            self._path.unlink()
+        self._file = None
+        self._path = None
+
+    def _segments(self, directory: Path, suffix: str) -> list[Path]:
+        # Other processes rename and delete segments concurrently.
+        segments = []
+        try:
+            for path in directory.iterdir():
+                if path.name.endswith(suffix):
+                    try:
+                        segments.append((path.stat().st_mtime, path.name, path))
+                    except FileNotFoundError:
+                        continue
+        except FileNotFoundError:
+            return []
+        return [path for _, _, path in sorted(segments)]
+
+    def _enforce_cap(self, directory: Path) -> None:
+        segments = self._segments(directory, _SEALED)
+        total = sum(_size(path) for path in directory.iterdir())
+        for path in segments:
+            if total <= self.max_bytes:
+                break
+            size = _size(path)
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            total -= size
+            self.evicted_segments += 1
+            self.evicted_bytes += size
+            logger.warning("Telemetry spool over %s bytes; evicted %s", self.max_bytes, path.name)
+
+    def _recover_orphans(self, directory: Path) -> None:
+        for suffix in (_OPEN, _CLAIMED):
+            for path in self._segments(directory, suffix):
+                if _pid_alive(_owner(path)):
+                    continue
+                original = path.name.split(_SEALED, 1)[0] if suffix == _CLAIMED else path.stem
+                try:
+                    os.replace(path, directory / f"{original}{_SEALED}")
+                except FileNotFoundError:
+                    continue
+
+    def pending(self) -> bool:
+        directory = self.directory
+        if directory is None:
+            return False
+        return self._file is not None or bool(self._segments(directory, _SEALED))
+
+    def drain(self, write: Callable[[str, list[dict]], Any], max_segments: Optional[int] = None) -> int:
+        """Replay sealed segments through ``write``; returns the number of events replayed."""
+        directory = self.directory
+        if directory is None:
+            return 0
+        with self._lock:
+            self._seal()
+        self._recover_orphans(directory)
+        replayed = 0
+        for n, path in enumerate(self._segments(directory, _SEALED)):
+            if max_segments is not None and n >= max_segments:
+                break
+            claimed = path.with_name(f"{path.name}.{os.getpid()}{_CLAIMED}")
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue  # another process claimed it
+            try:
+                replayed += self._replay(claimed, write)
+            except Exception:
+                os.replace(claimed, path)
+                logger.warning("Telemetry spool replay of %s failed; will retry", path.name, exc_info=True)
+                break
+            claimed.unlink()
+        self.replayed += replayed
+        return replayed
+
+    @staticmethod
+    def _replay(path: Path, write: Callable[[str, list[dict]], Any]) -> int:
+        batches: dict[str, list[dict]] = {}
+        with open(path, "rb") as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                try:
+                    record = json_util.loads(line, json_options=_JSON_OPTIONS)
+                except ValueError:
+                    logger.warning("Skipping corrupt line in telemetry spool segment %s", path.name)
+                    continue
+                batches.setdefault(record["collection"], []).extend(record["events"])
+        for collection, events in batches.items():
+            write(collection, events)
+        return sum(len(events) for events in batches.values())
+
+    def stats(self) -> dict[str, Any]:
+        directory = self.directory
+        segments = self._segments(directory, _SEALED) if directory is not None else []
+        return {
+            "enabled": directory is not None,
+            "segments": len(segments),
+            "bytes": sum(_size(path) for path in segments),
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "evicted_segments": self.evicted_segments,
+            "evicted_bytes": self.evicted_bytes,
+        }
@@ -1,13 +1,35 @@
 import logging
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 
-from celery import shared_task
+from celery import group, shared_task
+from django.conf import settings
 
+from .daily_usage import compact_partition, compact_users, day_bounds, day_users, partition_count, partition_users
 from .services.analytics_services import AnalyticsService
+from .telemetry import PartialBatchError, validate_batch
+from .timeseries import collection_kind
 
 logger = logging.getLogger(__name__)
 
 
+@shared_task(bind=True, max_retries=2, queue="analytics")
+def ingest_telemetry_batch(self, collection: str, events: list, skip_stored: bool = False):
+    """One buffered batch from a web process (TELEMETRY_SINK = "celery")."""
+    docs, invalid = validate_batch(collection, events)
+    if invalid:
+        logger.warning("Dropped %s invalid %s event(s)", invalid, collection)
+    try:
+        AnalyticsService().insert_batch(collection, docs, skip_stored=skip_stored)
+    except PartialBatchError as e:
+        # Retry only what was not stored.
+        logger.error("Failed to ingest part of a %s telemetry batch: %s", collection, e)
+        self.retry(exc=e, args=(collection, e.failed, skip_stored), countdown=60)
+    except Exception as e:
+        logger.error("Failed to ingest %s telemetry batch: %s", collection, e)
+        self.retry(exc=e, countdown=60)
+
+
+# Single-event tasks; kept for messages published before the telemetry buffer.
 @shared_task(bind=True, max_retries=2, queue="analytics")
 def log_http_request_task(self, data: dict):
     try:
@@ -73,99 +95,66 @@ def log_slow_query_task(self, data: dict):
 
 
 @shared_task(queue="analytics")
-def aggregate_daily_usage():
+def aggregate_daily_usage(day: str | None = None):
     """
-    Roll up per-user metrics for the previous UTC day.
-    HTTP stats come from `http_requests`; top collections from `db_operations`
-    (HTTP logs do not carry collection names).
+    Fan the compaction of ``day`` (default: the day of the hour that just closed)
+    out over user-id hash partitions, one subtask each. The day's users are
+    listed once here and each subtask gets its slice. Runs hourly, so the
+    current day's aggregate trails by at most an hour.
     """
-    yesterday = datetime.now(timezone.utc) - timedelta(days=1)
-    date_str = yesterday.strftime("%Y-%m-%d")
-    start = datetime(yesterday.year, yesterday.month, yesterday.day, tzinfo=timezone.utc)
-    end = start + timedelta(days=1)
+    if day is None:
+        day = (datetime.now(timezone.utc) - timedelta(hours=1)).date().isoformat()
+    partitions = partition_count()
+    users = day_users(AnalyticsService().db, *day_bounds(date.fromisoformat(day)))
+    group(
+        compact_daily_usage_partition.s(day, partition, partitions, user_ids)
+        for partition, user_ids in enumerate(partition_users(users, partitions))
+        if user_ids
+    ).apply_async()
+    logger.info("Daily aggregation for %s dispatched over %s partitions (%s users)", day, partitions, len(users))
 
-    svc = AnalyticsService()
-    time_filter = {"timestamp": {"$gte": start, "$lt": end}}
-
-    pipeline_http = [
-        {"$match": time_filter},
-        {
-            "$group": {
-                "_id": "$user_id",
-                "total_requests": {"$sum": 1},
-                "avg_duration": {"$avg": "$duration_ms"},
-                "error_count": {"$sum": {"$cond": [{"$eq": ["$success", False]}, 1, 0]}},
-            }
-        },
-    ]
-    http_by_user = {}
-    for doc in svc.db["http_requests"].aggregate(pipeline_http):
-        uid = doc["_id"]
-        http_by_user[uid] = {
-            "total_requests": doc["total_requests"],
-            "avg_duration": doc.get("avg_duration") or 0.0,
-            "error_count": doc["error_count"],
-        }
-
-    pipeline_coll = [
-        {"$match": {**time_filter, "collection": {"$exists": True, "$nin": ["", "system", "unknown"]}}},
-        {
-            "$group": {
-                "_id": {"uid": "$user_id", "c": "$collection"},
-                "n": {"$sum": 1},
-            }
-        },
-        {"$sort": {"n": -1}},
-        {
-            "$group": {
-                "_id": "$_id.uid",
-                "items": {"$push": {"collection": "$_id.c", "operations": "$n"}},
-            }
-        },
-        {"$project": {"user_id": "$_id", "top_collections": {"$slice": ["$items", 10]}}},
-    ]
-    coll_by_user = {}
-    for doc in svc.db["db_operations"].aggregate(pipeline_coll):
-        coll_by_user[doc["user_id"]] = doc.get("top_collections") or []
-
-    all_users = set(http_by_user) | set(coll_by_user)
-    for uid in all_users:
-        h = http_by_user.get(
-            uid,
-            {"total_requests": 0, "avg_duration": 0.0, "error_count": 0},
-        )
-        total = int(h["total_requests"])
-        err = int(h["error_count"])
-        payload = {
-            "user_id": uid,
-            "date": date_str,
-            "total_requests": total,
-            "avg_duration_ms": float(h["avg_duration"]),
-            "error_rate": (err / total) if total else 0.0,
-            "top_collections": coll_by_user.get(uid, []),
-            "top_endpoints": [],
-        }
-        svc.db["daily_aggregates"].update_one(
-            {"user_id": uid, "date": date_str},
-            {"$set": payload},
-            upsert=True,
-        )
-    logger.info("Daily aggregation for %s completed (%s users)", date_str, len(all_users))
+
+@shared_task(bind=True, max_retries=2, queue="analytics")
+def compact_daily_usage_partition(self, day: str, partition: int, partitions: int, user_ids: list | None = None):
+    try:
+        db = AnalyticsService().db
+        if user_ids is None:
+            # Messages queued before partitions carried their users.
+            users = compact_partition(db, date.fromisoformat(day), partition, partitions)
+        else:
+            users = compact_users(db, date.fromisoformat(day), user_ids)
+    except Exception as e:
+        logger.error("Daily aggregation for %s partition %s failed: %s", day, partition, e)
+        self.retry(exc=e, countdown=60)
+    else:
+        logger.info("Daily aggregation for %s partition %s/%s: %s users", day, partition, partitions, users)
 
 
 @shared_task(queue="maintenance")
-def cleanup_old_analytics(days_to_keep=30):
+def cleanup_old_analytics(days_to_keep=None):
+    """Prune telemetry kept in regular collections.
+
+    Time-series collections expire through expireAfterSeconds and are skipped.
+    """
+    if days_to_keep is None:
+        days_to_keep = getattr(settings, "TELEMETRY_RETENTION_DAYS", 30)
+    if not days_to_keep or days_to_keep <= 0:
+        return
     cutoff = datetime.now(timezone.utc) - timedelta(days=days_to_keep)
     svc = AnalyticsService()
     collections = [
-        "http_requests",
-        "db_operations",
-        "performance_metrics",
-        "client_info",
-        "errors",
+        "request_events",
         "mongo_details",
         "slow_queries",
+        # Renamed by the request event backfill; deleting from a missing collection is a no-op.
+        "http_requests_legacy",
+        "db_operations_legacy",
+        "performance_metrics_legacy",
+        "client_info_legacy",
+        "errors_legacy",
     ]
     for coll in collections:
+        if collection_kind(svc.db, coll) != "collection":
+            continue
         result = svc.db[coll].delete_many({"timestamp": {"$lt": cutoff}})
         logger.info("Deleted %s documents from %s", result.deleted_count, coll)
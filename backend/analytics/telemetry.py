@@ -0,0 +1,433 @@
+"""
+In-process telemetry buffer.
+
+Request paths used to publish one Celery message per telemetry event (up to
+seven per request), each a synchronous broker round trip followed by a worker
+``insert_one``. ``record_*`` now appends the event to a bounded per-collection
+queue and returns. A request contributes one wide ``request_events`` document
+(``begin_request_event``/``record_request_event``, see
+analytics.request_events); database operations recorded while it is active
+are attached to it. A daemon flusher thread drains the queues every
+``TELEMETRY_FLUSH_INTERVAL_SECONDS`` (sooner when a queue reaches
+``TELEMETRY_BATCH_SIZE``), validates each event against its schema and writes
+one ``insert_many`` per collection. With ``TELEMETRY_SINK = "celery"`` the
+flusher hands each batch to ``analytics.tasks.ingest_telemetry_batch``
+instead, so MongoDB writes stay on the analytics workers.
+
+The producer path takes no lock: ``deque.append``/``popleft`` are atomic and
+counters use ``itertools.count``. When a queue holds
+``TELEMETRY_BUFFER_CAPACITY`` events, new events are dropped and counted.
+``telemetry_stats()`` reports per-collection enqueued, dropped, flushed and
+failed counts, queue depth and flush latency.
+
+Under write pressure the buffer sheds low-priority telemetry before queues
+fill (analytics.load_shedding); events shed that way are counted by class,
+not as dropped. Batches whose write fails go to a disk spool
+(analytics.spool) and are replayed, one segment per flush, once writes
+succeed again. After one failed write, the rest of that flush is spooled
+without calling the sink again, and direct writes are bounded by
+``TELEMETRY_WRITE_TIMEOUT_SECONDS``.
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextvars
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+import pymongo
+from django.conf import settings
+from django.http import RawPostDataException
+from pydantic import BaseModel, ValidationError
+
+from analytics.load_shedding import LoadShedder
+from analytics.request_events import REQUEST_EVENTS, new_request_id
+from analytics.schemas import MongoDetailSchema, RequestEventSchema, SlowQuerySchema
+from analytics.spool import TelemetrySpool
+
+logger = logging.getLogger(__name__)
+
+SCHEMAS: dict[str, type[BaseModel]] = {
+    REQUEST_EVENTS: RequestEventSchema,
+    "mongo_details": MongoDetailSchema,
+    "slow_queries": SlowQuerySchema,
+}
+
+
+def validate_batch(collection: str, events: list[dict]) -> tuple[list[dict], int]:
+    """Schema-checked documents for ``collection`` and the number of invalid events."""
+    schema = SCHEMAS[collection]
+    docs, invalid = [], 0
+    for event in events:
+        try:
+            docs.append(schema(**event).model_dump())
+        except ValidationError as exc:
+            invalid += 1
+            logger.debug("Dropping invalid %s event: %s", collection, exc)
+    return docs, invalid
+
+
+class PartialBatchError(Exception):
+    """A sink stored part of a batch; ``failed`` holds the events to retry."""
+
+    def __init__(self, failed: list[dict]):
+        super().__init__(f"{len(failed)} telemetry events not stored")
+        self.failed = failed
+
+
+class _Counter:
+    """Event counter for producer threads; ``next()`` on ``itertools.count`` is atomic under the GIL."""
+
+    def __init__(self):
+        self._count = itertools.count(1)
+        self.value = 0
+
+    def incr(self) -> None:
+        self.value = next(self._count)
+
+
+class _Queue:
+    def __init__(self):
+        self.events: deque = deque()
+        self.enqueued = _Counter()
+        self.dropped = _Counter()
+        self.flushed = 0
+        self.failed = 0
+        self.spooled = 0
+        self.invalid = 0
+
+
+class TelemetryBuffer:
+    def __init__(
+        self,
+        write_batch: Optional[Callable[[str, list[dict]], None]] = None,
+        spool: Optional[TelemetrySpool] = None,
+    ):
+        self._queues = {name: _Queue() for name in SCHEMAS}
+        self._write_batch = write_batch
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        self.shedder = LoadShedder()
+        self.spool = spool or TelemetrySpool()
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return getattr(settings, "TELEMETRY_BUFFER_CAPACITY", 10_000)
+
+    @property
+    def batch_size(self) -> int:
+        return getattr(settings, "TELEMETRY_BATCH_SIZE", 500)
+
+    @property
+    def interval(self) -> float:
+        return getattr(settings, "TELEMETRY_FLUSH_INTERVAL_SECONDS", 1.0)
+
+    def add(self, collection: str, event: dict) -> bool:
+        """Queue one event; False if the buffer is full and it was dropped."""
+        queue = self._queues[collection]
+        depth = len(queue.events)
+        if depth >= self.capacity:
+            queue.dropped.incr()
+            return False
+        self.shedder.escalate_for_depth(depth / self.capacity)
+        event = self.shedder.apply(collection, event)
+        if event is None:
+            return False
+        event.setdefault("timestamp", datetime.now(timezone.utc))
+        queue.events.append(event)
+        queue.enqueued.incr()
+        if len(queue.events) >= self.batch_size:
+            self._wake.set()
+        self._ensure_flusher()
+        return True
+
+    def _ensure_flusher(self) -> None:
+        # Threads do not survive fork(); each worker process starts its own.
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="telemetry-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def _drain(self, queue: _Queue) -> list[dict]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(queue.events.popleft())
+            except IndexError:
+                break
+        return batch
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of events written."""
+        started = time.perf_counter()
+        written = 0
+        slowest_write_ms = None
+        sink_down = False
+        for collection, queue in self._queues.items():
+            while True:
+                batch = self._drain(queue)
+                if not batch:
+                    break
+                if sink_down:
+                    # Each attempt against a down sink can block for its whole timeout.
+                    self._spool(collection, batch, queue)
+                else:
+                    write_started = time.perf_counter()
+                    flushed = queue.flushed
+                    try:
+                        written += self._write(collection, batch, queue)
+                    except PartialBatchError as exc:
+                        # Only what was not stored is spooled; replaying the rest would duplicate it.
+                        sink_down = True
+                        written += queue.flushed - flushed
+                        logger.warning("Telemetry flush to %s partly failed: %s", collection, exc)
+                        self._spool(collection, exc.failed, queue)
+                    except Exception:
+                        sink_down = True
+                        logger.warning("Telemetry flush to %s failed", collection, exc_info=True)
+                        self._spool(collection, batch, queue)
+                    write_ms = (time.perf_counter() - write_started) * 1000
+                    slowest_write_ms = max(slowest_write_ms or 0.0, write_ms)
+                if len(batch) < self.batch_size:
+                    break
+        depth = max(len(queue.events) for queue in self._queues.values()) / self.capacity
+        self.shedder.observe(slowest_write_ms, depth)
+        if not sink_down and self.spool.pending():
+            written += self.replay_spool(max_segments=1)
+        if written:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        return written
+
+    def _spool(self, collection: str, batch: list[dict], queue: _Queue) -> None:
+        if self.spool.append(collection, batch):
+            queue.spooled += len(batch)
+            logger.info("Spooled %s %s events", len(batch), collection)
+        else:
+            queue.failed += len(batch)
+            logger.warning("Lost %s %s events (telemetry spool unavailable)", len(batch), collection)
+
+    def replay_spool(self, max_segments: Optional[int] = None) -> int:
+        """Write spooled batches through the configured sink; returns the number of events replayed."""
+
+        def write(collection: str, events: list[dict]) -> None:
+            for i in range(0, len(events), self.batch_size):
+                self._write(collection, events[i : i + self.batch_size], self._queues[collection], replay=True)
+
+        try:
+            return self.spool.drain(write, max_segments=max_segments)
+        except OSError:
+            logger.warning("Could not read the telemetry spool", exc_info=True)
+            return 0
+
+    def _write(self, collection: str, batch: list[dict], queue: _Queue, *, replay: bool = False) -> int:
+        """Hand ``batch`` to the sink; replayed batches skip request events that are already stored."""
+        if getattr(settings, "TELEMETRY_SINK", "mongo") == "celery":
+            from analytics.tasks import ingest_telemetry_batch
+
+            ingest_telemetry_batch.delay(collection, batch, skip_stored=replay)
+            queue.flushed += len(batch)
+            return len(batch)
+        docs, invalid = validate_batch(collection, batch)
+        queue.invalid += invalid
+        if docs:
+            try:
+                if self._write_batch is not None:
+                    self._write_batch(collection, docs)
+                else:
+                    write_telemetry_batch(collection, docs, skip_stored=replay)
+            except PartialBatchError as exc:
+                queue.flushed += len(docs) - len(exc.failed)
+                raise
+        queue.flushed += len(docs)
+        return len(docs)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the flusher and write what is left (process shutdown)."""
+        self._stopping.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            thread.join(timeout)
+        self._thread = None
+        self.flush()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "collections": {
+                name: {
+                    "queued": len(queue.events),
+                    "enqueued": queue.enqueued.value,
+                    "dropped": queue.dropped.value,
+                    "flushed": queue.flushed,
+                    "failed": queue.failed,
+                    "spooled": queue.spooled,
+                    "invalid": queue.invalid,
+                }
+                for name, queue in self._queues.items()
+            },
+            "flushes": self.flushes,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "shedding": self.shedder.stats(),
+            "spool": self.spool.stats(),
+        }
+
+
+def write_telemetry_batch(collection: str, docs: list[dict], *, skip_stored: bool = False) -> None:
+    from analytics.services.analytics_services import AnalyticsService
+
+    service = AnalyticsService()
+    # Bounds server selection too, so a down analytics Mongo fails fast and the batch is spooled.
+    with pymongo.timeout(getattr(settings, "TELEMETRY_WRITE_TIMEOUT_SECONDS", 5.0)):
+        service.insert_batch(collection, docs, skip_stored=skip_stored)
+
+
+telemetry_buffer = TelemetryBuffer()
+atexit.register(telemetry_buffer.stop)
+
+
+def telemetry_stats() -> dict[str, Any]:
+    return telemetry_buffer.stats()
+
+
+_current_event: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "telemetry_request_event", default=None
+)
+
+
+def begin_request_event(request) -> tuple[dict, contextvars.Token]:
+    """Open the request's event; views annotate it until ``end_request_event``."""
+    event = {"request_id": new_request_id(request.META.get("HTTP_X_REQUEST_ID")), "db_operations": []}
+    request.request_id = event["request_id"]
+    return event, _current_event.set(event)
+
+
+def end_request_event(token: contextvars.Token) -> None:
+    _current_event.reset(token)
+
+
+def current_request_event() -> Optional[dict]:
+    return _current_event.get()
+
+
+def current_request_id() -> Optional[str]:
+    event = _current_event.get()
+    return event["request_id"] if event is not None else None
+
+
+def request_size_bytes(request) -> int:
+    try:
+        return len(request.body) if request.body else 0
+    except RawPostDataException:
+        return int(request.META.get("CONTENT_LENGTH") or 0)
+
+
+def request_event_fields(
+    request,
+    *,
+    user_id: str,
+    status_code: int,
+    duration_ms: float,
+    response_size: int,
+    db_fields: Optional[dict] = None,
+    error_message: Optional[str] = None,
+) -> dict:
+    """Status, timing, sizes, client and error parts of a request event."""
+    request_size = request_size_bytes(request)
+    warning = None
+    if duration_ms > 1000:
+        warning = "slow_request"
+    elif request_size > 1024 * 1024:
+        warning = "large_request"
+    db_fields = db_fields or {}
+    db_ms = db_fields.get("db_time_ms")
+    fields = {
+        "user_id": user_id,
+        "method": request.method,
+        "path": request.path,
+        "status_code": status_code,
+        "success": 200 <= status_code < 300 and error_message is None,
+        "duration_ms": round(duration_ms, 2),
+        "timing": {
+            "db_ms": db_ms,
+            "db_pool_wait_ms": db_fields.get("db_pool_wait_ms"),
+            "app_ms": round(duration_ms - db_ms, 2) if db_ms is not None else None,
+            "db_commands": db_fields.get("db_commands"),
+            "db_failed_commands": db_fields.get("db_failed_commands"),
+        },
+        "sizes": {
+            "request_bytes": request_size,
+            "response_bytes": response_size,
+            "throughput_bytes_per_sec": round(response_size / (duration_ms / 1000), 2) if duration_ms > 0 else 0,
+            "warning": warning,
+        },
+        "client": {
+            "ip": request.META.get("REMOTE_ADDR", ""),
+            "user_agent": request.META.get("HTTP_USER_AGENT", "")[:200],
+            "content_type": request.content_type,
+        },
+        "error": None,
+    }
+    if status_code >= 400 or error_message is not None:
+        fields["error"] = {
+            "type": "server_error" if status_code >= 500 else "client_error",
+            "message": error_message,
+        }
+    return fields
+
+
+def record_request_event(event: dict) -> None:
+    telemetry_buffer.add(REQUEST_EVENTS, event)
+
+
+def record_db_operation(data: dict) -> None:
+    """Attach a database operation to the active request's event.
+
+    Outside a request it is written as an event of its own.
+    """
+    event = _current_event.get()
+    if event is not None:
+        event["db_operations"].append(data)
+        return
+    record_request_event({
+        "request_id": new_request_id(),
+        "user_id": data.get("user_id"),
+        "db_operations": [data],
+    })
+
+
+def record_mongo_detail(data: dict) -> None:
+    data.setdefault("request_id", current_request_id())
+    telemetry_buffer.add("mongo_details", data)
+
+
+def record_slow_query(data: dict) -> None:
+    data.setdefault("request_id", current_request_id())
+    telemetry_buffer.add("slow_queries", data)
@@ -0,0 +1,232 @@
+"""
+In-memory Mongo for analytics tests that need stored documents rather than
+call mocks. Operators it does not know raise NotImplementedError instead of
+matching silently; extend it here when a test needs more.
+"""
+
+import operator
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import CollectionInvalid
+
+_MISSING = object()
+_COMPARISONS = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+
+def _get_path(doc, path):
+    node = doc
+    for part in path.split("."):
+        if not isinstance(node, dict) or part not in node:
+            return _MISSING
+        node = node[part]
+    return node
+
+
+def mongo_matches(doc, query):
+    """Whether ``doc`` matches a find filter (equality, comparisons, $in/$nin, $exists)."""
+    for key, cond in (query or {}).items():
+        value = _get_path(doc, key)
+        if isinstance(cond, dict) and cond and all(op.startswith("$") for op in cond):
+            for op, operand in cond.items():
+                if op in _COMPARISONS:
+                    try:
+                        ok = value is not _MISSING and _COMPARISONS[op](value, operand)
+                    except TypeError:  # Mongo never matches across types
+                        ok = False
+                elif op in ("$eq", "$ne"):
+                    # Missing fields compare equal to null, as in Mongo.
+                    ok = ((None if value is _MISSING else value) == operand) == (op == "$eq")
+                elif op == "$in":
+                    ok = value is not _MISSING and value in operand
+                elif op == "$nin":
+                    ok = value is _MISSING or value not in operand
+                elif op == "$exists":
+                    ok = (value is not _MISSING) == bool(operand)
+                else:
+                    raise NotImplementedError(f"fake Mongo does not support {op}")
+                if not ok:
+                    return False
+        elif (None if value is _MISSING else value) != cond:
+            return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return dict(doc)
+    included = {key for key, flag in projection.items() if flag and key != "_id"}
+    if included:
+        keep = included | ({"_id"} if projection.get("_id", 1) else set())
+        return {key: value for key, value in doc.items() if key in keep}
+    return {key: value for key, value in doc.items() if projection.get(key, 1)}
+
+
+def _set_path(doc, path, value):
+    *parents, leaf = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[leaf] = value
+
+
+class FakeCursor(list):
+    def sort(self, key, direction=1):
+        return FakeCursor(sorted(self, key=lambda doc: doc[key], reverse=direction < 0))
+
+    def limit(self, n):
+        return FakeCursor(self[:n] if n else self)
+
+    async def to_list(self, length=None):
+        return list(self[:length] if length else self)
+
+
+class FakeCollection:
+    def __init__(self, db, name):
+        self.db, self.name, self.docs = db, name, []
+        self.bulk_writes = 0
+
+    def find(self, query=None, projection=None):
+        self.db.scans.append((self.name, "find", query))
+        return FakeCursor(_project(doc, projection) for doc in self.docs if mongo_matches(doc, query))
+
+    def find_one(self, query=None, projection=None):
+        doc = next((doc for doc in self.docs if mongo_matches(doc, query)), None)
+        return None if doc is None else _project(doc, projection)
+
+    def distinct(self, key, query=None):
+        return list({doc.get(key) for doc in self.docs if mongo_matches(doc, query)})
+
+    def aggregate(self, pipeline):
+        # Only the shape is emulated: a trailing $facet returns ``db.facet_rows``.
+        self.db.scans.append((self.name, "aggregate", pipeline))
+        return FakeCursor([dict(self.db.facet_rows)] if "$facet" in pipeline[-1] else [])
+
+    def _insert(self, doc):
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(doc)
+        return doc["_id"]
+
+    def _update(self, query, update, upsert):
+        doc = next((doc for doc in self.docs if mongo_matches(doc, query)), None)
+        inserted = doc is None
+        if inserted:
+            if not upsert:
+                return
+            doc = {key: value for key, value in query.items() if not isinstance(value, dict)}
+            self._insert(doc)
+        for op, fields in update.items():
+            for path, value in fields.items():
+                if op == "$inc":
+                    current = _get_path(doc, path)
+                    _set_path(doc, path, (0 if current is _MISSING else current) + value)
+                elif op == "$set" or (op == "$setOnInsert" and inserted):
+                    _set_path(doc, path, value)
+                elif op != "$setOnInsert":
+                    raise NotImplementedError(f"fake Mongo does not support {op}")
+
+    def _bulk_write(self, ops):
+        self.bulk_writes += 1
+        for op in ops:
+            self._update(op._filter, op._doc, op._upsert)
+
+    def insert_one(self, doc):
+        return SimpleNamespace(inserted_id=self._insert(doc))
+
+    def insert_many(self, docs, ordered=True):
+        for doc in docs:
+            self._insert(doc)
+
+    def update_one(self, query, update, upsert=False):
+        self._update(query, update, upsert)
+
+    def bulk_write(self, ops, ordered=True):
+        self._bulk_write(ops)
+
+    def rename(self, new_name):
+        self.db.kinds[new_name] = self.db.kinds.pop(self.name)
+        self.db.collections[new_name] = self.db.collections.pop(self.name)
+        self.name = new_name
+
+    def drop(self):
+        self.db.kinds.pop(self.name, None)
+        self.db.collections.pop(self.name, None)
+
+
+class FakeAsyncCollection(FakeCollection):
+    """``FakeCollection`` with the awaitable methods of ``AsyncMongoClient``."""
+
+    async def find_one(self, *args, **kwargs):
+        return super().find_one(*args, **kwargs)
+
+    async def distinct(self, *args, **kwargs):
+        return super().distinct(*args, **kwargs)
+
+    async def aggregate(self, pipeline):
+        return super().aggregate(pipeline)
+
+    async def insert_one(self, doc):
+        return super().insert_one(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        return super().insert_many(docs, ordered)
+
+    async def update_one(self, query, update, upsert=False):
+        return super().update_one(query, update, upsert)
+
+    async def bulk_write(self, ops, ordered=True):
+        return super().bulk_write(ops, ordered)
+
+
+class FakeMongoDb:
+    """
+    Database handle: collections appear on first access. ``scans`` records every
+    find/aggregate as ``(collection, kind, query_or_pipeline)``; ``kinds`` is what
+    ``list_collections`` reports and is only changed by create/rename/drop.
+    """
+
+    collection_class = FakeCollection
+
+    def __init__(self):
+        self.collections = {}
+        self.kinds = {}
+        self.created = {}
+        self.commands = []
+        self.scans = []
+        self.facet_rows = {}
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = self.collection_class(self, name)
+        return self.collections[name]
+
+    def list_collections(self, filter=None):
+        name = (filter or {}).get("name")
+        return [{"name": n, "type": kind} for n, kind in self.kinds.items() if name in (None, n)]
+
+    def create_collection(self, name, **options):
+        if name in self.kinds:
+            raise CollectionInvalid(f"collection {name} already exists")
+        self.kinds[name] = "timeseries" if "timeseries" in options else "collection"
+        self.created[name] = options
+        return self[name]
+
+    def command(self, spec):
+        self.commands.append(spec)
+        return {"ok": 1}
+
+
+class FakeAsyncMongoDb(FakeMongoDb):
+    collection_class = FakeAsyncCollection
+
+
+@pytest.fixture
+def fake_mongo_db():
+    """In-memory stand-in for a sync PyMongo database."""
+    return FakeMongoDb()
+
+
+@pytest.fixture
+def fake_async_mongo_db():
+    """In-memory stand-in for an ``AsyncMongoClient`` database."""
+    return FakeAsyncMongoDb()
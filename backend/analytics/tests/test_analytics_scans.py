@@ -0,0 +1,93 @@
+"""Scan-count harness: each analytics endpoint reads the user's events once."""
+
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from analytics import rollups
+from analytics.services import inventory_stats, platform_stats, query
+from analytics.services.inventory_stats import aggregate_db_operations
+from analytics.services.platform_stats import (
+    aggregate_endpoint_volume,
+    aggregate_errors,
+    aggregate_http_overview,
+    aggregate_operation_breakdown,
+)
+
+END = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+START = END - timedelta(days=14)
+
+ENDPOINTS = {
+    "dashboard": lambda: aggregate_http_overview("u1", start=START, end=END),
+    "errors": lambda: aggregate_errors("u1", start=START, end=END),
+    "endpoint_volume": lambda: aggregate_endpoint_volume("u1", start=START, end=END),
+    "operation_breakdown": lambda: aggregate_operation_breakdown("u1", start=START, end=END),
+    "db_operations": lambda: aggregate_db_operations("u1", START, END, db_id="db1"),
+}
+
+
+@pytest.fixture
+def db(monkeypatch, fake_async_mongo_db):
+    db = fake_async_mongo_db
+    monkeypatch.setattr(platform_stats, "_analytics_db", lambda: db)
+    monkeypatch.setattr(inventory_stats, "routed", lambda target: db)
+    return db
+
+
+@pytest.mark.parametrize("endpoint", sorted(ENDPOINTS))
+async def test_uncovered_window_is_one_facet_scan(db, monkeypatch, endpoint):
+    monkeypatch.setattr(rollups, "_since_cache", (time.monotonic(), None))
+
+    await ENDPOINTS[endpoint]()
+
+    assert len(db.scans) == 1
+    collection, kind, pipeline = db.scans[0]
+    assert (collection, kind) == ("request_events", "aggregate")
+    assert pipeline[0] == {"$match": {"user_id": "u1", "timestamp": {"$gte": START, "$lte": END}}}
+    assert list(pipeline[1]) == ["$facet"] and len(pipeline) == 2
+
+
+@pytest.mark.parametrize("endpoint", sorted(ENDPOINTS))
+async def test_covered_window_reads_rollups_only(db, monkeypatch, endpoint):
+    monkeypatch.setattr(rollups, "_since_cache", (time.monotonic(), START - timedelta(days=1)))
+
+    await ENDPOINTS[endpoint]()
+
+    # Hour buckets for the inner hours, minute buckets and raw events only for the edges.
+    assert not [scan for scan in db.scans if scan[1] == "aggregate"]
+    assert [scan[0] for scan in db.scans if scan[0] == "rollups_hour"] == ["rollups_hour"]
+
+
+async def test_facet_rows_become_endpoint_payloads(db, monkeypatch):
+    monkeypatch.setattr(rollups, "_since_cache", (time.monotonic(), None))
+    db.facet_rows.update({
+        "errors_by_status_code": [{"_id": 404, "count": 3}, {"_id": 500, "count": 1}],
+        "top_error_endpoints": [{"_id": "/api/v2/crud/", "count": 4}],
+        "error_types": [{"_id": "client_error", "count": 3}],
+    })
+
+    assert await aggregate_errors("u1", start=START, end=END) == {
+        "errors_by_status_code": {"404": 3, "500": 1},
+        "top_error_endpoints": [{"path": "/api/v2/crud/", "errors": 4}],
+        "error_types": {"client_error": 3},
+    }
+
+
+@pytest.mark.parametrize("path", [
+    "/api/v2/crud/", "/api/v2/files/65f1c0ffee0123456789abcd/download/", "/api/v2/jobs/42",
+    "/api/v2/keys/0f8fad5b-d9cb-469f-a165-70867728950e/", "/api/v2/v2/", "", None,
+])
+def test_raw_endpoint_groups_match_rollup_endpoint_keys(path):
+    regex = query._ENDPOINT["$let"]["vars"]["segments"]["$map"]["in"]["$cond"][0]["$regexMatch"]["regex"]
+    segments = ["{id}" if re.search(regex, segment) else segment for segment in (path or "").split("/")]
+
+    assert ("/".join(segments) or "/") == rollups.unescape_key(rollups.endpoint_key(path))
+    for metric in (query.ENDPOINT_VOLUME, query.TOP_ERROR_ENDPOINTS):
+        group = next(stage["$group"] for stage in metric.stages if "$group" in stage)
+        assert group["_id"] is query._ENDPOINT
+
+
+def test_error_types_are_not_truncated_unsorted():
+    assert not [stage for stage in query.ERROR_TYPES.stages if "$limit" in stage]
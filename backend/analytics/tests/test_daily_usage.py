@@ -0,0 +1,106 @@
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from analytics import daily_usage, tasks
+from analytics.daily_usage import backfill_daily_usage, compact_day, partition_of
+from analytics.rollups import fold_event, rollup_updates
+
+DAY = date(2026, 3, 9)
+START = datetime(2026, 3, 9, tzinfo=timezone.utc)
+
+
+def _event(hour, *, user, path="/api/v2/crud/", status=200, collection="orders"):
+    return {
+        "user_id": user, "timestamp": START + timedelta(hours=hour, minutes=7), "method": "GET", "path": path,
+        "status_code": status, "success": status < 400, "duration_ms": 20.0,
+        "db_operations": [{"db_id": "db1", "collection": collection, "operation_type": "document_query"}],
+    }
+
+
+def _seed(db, events, since):
+    db["request_events"].docs = [dict(event) for event in events]
+    db["rollup_state"].docs.append({"_id": "rollups", "since": since})
+    rolled = [event for event in events if event["timestamp"] >= since]
+    for op in rollup_updates(rolled, now=START + timedelta(days=3))["rollups_hour"]:
+        db["rollups_hour"].update_one(op._filter, op._doc, upsert=True)
+    return db
+
+
+def test_day_mixes_raw_hours_before_rollups_with_hour_buckets(settings, fake_mongo_db):
+    settings.DAILY_USAGE_PARTITIONS = 4
+    users = [f"user{i}" for i in range(12)]
+    events = [
+        _event(hour, user=user, path=f"/api/v2/{'files' if hour % 3 else 'crud'}/", status=500 if hour == 4 else 200)
+        for user in users for hour in range(0, 24, 2)
+    ]
+    events.append(_event(23, user="user0", path="/api/v2/files/", collection="system"))
+    db = _seed(fake_mongo_db, events, since=START + timedelta(hours=10))
+
+    assert compact_day(db, DAY) == len(users)
+
+    rows = {row["user_id"]: row for row in db["daily_aggregates"].docs}
+    assert set(rows) == set(users)
+    expected = {}
+    for event in events:
+        if event["user_id"] == "user0":
+            fold_event(expected, event)
+    row = rows["user0"]
+    assert row["date"] == "2026-03-09" and row["total_requests"] == expected["requests"] == 13
+    assert row["error_rate"] == 1 / 13 and row["avg_duration_ms"] == 20.0
+    assert row["top_collections"] == [{"collection": "orders", "operations": 12}]
+    assert row["top_endpoints"] == [{"endpoint": "/api/v2/files/", "requests": 9},
+                                    {"endpoint": "/api/v2/crud/", "requests": 4}]
+    # One bulk_write per non-empty partition.
+    assert db["daily_aggregates"].bulk_writes == len({partition_of(user, 4) for user in users})
+
+
+def test_recompaction_is_idempotent_and_backfill_resumes(settings, monkeypatch, fake_mongo_db):
+    settings.DAILY_USAGE_PARTITIONS = 2
+    events = [_event(1, user="a"), _event(30, user="a"), _event(50, user="b")]
+    db = _seed(fake_mongo_db, events, since=START - timedelta(days=1))
+    calls = []
+    original = daily_usage.compact_day
+
+    def flaky(db, day, partitions=None):
+        if day == DAY + timedelta(days=2) and not calls:
+            calls.append(day)
+            raise RuntimeError("worker lost")
+        return original(db, day, partitions)
+
+    monkeypatch.setattr(daily_usage, "compact_day", flaky)
+    with pytest.raises(RuntimeError):
+        backfill_daily_usage(db, DAY, DAY + timedelta(days=2))
+    assert db["daily_usage_backfill"].docs[0]["last_day"] == "2026-03-10"
+    assert backfill_daily_usage(db, DAY, DAY + timedelta(days=2)) == 1
+    assert backfill_daily_usage(db, DAY, DAY + timedelta(days=2), restart=True) == 3
+
+    rows = sorted((row["user_id"], row["date"], row["total_requests"]) for row in db["daily_aggregates"].docs)
+    assert rows == [("a", "2026-03-09", 1), ("a", "2026-03-10", 1), ("b", "2026-03-11", 1)]
+
+
+def test_day_users_are_listed_once_and_sliced_per_partition(settings, monkeypatch, fake_mongo_db):
+    settings.DAILY_USAGE_PARTITIONS = 4
+    users = [f"user{i}" for i in range(12)]
+    db = _seed(fake_mongo_db, [_event(hour, user=user) for user in users for hour in (2, 14)],
+               since=START + timedelta(hours=10))
+    distinct = {name: mock.patch.object(db[name], "distinct", wraps=db[name].distinct)
+                for name in ("rollups_hour", "request_events")}
+    calls = {name: patcher.start() for name, patcher in distinct.items()}
+    try:
+        assert compact_day(db, DAY) == len(users)
+        assert {name: call.call_count for name, call in calls.items()} == {"rollups_hour": 1, "request_events": 1}
+
+        monkeypatch.setattr(tasks, "AnalyticsService", lambda: SimpleNamespace(db=db))
+        with mock.patch.object(tasks, "group") as group:
+            tasks.aggregate_daily_usage(DAY.isoformat())
+    finally:
+        mock.patch.stopall()
+
+    signatures = list(group.call_args.args[0])
+    assert sorted(user for sig in signatures for user in sig.args[3]) == sorted(users)
+    for sig in signatures:
+        day, partition, partitions, user_ids = sig.args
+        assert partitions == 4 and all(partition_of(user, 4) == partition for user in user_ids)
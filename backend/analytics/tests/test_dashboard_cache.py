@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+
+from analytics.dashboard_cache import StaleWhileRevalidateCache
+from analytics.views.analytics_views import gather_bounded
+
+
+@pytest.fixture
+def swr(settings):
+    settings.DASHBOARD_CACHE_FRESH_SECONDS = 30
+    settings.DASHBOARD_CACHE_STALE_SECONDS = 300
+    settings.DASHBOARD_CACHE_LOCK_SECONDS = 1
+    cache.clear()
+    yield StaleWhileRevalidateCache("test:dashboard")
+    cache.clear()
+
+
+def _builder(calls, value="v"):
+    async def build():
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return {"value": value, "build": len(calls)}
+    return build
+
+
+async def test_concurrent_cold_loads_share_one_rebuild(swr):
+    calls = []
+    key = swr.key("u1", "2026-03-01", "2026-03-14", 14)
+    results = await asyncio.gather(*(swr.get_or_build(key, _builder(calls)) for _ in range(20)))
+    assert calls == ["v"]
+    assert all(result == {"value": "v", "build": 1} for result in results)
+    assert await swr.get_or_build(key, _builder(calls)) == {"value": "v", "build": 1}
+    assert calls == ["v"]
+
+
+async def test_stale_entry_is_served_while_one_refresh_runs(swr):
+    key = swr.key("u1", "7")
+    await cache.aset(key, {"built_at": time.time() - 60, "value": "old"}, 600)
+    calls = []
+
+    results = await asyncio.gather(*(swr.get_or_build(key, _builder(calls, "new")) for _ in range(10)))
+    assert results == ["old"] * 10
+    await asyncio.gather(*(asyncio.wrap_future(refresh) for refresh in swr._inflight.values()))
+    assert calls == ["new"]
+    assert await swr.get_or_build(key, _builder(calls, "newer")) == {"value": "new", "build": 1}
+
+
+def test_background_refresh_outlives_the_request_loop(swr):
+    key = swr.key("u3", "7")
+    cache.set(key, {"built_at": time.time() - 60, "value": "old"}, 600)
+    calls = []
+
+    # async_to_sync closes its loop, cancelling leftover tasks, once the call returns.
+    assert async_to_sync(swr.get_or_build)(key, _builder(calls, "new")) == "old"
+
+    deadline = time.monotonic() + 5
+    while cache.get(key)["value"] == "old" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get(key)["value"] == {"value": "new", "build": 1}
+
+
+async def test_expired_entry_waits_for_rebuild(swr):
+    key = swr.key("u2", "7")
+    await cache.aset(key, {"built_at": time.time() - 1000, "value": "ancient"}, 600)
+    calls = []
+    assert await swr.get_or_build(key, _builder(calls)) == {"value": "v", "build": 1}
+
+
+async def test_gather_bounded_limits_concurrency():
+    running = peak = 0
+
+    async def query(i):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return i
+
+    assert await gather_bounded(*(query(i) for i in range(10)), limit=3) == list(range(10))
+    assert peak == 3
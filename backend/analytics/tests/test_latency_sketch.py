@@ -0,0 +1,54 @@
+import random
+from datetime import datetime, timezone
+
+from analytics import sketches
+from analytics.rollups import WindowCounters, endpoint_family, fold_event
+
+NOW = datetime(2026, 3, 10, 12, 30, tzinfo=timezone.utc)
+
+
+def _exact(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def _sketch(values):
+    sketch = {}
+    for value in values:
+        key = sketches.bucket_key(value)
+        sketch[key] = sketch.get(key, 0) + 1
+    return sketch
+
+
+def test_merged_quantiles_stay_within_relative_error():
+    random.seed(11)
+    parts = [[random.lognormvariate(3, 1.2) for _ in range(random.randint(1, 400))] for _ in range(300)]
+    values = [value for part in parts for value in part]
+
+    estimates = sketches.quantiles([_sketch(part) for part in parts], (0.5, 0.9, 0.95, 0.99))
+
+    for q, estimate in zip((0.5, 0.9, 0.95, 0.99), estimates):
+        exact = _exact(values, q)
+        assert abs(estimate - exact) <= sketches.RELATIVE_ACCURACY * exact
+
+
+def test_zero_bucket_and_empty_sketches():
+    assert sketches.percentiles_ms([]) == {}
+    assert sketches.percentiles_ms([{}]) == {}
+    low, high = sketches.quantiles([{"z": 3}, {sketches.bucket_key(0.001): 2, sketches.bucket_key(100.0): 1}], (0.5, 0.99))
+    assert low == 0.0 and abs(high - 100.0) <= 1.0
+
+
+def test_window_percentiles_per_endpoint_family():
+    counters = WindowCounters()
+    for path, duration in (("/api/v2/crud/64b7f0c2a1b2c3d4e5f60718/", 10.0), ("/api/v2/files/", 200.0)) * 50:
+        event = {"user_id": "u1", "timestamp": NOW, "method": "GET", "path": path, "status_code": 200,
+                 "success": True, "duration_ms": duration}
+        counters.add("2026-03-10", fold_event({}, event))
+
+    assert endpoint_family("/api/v2/crud/64b7f0c2a1b2c3d4e5f60718/docs") == "/api/v2/crud"
+    assert counters.latency_families() == ["/api/v2/crud", "/api/v2/files"]
+    assert "latency" not in counters.totals
+    assert abs(counters.percentiles_ms("/api/v2/crud")["p99"] - 10.0) <= 0.1
+    overall = counters.percentiles_ms()
+    assert abs(overall["p50"] - 200.0) <= 2.0 and abs(overall["p90"] - 200.0) <= 2.0
@@ -0,0 +1,78 @@
+from unittest import mock
+
+import pytest
+
+from analytics.load_shedding import LoadShedder
+from analytics.telemetry import TelemetryBuffer
+
+
+def _http_event(n=0, status_code=200):
+    event = {"request_id": f"req-{n:08d}", "user_id": "u1", "method": "GET", "path": "/api/v2/crud/",
+             "status_code": status_code, "duration_ms": 1.5, "success": status_code < 400,
+             "timing": {"db_ms": 0.5}, "sizes": {"request_bytes": 0}, "client": {"ip": "10.0.0.1"}, "error": None}
+    if status_code >= 400:
+        event["error"] = {"type": "client_error"}
+    return event
+
+
+@pytest.fixture
+def shedder(settings):
+    settings.TELEMETRY_SHED_WRITE_MS = [100, 500, 2000]
+    settings.TELEMETRY_SHED_QUEUE_FRACTION = [0.5, 0.7, 0.9]
+    settings.TELEMETRY_SHED_RECOVERY_FACTOR = 0.5
+    settings.TELEMETRY_SHED_COOLDOWN_SECONDS = 10
+    return LoadShedder()
+
+
+def test_levels_shed_lowest_priority_first(shedder):
+    shedder.level = 1
+    event = shedder.apply("request_events", _http_event())
+    assert "client" not in event and "sizes" not in event and event["timing"] == {"db_ms": 0.5}
+    assert shedder.apply("mongo_details", {"user_id": "u1"}) is None
+    assert shedder.apply("slow_queries", {"user_id": "u1"}) is not None
+
+    shedder.level = 2
+    assert "timing" not in shedder.apply("request_events", _http_event())
+    assert shedder.apply("slow_queries", {"user_id": "u1"}) is None
+
+    shedder.level = 3
+    assert shedder.apply("request_events", _http_event()) is None
+    assert shedder.apply("request_events", _http_event(status_code=500))["error"] == {"type": "client_error"}
+
+    assert shedder.stats()["shed"] == {"client_info": 4, "performance": 3, "http": 1}
+
+
+def test_escalates_at_once_and_recovers_with_hysteresis(shedder):
+    assert shedder.observe(6000, 0.0, now=0) == 2  # EWMA after one 6 s write is 1.8 s
+    assert shedder.observe(6000, 0.0, now=1) == 3
+
+    # Idle cycles decay the EWMA; stepping down waits for the cooldown, one level at a time.
+    levels = [shedder.observe(None, 0.0, now=now) for now in range(2, 60)]
+    assert levels[0] == 3 and levels[-1] == 0
+    assert [levels.index(level) for level in (2, 1, 0)] == sorted(levels.index(level) for level in (2, 1, 0))
+    assert shedder.transitions == 5
+
+
+def test_signal_between_exit_and_entry_holds_the_level(shedder):
+    shedder.observe(None, 0.75, now=0)
+    assert shedder.level == 2
+    # 0.4 is under the performance entry (0.7) but over its exit (0.35): no step down.
+    for now in range(1, 100):
+        shedder.observe(None, 0.4, now=now)
+    assert shedder.level == 2
+
+
+def test_buffer_sheds_as_queue_fills(settings, shedder):
+    settings.TELEMETRY_SINK = "mongo"
+    settings.TELEMETRY_BATCH_SIZE = 100
+    settings.TELEMETRY_BUFFER_CAPACITY = 10
+    buffer = TelemetryBuffer(write_batch=mock.Mock())
+    with mock.patch.object(buffer, "_ensure_flusher"):
+        accepted = [buffer.add("request_events", _http_event(n)) for n in range(12)]
+
+    assert accepted == [True] * 9 + [False] * 3
+    stats = buffer.stats()
+    assert stats["shedding"]["level"] == "http"
+    # Shedding kicks in before the queue is full, so nothing reaches the drop path.
+    assert stats["shedding"]["shed"]["http"] == 3
+    assert stats["collections"]["request_events"]["dropped"] == 0
@@ -0,0 +1,112 @@
+import json
+import time
+from types import SimpleNamespace
+from unittest import mock
+from unittest.mock import MagicMock
+
+from bson import ObjectId
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from analytics.middleware import DatacubeObservabilityMiddleware
+from analytics.request_events import (
+    COMPAT_VIEWS,
+    backfill_request_events,
+    ensure_compat_views,
+    legacy_to_event,
+)
+from analytics.schemas import RequestEventSchema
+from analytics.telemetry import record_slow_query
+from api.presentation.views.base import BaseAPIView
+
+
+def _api_request():
+    request = RequestFactory().post(
+        "/api/v2/crud/",
+        data=json.dumps({"database_id": "db1", "collection_name": "orders", "documents": [{}, {}]}),
+        content_type="application/json",
+        HTTP_HOST="localhost",
+        HTTP_X_REQUEST_ID="req-0123456789",
+    )
+    request.user = SimpleNamespace(pk="u1", id="u1", is_authenticated=True)
+    return request
+
+
+def test_request_writes_one_wide_event(settings):
+    settings.ANALYTICS_DISABLE_VIEW_TELEMETRY_FOR_API_V2 = False
+
+    def view(request):
+        record_slow_query({"user_id": "u1", "query_details": {}, "duration_ms": 900.0, "threshold_ms": 500, "collection": "orders"})
+        response = HttpResponse(b'{"detail": "bad"}', status=400, content_type="application/json")
+        BaseAPIView._track(request, response, time.perf_counter(), error=ValueError("bad filter"))
+        return response
+
+    with mock.patch("analytics.middleware.record_request_event") as record, \
+            mock.patch("analytics.telemetry.telemetry_buffer.add") as add:
+        response = DatacubeObservabilityMiddleware(view)(_api_request())
+
+    record.assert_called_once()
+    event = record.call_args[0][0]
+    assert event["request_id"] == response["X-Request-ID"] == "req-0123456789"
+    assert (event["status_code"], event["success"]) == (400, False)
+    assert event["error"] == {"type": "client_error", "message": "bad filter"}
+    assert event["sizes"]["request_bytes"] > 0 and event["client"]["content_type"] == "application/json"
+    assert [(op["db_id"], op["collection"], op["document_count"]) for op in event["db_operations"]] == [("db1", "orders", 2)]
+    assert add.call_args[0][1]["request_id"] == "req-0123456789"
+    RequestEventSchema(**event)
+
+
+def test_view_without_middleware_records_its_own_event(settings):
+    settings.ANALYTICS_DISABLE_VIEW_TELEMETRY_FOR_API_V2 = False
+    request = _api_request()
+    request.data = json.loads(request.body)
+    with mock.patch("api.presentation.views.base.record_request_event") as record:
+        BaseAPIView._track(request, HttpResponse(b"ok"), time.perf_counter())
+    event = record.call_args[0][0]
+    assert event["success"] is True and len(event["request_id"]) == 32
+    assert event["db_operations"][0]["operation_type"] == "document_creation"
+
+
+def test_legacy_documents_become_partial_events():
+    legacy_id = ObjectId()
+    event = legacy_to_event("errors", {"_id": legacy_id, "user_id": "u1", "status_code": 503, "error_type": "server_error"})
+    assert event["request_id"] == f"errors:{legacy_id}"
+    assert event["error"] == {"type": "server_error", "message": None}
+    assert "method" not in event and "sizes" not in event
+    RequestEventSchema(**event)
+
+
+def _db(collections):
+    db = MagicMock()
+    named = {}
+    db.__getitem__.side_effect = lambda name: named.setdefault(name, MagicMock())
+    db.list_collections.side_effect = lambda: [{"name": name, "type": kind} for name, kind in collections.items()]
+    return db
+
+
+def test_compat_views_wait_for_legacy_collections():
+    db = _db({"http_requests": "collection", "errors": "view"})
+    created = ensure_compat_views(db)
+    assert set(created) == set(COMPAT_VIEWS) - {"http_requests", "errors"}
+    assert db.command.call_args[0][0]["collMod"] == "errors"
+
+
+def test_backfill_copies_then_swaps_legacy_collection():
+    collections = {"client_info": "collection"}
+    db = _db(collections)
+    legacy = [{"_id": ObjectId(), "user_id": "u1", "client_ip": "10.0.0.1", "user_agent": "curl"}]
+    db["client_info"].find.return_value = legacy
+    db["request_events"].find.return_value = []
+
+    def rename(new_name):
+        collections.pop("client_info")
+        collections[new_name] = "collection"
+
+    db["client_info"].rename.side_effect = rename
+
+    assert backfill_request_events(db, batch_size=10) == {"client_info": 1}
+    (events,), _ = db["request_events"].insert_many.call_args
+    assert events[0]["client"] == {"ip": "10.0.0.1", "user_agent": "curl", "content_type": None}
+    db["client_info"].rename.assert_called_once_with("client_info_legacy")
+    views = {call.args[0] for call in db.create_collection.call_args_list}
+    assert views == set(COMPAT_VIEWS)
@@ -0,0 +1,101 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from analytics import rollups
+from analytics.rollups import (
+    HOUR_COLLECTION,
+    MINUTE_COLLECTION,
+    fold_event,
+    rollup_updates,
+    rollup_window,
+)
+from analytics.services.query import HTTP_DAILY, HTTP_TOTALS, db_operations_metrics
+
+NOW = datetime(2026, 3, 10, 12, 30, 20, tzinfo=timezone.utc)
+
+
+def _event(ts, *, user="u1", method="GET", path="/api/v2/crud/", status=200, db_id="db1"):
+    return {
+        "user_id": user, "timestamp": ts, "method": method, "path": path, "status_code": status,
+        "success": status < 300, "duration_ms": 10.0,
+        "error": {"type": "client_error", "message": None} if status >= 400 else None,
+        "db_operations": [{"db_id": db_id, "collection": "orders", "operation_type": "document_query"}],
+    }
+
+
+@pytest.fixture
+def db(monkeypatch, fake_async_mongo_db):
+    monkeypatch.setattr(rollups, "_since_cache", (0.0, None))
+    db = fake_async_mongo_db
+    db["rollup_state"].docs.append({"_id": "rollups", "since": NOW - timedelta(days=7)})
+    return db
+
+
+def test_batch_is_combined_into_one_upsert_per_bucket():
+    events = [_event(NOW), _event(NOW + timedelta(seconds=5), path="/api/v2/files/64b7f0c2a1b2c3d4e5f60718/a.csv", status=404)]
+    events.append(_event(NOW - timedelta(days=3)))
+    updates = rollup_updates(events, now=NOW)
+
+    assert len(updates[MINUTE_COLLECTION]) == 1
+    assert len(updates[HOUR_COLLECTION]) == 2
+    minute = updates[MINUTE_COLLECTION][0]
+    assert minute._filter == {"user_id": "u1", "bucket": NOW.replace(second=0)}
+    inc = minute._doc["$inc"]
+    assert (inc["requests"], inc["errors"], inc["status.404"], inc["methods.GET"]) == (2, 1, 1, 2)
+    assert inc["endpoints./api/v2/files/{id}/a\u2024csv"] == 1
+    assert inc["dbs.db1.collections.orders"] == 2
+
+
+async def test_window_from_buckets_matches_raw_events(db):
+    random.seed(7)
+    start, end = NOW - timedelta(hours=30, minutes=17, seconds=41), NOW
+    events = [_event(NOW - timedelta(seconds=random.uniform(0, 40 * 3600)), status=random.choice((200, 500)))
+              for _ in range(400)]
+    db["request_events"].docs = events
+    for collection, ops in rollup_updates(events, now=NOW).items():
+        await db[collection].bulk_write(ops)
+
+    counters = await rollup_window(db, "u1", start, end, now=NOW)
+
+    expected = {}
+    for event in events:
+        if start <= event["timestamp"] <= end:
+            fold_event(expected, event)
+    assert counters.totals["requests"] == expected["requests"]
+    assert counters.totals["errors"] == expected["errors"]
+    assert counters.totals["dbs"] == expected["dbs"]
+    assert counters.granularity == {"hour", "minute", "raw"}
+    # Raw reads are limited to the sub-minute edges.
+    for collection, _, query in db.scans:
+        if collection != "request_events":
+            continue
+        window = query["timestamp"]
+        upper = window.get("$lt") or window.get("$lte")
+        assert upper - window["$gte"] < timedelta(minutes=1)
+
+
+async def test_short_or_uncovered_windows_use_raw_pipelines(db):
+    assert await rollup_window(db, "u1", NOW - timedelta(minutes=5), NOW, now=NOW) is None
+    assert await rollup_window(db, "u1", NOW - timedelta(days=30), NOW, now=NOW) is None
+    assert await rollup_window(db, "u1", NOW - timedelta(days=2), NOW, now=NOW) is not None
+
+
+def test_endpoint_payloads_from_rollups():
+    counters = rollups.WindowCounters()
+    counters.add("2026-03-09", fold_event({}, _event(NOW, status=500)))
+    counters.add("2026-03-10", fold_event({}, _event(NOW)))
+    counters.add("2026-03-10", fold_event({}, _event(NOW, db_id="db2")))
+
+    summary = HTTP_TOTALS.from_rollups(counters)
+    assert summary["total_requests"] == 3 and summary["error_rate_percent"] == 33.33
+    assert HTTP_DAILY.from_rollups(counters)["counts"] == [1, 2]
+
+    totals, daily = db_operations_metrics(db_id="db1")
+    assert totals.from_rollups(counters) == {
+        "db1": {"total": 2, "by_collection": {"orders": 2}, "by_operation": {"document_query": 2}}
+    }
+    assert daily.from_rollups(counters) == {
+        "db1": [{"date": "2026-03-09", "api_calls": 1}, {"date": "2026-03-10", "api_calls": 1}]
+    }
@@ -0,0 +1,102 @@
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest import mock
+from uuid import uuid4
+
+from django.http import JsonResponse
+from django.test import RequestFactory
+
+from analytics.middleware import DatacubeObservabilityMiddleware
+
+from analytics.rollups import fold_event
+from analytics.sampling import categorize_endpoint, sample_every, sample_weight
+from analytics.thresholds import get_slow_threshold_ms
+
+NOW = datetime(2026, 3, 10, 12, 30, tzinfo=timezone.utc)
+
+
+def _weight(request_id, *, status_code=200, duration_ms=5.0, error=False, user_id="u1"):
+    return sample_weight(
+        request_id=request_id,
+        user_id=user_id,
+        operation_type="document_query",
+        status_code=status_code,
+        duration_ms=duration_ms,
+        error=error,
+    )
+
+
+def test_errors_and_slow_requests_are_always_kept(settings):
+    settings.TELEMETRY_SAMPLE_RATE = 0.0
+
+    assert _weight("r1") == 0
+    assert _weight("r1", status_code=404) == 1
+    assert _weight("r1", status_code=503) == 1
+    assert _weight("r1", error=True) == 1
+    assert _weight("r1", duration_ms=get_slow_threshold_ms("document_query") + 1) == 1
+
+
+def test_kept_events_carry_one_in_n_weight(settings):
+    settings.TELEMETRY_SAMPLE_RATE = 0.1
+    weights = [_weight(str(uuid4())) for _ in range(5000)]
+
+    assert set(weights) <= {0, 10}
+    assert 350 <= weights.count(10) <= 650
+    # The decision is a function of the request id, so every hop agrees.
+    assert _weight("fixed-id") == _weight("fixed-id")
+
+
+def test_tenant_rate_overrides_operation_rate(settings):
+    settings.TELEMETRY_SAMPLE_RATE = 1.0
+    settings.TELEMETRY_SAMPLE_RATES_BY_OPERATION = {"document_query": 0.25, "health_check": 0.01}
+    settings.TELEMETRY_SAMPLE_RATES_BY_TENANT = {"noisy": 0.5}
+
+    assert sample_every("u1", "document_query") == 4
+    assert sample_every("u1", categorize_endpoint("/api/v2/health_check/", "GET")) == 100
+    assert sample_every("noisy", "document_query") == 2
+    assert sample_every("u1", "document_creation") == 1
+
+
+def test_rollups_count_sampled_events_by_weight():
+    counters = {}
+    for weight in (10, 10, 1):
+        event = {"user_id": "u1", "timestamp": NOW, "method": "GET", "path": "/api/v2/crud/",
+                 "status_code": 200, "success": True, "duration_ms": 4.0, "sample_weight": weight,
+                 "db_operations": [{"db_id": "db1", "operation_type": "document_query"}]}
+        fold_event(counters, event)
+    fold_event(counters, {"method": "GET", "path": "/api/v2/crud/", "status_code": 500, "success": False,
+                          "duration_ms": 8.0})
+
+    assert counters["requests"] == 22
+    assert counters["errors"] == 1
+    assert counters["duration_ms_sum"] == 4.0 * 21 + 8.0
+    assert counters["dbs"]["db1"]["total"] == 21
+
+
+def test_decision_depends_on_server_key(settings):
+    settings.TELEMETRY_SAMPLE_RATE = 0.5
+    ids = [f"client-chosen-{n}" for n in range(200)]
+
+    settings.SECRET_KEY = "key-one"
+    first = [_weight(request_id) for request_id in ids]
+    settings.SECRET_KEY = "key-two"
+    second = [_weight(request_id) for request_id in ids]
+
+    assert first != second
+
+
+def test_middleware_and_view_sample_crud_writes_as_one_family(settings):
+    settings.TELEMETRY_SAMPLE_RATE = 1.0
+    settings.TELEMETRY_SAMPLE_RATES_BY_OPERATION = {"document_creation": 0.1}
+
+    with mock.patch("analytics.middleware.sample_weight", return_value=0) as weight:
+        middleware = DatacubeObservabilityMiddleware(lambda request: JsonResponse({"inserted_ids": ["a", "b"]}))
+        request = RequestFactory().post(
+            "/api/crud/", data=json.dumps({"documents": [{}, {}]}), content_type="application/json"
+        )
+        request.user = SimpleNamespace(is_authenticated=True, id="u1")
+        middleware(request)
+
+    assert weight.call_args.kwargs["operation_type"] == "document_creation"
+    assert sample_every("u1", weight.call_args.kwargs["operation_type"]) == 10
@@ -0,0 +1,108 @@
+import threading
+from unittest import mock
+
+import pytest
+
+from analytics.telemetry import TelemetryBuffer
+
+
+def _http_event(n=0, method="GET"):
+    return {"request_id": f"req-{n:08d}", "user_id": f"u{n}", "method": method, "path": "/api/v2/crud/", "status_code": 200,
+            "duration_ms": 1.5, "success": True}
+
+
+@pytest.fixture
+def written():
+    return {}
+
+
+@pytest.fixture
+def buffer(settings, written):
+    settings.TELEMETRY_SINK = "mongo"
+    settings.TELEMETRY_BATCH_SIZE = 3
+    settings.TELEMETRY_BUFFER_CAPACITY = 5
+    # Depth-based shedding would trip at this capacity; it has its own tests (test_load_shedding).
+    settings.TELEMETRY_SHED_QUEUE_FRACTION = [1.0, 1.0, 1.0]
+
+    def write(collection, docs):
+        written.setdefault(collection, []).append(docs)
+
+    buf = TelemetryBuffer(write_batch=write)
+    with mock.patch.object(buf, "_ensure_flusher"):
+        yield buf
+
+
+def test_flush_writes_one_batch_per_collection_chunk(buffer, written):
+    for n in range(4):
+        buffer.add("request_events", _http_event(n))
+    buffer.add("mongo_details", {"user_id": "u1", "inserted_count": 2})
+
+    assert buffer.flush() == 5
+    assert [len(batch) for batch in written["request_events"]] == [3, 1]
+    assert written["request_events"][0][0]["timestamp"] is not None
+    stats = buffer.stats()["collections"]
+    assert stats["request_events"] == {
+        "queued": 0, "enqueued": 4, "dropped": 0, "flushed": 4, "failed": 0, "spooled": 0, "invalid": 0
+    }
+    assert buffer.stats()["flushes"] == 1
+
+
+def test_full_buffer_drops_and_counts(buffer):
+    accepted = [buffer.add("request_events", _http_event(n)) for n in range(7)]
+    assert accepted == [True] * 5 + [False] * 2
+    assert buffer.stats()["collections"]["request_events"]["dropped"] == 2
+
+
+def test_invalid_events_and_failed_writes_are_counted(settings):
+    settings.TELEMETRY_SINK = "mongo"
+    settings.TELEMETRY_SPOOL_DIR = ""  # without a spool, failed batches are lost
+    failing = TelemetryBuffer(write_batch=mock.Mock(side_effect=RuntimeError("down")))
+    with mock.patch.object(failing, "_ensure_flusher"):
+        failing.add("request_events", _http_event(method="BREW"))
+        failing.add("request_events", _http_event())
+        failing.flush()
+    stats = failing.stats()["collections"]["request_events"]
+    assert (stats["invalid"], stats["failed"], stats["flushed"]) == (1, 2, 0)
+
+
+def test_celery_sink_hands_over_raw_batches(buffer, settings):
+    settings.TELEMETRY_SINK = "celery"
+    buffer.add("slow_queries", {"user_id": "u1", "query_details": {}, "duration_ms": 900.0, "threshold_ms": 500})
+    with mock.patch("analytics.tasks.ingest_telemetry_batch") as task:
+        buffer.flush()
+    collection, batch = task.delay.call_args[0]
+    assert collection == "slow_queries" and len(batch) == 1
+
+
+def test_background_flusher_drains_on_batch_size(settings, written):
+    settings.TELEMETRY_SINK = "mongo"
+    settings.TELEMETRY_BATCH_SIZE = 2
+    settings.TELEMETRY_FLUSH_INTERVAL_SECONDS = 30
+    flushed = threading.Event()
+
+    def write(collection, docs):
+        written[collection] = docs
+        flushed.set()
+
+    buf = TelemetryBuffer(write_batch=write)
+    buf.add("request_events", _http_event(1))
+    buf.add("request_events", _http_event(2))
+    assert flushed.wait(5)
+    buf.stop()
+    assert len(written["request_events"]) == 2
+
+
+def test_analytics_indexes_are_created_once_per_process(settings, monkeypatch):
+    from analytics.services import analytics_services
+
+    monkeypatch.setattr(analytics_services, "_indexes_ready_pid", None)
+    settings.SYNC_MONGODB_CLIENT = mock.MagicMock()
+    db = settings.SYNC_MONGODB_CLIENT["datacube_analytics"]
+
+    analytics_services.AnalyticsService().insert_batch("request_events", [{"n": 1}])
+    created = db.__getitem__.return_value.create_index.call_count
+    analytics_services.AnalyticsService().insert_batch("request_events", [{"n": 2}])
+
+    assert created > 0
+    assert db.__getitem__.return_value.create_index.call_count == created
+    db["request_events"].insert_many.assert_called_with([{"n": 2}], ordered=False)
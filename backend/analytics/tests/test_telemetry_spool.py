@@ -0,0 +1,146 @@
+import os
+from datetime import datetime, timezone
+from unittest import mock
+
+import pytest
+
+from analytics.spool import TelemetrySpool
+from analytics.telemetry import TelemetryBuffer
+
+NOW = datetime(2026, 3, 10, 12, 30, tzinfo=timezone.utc)
+
+
+def _http_event(n=0):
+    return {"request_id": f"req-{n:08d}", "user_id": "u1", "method": "GET", "path": "/api/v2/crud/",
+            "status_code": 200, "duration_ms": 1.5, "success": True, "timestamp": NOW}
+
+
+@pytest.fixture
+def spool(settings, tmp_path):
+    settings.TELEMETRY_SPOOL_SEGMENT_BYTES = 1024
+    settings.TELEMETRY_SPOOL_MAX_BYTES = 1024 * 1024
+    return TelemetrySpool(str(tmp_path))
+
+
+def test_segments_rotate_and_replay_in_order(spool, tmp_path):
+    for n in range(20):
+        assert spool.append("request_events", [_http_event(n)])
+    assert len(list(tmp_path.glob("*.seg"))) >= 2
+
+    replayed = []
+    assert spool.drain(lambda collection, events: replayed.extend(events)) == 20
+    assert [event["request_id"] for event in replayed] == [f"req-{n:08d}" for n in range(20)]
+    assert replayed[0]["timestamp"] == NOW
+    assert list(tmp_path.iterdir()) == [] and not spool.pending()
+
+
+def test_failed_replay_keeps_the_segment(spool, tmp_path):
+    spool.append("slow_queries", [{"user_id": "u1", "duration_ms": 900.0}])
+
+    assert spool.drain(mock.Mock(side_effect=ConnectionError("broker down"))) == 0
+    assert [path.suffix for path in tmp_path.iterdir()] == [".seg"]
+    assert spool.drain(mock.Mock()) == 1
+
+
+def test_size_cap_evicts_oldest_segments(spool, settings, tmp_path):
+    settings.TELEMETRY_SPOOL_MAX_BYTES = 3 * 1024
+    for n in range(200):
+        spool.append("request_events", [_http_event(n)])
+
+    assert sum(path.stat().st_size for path in tmp_path.iterdir()) <= 3 * 1024
+    assert spool.stats()["evicted_segments"] > 0
+    replayed = []
+    spool.drain(lambda collection, events: replayed.extend(events))
+    assert replayed[-1]["request_id"] == "req-00000199"
+
+
+def test_segments_of_dead_processes_are_recovered(spool, tmp_path):
+    (tmp_path / "999999-00000001.open").write_text('{"collection": "request_events", "events": [{"a": 1}]}\n')
+    (tmp_path / "999999-00000002.seg.999998.claimed").write_text('{"collection": "mongo_details", "events": [{}]}\n')
+
+    with mock.patch("analytics.spool._pid_alive", return_value=False):
+        written = []
+        assert spool.drain(lambda collection, events: written.append(collection)) == 2
+    assert sorted(written) == ["mongo_details", "request_events"]
+
+
+def test_buffer_spools_failed_batches_and_replays_on_recovery(settings, spool):
+    settings.TELEMETRY_SINK = "mongo"
+    settings.TELEMETRY_BATCH_SIZE = 2
+    write = mock.Mock(side_effect=ConnectionError("mongo down"))
+    buffer = TelemetryBuffer(write_batch=write, spool=spool)
+    with mock.patch.object(buffer, "_ensure_flusher"):
+        for n in range(3):
+            buffer.add("request_events", _http_event(n))
+        assert buffer.flush() == 0
+        assert buffer.stats()["collections"]["request_events"]["spooled"] == 3
+
+        write.side_effect = None
+        buffer.add("request_events", _http_event(3))
+        assert buffer.flush() == 4
+
+    assert [len(call.args[1]) for call in write.call_args_list[-3:]] == [1, 2, 1]
+    assert buffer.stats()["spool"]["segments"] == 0
+    assert os.listdir(spool.directory) == []
+
+
+def test_flush_stops_calling_a_failed_sink(settings, spool):
+    settings.TELEMETRY_SINK = "mongo"
+    settings.TELEMETRY_BATCH_SIZE = 10
+    write = mock.Mock(side_effect=ConnectionError("mongo down"))
+    buffer = TelemetryBuffer(write_batch=write, spool=spool)
+    with mock.patch.object(buffer, "_ensure_flusher"):
+        for n in range(95):
+            buffer.add("request_events", _http_event(n))
+        assert buffer.flush() == 0
+
+    assert write.call_count == 1
+    assert buffer.stats()["collections"]["request_events"]["spooled"] == 95
+    assert buffer.stats()["collections"]["request_events"]["queued"] == 0
+
+
+@pytest.fixture
+def analytics_db(settings, monkeypatch):
+    from analytics.services import analytics_services
+
+    monkeypatch.setattr(analytics_services, "_indexes_ready_pid", os.getpid())
+    settings.TELEMETRY_SINK = "mongo"
+    settings.SYNC_MONGODB_CLIENT = mock.MagicMock()
+    return settings.SYNC_MONGODB_CLIENT["datacube_analytics"]["request_events"]
+
+
+def test_partial_insert_spools_only_the_unstored_events(settings, spool, analytics_db):
+    from pymongo.errors import BulkWriteError
+
+    settings.TELEMETRY_BATCH_SIZE = 10
+    analytics_db.insert_many.side_effect = BulkWriteError(
+        {"writeErrors": [{"index": 1, "code": 121}, {"index": 2, "code": 11000}]}
+    )
+    buffer = TelemetryBuffer(spool=spool)
+    with mock.patch.object(buffer, "_ensure_flusher"), \
+            mock.patch("analytics.services.analytics_services.apply_rollups") as rollups:
+        for n in range(4):
+            buffer.add("request_events", _http_event(n))
+        assert buffer.flush() == 3
+
+    assert [doc["request_id"] for doc in rollups.call_args.args[1]] == ["req-00000000", "req-00000003"]
+    stats = buffer.stats()["collections"]["request_events"]
+    assert stats["spooled"] == 1 and stats["flushed"] == 3
+    replayed = []
+    spool.drain(lambda collection, events: replayed.extend(events))
+    assert [event["request_id"] for event in replayed] == ["req-00000001"]
+
+
+def test_replay_skips_request_events_already_stored(settings, spool, analytics_db):
+    settings.TELEMETRY_BATCH_SIZE = 10
+    spool.append("request_events", [_http_event(0), _http_event(1)])
+    analytics_db.find.return_value = [{"request_id": "req-00000000"}]
+    buffer = TelemetryBuffer(spool=spool)
+    with mock.patch("analytics.services.analytics_services.apply_rollups"):
+        buffer.replay_spool()
+
+    analytics_db.find.assert_called_once_with(
+        {"request_id": {"$in": ["req-00000000", "req-00000001"]}}, {"request_id": 1}
+    )
+    (inserted,), _ = analytics_db.insert_many.call_args
+    assert [doc["request_id"] for doc in inserted] == ["req-00000001"]
@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from analytics.timeseries import ensure_timeseries_collection, migrate_to_timeseries
+
+
+def test_missing_collection_is_created_as_timeseries(settings, fake_mongo_db):
+    settings.TELEMETRY_RETENTION_DAYS = 7
+    db = fake_mongo_db
+    assert ensure_timeseries_collection(db, "request_events") == "timeseries"
+    assert db.created["request_events"] == {
+        "timeseries": {"timeField": "timestamp", "metaField": "user_id", "granularity": "seconds"},
+        "expireAfterSeconds": 7 * 86400,
+    }
+    assert db.commands == [{"collMod": "request_events", "expireAfterSeconds": 7 * 86400}]
+
+
+def test_regular_collection_is_left_for_the_migration(fake_mongo_db):
+    db = fake_mongo_db
+    db.kinds["request_events"] = "collection"
+    assert ensure_timeseries_collection(db, "request_events") == "collection"
+    assert not db.created
+
+
+def test_migration_copies_regular_collection_in_batches(fake_mongo_db):
+    db = fake_mongo_db
+    db.kinds["slow_queries"] = "collection"
+    stamp = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    docs = [{"_id": ObjectId(), "user_id": "u1", "timestamp": stamp} for _ in range(5)]
+    docs.append({"_id": ObjectId(), "user_id": "u2"})
+    db["slow_queries"].docs = list(docs)
+
+    assert migrate_to_timeseries(db, "slow_queries", batch_size=2, drop_source=True) == 6
+
+    assert db.kinds == {"slow_queries": "timeseries"}
+    copied = db["slow_queries"].docs
+    assert [doc["_id"] for doc in copied] == [doc["_id"] for doc in docs]
+    assert isinstance(copied[-1]["timestamp"], datetime)
+    progress = db["timeseries_migrations"].find_one({"_id": "slow_queries"})
+    assert progress["last_id"] == docs[-1]["_id"] and progress["copied"] == 6
+    # Three batches of two, then the empty read that ends the copy.
+    assert [scan[0] for scan in db.scans].count("slow_queries_pre_ts") == 4
+
+
+def test_interrupted_migration_resumes_after_last_copied_id(fake_mongo_db):
+    docs = [{"_id": ObjectId(), "user_id": "u1", "timestamp": datetime.now(timezone.utc)} for _ in range(4)]
+    db = fake_mongo_db
+    db.kinds.update(mongo_details="timeseries", mongo_details_pre_ts="collection")
+    db["mongo_details_pre_ts"].docs = list(docs)
+    db["mongo_details"].docs = docs[:2]
+    db["timeseries_migrations"].docs.append({"_id": "mongo_details", "last_id": docs[1]["_id"]})
+
+    assert migrate_to_timeseries(db, "mongo_details") == 2
+    assert [doc["_id"] for doc in db["mongo_details"].docs] == [doc["_id"] for doc in docs]
+    assert "mongo_details_pre_ts" in db.kinds
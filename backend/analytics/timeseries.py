@@ -0,0 +1,157 @@
+"""
+Raw telemetry in MongoDB time-series collections.
+
+``request_events``, ``mongo_details`` and ``slow_queries`` are created as
+time-series collections with ``timestamp`` as the time field and ``user_id`` as
+the meta field. MongoDB groups each user's events into compressed buckets, so
+"one user over a time window" reads touch a few buckets instead of one index
+entry and document per event. Retention comes from ``expireAfterSeconds``
+(``TELEMETRY_RETENTION_DAYS``): whole buckets are dropped when they expire, so
+no ``delete_many`` scan is needed.
+
+A collection that already exists as a regular collection stays as it is until
+``migrate_to_timeseries`` (the ``migrate_telemetry_timeseries`` management
+command) converts it. Time-series collections cannot be renamed, so the
+migration moves the regular collection aside to ``<name>_pre_ts``, creates the
+time-series collection under the original name and copies the documents over in
+``_id`` order. Progress is kept in ``timeseries_migrations``, so an interrupted
+run resumes where it stopped.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from django.conf import settings
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from analytics.request_events import REQUEST_EVENTS
+
+logger = logging.getLogger(__name__)
+
+TIMESERIES_COLLECTIONS = (REQUEST_EVENTS, "mongo_details", "slow_queries")
+PRE_TS_SUFFIX = "_pre_ts"
+MIGRATIONS_COLLECTION = "timeseries_migrations"
+
+
+def timeseries_enabled() -> bool:
+    return getattr(settings, "TELEMETRY_TIMESERIES", True)
+
+
+def retention_seconds() -> Optional[int]:
+    days = getattr(settings, "TELEMETRY_RETENTION_DAYS", 30)
+    return int(days * 86400) if days and days > 0 else None
+
+
+def timeseries_options() -> dict:
+    return {
+        "timeField": "timestamp",
+        "metaField": "user_id",
+        "granularity": getattr(settings, "TELEMETRY_TIMESERIES_GRANULARITY", "seconds"),
+    }
+
+
+def collection_kind(db, name: str) -> Optional[str]:
+    """``"timeseries"``, ``"collection"``, ``"view"`` or None when ``name`` does not exist."""
+    for info in db.list_collections(filter={"name": name}):
+        return info.get("type", "collection")
+    return None
+
+
+def _create(db, name: str) -> None:
+    options = {"timeseries": timeseries_options()}
+    expire = retention_seconds()
+    if expire is not None:
+        options["expireAfterSeconds"] = expire
+    db.create_collection(name, **options)
+
+
+def _sync_retention(db, name: str) -> None:
+    expire = retention_seconds()
+    db.command({"collMod": name, "expireAfterSeconds": expire if expire is not None else "off"})
+
+
+def ensure_timeseries_collection(db, name: str) -> Optional[str]:
+    """Create ``name`` as a time-series collection if it is missing; returns its kind."""
+    kind = collection_kind(db, name)
+    if kind is None:
+        try:
+            _create(db, name)
+        except CollectionInvalid:
+            pass  # another process created it first
+        kind = collection_kind(db, name)
+    if kind == "timeseries":
+        _sync_retention(db, name)
+    elif kind == "collection":
+        logger.info("%s is a regular collection; run migrate_telemetry_timeseries to convert it", name)
+    return kind
+
+
+def _move_aside(db, name: str) -> None:
+    """Rename the regular collection ``name`` into the ``_pre_ts`` staging area."""
+    source = f"{name}{PRE_TS_SUFFIX}"
+    if collection_kind(db, source) is None:
+        db[name].rename(source)
+        return
+    # An earlier run already staged a collection: merge late writes into it.
+    for batch in _batches(db[name], None, 1000):
+        db[source].insert_many(batch, ordered=False)
+    db[name].drop()
+
+
+def _batches(collection, after, size: int):
+    query = {"_id": {"$gt": after}} if after is not None else {}
+    while True:
+        batch = list(collection.find(query).sort("_id", 1).limit(size))
+        if not batch:
+            return
+        yield batch
+        query = {"_id": {"$gt": batch[-1]["_id"]}}
+
+
+def migrate_to_timeseries(db, name: str, *, batch_size: int = 1000, drop_source: bool = False) -> int:
+    """Convert the regular collection ``name`` into a time-series collection.
+
+    Returns the number of documents copied in this run. Documents without a
+    timestamp get the migration time, since the time field is mandatory.
+    """
+    kind = collection_kind(db, name)
+    if kind == "collection":
+        _move_aside(db, name)
+        # Writers may recreate ``name`` as a regular collection between the
+        # rename and the create; fold such a collection in and try again.
+        for _ in range(3):
+            try:
+                _create(db, name)
+                break
+            except (CollectionInvalid, OperationFailure):
+                if collection_kind(db, name) != "collection":
+                    break
+                _move_aside(db, name)
+    elif kind is None:
+        _create(db, name)
+    if collection_kind(db, name) != "timeseries":
+        raise RuntimeError(f"{name} could not be converted to a time-series collection")
+
+    source = db[f"{name}{PRE_TS_SUFFIX}"]
+    progress = db[MIGRATIONS_COLLECTION]
+    state = progress.find_one({"_id": name}) or {}
+    copied = 0
+    now = datetime.now(timezone.utc)
+    for batch in _batches(source, state.get("last_id"), batch_size):
+        for doc in batch:
+            if not isinstance(doc.get("timestamp"), datetime):
+                doc["timestamp"] = now
+        db[name].insert_many(batch, ordered=False)
+        copied += len(batch)
+        progress.update_one(
+            {"_id": name},
+            {"$set": {"last_id": batch[-1]["_id"], "updated_at": now}, "$inc": {"copied": len(batch)}},
+            upsert=True,
+        )
+    if drop_source and collection_kind(db, source.name) is not None:
+        source.drop()
+    logger.info("Copied %s documents into time-series collection %s", copied, name)
+    return copied
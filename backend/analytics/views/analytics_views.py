@@ -1,20 +1,26 @@
+import asyncio
 from datetime import datetime, timedelta, timezone
 import logging
 
 from django.conf import settings
 from adrf.views import APIView as AsyncAPIView
-from pymongo.errors import OperationFailure
+from asgiref.sync import sync_to_async
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
+from analytics.dashboard_cache import dashboard_cache
 from analytics.services.date_range import parse_analytics_date_range
+from analytics.services.query import LATENCY_PERCENTILES, run_metrics
+from api.infrastructure.read_routing import routed
 from analytics.services.inventory_stats import aggregate_db_operations, build_inventory
 from analytics.services.platform_stats import (
+    aggregate_endpoint_volume,
+    aggregate_errors,
     aggregate_file_storage,
-    aggregate_http_methods,
-    aggregate_http_summary,
+    aggregate_http_overview,
     aggregate_metadata_counts,
     aggregate_metadata_storage_totals,
+    aggregate_operation_breakdown,
     aggregate_top_collections_scoped,
     count_slow_queries,
     file_storage_trend,
@@ -25,14 +31,26 @@ from analytics.services.platform_stats import (
 logger = logging.getLogger(__name__)
 
 
+async def gather_bounded(*aws, limit: int):
+    """``asyncio.gather`` with at most ``limit`` of ``aws`` running at once."""
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws))
+
+
 class AnalyticsBaseView(AsyncAPIView):
     """Base async view for analytics with MongoDB connection."""
     permission_classes = [IsAuthenticated]
 
     @property
     async def analytics_db(self):
+        # Telemetry reads tolerate replication lag; keep them off the primary.
         client = settings.MONGODB_CLIENT
-        return client["datacube_analytics"]
+        return routed(client["datacube_analytics"])
 
     def get_user_id(self, request) -> str:
         return str(request.user.pk)
@@ -42,22 +60,37 @@ class AnalyticsBaseView(AsyncAPIView):
 
 
 class DashboardOverviewView(AnalyticsBaseView):
-    """Dashboard with base + technical summaries and configurable date range."""
+    """Dashboard with base + technical summaries and configurable date range.
+
+    The queries run concurrently (``DASHBOARD_QUERY_CONCURRENCY``) and the
+    assembled payload is cached per (user, period) by ``dashboard_cache``.
+    """
 
     async def get(self, request):
         user_id = self.get_user_id(request)
         start, end, period = self.get_period(request)
-
-        http = await aggregate_http_summary(user_id, start=start, end=end)
-        storage_files = await aggregate_file_storage(user_id)
-        storage_data = await aggregate_metadata_storage_totals(user_id)
-        meta_counts = await aggregate_metadata_counts(user_id)
-        usage = get_usage_snapshot(user_id)
-        methods = await aggregate_http_methods(user_id, start=start, end=end)
-        slow_count = await count_slow_queries(user_id, start=start, end=end)
-
-        inventory_preview = await build_inventory(
-            user_id, start, end, refresh_storage=False, skip_storage_refresh=True
+        key = dashboard_cache.key(user_id, start.date(), end.date(), period["days"])
+        payload = await dashboard_cache.get_or_build(key, lambda: self._build(user_id, start, end))
+        return Response({"success": True, "period": period, **payload})
+
+    async def _build(self, user_id: str, start, end) -> dict:
+        (
+            (http, methods),
+            storage_files,
+            storage_data,
+            meta_counts,
+            usage,
+            slow_count,
+            inventory_preview,
+        ) = await gather_bounded(
+            aggregate_http_overview(user_id, start=start, end=end),
+            aggregate_file_storage(user_id),
+            aggregate_metadata_storage_totals(user_id),
+            aggregate_metadata_counts(user_id),
+            sync_to_async(get_usage_snapshot, thread_sensitive=False)(user_id),
+            count_slow_queries(user_id, start=start, end=end),
+            build_inventory(user_id, start, end, refresh_storage=False, skip_storage_refresh=True),
+            limit=getattr(settings, "DASHBOARD_QUERY_CONCURRENCY", 4),
         )
         inv_totals = inventory_preview.get("totals") or {}
 
@@ -93,16 +126,14 @@ class DashboardOverviewView(AnalyticsBaseView):
             "total_storage_mb": base_summary["storage_total_mb"],
         }
 
-        return Response({
-            "success": True,
-            "period": period,
+        return {
             "base_summary": base_summary,
             "technical_summary": technical_summary,
             "overview": overview,
             "methods": methods,
             "methods_7d": methods,
             "daily_requests": http["daily_requests"],
-        })
+        }
 
 
 class InventoryView(AnalyticsBaseView):
@@ -134,90 +165,21 @@ class InventoryView(AnalyticsBaseView):
 
 
 class PerformanceMetricsView(AnalyticsBaseView):
-    """Response time percentiles (p50, p90, p95, p99) and throughput."""
-
-    _MAX_CLIENT_SIDE_DOCS = 100_000
-    _SAMPLE_FALLBACK = 50_000
-
-    async def _percentiles_ms_server(self, coll, user_id: str, start, end) -> dict | None:
-        pipeline = [
-            {"$match": {"user_id": user_id, "timestamp": {"$gte": start, "$lte": end}}},
-            {
-                "$group": {
-                    "_id": None,
-                    "n": {"$sum": 1},
-                    "pct": {
-                        "$percentile": {
-                            "input": "$duration_ms",
-                            "p": [0.5, 0.9, 0.95, 0.99],
-                            "method": "approximate",
-                        }
-                    },
-                }
-            },
-        ]
-        try:
-            cursor = await coll.aggregate(pipeline)
-            rows = await cursor.to_list(length=1)
-        except OperationFailure as exc:
-            logger.info("Analytics percentile aggregation not available: %s", exc)
-            return None
-        if not rows or rows[0].get("n", 0) == 0:
-            return {}
-        pct = rows[0]["pct"] or []
-        if len(pct) < 4:
-            return None
-        return {
-            "p50": round(float(pct[0]), 2),
-            "p90": round(float(pct[1]), 2),
-            "p95": round(float(pct[2]), 2),
-            "p99": round(float(pct[3]), 2),
-        }
-
-    async def _percentiles_ms_fallback(self, coll, user_id: str, start, end) -> dict:
-        match = {"user_id": user_id, "timestamp": {"$gte": start, "$lte": end}}
-        total = await coll.count_documents(match)
-        if total == 0:
-            return {}
-
-        if total <= self._MAX_CLIENT_SIDE_DOCS:
-            cursor = coll.find(match, {"duration_ms": 1, "_id": 0})
-            docs = await cursor.to_list(length=self._MAX_CLIENT_SIDE_DOCS + 1)
-            durations_ms = [d["duration_ms"] for d in docs]
-        else:
-            sample_size = min(self._SAMPLE_FALLBACK, total)
-            pipeline = [
-                {"$match": match},
-                {"$sample": {"size": sample_size}},
-                {"$project": {"duration_ms": 1, "_id": 0}},
-            ]
-            cursor = await coll.aggregate(pipeline)
-            docs = await cursor.to_list(length=sample_size)
-            durations_ms = [d["duration_ms"] for d in docs]
-
-        durations_ms.sort()
-        n = len(durations_ms)
-
-        def percentile(p: int) -> float:
-            idx = int((p / 100) * n)
-            return float(durations_ms[min(idx, n - 1)])
+    """Response time percentiles (p50, p90, p95, p99) and throughput.
 
-        return {
-            "p50": round(percentile(50), 2),
-            "p90": round(percentile(90), 2),
-            "p95": round(percentile(95), 2),
-            "p99": round(percentile(99), 2),
-        }
+    Percentiles come from the latency sketches in the rollups. Windows the
+    rollups don't cover build the same sketch with a ``$group`` on bucket
+    index, weighted by ``sample_weight``, so no raw durations are pulled
+    (error bound: see ``analytics.sketches``).
+    """
 
     async def get(self, request):
         user_id = self.get_user_id(request)
         db = await self.analytics_db
         start, end, period = self.get_period(request)
 
-        coll = db["http_requests"]
-        percentiles = await self._percentiles_ms_server(coll, user_id, start, end)
-        if percentiles is None:
-            percentiles = await self._percentiles_ms_fallback(coll, user_id, start, end)
+        result = await run_metrics(db, user_id, start, end, (LATENCY_PERCENTILES,))
+        percentiles, by_endpoint = result[LATENCY_PERCENTILES.name]
 
         day_start = end - timedelta(days=1)
         pipeline_throughput = [
@@ -225,7 +187,7 @@ class PerformanceMetricsView(AnalyticsBaseView):
             {
                 "$group": {
                     "_id": {"$dateToString": {"format": "%Y-%m-%d %H:00", "date": "$timestamp"}},
-                    "count": {"$sum": 1},
+                    "count": {"$sum": {"$ifNull": ["$sample_weight", 1]}},
                 }
             },
             {"$sort": {"_id": 1}},
@@ -238,6 +200,7 @@ class PerformanceMetricsView(AnalyticsBaseView):
             "success": True,
             "period": period,
             "percentiles_ms": percentiles,
+            **({"percentiles_ms_by_endpoint": by_endpoint} if by_endpoint is not None else {}),
             "throughput_last_24h": throughput,
         })
 
@@ -247,54 +210,12 @@ class ErrorAnalyticsView(AnalyticsBaseView):
 
     async def get(self, request):
         user_id = self.get_user_id(request)
-        db = await self.analytics_db
         start, end, period = self.get_period(request)
-
-        pipeline_status = [
-            {
-                "$match": {
-                    "user_id": user_id,
-                    "timestamp": {"$gte": start, "$lte": end},
-                    "status_code": {"$gte": 400},
-                }
-            },
-            {"$group": {"_id": "$status_code", "count": {"$sum": 1}}},
-            {"$sort": {"_id": 1}},
-        ]
-        cursor = await db["http_requests"].aggregate(pipeline_status)
-        status_errors = await cursor.to_list(length=100)
-        error_by_status = {str(d["_id"]): d["count"] for d in status_errors}
-
-        pipeline_endpoints = [
-            {
-                "$match": {
-                    "user_id": user_id,
-                    "timestamp": {"$gte": start, "$lte": end},
-                    "status_code": {"$gte": 400},
-                }
-            },
-            {"$group": {"_id": "$path", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 5},
-        ]
-        cursor = await db["http_requests"].aggregate(pipeline_endpoints)
-        top_error_endpoints = await cursor.to_list(length=5)
-        top_endpoints = [{"path": d["_id"], "errors": d["count"]} for d in top_error_endpoints]
-
-        pipeline_types = [
-            {"$match": {"user_id": user_id, "timestamp": {"$gte": start, "$lte": end}}},
-            {"$group": {"_id": "$error_type", "count": {"$sum": 1}}},
-        ]
-        cursor = await db["errors"].aggregate(pipeline_types)
-        error_types = await cursor.to_list(length=10)
-        error_type_map = {d["_id"]: d["count"] for d in error_types if d["_id"]}
-
+        errors = await aggregate_errors(user_id, start=start, end=end)
         return Response({
             "success": True,
             "period": period,
-            "errors_by_status_code": error_by_status,
-            "top_error_endpoints": top_endpoints,
-            "error_types": error_type_map,
+            **errors,
         })
 
 
@@ -357,18 +278,8 @@ class RequestVolumeByEndpointView(AnalyticsBaseView):
 
     async def get(self, request):
         user_id = self.get_user_id(request)
-        db = await self.analytics_db
         start, end, period = self.get_period(request)
-
-        pipeline = [
-            {"$match": {"user_id": user_id, "timestamp": {"$gte": start, "$lte": end}}},
-            {"$group": {"_id": "$path", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 15},
-        ]
-        cursor = await db["http_requests"].aggregate(pipeline)
-        result = await cursor.to_list(length=15)
-        endpoints = [{"endpoint": d["_id"], "requests": d["count"]} for d in result]
+        endpoints = await aggregate_endpoint_volume(user_id, start=start, end=end)
         return Response({
             "success": True,
             "period": period,
@@ -381,16 +292,8 @@ class DatabaseOperationBreakdownView(AnalyticsBaseView):
 
     async def get(self, request):
         user_id = self.get_user_id(request)
-        db = await self.analytics_db
         start, end, period = self.get_period(request)
-
-        pipeline = [
-            {"$match": {"user_id": user_id, "timestamp": {"$gte": start, "$lte": end}}},
-            {"$group": {"_id": "$operation_type", "count": {"$sum": 1}}},
-        ]
-        cursor = await db["db_operations"].aggregate(pipeline)
-        result = await cursor.to_list(length=20)
-        operations = {d["_id"]: d["count"] for d in result}
+        operations = await aggregate_operation_breakdown(user_id, start=start, end=end)
         return Response({
             "success": True,
             "period": period,
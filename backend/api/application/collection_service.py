@@ -155,6 +155,31 @@ class CollectionService:
 
         return await cursor.to_list(length=limit or 1000)
 
+    def iter_raw_batches(
+        self, coll_name: str, filt: Optional[Dict] = None, skip: int = 0, limit: int = 0,
+        *, batch_size: int = 0, session=None
+    ):
+        """Raw BSON batch cursor (async iterable); 'is_deleted' is projected out server-side."""
+        new_filt = self.filter_helper.convert_filter_ids(filt or {})
+        new_filt["is_deleted"] = {"$ne": True}
+        return self.db[coll_name].find_raw_batches(
+            new_filt,
+            {"is_deleted": 0},
+            skip=skip,
+            limit=limit,
+            batch_size=batch_size,
+            session=session,
+        )
+
+    async def find_raw(
+        self, coll_name: str, filt: Optional[Dict] = None, skip: int = 0, limit: int = 0, session=None
+    ) -> List[bytes]:
+        """Returns raw BSON batches (no dict decoding) for the requested page."""
+        cursor = self.iter_raw_batches(
+            coll_name, filt, skip, limit, batch_size=limit or 0, session=session
+        )
+        return [batch async for batch in cursor]
+
     async def insert_many(self, coll_name: str, docs: List[Dict], session=None):
         """Native async batch insertion."""
         if not docs:
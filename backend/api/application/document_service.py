@@ -6,10 +6,17 @@ Refactored for 2025:
 3. Separation of Concerns: Decouples metadata verification from data access.
 """
 from datetime import datetime, timezone
-from typing import List, Dict, Tuple, Optional
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Tuple, Optional
 from api.application.metadata_service import MetadataService
 from api.application.collection_service import CollectionService
 from api.application.service_context import UserServiceContext
+from api.application.storage_accounting import estimate_bson_size, storage_quota
+from api.domain.type_coercion import (
+    build_field_coercers,
+    coerce_document,
+    coerce_filter,
+    coerce_update,
+)
 from api.infrastructure.query_safety import (
     assert_mutating_filter_allowed,
     is_operator_update,
@@ -31,9 +38,10 @@ class DocumentService:
         self.user_id = self.ctx.user_id
         self.meta_svc = MetadataService(user_id=self.user_id, role=self.ctx.role)
 
-    async def _get_scoped_collection_svc(self, db_id: str, coll_name: str) -> CollectionService:
+    async def _resolve_collection(self, db_id: str, coll_name: str) -> Tuple[CollectionService, Dict]:
         """
         Internal helper: Verifies permissions and resolves the internal dbName.
+        Also returns value coercers for the collection's declared field types.
         """
         # Step 1: Securely fetch metadata (already scoped to self.user_id)
         meta = await self.meta_svc.get_db(db_id)
@@ -42,14 +50,15 @@ class DocumentService:
 
 
         # Step 2: Validate the collection exists in the authorized schema
-        authorized_collections = {c["name"] for c in meta.get("collections", [])}
-        if coll_name not in authorized_collections:
+        coll_meta = next((c for c in meta.get("collections", []) if c["name"] == coll_name), None)
+        if coll_meta is None:
             raise ValueError(f"Collection '{coll_name}' is not defined in metadata.")
 
         # Step 3: Instantiate CollectionService using the internal 'dbName'
         dislplay_name = meta.get("displayName")
         db_name = meta.get("dbName")
-        return CollectionService(db_name=dislplay_name, user_id=self.user_id, internal_db_name=db_name) # type: ignore
+        svc = CollectionService(db_name=dislplay_name, user_id=self.user_id, internal_db_name=db_name) # type: ignore
+        return svc, build_field_coercers(coll_meta.get("fields"))
 
     async def list_docs(
         self,
@@ -61,7 +70,8 @@ class DocumentService:
     ) -> Tuple[int, List[Dict]]:
         """Lists documents with pagination and user-scoping."""
         try:
-            svc = await self._get_scoped_collection_svc(db_id, coll_name)
+            svc, coercers = await self._resolve_collection(db_id, coll_name)
+            filt = coerce_filter(filt or {}, coercers)
             skip = (page - 1) * page_size
             total = await svc.count_documents(coll_name, filt or {})
             docs = await svc.find(coll_name, filt or {}, skip, page_size)
@@ -77,6 +87,61 @@ class DocumentService:
         except PyMongoError as e:
             raise RuntimeError(f"Database error during list: {e}")
 
+    async def list_docs_raw(
+        self,
+        db_id: str,
+        coll_name: str,
+        filt: Optional[dict] = None,
+        page: int = 1,
+        page_size: int = 20
+    ) -> Tuple[int, List[bytes]]:
+        """Like ``list_docs`` but returns raw BSON batches for direct JSON encoding."""
+        try:
+            svc, coercers = await self._resolve_collection(db_id, coll_name)
+            filt = coerce_filter(filt or {}, coercers)
+            skip = (page - 1) * page_size
+            total = await svc.count_documents(coll_name, filt or {})
+            batches = await svc.find_raw(coll_name, filt or {}, skip, page_size)
+
+            await self.meta_svc.touch_collection_access(db_id, coll_name)
+            return total, batches
+        except (ValueError, PermissionError) as e:
+            raise e
+        except PyMongoError as e:
+            raise RuntimeError(f"Database error during list: {e}")
+
+    async def stream_docs_raw(
+        self,
+        db_id: str,
+        coll_name: str,
+        filt: Optional[dict] = None,
+        page: int = 1,
+        page_size: int = 20,
+        *,
+        batch_size: int = 100,
+    ) -> Tuple[AsyncIterator[bytes], Callable[[], Awaitable[int]]]:
+        """
+        Resolve access up front, then hand back a lazy raw-batch cursor plus a
+        deferred total count, so callers can start writing before counting.
+        """
+        try:
+            svc, coercers = await self._resolve_collection(db_id, coll_name)
+            filt = coerce_filter(filt or {}, coercers)
+            skip = (page - 1) * page_size
+            cursor = svc.iter_raw_batches(
+                coll_name, filt or {}, skip, page_size, batch_size=batch_size
+            )
+
+            async def count_total() -> int:
+                return await svc.count_documents(coll_name, filt or {})
+
+            await self.meta_svc.touch_collection_access(db_id, coll_name)
+            return cursor, count_total
+        except (ValueError, PermissionError) as e:
+            raise e
+        except PyMongoError as e:
+            raise RuntimeError(f"Database error during list: {e}")
+
     async def create_docs(self, db_id: str, coll_name: str, docs: List[Dict]):
         """Inserts documents and triggers schema discovery."""
         self.ctx.assert_can_write()
@@ -85,12 +150,14 @@ class DocumentService:
 
         await enforce_playground_document_limit(self.user_id, len(docs))
         try:
+            svc, coercers = await self._resolve_collection(db_id, coll_name)
             # append "is_deleted" to all docs if not present
             for doc in docs:
+                coerce_document(doc, coercers)
                 if "is_deleted" not in doc:
                     doc["is_deleted"] = False
-            svc = await self._get_scoped_collection_svc(db_id, coll_name)
             result = await svc.insert_many(coll_name, docs)
+            await storage_quota.record_delta(self.user_id, estimate_bson_size(docs))
 
             # Schema Evolution: Learn new field types from the inserted data
             if docs:
@@ -181,7 +248,7 @@ class DocumentService:
             raise ValueError("operations must not be empty.")
 
         try:
-            svc = await self._get_scoped_collection_svc(db_id, coll_name)
+            svc, coercers = await self._resolve_collection(db_id, coll_name)
             requests: List[UpdateOne] = []
             schema_samples: List[Dict] = []
 
@@ -190,10 +257,11 @@ class DocumentService:
                 validate_filter(filt or {})
                 assert_mutating_filter_allowed(filt or {}, update_many=False)
 
+                filt = coerce_filter(filt, coercers)
                 allow_new_fields = op.get("update_all_fields", False)
                 upsert = op.get("upsert", False)
                 update_payload, schema_sample = self._prepare_update_payload(
-                    op["update_data"],
+                    coerce_update(op["update_data"], coercers),
                     allow_new_fields=allow_new_fields,
                     upsert=upsert,
                 )
@@ -264,14 +332,14 @@ class DocumentService:
             if not (filt.get("_id") or filt.get("id")):
                 raise ValueError("upsert requires '_id' or 'id' in filters.")
 
-        update_payload, schema_sample = self._prepare_update_payload(
-            update_data,
-            allow_new_fields=allow_new_fields,
-            upsert=upsert,
-        )
-
         try:
-            svc = await self._get_scoped_collection_svc(db_id, coll_name)
+            svc, coercers = await self._resolve_collection(db_id, coll_name)
+            filt = coerce_filter(filt, coercers)
+            update_payload, schema_sample = self._prepare_update_payload(
+                coerce_update(update_data, coercers),
+                allow_new_fields=allow_new_fields,
+                upsert=upsert,
+            )
 
             if allow_new_fields:
                 if update_many:
@@ -307,7 +375,8 @@ class DocumentService:
         assert_mutating_filter_allowed(filt or {}, update_many=True)
 
         try:
-            svc = await self._get_scoped_collection_svc(db_id, coll_name)
+            svc, coercers = await self._resolve_collection(db_id, coll_name)
+            filt = coerce_filter(filt, coercers)
             if soft:
                 soft_delete_payload = {
                     "is_deleted": True,
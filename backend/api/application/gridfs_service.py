@@ -6,6 +6,7 @@ from bson import ObjectId
 from gridfs.asynchronous import AsyncGridFSBucket
 from api.application.metadata_service import MetadataService
 from api.application.service_context import UserServiceContext
+from api.application.storage_accounting import storage_quota
 
 
 logger = logging.getLogger(__name__)
@@ -55,7 +56,8 @@ class GridFSService:
             content_type=content_type,
             storage_type="gridfs"
         )
-        
+        await storage_quota.record_delta(self.user_id, total_uploaded)
+
         return file_id_str
 
     async def get_file_info(self, file_id: str) -> Optional[Dict[str, Any]]:
@@ -96,5 +98,6 @@ class GridFSService:
             if not entry: return False
             await self.bucket.delete(ObjectId(file_id))
             await self.meta_svc.delete_file_entry(file_id=file_id)
+            await storage_quota.record_delta(self.user_id, -int(entry.get("size") or 0))
             return True
         except Exception: return False
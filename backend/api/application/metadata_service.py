@@ -6,6 +6,8 @@ from bson import ObjectId
 from pymongo import ReturnDocument
 
 from api.application.service_context import UserServiceContext
+from api.application.storage_accounting import quota_limit_bytes, storage_quota
+from api.infrastructure.read_routing import causal_session, routed
 from api.domain.metadata_models import (
     format_collection_schema,
     infer_field_type,
@@ -14,6 +16,7 @@ from api.domain.metadata_models import (
     serialize_metadata_doc,
     utc_now,
 )
+from api.domain.type_coercion import coerced_types
 
 
 class MetadataService:
@@ -101,21 +104,23 @@ class MetadataService:
             internal_db_name=internal_db_name,
             collections=collections,
         )
-        result = await self._coll.insert_one(meta, session=session)
+        async with causal_session(self.user_id, session=session, record=True) as session:
+            result = await self._coll.insert_one(meta, session=session)
         meta["_id"] = result.inserted_id
         return meta
 
     async def add_collections(self, db_id: str, new_collections: List[Dict], *, session=None) -> List[Dict]:
         formatted_docs = format_collection_schema(new_collections)
-        updated = await self._coll.find_one_and_update(
-            self._get_user_filter(db_id),
-            {
-                "$push": {"collections": {"$each": formatted_docs}},
-                "$set": {"updated_at": datetime.now(timezone.utc)}
-            },
-            return_document=ReturnDocument.AFTER,
-            session=session
-        )
+        async with causal_session(self.user_id, session=session, record=True) as session:
+            updated = await self._coll.find_one_and_update(
+                self._get_user_filter(db_id),
+                {
+                    "$push": {"collections": {"$each": formatted_docs}},
+                    "$set": {"updated_at": datetime.now(timezone.utc)}
+                },
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
         if not updated:
             raise PermissionError("Access denied or Database not found.")
         return formatted_docs
@@ -133,14 +138,15 @@ class MetadataService:
         if invalid:
             raise ValueError(f"Collections not found in metadata: {', '.join(invalid)}")
 
-        await self._coll.update_one(
-            {"_id": ObjectId(db_id), "user_id": self.user_id},
-            {
-                "$pull": {"collections": {"name": {"$in": names}}},
-                "$set": {"updated_at": datetime.now(timezone.utc)}
-            },
-            session=session
-        )
+        async with causal_session(self.user_id, session=session, record=True) as session:
+            await self._coll.update_one(
+                {"_id": ObjectId(db_id), "user_id": self.user_id},
+                {
+                    "$pull": {"collections": {"name": {"$in": names}}},
+                    "$set": {"updated_at": datetime.now(timezone.utc)}
+                },
+                session=session
+            )
 
         db_instance = settings.MONGODB_CLIENT[internal_db_name]
         for name in names:
@@ -150,7 +156,8 @@ class MetadataService:
     async def drop_database(self, db_id: str, *, session=None) -> Dict:
         """Drops the entire database (metadata + physical) scoped to user permissions."""
         self.ctx.assert_can_write()
-        meta = await self._coll.find_one_and_delete(self._get_user_filter(db_id), session=session)
+        async with causal_session(self.user_id, session=session, record=True) as session:
+            meta = await self._coll.find_one_and_delete(self._get_user_filter(db_id), session=session)
         if not meta:
             raise PermissionError("Access denied or Database not found.")
         await settings.MONGODB_CLIENT.drop_database(meta['dbName'])
@@ -164,13 +171,15 @@ class MetadataService:
         if search_term:
             query["displayName"] = {"$regex": search_term.strip(), "$options": "i"}
 
-        total = await self._coll.count_documents(query)
+        coll = routed(self._coll, causal=True)
         skip = (page - 1) * page_size
-        cursor = self._coll.find(query, {"_id": 1, "displayName": 1, "collections": 1}) \
-             .sort("displayName", 1) \
-             .skip(skip) \
-             .limit(page_size)
-        results_docs = await cursor.to_list(length=page_size)
+        async with causal_session(self.user_id) as session:
+            total = await coll.count_documents(query, session=session)
+            cursor = coll.find(query, {"_id": 1, "displayName": 1, "collections": 1}, session=session) \
+                 .sort("displayName", 1) \
+                 .skip(skip) \
+                 .limit(page_size)
+            results_docs = await cursor.to_list(length=page_size)
 
         results = []
         for doc in results_docs:
@@ -276,8 +285,9 @@ class MetadataService:
 
     async def list_user_databases_for_inventory(self) -> List[Dict]:
         """All database metadata docs for the bound user (inventory)."""
-        cursor = self._coll.find(self._get_user_filter()).sort("displayName", 1)
-        return await cursor.to_list(length=500)
+        async with causal_session(self.user_id) as session:
+            cursor = routed(self._coll, causal=True).find(self._get_user_filter(), session=session).sort("displayName", 1)
+            return await cursor.to_list(length=500)
 
     def _generate_schema_from_docs(self, docs: List[Dict]) -> Dict[str, str]:
         """Generates a field schema by inferring types from a sample of documents."""
@@ -313,7 +323,8 @@ class MetadataService:
                 has_changed = True
             else:
                 current_types = set(existing_fields[field_name].split(", "))
-                incoming_types = set(inferred_types.split(", "))
+                # Values coerced to the declared type must not widen it (that would turn coercion off).
+                incoming_types = set(inferred_types.split(", ")) - coerced_types(existing_fields[field_name])
                 merged = ", ".join(sorted(current_types | incoming_types))
                 if merged != existing_fields[field_name]:
                     existing_fields[field_name] = merged
@@ -416,26 +427,18 @@ class MetadataService:
         )
 
     async def check_quota_is_exceeded(self) -> bool:
-        """Checks if the user has exceeded their storage quota based on the latest snapshot."""
-        ops_db = settings.MONGODB_CLIENT["platform_ops"]
-        latest_stat = await ops_db["storage_snapshots"].find_one(
-            {"user_id": self.user_id},
-            sort=[("timestamp", -1)]
-        )
-        if not latest_stat:
+        """Checks the user's storage usage against the quota (cached in process; see storage_accounting)."""
+        if not await storage_quota.is_exceeded(self.user_id):
             return False
-        limit_mb = getattr(settings, "DATACUBE_FREE_TIER_MB", 500)
-        total_limit_bytes = 1024 * 1024 * limit_mb
-        current_usage = latest_stat.get("total_size", 0)
-        is_exceeded = current_usage > total_limit_bytes
-
-        if is_exceeded:
-            await ops_db["user_activity"].insert_one({
-                "timestamp": datetime.now(timezone.utc),
-                "metadata": {"user_id": self.user_id, "type": "quota_block"},
-                "details": f"Blocked write at {current_usage} bytes (Limit: {total_limit_bytes})"
-            })
-        return is_exceeded
+        current_usage = await storage_quota.usage_bytes(self.user_id)
+        total_limit_bytes = quota_limit_bytes()
+        ops_db = settings.MONGODB_CLIENT["platform_ops"]
+        await ops_db["user_activity"].insert_one({
+            "timestamp": datetime.now(timezone.utc),
+            "metadata": {"user_id": self.user_id, "type": "quota_block"},
+            "details": f"Blocked write at {current_usage} bytes (Limit: {total_limit_bytes})"
+        })
+        return True
 
     # ----------------------------------------------------------------------
     # New methods for file metadata (GridFS)
@@ -476,7 +479,8 @@ class MetadataService:
             "uploaded_at": now,
             "updated_at": now,
         }
-        result = await self._file_coll.insert_one(entry, session=session)
+        async with causal_session(self.user_id, session=session, record=True) as session:
+            result = await self._file_coll.insert_one(entry, session=session)
         entry["_id"] = result.inserted_id
 
         return self._stringify_objectids(entry) # type: ignore
@@ -488,10 +492,11 @@ class MetadataService:
         Returns True if a document was deleted, False otherwise.
         """
         self.ctx.assert_can_write()
-        result = await self._file_coll.delete_one(
-            self._get_file_user_filter(file_id),
-            session=session
-        )
+        async with causal_session(self.user_id, session=session, record=True) as session:
+            result = await self._file_coll.delete_one(
+                self._get_file_user_filter(file_id),
+                session=session
+            )
         return result.deleted_count == 1
 
     # Optional: add method to retrieve file entry if needed later
@@ -513,11 +518,12 @@ class MetadataService:
         if search_term:
             query["filename"] = {"$regex": search_term, "$options": "i"} # type: ignore
         
-        total = await self._file_coll.count_documents(query)
+        file_coll = routed(self._file_coll, causal=True)
         skip = (page - 1) * page_size
-
-        cursor = self._file_coll.find(query).sort("uploaded_at", -1).skip(skip).limit(page_size)
-        docs = await cursor.to_list(length=page_size)
+        async with causal_session(self.user_id) as session:
+            total = await file_coll.count_documents(query, session=session)
+            cursor = file_coll.find(query, session=session).sort("uploaded_at", -1).skip(skip).limit(page_size)
+            docs = await cursor.to_list(length=page_size)
         
         docs = [self._stringify_objectids(doc) for doc in docs]
         return total, docs # type: ignore
@@ -540,8 +546,9 @@ class MetadataService:
             }
         ]
         
-        cursor = await self._file_coll.aggregate(pipeline)
-        results = await cursor.to_list(length=1)
+        async with causal_session(self.user_id) as session:
+            cursor = await routed(self._file_coll, causal=True).aggregate(pipeline, session=session)
+            results = await cursor.to_list(length=1)
         
         if not results:
             return {
@@ -0,0 +1,181 @@
+"""
+Per-user storage accounting for the storage quota.
+
+``platform_ops.storage_usage`` holds one document per user:
+
+- ``measured_bytes``: the last measurement by ``measure_user_storage`` (Celery
+  beat), i.e. ``dbStats.dataSize`` of each of the user's databases plus the
+  sizes recorded in the GridFS file metadata. Each run also appends a point to
+  ``platform_ops.storage_snapshots``;
+- ``delta_bytes``: growth since that measurement, estimated at write time from
+  the BSON size of inserted documents and uploaded file lengths. A measurement
+  subtracts the delta it has absorbed, so writes racing with it are kept.
+
+``storage_quota`` caches each user's usage in process for
+``STORAGE_QUOTA_CACHE_SECONDS`` and adds this process's own deltas to it, so
+the quota check before a write is an in-memory read. Writes in other workers
+become visible when the entry expires.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+import bson
+from bson import ObjectId
+from bson.errors import InvalidDocument
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+OPS_DB = "platform_ops"
+USAGE_COLLECTION = "storage_usage"
+SNAPSHOT_COLLECTION = "storage_snapshots"
+
+
+def estimate_bson_size(docs: Iterable[dict]) -> int:
+    """Bytes the documents occupy as BSON (the unit ``dbStats.dataSize`` counts in)."""
+    total = 0
+    for doc in docs:
+        try:
+            total += len(bson.encode(doc))
+        except InvalidDocument:
+            continue
+    return total
+
+
+def quota_limit_bytes() -> int:
+    return 1024 * 1024 * getattr(settings, "DATACUBE_FREE_TIER_MB", 500)
+
+
+class StorageQuota:
+    """Per-process cache of user storage usage, refreshed from ``storage_usage``."""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._usage: dict[str, tuple[float, int]] = {}  # user id -> (expires_at, bytes)
+
+    @property
+    def ttl(self) -> float:
+        return getattr(settings, "STORAGE_QUOTA_CACHE_SECONDS", 30)
+
+    @staticmethod
+    def _collection():
+        return settings.MONGODB_CLIENT[OPS_DB][USAGE_COLLECTION]
+
+    def _cached(self, user_id: str) -> Optional[int]:
+        with self._lock:
+            entry = self._usage.get(user_id)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return entry[1]
+
+    def _store(self, user_id: str, usage: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._usage) >= self.max_entries:
+                for stale in [uid for uid, (expires_at, _) in self._usage.items() if expires_at <= now]:
+                    del self._usage[stale]
+                if len(self._usage) >= self.max_entries:
+                    self._usage.pop(next(iter(self._usage)))
+            self._usage[user_id] = (now + self.ttl, usage)
+
+    async def usage_bytes(self, user_id) -> int:
+        user_id = str(user_id)
+        usage = self._cached(user_id)
+        if usage is None:
+            doc = await self._collection().find_one(
+                {"_id": ObjectId(user_id)}, {"measured_bytes": 1, "delta_bytes": 1}
+            )
+            usage = int((doc or {}).get("measured_bytes", 0)) + int((doc or {}).get("delta_bytes", 0))
+            self._store(user_id, usage)
+        return usage
+
+    async def is_exceeded(self, user_id) -> bool:
+        return await self.usage_bytes(user_id) > quota_limit_bytes()
+
+    async def record_delta(self, user_id, nbytes: int) -> None:
+        """Account ``nbytes`` (negative when data is removed) to the user's usage."""
+        if not nbytes:
+            return
+        user_id = str(user_id)
+        await self._collection().update_one(
+            {"_id": ObjectId(user_id)}, {"$inc": {"delta_bytes": nbytes}}, upsert=True
+        )
+        with self._lock:
+            entry = self._usage.get(user_id)
+            if entry is not None:
+                self._usage[user_id] = (entry[0], entry[1] + nbytes)
+
+    def forget(self, user_id) -> None:
+        with self._lock:
+            self._usage.pop(str(user_id), None)
+
+
+def measure_user_storage(user_id: ObjectId, client=None) -> dict:
+    """Measure one user's storage from ``dbStats`` and GridFS metadata; store and return it."""
+    client = client or settings.MONGO_CONNECTIONS.sync_client()
+    ops = client[OPS_DB]
+    metadata_db = client[settings.MONGODB_DATABASE]
+
+    absorbed = (ops[USAGE_COLLECTION].find_one({"_id": user_id}, {"delta_bytes": 1}) or {}).get("delta_bytes", 0)
+
+    db_bytes = 0
+    for meta in metadata_db[settings.MONGODB_COLLECTION].find({"user_id": user_id}, {"dbName": 1}):
+        if meta.get("dbName"):
+            db_bytes += int(client[meta["dbName"]].command("dbStats").get("dataSize", 0))
+
+    files = list(metadata_db["file_metadata"].aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": None, "total": {"$sum": "$size"}}},
+    ]))
+    file_bytes = int(files[0]["total"]) if files else 0
+
+    now = datetime.now(timezone.utc)
+    usage = {
+        "measured_bytes": db_bytes + file_bytes,
+        "db_bytes": db_bytes,
+        "file_bytes": file_bytes,
+        "measured_at": now,
+    }
+    ops[USAGE_COLLECTION].update_one(
+        {"_id": user_id}, {"$set": usage, "$inc": {"delta_bytes": -absorbed}}, upsert=True
+    )
+    ops[SNAPSHOT_COLLECTION].insert_one({
+        "user_id": user_id,
+        "timestamp": now,
+        "total_size": usage["measured_bytes"],
+        "db_size": db_bytes,
+        "file_size": file_bytes,
+    })
+    return usage
+
+
+def accounted_user_ids(client=None) -> list:
+    """Every user owning a database or a stored file."""
+    client = client or settings.MONGO_CONNECTIONS.sync_client()
+    metadata_db = client[settings.MONGODB_DATABASE]
+    owners = set(metadata_db[settings.MONGODB_COLLECTION].distinct("user_id"))
+    owners.update(metadata_db["file_metadata"].distinct("user_id"))
+    return [owner for owner in owners if isinstance(owner, ObjectId)]
+
+
+def measure_all_storage(client=None) -> int:
+    """Measure every user; failures are logged and retried on the next run."""
+    client = client or settings.MONGO_CONNECTIONS.sync_client()
+    measured = 0
+    for user_id in accounted_user_ids(client):
+        try:
+            measure_user_storage(user_id, client)
+            measured += 1
+        except Exception:
+            logger.warning("Storage measurement failed for user %s", user_id, exc_info=True)
+    return measured
+
+
+storage_quota = StorageQuota()
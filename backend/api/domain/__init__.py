@@ -13,6 +13,13 @@ from api.domain.metadata_models import (
     normalize_field_type,
     serialize_metadata_doc,
 )
+from api.domain.type_coercion import (
+    build_field_coercers,
+    coerce_document,
+    coerce_filter,
+    coerce_update,
+    coerced_types,
+)
 
 __all__ = [
     "FIELD_TYPE_CHOICES",
@@ -26,4 +33,9 @@ __all__ = [
     "normalize_display_name",
     "normalize_field_type",
     "serialize_metadata_doc",
+    "build_field_coercers",
+    "coerce_document",
+    "coerce_filter",
+    "coerce_update",
+    "coerced_types",
 ]
@@ -11,6 +11,7 @@ from datetime import datetime, timezone
 from typing import Any, TypedDict
 
 from bson import ObjectId
+from bson.decimal128 import Decimal128
 
 # Types accepted on create/update via API serializers (subset of inferred types).
 FIELD_TYPE_CHOICES: tuple[str, ...] = (
@@ -165,6 +166,8 @@ def infer_field_type(value: Any) -> str:
         return "datetime"
     if isinstance(value, ObjectId):
         return "objectid"
+    if isinstance(value, Decimal128):
+        return "decimal128"
     if isinstance(value, str):
         return "string"
     if isinstance(value, list):
@@ -0,0 +1,215 @@
+"""
+Coerce client values to the BSON types declared in collection metadata.
+
+JSON clients send dates as ISO strings and often send numbers as strings. When a
+collection field declares a single concrete type (``CollectionFieldMeta.type``
+of ``datetime``, ``integer``, ...), writes store the real BSON type and filters
+compare against it, so ``$gte``/``$lt`` on a date is an index range scan
+instead of a string comparison. Schema inference learns from the coerced values,
+so it must not widen the declared type with them (``coerced_types``). Fields with mixed or undeclared types, and
+values that do not parse, are left untouched.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Mapping
+
+from bson.decimal128 import Decimal128
+
+from api.domain.metadata_models import CollectionFieldMeta, normalize_field_type
+
+_INTEGER_RE = re.compile(r"^[+-]?\d+$")
+
+# Query operators whose operand is a single value / a list of values of the field's type.
+_VALUE_OPERATORS = frozenset({"$eq", "$ne", "$gt", "$gte", "$lt", "$lte"})
+_LIST_OPERATORS = frozenset({"$in", "$nin", "$all"})
+_LOGICAL_OPERATORS = frozenset({"$and", "$or", "$nor"})
+
+# Update operators whose values are field values (not counters or paths).
+_VALUE_UPDATE_OPERATORS = frozenset({"$set", "$setOnInsert", "$min", "$max"})
+
+
+def _to_datetime(value: Any) -> Any:
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    if text.endswith(("Z", "z")):
+        text = text[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        return value
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _to_integer(value: Any) -> Any:
+    if isinstance(value, str) and _INTEGER_RE.match(value.strip()):
+        return int(value.strip())
+    return value
+
+
+def _to_number(value: Any) -> Any:
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    if _INTEGER_RE.match(text):
+        return int(text)
+    try:
+        number = float(text)
+    except ValueError:
+        return value
+    return number if math.isfinite(number) else value
+
+
+def _to_decimal128(value: Any) -> Any:
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return value
+    try:
+        return Decimal128(Decimal(str(value).strip()))
+    except (InvalidOperation, ValueError):
+        return value
+
+
+# Declared types that coerce the same way share a kind ("date" and "datetime", ...).
+# ``timestamp`` is a BSON Timestamp (oplog-style counter), not a date: left uncoerced.
+_KINDS: dict[str, str] = {
+    "date": "datetime",
+    "datetime": "datetime",
+    "integer": "integer",
+    "number": "number",
+    "float": "number",
+    "double": "number",
+    "decimal128": "decimal128",
+}
+
+_COERCERS: dict[str, Callable[[Any], Any]] = {
+    "datetime": _to_datetime,
+    "integer": _to_integer,
+    "number": _to_number,
+    "decimal128": _to_decimal128,
+}
+
+# What ``infer_field_type`` reports for the values each kind's coercer produces.
+_PRODUCED_TYPES: dict[str, frozenset[str]] = {
+    "datetime": frozenset({"datetime"}),
+    "integer": frozenset({"integer"}),
+    "number": frozenset({"integer", "number"}),
+    "decimal128": frozenset({"decimal128"}),
+}
+
+
+def _coercion_kind(declared_type: str | None) -> tuple[str, bool] | None:
+    """``(kind, is_array)`` when every declared type coerces the same way, else None.
+
+    Schema inference can list equivalent types side by side ("date, datetime",
+    "integer, number"); they still name one coercion.
+    """
+    kinds: set[str] = set()
+    arrays: set[bool] = set()
+    for part in str(declared_type or "").split(","):
+        field_type = part.strip().lower()
+        if not field_type:
+            continue
+        is_array = field_type.startswith("array<") and field_type.endswith(">")
+        if is_array:
+            field_type = field_type[len("array<"):-1]
+        kind = _KINDS.get(normalize_field_type(field_type, default=""))
+        if kind is None:
+            return None
+        kinds.add(kind)
+        arrays.add(is_array)
+    if kinds == {"integer", "number"}:
+        kinds = {"number"}
+    if len(kinds) != 1 or len(arrays) != 1:
+        return None
+    return kinds.pop(), arrays.pop()
+
+
+def coerced_types(declared_type: str | None) -> frozenset[str]:
+    """Inferred types of values coerced to ``declared_type``; inference must not widen with them."""
+    coercion = _coercion_kind(declared_type)
+    if coercion is None:
+        return frozenset()
+    kind, is_array = coercion
+    produced = _PRODUCED_TYPES[kind]
+    return frozenset(f"array<{t}>" for t in produced) if is_array else produced
+
+
+def build_field_coercers(fields: list[CollectionFieldMeta] | None) -> dict[str, Callable[[Any], Any]]:
+    """Map field name → coercer for fields whose declared types name one coercion."""
+    coercers: dict[str, Callable[[Any], Any]] = {}
+    for field in fields or []:
+        coercion = _coercion_kind(field.get("type"))
+        if coercion is None:
+            continue
+        kind, is_array = coercion
+        coercer = _COERCERS[kind]
+        coercers[field["name"]] = _each(coercer) if is_array else coercer
+    return coercers
+
+
+def _each(coercer: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    def coerce(value: Any) -> Any:
+        if isinstance(value, list):
+            return [coercer(item) for item in value]
+        return coercer(value)
+    return coerce
+
+
+def coerce_document(doc: dict, coercers: Mapping[str, Callable[[Any], Any]]) -> dict:
+    """Coerce top-level fields of a document in place; returns the document."""
+    if coercers:
+        for name, coercer in coercers.items():
+            if name in doc:
+                doc[name] = coercer(doc[name])
+    return doc
+
+
+def coerce_update(update_data: dict, coercers: Mapping[str, Callable[[Any], Any]]) -> dict:
+    """Coerce field values in a plain field map or in $set-style update operators."""
+    if not coercers:
+        return update_data
+    if not any(str(key).startswith("$") for key in update_data):
+        return coerce_document(dict(update_data), coercers)
+    out = dict(update_data)
+    for op in _VALUE_UPDATE_OPERATORS:
+        if isinstance(out.get(op), dict):
+            out[op] = coerce_document(dict(out[op]), coercers)
+    return out
+
+
+def coerce_filter(filt: Any, coercers: Mapping[str, Callable[[Any], Any]]) -> Any:
+    """Return a copy of ``filt`` with operands of declared fields coerced."""
+    if not coercers or not isinstance(filt, dict):
+        return filt
+    out: dict = {}
+    for key, value in filt.items():
+        if key in _LOGICAL_OPERATORS and isinstance(value, list):
+            out[key] = [coerce_filter(item, coercers) for item in value]
+        elif key in coercers:
+            out[key] = _coerce_condition(value, coercers[key])
+        else:
+            out[key] = value
+    return out
+
+
+def _coerce_condition(condition: Any, coercer: Callable[[Any], Any]) -> Any:
+    if isinstance(condition, dict) and any(str(k).startswith("$") for k in condition):
+        out = {}
+        for op, operand in condition.items():
+            if op in _VALUE_OPERATORS:
+                out[op] = coercer(operand)
+            elif op in _LIST_OPERATORS and isinstance(operand, list):
+                out[op] = [coercer(item) for item in operand]
+            elif op == "$not":
+                out[op] = _coerce_condition(operand, coercer)
+            else:
+                out[op] = operand
+        return out
+    return coercer(condition)
@@ -0,0 +1,111 @@
+"""
+Direct BSON → JSON encoding for document read responses.
+
+The default read path decodes BSON into dicts, walks them with
+``jsonify_object_ids`` and then lets DRF's ``JSONRenderer`` walk them again.
+This module encodes raw batches from ``find_raw_batches`` in one pass: BSON is
+decoded by the C extension and serialized by the C JSON encoder, with BSON
+types (ObjectId, datetime, Decimal128, Binary, ...) handled in ``default``.
+Output matches ``JSONRenderer`` for the types both paths support.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Iterable, Tuple
+
+from bson import ObjectId, decode_all  # pyright: ignore[reportMissingImports]
+from bson.binary import Binary
+from bson.codec_options import CodecOptions
+from bson.decimal128 import Decimal128
+from bson.regex import Regex
+from bson.timestamp import Timestamp
+from rest_framework.utils.encoders import JSONEncoder
+
+# Same decoding as the shared client (naive UTC datetimes), so both read paths
+# render identical timestamps.
+RAW_CODEC_OPTIONS = CodecOptions()
+
+
+def _datetime(value: datetime) -> str:
+    # Same representation as DRF's JSONEncoder.
+    text = value.isoformat()
+    if text.endswith("+00:00"):
+        text = text[:-6] + "Z"
+    return text
+
+
+# Exact-type dispatch: one dict lookup per value instead of an isinstance chain.
+_BSON_TYPE_HANDLERS: dict[type, Callable[[Any], Any]] = {
+    ObjectId: str,
+    datetime: _datetime,
+    # String keeps the full 34-digit precision (float would not).
+    Decimal128: str,
+    Binary: lambda value: base64.b64encode(bytes(value)).decode("ascii"),
+    Timestamp: lambda value: {"t": value.time, "i": value.inc},
+    Regex: lambda value: {"pattern": value.pattern, "flags": value.flags},
+}
+
+
+class BSONJSONEncoder(JSONEncoder):
+    """DRF's encoder plus native handling of BSON-only types."""
+
+    def default(self, obj):
+        handler = _BSON_TYPE_HANDLERS.get(type(obj))
+        if handler is not None:
+            return handler(obj)
+        return super().default(obj)
+
+
+# Same knobs as JSONRenderer under default DRF settings (compact, unicode, strict).
+_ENCODER = BSONJSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def _finalize(text: str) -> bytes:
+    # JSONRenderer escapes these so the payload is also valid JavaScript.
+    return text.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029").encode("utf-8")
+
+
+def decode_raw_batches(batches: Iterable[bytes]) -> list[dict]:
+    """Decode ``find_raw_batches`` output into dicts using the C decoder."""
+    docs: list[dict] = []
+    for batch in batches:
+        docs.extend(decode_all(batch, RAW_CODEC_OPTIONS))
+    return docs
+
+
+def encode_documents(batches: Iterable[bytes]) -> Tuple[bytes, int]:
+    """Encode raw BSON batches as a JSON array; returns ``(body, document_count)``."""
+    docs = decode_raw_batches(batches)
+    return _finalize(_ENCODER.encode(docs)), len(docs)
+
+
+def encode_batch_items(batch: bytes) -> Tuple[bytes, int]:
+    """
+    Encode one raw batch as comma-separated JSON documents (no brackets), for
+    splicing into a streamed array. Returns ``(b"", 0)`` for an empty batch.
+    """
+    docs = decode_all(batch, RAW_CODEC_OPTIONS)
+    if not docs:
+        return b"", 0
+    return _finalize(_ENCODER.encode(docs)[1:-1]), len(docs)
+
+
+def encode_value(value: Any) -> bytes:
+    """Encode any JSON/BSON-compatible value with the shared encoder."""
+    return _finalize(_ENCODER.encode(value))
+
+
+def render_envelope(batches: Iterable[bytes], envelope: dict[str, Any], *, key: str = "data") -> Tuple[bytes, int]:
+    """
+    Encode ``envelope`` with the documents from ``batches`` spliced in at ``key``.
+
+    Keys keep their insertion order, so ``{"success": True, "data": None,
+    "pagination": {...}}`` renders exactly like the DRF response body.
+    """
+    docs = decode_raw_batches(batches)
+    body = dict(envelope)
+    body[key] = docs
+    return _finalize(_ENCODER.encode(body)), len(docs)
@@ -0,0 +1,101 @@
+"""
+Content-coding helpers for HTTP response compression (Brotli and gzip).
+
+``negotiate_encoding`` picks a coding from ``Accept-Encoding`` (server
+preference: br, then gzip; ``q=0`` excludes). ``StreamCompressor`` compresses
+chunk by chunk and flushes after each one, so streamed bodies reach the client
+progressively instead of being held until the compressor's window fills.
+"""
+
+from __future__ import annotations
+
+import zlib
+from typing import Optional
+
+import brotli  # pyright: ignore[reportMissingImports]
+
+BROTLI = "br"
+GZIP = "gzip"
+
+# Server preference order when the client accepts several codings equally.
+SUPPORTED_ENCODINGS = (BROTLI, GZIP)
+
+# Content types worth compressing; images, archives and GridFS blobs are skipped.
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+})
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = (content_type or "").split(";", 1)[0].strip().lower()
+    return (
+        media_type in COMPRESSIBLE_TYPES
+        or media_type.startswith("text/")
+        or media_type.endswith("+json")
+    )
+
+
+def _parse_accept_encoding(header: str) -> dict[str, float]:
+    weights: dict[str, float] = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    return weights
+
+
+def negotiate_encoding(header: str, allowed: tuple[str, ...] = SUPPORTED_ENCODINGS) -> Optional[str]:
+    """Return the best coding in ``allowed`` the client accepts, or None for identity."""
+    weights = _parse_accept_encoding(header)
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in allowed:
+        q = weights.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress_bytes(data: bytes, encoding: str, level: int) -> bytes:
+    if encoding == BROTLI:
+        return brotli.compress(data, mode=brotli.MODE_TEXT, quality=level)
+    if encoding == GZIP:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    raise ValueError(f"Unsupported content coding: {encoding}")
+
+
+class StreamCompressor:
+    """Incremental compressor; ``compress`` output is flushed so each chunk is decodable."""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == BROTLI:
+            self._brotli = brotli.Compressor(mode=brotli.MODE_TEXT, quality=level)
+        elif encoding == GZIP:
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)
+        else:
+            raise ValueError(f"Unsupported content coding: {encoding}")
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == BROTLI:
+            return self._brotli.process(chunk) + self._brotli.flush()
+        return self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == BROTLI:
+            return self._brotli.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
@@ -0,0 +1,448 @@
+"""
+Per-tenant token buckets and in-flight caps for the data API.
+
+Each tenant identity (``user:<id>``, ``key:<api key hash prefix>``) gets:
+
+- a request bucket (``requests_per_second`` refill, ``burst`` capacity);
+- a byte bucket (``bytes_per_second``, ``bytes_burst``), charged with the
+  request body on admission and the response body on release. It may go
+  negative, so one large transfer delays the tenant's next requests instead
+  of being refused outright;
+- a cap of ``max_in_flight`` concurrent requests. In Redis, slots are leased
+  for ``RATE_LIMIT_LEASE_SECONDS`` so a crashed worker cannot leak them.
+
+A request may carry several identities (an API key and its owner). Admission
+checks all of them and charges all of them, or none. With a Redis URL
+(``RATE_LIMIT_REDIS_URL``, defaults to ``REDIS_CACHE_URL``) this is one Lua
+script call shared by every worker. Without one, or while Redis is
+unreachable, each process enforces the same limits in memory.
+
+Admission and rejection counts, current and peak in-flight requests are kept
+per identity for ``RATE_LIMIT_STATS_TTL_SECONDS`` (``saturation_snapshot``).
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from project.redis_clients import RedisScripts
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "datacube:rl:"
+TENANTS_KEY = KEY_PREFIX + "tenants"
+
+# KEYS: per identity (requests bucket, bytes bucket, in-flight zset, stats hash), then TENANTS_KEY
+# ARGV: request id, request bytes, lease ms, concurrency retry ms, stats ttl ms,
+#       then per identity: name, rps, burst, bytes/s, bytes burst, max in flight
+# Returns {1} when admitted, else {0, retry_after_ms, reason, identity}.
+ADMIT_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local n = (#KEYS - 1) / 4
+local cost = tonumber(ARGV[2])
+local lease = tonumber(ARGV[3])
+local stats_ttl = tonumber(ARGV[5])
+
+local function level(key, rate, burst)
+  local b = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(b[1]) or burst
+  local ts = tonumber(b[2]) or now
+  return math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+end
+
+local function store(key, tokens, rate, burst)
+  redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+  redis.call('PEXPIRE', key, math.ceil((burst - tokens) * 1000 / rate) + 1000)
+end
+
+local levels = {}
+local retry, reason, who = 0, '', ''
+for i = 1, n do
+  local k, a = (i - 1) * 4, 5 + (i - 1) * 6
+  local rps, burst = tonumber(ARGV[a + 2]), tonumber(ARGV[a + 3])
+  local bps, bburst = tonumber(ARGV[a + 4]), tonumber(ARGV[a + 5])
+  local cap = tonumber(ARGV[a + 6])
+  local l = {}
+  if rps > 0 then
+    l.requests = level(KEYS[k + 1], rps, burst)
+    local wait = (1 - l.requests) * 1000 / rps
+    if wait > retry then retry, reason, who = wait, 'requests', ARGV[a + 1] end
+  end
+  if bps > 0 then
+    l.bytes = level(KEYS[k + 2], bps, bburst)
+    local wait = -l.bytes * 1000 / bps
+    if wait > retry then retry, reason, who = wait, 'bytes', ARGV[a + 1] end
+  end
+  if cap > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[k + 3], '-inf', now - lease)
+    l.in_flight = redis.call('ZCARD', KEYS[k + 3])
+    if l.in_flight >= cap and tonumber(ARGV[4]) > retry then
+      retry, reason, who = tonumber(ARGV[4]), 'concurrency', ARGV[a + 1]
+    end
+  end
+  levels[i] = l
+end
+
+redis.call('ZREMRANGEBYSCORE', KEYS[#KEYS], '-inf', now - stats_ttl)
+if retry > 0 then
+  for i = 1, n do
+    local a = 5 + (i - 1) * 6
+    if ARGV[a + 1] == who then
+      local stats = KEYS[(i - 1) * 4 + 4]
+      redis.call('HINCRBY', stats, 'rejected_' .. reason, 1)
+      redis.call('PEXPIRE', stats, stats_ttl)
+      redis.call('ZADD', KEYS[#KEYS], now, who)
+    end
+  end
+  return {0, math.ceil(retry), reason, who}
+end
+
+for i = 1, n do
+  local k, a = (i - 1) * 4, 5 + (i - 1) * 6
+  local rps, burst = tonumber(ARGV[a + 2]), tonumber(ARGV[a + 3])
+  local bps, bburst = tonumber(ARGV[a + 4]), tonumber(ARGV[a + 5])
+  local l = levels[i]
+  if l.requests then store(KEYS[k + 1], l.requests - 1, rps, burst) end
+  if l.bytes then store(KEYS[k + 2], l.bytes - cost, bps, bburst) end
+  local in_flight = 0
+  if l.in_flight then
+    redis.call('ZADD', KEYS[k + 3], now, ARGV[1])
+    redis.call('PEXPIRE', KEYS[k + 3], lease)
+    in_flight = l.in_flight + 1
+  end
+  local stats = KEYS[k + 4]
+  redis.call('HINCRBY', stats, 'admitted', 1)
+  if in_flight > (tonumber(redis.call('HGET', stats, 'peak_in_flight')) or 0) then
+    redis.call('HSET', stats, 'peak_in_flight', in_flight)
+  end
+  redis.call('PEXPIRE', stats, stats_ttl)
+  redis.call('ZADD', KEYS[#KEYS], now, ARGV[a + 1])
+end
+return {1}
+"""
+
+# KEYS: per identity (bytes bucket, in-flight zset)
+# ARGV: request id, response bytes, then per identity: bytes/s, bytes burst
+RELEASE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local cost = tonumber(ARGV[2])
+for i = 1, #KEYS / 2 do
+  local k, a = (i - 1) * 2, 2 + (i - 1) * 2
+  redis.call('ZREM', KEYS[k + 2], ARGV[1])
+  local bps, bburst = tonumber(ARGV[a + 1]), tonumber(ARGV[a + 2])
+  if bps > 0 and cost > 0 then
+    local b = redis.call('HMGET', KEYS[k + 1], 'tokens', 'ts')
+    local tokens = tonumber(b[1]) or bburst
+    local ts = tonumber(b[2]) or now
+    tokens = math.min(bburst, tokens + math.max(0, now - ts) * bps / 1000) - cost
+    redis.call('HSET', KEYS[k + 1], 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', KEYS[k + 1], math.ceil((bburst - tokens) * 1000 / bps) + 1000)
+  end
+end
+return 1
+"""
+
+
+@dataclass(frozen=True)
+class TenantLimits:
+    """0 disables a dimension."""
+
+    requests_per_second: float = 0
+    burst: float = 0
+    bytes_per_second: float = 0
+    bytes_burst: float = 0
+    max_in_flight: int = 0
+
+    @classmethod
+    def from_settings(cls, kind: str) -> "TenantLimits":
+        return cls(**getattr(settings, "RATE_LIMITS", {}).get(kind, {}))
+
+    @property
+    def active(self) -> bool:
+        return bool(self.requests_per_second or self.bytes_per_second or self.max_in_flight)
+
+
+@dataclass(frozen=True)
+class Identity:
+    name: str
+    limits: TenantLimits
+
+
+@dataclass
+class Ticket:
+    """An admitted request; hand back to ``release`` once the response is ready."""
+
+    request_id: str
+    identities: tuple[Identity, ...]
+    backend: str  # "redis" | "local"
+
+
+@dataclass(frozen=True)
+class Rejection:
+    identity: str
+    reason: str  # "requests" | "bytes" | "concurrency"
+    retry_after: float  # seconds
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def identity(kind: str, tenant_id: str) -> Optional[Identity]:
+    limits = TenantLimits.from_settings(kind)
+    if not limits.active:
+        return None
+    return Identity(f"{'key' if kind == 'api_key' else kind}:{tenant_id}", limits)
+
+
+def _keys(name: str) -> tuple[str, str, str, str]:
+    base = KEY_PREFIX + name
+    return f"{base}:req", f"{base}:bytes", f"{base}:inflight", f"{base}:stats"
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+@dataclass
+class _Bucket:
+    tokens: float
+    stamp: float
+
+    def level(self, now: float, rate: float, burst: float) -> float:
+        return min(burst, self.tokens + max(0.0, now - self.stamp) * rate)
+
+
+@dataclass
+class _LocalState:
+    requests: Optional[_Bucket] = None
+    bytes: Optional[_Bucket] = None
+    in_flight: int = 0
+    stats: dict = field(default_factory=dict)
+    seen: float = 0.0
+
+
+class LocalRateLimiter:
+    """Same buckets and caps as the Redis script, for this process only."""
+
+    def __init__(self, max_tenants: int = 10_000):
+        self.max_tenants = max_tenants
+        self._lock = threading.Lock()
+        self._state: dict[str, _LocalState] = {}
+
+    def _get(self, name: str, now: float) -> _LocalState:
+        state = self._state.get(name)
+        if state is None:
+            if len(self._state) >= self.max_tenants:
+                self._prune(now)
+            state = self._state[name] = _LocalState()
+        state.seen = now
+        return state
+
+    def _prune(self, now: float) -> None:
+        ttl = settings.RATE_LIMIT_STATS_TTL_SECONDS
+        idle = [name for name, s in self._state.items() if not s.in_flight and now - s.seen > ttl]
+        for name in idle or [min(self._state, key=lambda n: self._state[n].seen)]:
+            del self._state[name]
+
+    def admit(self, identities: Iterable[Identity], request_bytes: int) -> Optional[Rejection]:
+        now = time.monotonic()
+        with self._lock:
+            checked = []
+            rejection: Optional[Rejection] = None
+            for ident in identities:
+                state = self._get(ident.name, now)
+                lim = ident.limits
+                levels = {}
+                waits = []
+                if lim.requests_per_second:
+                    bucket = state.requests or _Bucket(lim.burst, now)
+                    levels["requests"] = bucket.level(now, lim.requests_per_second, lim.burst)
+                    waits.append(((1 - levels["requests"]) / lim.requests_per_second, "requests"))
+                if lim.bytes_per_second:
+                    bucket = state.bytes or _Bucket(lim.bytes_burst, now)
+                    levels["bytes"] = bucket.level(now, lim.bytes_per_second, lim.bytes_burst)
+                    waits.append((-levels["bytes"] / lim.bytes_per_second, "bytes"))
+                if lim.max_in_flight and state.in_flight >= lim.max_in_flight:
+                    waits.append((settings.RATE_LIMIT_CONCURRENCY_RETRY_SECONDS, "concurrency"))
+                wait, reason = max(waits, default=(0.0, ""))
+                if wait > 0 and (rejection is None or wait > rejection.retry_after):
+                    rejection = Rejection(ident.name, reason, wait)
+                checked.append((ident, state, levels))
+
+            if rejection is not None:
+                stats = self._state[rejection.identity].stats
+                key = f"rejected_{rejection.reason}"
+                stats[key] = stats.get(key, 0) + 1
+                return rejection
+
+            for ident, state, levels in checked:
+                if "requests" in levels:
+                    state.requests = _Bucket(levels["requests"] - 1, now)
+                if "bytes" in levels:
+                    state.bytes = _Bucket(levels["bytes"] - request_bytes, now)
+                if ident.limits.max_in_flight:
+                    state.in_flight += 1
+                state.stats["admitted"] = state.stats.get("admitted", 0) + 1
+                state.stats["peak_in_flight"] = max(state.stats.get("peak_in_flight", 0), state.in_flight)
+            return None
+
+    def release(self, identities: Iterable[Identity], response_bytes: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for ident in identities:
+                state = self._state.get(ident.name)
+                if state is None:
+                    continue
+                if ident.limits.max_in_flight:
+                    state.in_flight = max(0, state.in_flight - 1)
+                lim = ident.limits
+                if lim.bytes_per_second and response_bytes:
+                    bucket = state.bytes or _Bucket(lim.bytes_burst, now)
+                    state.bytes = _Bucket(
+                        bucket.level(now, lim.bytes_per_second, lim.bytes_burst) - response_bytes, now
+                    )
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                name: {**state.stats, "in_flight": state.in_flight}
+                for name, state in self._state.items()
+            }
+
+
+class TenantRateLimiter:
+    """Redis-backed admission with an in-process fallback."""
+
+    def __init__(self, url: Optional[str] = None):
+        self.redis = RedisScripts("RATE_LIMIT_REDIS_URL", url)
+        self.local = LocalRateLimiter()
+
+    @staticmethod
+    def _admit_call(identities: tuple[Identity, ...], request_id: str, request_bytes: int):
+        keys, args = [], [
+            request_id,
+            request_bytes,
+            int(settings.RATE_LIMIT_LEASE_SECONDS * 1000),
+            int(settings.RATE_LIMIT_CONCURRENCY_RETRY_SECONDS * 1000),
+            int(settings.RATE_LIMIT_STATS_TTL_SECONDS * 1000),
+        ]
+        for ident in identities:
+            lim = ident.limits
+            keys.extend(_keys(ident.name))
+            args.extend([
+                ident.name,
+                lim.requests_per_second,
+                lim.burst,
+                lim.bytes_per_second,
+                lim.bytes_burst,
+                lim.max_in_flight,
+            ])
+        keys.append(TENANTS_KEY)
+        return keys, args
+
+    @staticmethod
+    def _release_call(ticket: Ticket, response_bytes: int):
+        keys, args = [], [ticket.request_id, response_bytes]
+        for ident in ticket.identities:
+            bytes_key, inflight_key = _keys(ident.name)[1:3]
+            keys.extend([bytes_key, inflight_key])
+            args.extend([ident.limits.bytes_per_second, ident.limits.bytes_burst])
+        return keys, args
+
+    @staticmethod
+    def _rejection(result) -> Optional[Rejection]:
+        if int(result[0]) == 1:
+            return None
+        return Rejection(_decode(result[3]), _decode(result[2]), int(result[1]) / 1000)
+
+    def _local_admit(self, identities, request_id, request_bytes):
+        rejection = self.local.admit(identities, request_bytes)
+        return (None, rejection) if rejection else (Ticket(request_id, identities, "local"), None)
+
+    def admit(self, identities: Iterable[Identity], request_bytes: int = 0):
+        """``(ticket, None)`` when admitted, ``(None, rejection)`` otherwise."""
+        identities = tuple(identities)
+        request_id = uuid.uuid4().hex
+        if self.redis.enabled:
+            keys, args = self._admit_call(identities, request_id, request_bytes)
+            try:
+                rejection = self._rejection(self.redis.sync_script(ADMIT_SCRIPT)(keys=keys, args=args))
+            except RedisError:
+                logger.warning("Rate limit store unavailable; limiting per process", exc_info=True)
+            else:
+                return (None, rejection) if rejection else (Ticket(request_id, identities, "redis"), None)
+        return self._local_admit(identities, request_id, request_bytes)
+
+    async def aadmit(self, identities: Iterable[Identity], request_bytes: int = 0):
+        identities = tuple(identities)
+        request_id = uuid.uuid4().hex
+        if self.redis.enabled:
+            keys, args = self._admit_call(identities, request_id, request_bytes)
+            try:
+                rejection = self._rejection(await self.redis.async_script(ADMIT_SCRIPT)(keys=keys, args=args))
+            except RedisError:
+                logger.warning("Rate limit store unavailable; limiting per process", exc_info=True)
+            else:
+                return (None, rejection) if rejection else (Ticket(request_id, identities, "redis"), None)
+        return self._local_admit(identities, request_id, request_bytes)
+
+    def release(self, ticket: Ticket, response_bytes: int = 0) -> None:
+        if ticket.backend == "local":
+            self.local.release(ticket.identities, response_bytes)
+            return
+        keys, args = self._release_call(ticket, response_bytes)
+        try:
+            self.redis.sync_script(RELEASE_SCRIPT)(keys=keys, args=args)
+        except RedisError:
+            # The in-flight lease expires on its own.
+            logger.warning("Could not release rate limit slot", exc_info=True)
+
+    async def arelease(self, ticket: Ticket, response_bytes: int = 0) -> None:
+        if ticket.backend == "local":
+            self.local.release(ticket.identities, response_bytes)
+            return
+        keys, args = self._release_call(ticket, response_bytes)
+        try:
+            await self.redis.async_script(RELEASE_SCRIPT)(keys=keys, args=args)
+        except RedisError:
+            logger.warning("Could not release rate limit slot", exc_info=True)
+
+    def saturation_snapshot(self, limit: int = 100) -> dict[str, dict]:
+        """Per-identity counters for the most recently active tenants (all workers when Redis is used)."""
+        if not self.redis.enabled:
+            return dict(list(self.local.snapshot().items())[:limit])
+        try:
+            client = self.redis.sync_client()
+            names = [_decode(n) for n in client.zrevrange(TENANTS_KEY, 0, limit - 1)]
+            pipe = client.pipeline(transaction=False)
+            for name in names:
+                _, _, inflight_key, stats_key = _keys(name)
+                pipe.hgetall(stats_key)
+                pipe.zcard(inflight_key)
+            results = pipe.execute()
+        except RedisError:
+            logger.warning("Rate limit store unavailable; reporting this process only", exc_info=True)
+            return dict(list(self.local.snapshot().items())[:limit])
+        snapshot = {}
+        for index, name in enumerate(names):
+            stats, in_flight = results[2 * index], results[2 * index + 1]
+            snapshot[name] = {
+                **{_decode(k): int(v) for k, v in stats.items()},
+                "in_flight": int(in_flight),
+            }
+        return snapshot
+
+
+tenant_rate_limiter = TenantRateLimiter()
@@ -0,0 +1,104 @@
+"""
+Route read-mostly queries away from the primary.
+
+Analytics aggregations and inventory listings tolerate a little replication
+lag, so they read with ``settings.MONGODB_ROUTED_READ_PREFERENCE``
+(``secondaryPreferred`` with a ``maxStalenessSeconds`` bound by default)
+instead of competing with tenant writes on the primary.
+
+Listings a tenant expects to reflect its own changes (databases, collections,
+files) additionally run in a causally consistent session. Metadata writes record
+the session's cluster/operation time per tenant in the Django cache; the next
+routed read advances a fresh session to that token, so a secondary only answers
+once it has replicated the tenant's last write (``afterClusterTime``). Tokens
+expire after ``MONGODB_CAUSAL_TOKEN_TTL`` seconds, by which time any healthy
+secondary has caught up.
+
+The token only helps if every process sees it, so it needs a shared cache
+(``MONGODB_CAUSAL_TOKENS_SHARED``, on with ``REDIS_CACHE_URL``). Without one,
+tenant listings (``routed(..., causal=True)``) read from the primary. When
+routing is off or tokens are not shared, ``causal_session`` skips the cache and
+yields no session of its own.
+"""
+
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+CAUSAL_TOKEN_KEY = "mongo:causal:{tenant}"
+
+
+def routed(target: Any, *, causal: bool = False) -> Any:
+    """
+    Return ``target`` (database or collection) reading with the routed read preference.
+
+    ``causal=True`` marks reads that must see the tenant's own writes; they stay
+    on ``target``'s (primary) preference unless causal tokens are in use.
+    """
+    if causal and not causal_reads_routed():
+        return target
+    return target.with_options(read_preference=settings.MONGODB_ROUTED_READ_PREFERENCE)
+
+
+def causal_reads_routed() -> bool:
+    """Whether tenant listings leave the primary, guarded by a shared causal token."""
+    return settings.MONGODB_ROUTED_READ_PREFERENCE.mode != 0 and settings.MONGODB_CAUSAL_TOKENS_SHARED
+
+
+def _token_key(tenant_id: Any) -> str:
+    return CAUSAL_TOKEN_KEY.format(tenant=tenant_id)
+
+
+async def load_causal_token(tenant_id: Any) -> Optional[dict]:
+    return await cache.aget(_token_key(tenant_id))
+
+
+async def remember_causal_token(tenant_id: Any, session) -> None:
+    """Store the session's cluster/operation time if it is newer than the stored token."""
+    operation_time = session.operation_time
+    if operation_time is None:
+        # Standalone servers do not report operation times; nothing to wait for.
+        return
+    current = await load_causal_token(tenant_id)
+    if current is not None and current["operation_time"] >= operation_time:
+        return
+    await cache.aset(
+        _token_key(tenant_id),
+        {"cluster_time": session.cluster_time, "operation_time": operation_time},
+        settings.MONGODB_CAUSAL_TOKEN_TTL,
+    )
+
+
+@asynccontextmanager
+async def causal_session(tenant_id: Any, *, session=None, record: bool = False) -> AsyncIterator[Any]:
+    """
+    Causally consistent session for ``tenant_id``, advanced to its last recorded write.
+
+    Reads run with the yielded session observe every write the tenant made in
+    a ``record=True`` session. Write paths pass ``record=True`` so the token is
+    stored on exit; an explicit ``session`` (e.g. the caller's transaction) is
+    used as is and only has its token recorded. When causal reads are not
+    routed (see ``causal_reads_routed``) the cache is not touched and, without
+    an explicit ``session``, ``None`` is yielded.
+    """
+    tracked = causal_reads_routed()
+    if session is not None or not tracked:
+        yield session
+        if record and tracked:
+            await remember_causal_token(tenant_id, session)
+        return
+
+    client = settings.MONGO_CONNECTIONS.async_client()
+    async with client.start_session(causal_consistency=True) as own_session:
+        token = await load_causal_token(tenant_id)
+        if token is not None:
+            if token.get("cluster_time"):
+                own_session.advance_cluster_time(token["cluster_time"])
+            own_session.advance_operation_time(token["operation_time"])
+        yield own_session
+        if record:
+            await remember_causal_token(tenant_id, own_session)
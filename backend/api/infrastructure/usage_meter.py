@@ -0,0 +1,206 @@
+"""
+Monthly API-call metering in Redis.
+
+Each user has a counter hash (``month``, ``calls``) and a plan entry (``plan``,
+``limit``) in Redis. ``METER_SCRIPT`` checks the limit, rolls the counter over
+when the month changed and increments it in one atomic step, so concurrent
+requests can never overshoot the plan limit and the request path costs a
+single Redis round trip.
+
+Counters are seeded from the user document on first use (or after the plan
+entry expires, every ``USAGE_METER_PLAN_TTL_SECONDS``, so plan changes take
+effect). Users whose counter changed are added to a dirty set;
+``flush_usage_counters`` (Celery beat) writes them back to
+``usage.api_calls_current_month`` in batches, so the value in MongoDB trails
+Redis by at most ``USAGE_METER_FLUSH_SECONDS``.
+
+Without ``USAGE_METER_REDIS_URL`` (defaults to ``REDIS_CACHE_URL``) the meter
+is disabled and ``UsageMeteringMiddleware`` meters against MongoDB directly.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from bson import ObjectId
+from django.conf import settings
+from pymongo import UpdateOne
+
+from project.redis_clients import RedisScripts
+
+COUNTER_KEY = "datacube:usage:{user_id}:calls"
+PLAN_KEY = "datacube:usage:{user_id}:plan"
+DIRTY_KEY = "datacube:usage:dirty"
+
+# KEYS: counter hash, plan hash, dirty set
+# ARGV: user_id, month, counter_ttl[, plan, limit, plan_ttl, seed_month, seed_calls]
+# Returns {status, calls, plan}: 1 allowed, 0 limit reached, -1 needs seeding.
+METER_SCRIPT = """
+local plan_entry = redis.call('HMGET', KEYS[2], 'plan', 'limit')
+if ARGV[4] then
+  plan_entry = {ARGV[4], ARGV[5]}
+  redis.call('HSET', KEYS[2], 'plan', ARGV[4], 'limit', ARGV[5])
+  redis.call('EXPIRE', KEYS[2], ARGV[6])
+  if redis.call('HSETNX', KEYS[1], 'month', ARGV[7]) == 1 then
+    redis.call('HSET', KEYS[1], 'calls', ARGV[8])
+  end
+elseif not plan_entry[2] or redis.call('EXISTS', KEYS[1]) == 0 then
+  return {-1, 0, ''}
+end
+if redis.call('HGET', KEYS[1], 'month') ~= ARGV[2] then
+  redis.call('HSET', KEYS[1], 'month', ARGV[2], 'calls', 0)
+  redis.call('SADD', KEYS[3], ARGV[1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+local calls = tonumber(redis.call('HGET', KEYS[1], 'calls'))
+if calls >= tonumber(plan_entry[2]) then
+  return {0, calls, plan_entry[1]}
+end
+calls = redis.call('HINCRBY', KEYS[1], 'calls', 1)
+redis.call('SADD', KEYS[3], ARGV[1])
+return {1, calls, plan_entry[1]}
+"""
+
+
+@dataclass(frozen=True)
+class MeterSeed:
+    """What the script needs from the user document when Redis has no state."""
+
+    plan: str
+    limit: int
+    month: str
+    calls: int
+
+
+@dataclass(frozen=True)
+class MeterDecision:
+    allowed: bool
+    calls: int
+    plan: str
+    needs_seed: bool = False
+
+
+def month_of(moment: datetime) -> str:
+    """``YYYY-MM``; also the prefix of the ISO ``usage.last_reset_date``."""
+    return moment.strftime("%Y-%m")
+
+
+def _decode(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+class UsageMeter:
+    """Runs ``METER_SCRIPT`` with a sync client, or the running loop's async client."""
+
+    def __init__(self, url: Optional[str] = None):
+        self.redis = RedisScripts("USAGE_METER_REDIS_URL", url)
+
+    @property
+    def enabled(self) -> bool:
+        return self.redis.enabled
+
+    def sync_client(self):
+        return self.redis.sync_client()
+
+    @staticmethod
+    def _call(user_id: str, now: datetime, seed: Optional[MeterSeed]) -> tuple[list, list]:
+        keys = [COUNTER_KEY.format(user_id=user_id), PLAN_KEY.format(user_id=user_id), DIRTY_KEY]
+        args = [user_id, month_of(now), settings.USAGE_METER_COUNTER_TTL_SECONDS]
+        if seed is not None:
+            args += [seed.plan, seed.limit, settings.USAGE_METER_PLAN_TTL_SECONDS, seed.month, seed.calls]
+        return keys, args
+
+    @staticmethod
+    def _decision(result) -> MeterDecision:
+        status, calls, plan = result
+        status = int(status)
+        return MeterDecision(allowed=status == 1, calls=int(calls), plan=_decode(plan), needs_seed=status == -1)
+
+    def hit(self, user_id: str, now: datetime, seed: Optional[MeterSeed] = None) -> MeterDecision:
+        """Count one call for ``user_id`` unless the plan limit is reached."""
+        keys, args = self._call(user_id, now, seed)
+        return self._decision(self.redis.sync_script(METER_SCRIPT)(keys=keys, args=args))
+
+    async def ahit(self, user_id: str, now: datetime, seed: Optional[MeterSeed] = None) -> MeterDecision:
+        keys, args = self._call(user_id, now, seed)
+        return self._decision(await self.redis.async_script(METER_SCRIPT)(keys=keys, args=args))
+
+
+def seed_from_user(user_doc: dict, plan_limits: dict, now: Optional[datetime] = None) -> MeterSeed:
+    plan = user_doc.get("subscription_plan", "free")
+    limit = plan_limits.get(plan, plan_limits["free"])["api_calls"]
+    usage = user_doc.get("usage") or {}
+    last_reset = usage.get("last_reset_date") or (now or datetime.now(timezone.utc)).isoformat()
+    return MeterSeed(plan=plan, limit=limit, month=last_reset[:7], calls=int(usage.get("api_calls_current_month", 0)))
+
+
+def flush_update(month: str, calls: int) -> list:
+    """
+    Pipeline update writing a Redis counter back to the user document.
+
+    Same month: keep the larger value (the MongoDB fallback path may have
+    counted too). Newer month in Redis: reset to it. A document already on a
+    later month is left alone.
+    """
+    stored_month = {"$substrCP": [{"$ifNull": ["$usage.last_reset_date", ""]}, 0, 7]}
+    current = "$usage.api_calls_current_month"
+    return [
+        {
+            "$set": {
+                "usage.api_calls_current_month": {
+                    "$switch": {
+                        "branches": [
+                            {"case": {"$gt": [stored_month, month]}, "then": current},
+                            {"case": {"$eq": [stored_month, month]}, "then": {"$max": [current, calls]}},
+                        ],
+                        "default": calls,
+                    }
+                },
+                "usage.last_reset_date": {
+                    "$cond": [
+                        {"$gte": [stored_month, month]},
+                        "$usage.last_reset_date",
+                        f"{month}-01T00:00:00+00:00",
+                    ]
+                },
+            }
+        }
+    ]
+
+
+def flush_usage_counters(users, meter: Optional[UsageMeter] = None, *, batch_size: Optional[int] = None,
+                         max_batches: int = 100) -> int:
+    """Write dirty counters to ``users`` with one ``bulk_write`` per batch. Returns users flushed."""
+    meter = meter or usage_meter
+    if not meter.enabled:
+        return 0
+    batch_size = batch_size or settings.USAGE_METER_FLUSH_BATCH_SIZE
+    client = meter.sync_client()
+    flushed = 0
+    for _ in range(max_batches):
+        user_ids = [_decode(uid) for uid in client.spop(DIRTY_KEY, batch_size) or []]
+        if not user_ids:
+            break
+        pipe = client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.hmget(COUNTER_KEY.format(user_id=user_id), "month", "calls")
+        ops = []
+        for user_id, (month, calls) in zip(user_ids, pipe.execute()):
+            if month is None or calls is None or not ObjectId.is_valid(user_id):
+                continue
+            ops.append(UpdateOne({"_id": ObjectId(user_id)}, flush_update(_decode(month), int(calls))))
+        if not ops:
+            continue
+        try:
+            users.bulk_write(ops, ordered=False)
+        except Exception:
+            # Put them back so the next run retries; writes are idempotent.
+            client.sadd(DIRTY_KEY, *user_ids)
+            raise
+        flushed += len(ops)
+    return flushed
+
+
+usage_meter = UsageMeter()
@@ -1,22 +1,210 @@
+import logging
 import os
+import threading
 from datetime import datetime, timezone
 
+from bson import ObjectId
+from django.conf import settings
 from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from redis.exceptions import RedisError
+from rest_framework.authentication import get_authorization_header
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
 
+from api.infrastructure.compression import (
+    BROTLI,
+    GZIP,
+    StreamCompressor,
+    compress_bytes,
+    is_compressible,
+    negotiate_encoding,
+)
+from api.infrastructure.rate_limits import identity, tenant_rate_limiter
+from api.infrastructure.usage_meter import seed_from_user, usage_meter
+from core.infrastructure.api_keys import hash_api_key
+from core.infrastructure.db import AUTH_DB_NAME
 from core.infrastructure.managers import user_manager
+from core.infrastructure.principal_cache import principal_cache
+from project.middleware import HybridMiddleware, resolve_lazy_user
+
+logger = logging.getLogger(__name__)
 
 # Bill only writes by default so read-heavy dashboards do not burn monthly quota.
 _MUTATING = frozenset({"POST", "PUT", "PATCH", "DELETE"})
 
 
-class UsageMeteringMiddleware:
+class TenantRateLimitMiddleware(HybridMiddleware):
+    """
+    Per-tenant request/byte token buckets and in-flight caps for the data API
+    (api.infrastructure.rate_limits), applied before usage metering so
+    rejected requests are not billed.
+
+    Tenants are identified without a database round trip: the API key (by
+    hash) plus its owner when this process has it cached, the ``user_id``
+    claim of a valid JWT, or the session user. Unidentified requests pass
+    through; DRF authentication rejects them later.
+
+    Buffered responses release their slot and are charged when the view
+    returns. Streaming responses (CRUD stream pages, file streams) keep it
+    until the body has been sent or the response is closed, and are charged
+    the bytes actually sent.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.limiter = tenant_rate_limiter
+
+    @staticmethod
+    def _applies(request) -> bool:
+        return request.path.startswith("/api/v2/") and "health_check" not in request.path
+
+    @staticmethod
+    def _identities(request, session_user=None):
+        idents = []
+        user_id = None
+        auth = get_authorization_header(request).split()
+        if len(auth) == 2 and auth[0].lower() == b"api-key":
+            key_hash = hash_api_key(auth[1].decode("utf-8", "replace"))
+            idents.append(identity("api_key", key_hash[:24]))
+            user_id = principal_cache.peek_api_key_owner(key_hash)
+        elif len(auth) == 2 and auth[0].lower() == b"bearer":
+            try:
+                user_id = AccessToken(auth[1].decode()).get(jwt_settings.USER_ID_CLAIM)
+            except (TokenError, UnicodeError):
+                user_id = None
+        elif session_user is not None and session_user.is_authenticated:
+            user_id = session_user.id
+        if user_id:
+            idents.append(identity("user", str(user_id)))
+        return [ident for ident in idents if ident is not None]
+
+    @staticmethod
+    def _request_bytes(request) -> int:
+        try:
+            return max(0, int(request.META.get("CONTENT_LENGTH") or 0))
+        except ValueError:
+            return 0
+
+    @staticmethod
+    def _rejected(rejection):
+        response = JsonResponse(
+            {'error': 'Rate limit exceeded.', 'reason': rejection.reason},
+            status=429,
+        )
+        response["Retry-After"] = rejection.retry_after_header
+        return response
+
+    def process(self, request):
+        if not self._applies(request):
+            return self.get_response(request)
+        has_credentials = bool(get_authorization_header(request))
+        idents = self._identities(request, None if has_credentials else getattr(request, "user", None))
+        if not idents:
+            return self.get_response(request)
+
+        ticket, rejection = self.limiter.admit(idents, self._request_bytes(request))
+        if rejection is not None:
+            return self._rejected(rejection)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            self.limiter.release(ticket)
+            raise
+        if response.streaming:
+            _StreamedTicket(self.limiter, ticket).attach(response)
+        else:
+            self.limiter.release(ticket, len(response.content))
+        return response
+
+    async def __acall__(self, request):
+        if not self._applies(request):
+            return await self.get_response(request)
+        session_user = None if get_authorization_header(request) else await resolve_lazy_user(request)
+        idents = self._identities(request, session_user)
+        if not idents:
+            return await self.get_response(request)
+
+        ticket, rejection = await self.limiter.aadmit(idents, self._request_bytes(request))
+        if rejection is not None:
+            return self._rejected(rejection)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            await self.limiter.arelease(ticket)
+            raise
+        if response.streaming:
+            _StreamedTicket(self.limiter, ticket).attach(response)
+        else:
+            await self.limiter.arelease(ticket, len(response.content))
+        return response
+
+
+class _StreamedTicket:
+    """Holds a rate-limit ticket until a streamed body has been sent; releases exactly once."""
+
+    def __init__(self, limiter, ticket):
+        self.limiter = limiter
+        self.ticket = ticket
+        self.sent = 0
+        self._released = False
+        self._lock = threading.Lock()
+
+    def attach(self, response):
+        if response.is_async:
+            response.streaming_content = self._acount(response.streaming_content)
+        else:
+            response.streaming_content = self._count(response.streaming_content)
+        # Clients that disconnect before the body is consumed still end with close().
+        response._resource_closers.append(self.release)
+
+    def _claim(self) -> bool:
+        with self._lock:
+            if self._released:
+                return False
+            self._released = True
+            return True
+
+    def release(self):
+        if self._claim():
+            self.limiter.release(self.ticket, self.sent)
+
+    async def arelease(self):
+        if self._claim():
+            await self.limiter.arelease(self.ticket, self.sent)
+
+    def _count(self, chunks):
+        try:
+            for chunk in chunks:
+                self.sent += len(chunk)
+                yield chunk
+        finally:
+            self.release()
+
+    async def _acount(self, chunks):
+        try:
+            async for chunk in chunks:
+                self.sent += len(chunk)
+                yield chunk
+        finally:
+            await self.arelease()
+
+
+class UsageMeteringMiddleware(HybridMiddleware):
     """
     Middleware to meter API usage per user based on their subscription plan.
     Enforces limits and resets usage counters monthly.
+
+    With a usage meter Redis configured, check-and-increment is one atomic
+    script call (api.infrastructure.usage_meter) and counters reach MongoDB
+    through the ``flush_usage_counters`` beat task. Otherwise, or while Redis
+    is unreachable, usage is metered against the user document directly;
+    under ASGI those Mongo reads/writes use the loop's async client.
     """
 
     def __init__(self, get_response):
-        self.get_response = get_response
+        super().__init__(get_response)
         self.plan_limits = {
             "free": {"api_calls": 1000},
             "pro": {"api_calls": 50000},
@@ -27,13 +215,75 @@ class UsageMeteringMiddleware:
             "yes",
         )
 
-    def __call__(self, request):
+    def _is_metered(self, request) -> bool:
         if not request.path.startswith("/api/v2/"):
-            return self.get_response(request)
+            return False
         if "health_check" in request.path:
-            return self.get_response(request)
+            return False
+        return self._meter_reads or request.method in _MUTATING
+
+    @staticmethod
+    def _needs_reset(user_doc, now) -> bool:
+        last_reset = datetime.fromisoformat(user_doc['usage']['last_reset_date'])
+        return now.month != last_reset.month or now.year != last_reset.year
+
+    @staticmethod
+    def _reset_update(now):
+        return {'$set': {
+            'usage.api_calls_current_month': 0,
+            'usage.last_reset_date': now.isoformat()
+        }}
+
+    def _limit_response(self, plan):
+        limit = self.plan_limits.get(plan, self.plan_limits['free'])['api_calls']
+        return JsonResponse(
+            {'error': f'API call limit of {limit} for the {plan} plan exceeded.'},
+            status=429 # Too Many Requests
+        )
+
+    def _limit_exceeded(self, user_doc):
+        plan = user_doc.get('subscription_plan', 'free') # type: ignore
+        limit = self.plan_limits.get(plan, self.plan_limits['free'])['api_calls']
+        current_usage = user_doc['usage']['api_calls_current_month'] # type: ignore
+
+        if current_usage >= limit:
+            return self._limit_response(plan)
+        return None
 
-        if not self._meter_reads and request.method not in _MUTATING:
+    def _metered_in_redis(self, user_id):
+        """
+        Meter the call in Redis: the response to send instead of the view (404
+        or 429), ``None`` to proceed, or ``False`` to fall back to MongoDB.
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            decision = usage_meter.hit(user_id, now)
+            if decision.needs_seed:
+                user_doc = user_manager.get_user_by_id(user_id)
+                if not user_doc:
+                    return JsonResponse({'error': 'User not found'}, status=404)
+                decision = usage_meter.hit(user_id, now, seed_from_user(user_doc, self.plan_limits, now))
+        except RedisError:
+            logger.warning("Usage meter unavailable; metering in MongoDB", exc_info=True)
+            return False
+        return None if decision.allowed else self._limit_response(decision.plan)
+
+    async def _ametered_in_redis(self, user_id, users, user_filter):
+        now = datetime.now(timezone.utc)
+        try:
+            decision = await usage_meter.ahit(user_id, now)
+            if decision.needs_seed:
+                user_doc = await users.find_one(user_filter)
+                if not user_doc:
+                    return JsonResponse({'error': 'User not found'}, status=404)
+                decision = await usage_meter.ahit(user_id, now, seed_from_user(user_doc, self.plan_limits, now))
+        except RedisError:
+            logger.warning("Usage meter unavailable; metering in MongoDB", exc_info=True)
+            return False
+        return None if decision.allowed else self._limit_response(decision.plan)
+
+    def process(self, request):
+        if not self._is_metered(request):
             return self.get_response(request)
 
         # request.user is set by the authentication middleware
@@ -41,7 +291,14 @@ class UsageMeteringMiddleware:
             return self.get_response(request)
         
         user_id = request.user.id
-        
+
+        if usage_meter.enabled:
+            denied = self._metered_in_redis(str(user_id))
+            if denied is None:
+                return self.get_response(request)
+            if denied is not False:
+                return denied
+
         # Fetch the full user document to get subscription and usage info
         user_doc = user_manager.get_user_by_id(user_id)
         if not user_doc:
@@ -49,30 +306,18 @@ class UsageMeteringMiddleware:
 
         # Check if the month has rolled over
         now = datetime.now(timezone.utc)
-        last_reset = datetime.fromisoformat(user_doc['usage']['last_reset_date'])
-        
-        if now.month != last_reset.month or now.year != last_reset.year:
+        if self._needs_reset(user_doc, now):
             # Month has changed, reset the counter
             user_manager.users_collection.update_one(
-                {'_id': user_doc['_id']},
-                {'$set': {
-                    'usage.api_calls_current_month': 0,
-                    'usage.last_reset_date': now.isoformat()
-                }}
+                {'_id': user_doc['_id']}, self._reset_update(now)
             )
             # Refresh the document to get the reset values
             user_doc = user_manager.get_user_by_id(user_id)
 
         # Enforce limits
-        plan = user_doc.get('subscription_plan', 'free') # type: ignore
-        limit = self.plan_limits.get(plan, self.plan_limits['free'])['api_calls']
-        current_usage = user_doc['usage']['api_calls_current_month'] # type: ignore
-
-        if current_usage >= limit:
-            return JsonResponse(
-                {'error': f'API call limit of {limit} for the {plan} plan exceeded.'},
-                status=429 # Too Many Requests
-            )
+        denied = self._limit_exceeded(user_doc)
+        if denied is not None:
+            return denied
 
         # Increment usage count using an atomic operation
         user_manager.users_collection.update_one(
@@ -80,4 +325,123 @@ class UsageMeteringMiddleware:
             {'$inc': {'usage.api_calls_current_month': 1}}
         )
 
-        return self.get_response(request)
\ No newline at end of file
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not self._is_metered(request):
+            return await self.get_response(request)
+
+        user = await resolve_lazy_user(request)
+        if user is None or not user.is_authenticated:
+            return await self.get_response(request)
+
+        users = settings.MONGODB_CLIENT[AUTH_DB_NAME]["users"]
+        user_filter = {"_id": ObjectId(user.id), "deleted_at": None}
+
+        if usage_meter.enabled:
+            denied = await self._ametered_in_redis(str(user.id), users, user_filter)
+            if denied is None:
+                return await self.get_response(request)
+            if denied is not False:
+                return denied
+
+        user_doc = await users.find_one(user_filter)
+        if not user_doc:
+            return JsonResponse({'error': 'User not found'}, status=404)
+
+        now = datetime.now(timezone.utc)
+        if self._needs_reset(user_doc, now):
+            await users.update_one({'_id': user_doc['_id']}, self._reset_update(now))
+            user_doc = await users.find_one(user_filter)
+
+        denied = self._limit_exceeded(user_doc)
+        if denied is not None:
+            return denied
+
+        await users.update_one(
+            {'_id': user_doc['_id']},
+            {'$inc': {'usage.api_calls_current_month': 1}}
+        )
+        return await self.get_response(request)
+
+
+class ResponseCompressionMiddleware(HybridMiddleware):
+    """
+    Content-negotiated Brotli/gzip compression for JSON and text responses.
+
+    Each path prefix in ``RESPONSE_COMPRESSION_CLASSES`` maps to a Brotli quality
+    and gzip level (first match wins; 0 disables compression for that class).
+    Buffered bodies under ``RESPONSE_COMPRESSION_MIN_BYTES`` and partial-content
+    (range) responses go out as-is; streaming bodies are compressed chunk by chunk.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_bytes = getattr(settings, "RESPONSE_COMPRESSION_MIN_BYTES", 1024)
+        self.classes = getattr(settings, "RESPONSE_COMPRESSION_CLASSES", [])
+
+    def _levels_for(self, path):
+        for entry in self.classes:
+            if path.startswith(entry["prefix"]):
+                return {BROTLI: entry.get("brotli_quality", 0), GZIP: entry.get("gzip_level", 0)}
+        return None
+
+    def process(self, request):
+        return self._compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._compress(request, await self.get_response(request))
+
+    def _compress(self, request, response):
+        levels = self._levels_for(request.path)
+        if not levels:
+            return response
+        if response.has_header("Content-Encoding") or not is_compressible(response.get("Content-Type", "")):
+            return response
+        # Range responses carry byte offsets of the identity body (file streams, resumed downloads).
+        if response.status_code == 206 or response.has_header("Content-Range"):
+            return response
+        if not response.streaming and len(response.content) < self.min_bytes:
+            return response
+
+        # Vary even when we fall back to identity, so caches key on the header.
+        patch_vary_headers(response, ("Accept-Encoding",))
+        allowed = tuple(coding for coding in (BROTLI, GZIP) if levels[coding] > 0)
+        encoding = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""), allowed)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            compressor = StreamCompressor(encoding, levels[encoding])
+            if response.is_async:
+                response.streaming_content = self._compress_async(response.streaming_content, compressor)
+            else:
+                response.streaming_content = self._compress_sync(response.streaming_content, compressor)
+            del response.headers["Content-Length"]
+        else:
+            compressed = compress_bytes(response.content, encoding, levels[encoding])
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # The representation changed, so a strong validator no longer applies.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    @staticmethod
+    def _compress_sync(chunks, compressor):
+        for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+
+    @staticmethod
+    async def _compress_async(chunks, compressor):
+        async for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
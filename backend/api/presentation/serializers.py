@@ -5,8 +5,10 @@ This module contains all serializers used by the API, organized by functionality
 """
 
 import re
+from bson import ObjectId
 from rest_framework import serializers
 from api.domain.metadata_models import FIELD_TYPE_CHOICES, normalize_field_type
+from api.infrastructure.bson_json import BSONJSONEncoder
 from api.infrastructure.query_safety import MAX_BULK_UPDATE_OPERATIONS
 from api.infrastructure.validators import validate_collection_name, validate_unique_fields
 
@@ -16,6 +18,8 @@ class ObjectIdField(serializers.CharField):
     Custom serializer field to validate a string as a valid MongoDB ObjectId.
     """
     def to_internal_value(self, data):
+        if isinstance(data, ObjectId):  # BSON/MessagePack bodies carry native ids
+            return str(data)
         if not isinstance(data, str) or not re.match(r'^[a-fA-F0-9]{24}$', data):
             raise serializers.ValidationError(
                 "Must be a valid 24-character hexadecimal ObjectId."
@@ -153,10 +157,12 @@ class UpdateDocumentSerializer(DocumentBaseSerializer):
     """Validates the request for updating documents."""
     
     filters = serializers.JSONField(
+        encoder=BSONJSONEncoder,
         help_text="MongoDB query; must be non-empty. Single-doc updates require _id or id."
     )
     
     update_data = serializers.JSONField(
+        encoder=BSONJSONEncoder,
         help_text="Plain field map or allowed update operators ($set, $inc, …)."
     )
     
@@ -221,9 +227,11 @@ class BulkUpdateOperationSerializer(serializers.Serializer):
     """One updateOne operation inside a bulk CRUD request."""
 
     filters = serializers.JSONField(
+        encoder=BSONJSONEncoder,
         help_text="MongoDB query; must be non-empty and include _id or id."
     )
     update_data = serializers.JSONField(
+        encoder=BSONJSONEncoder,
         help_text="Plain field map or allowed update operators ($set, $inc, …)."
     )
     update_all_fields = serializers.BooleanField(
@@ -283,6 +291,7 @@ class DeleteDocumentSerializer(DocumentBaseSerializer):
     """Validates the request for deleting documents."""
     
     filters = serializers.JSONField(
+        encoder=BSONJSONEncoder,
         help_text="A MongoDB query object to select which documents to delete."
     )
     
@@ -303,6 +312,7 @@ class DocumentQuerySerializer(DocumentBaseSerializer):
     """Serializer for validating and sanitizing MongoDB document query parameters."""
     
     filters = serializers.JSONField(
+        encoder=BSONJSONEncoder,
         required=False,
         default=dict,
         help_text="A JSON object containing MongoDB query filters."
@@ -323,6 +333,15 @@ class DocumentQuerySerializer(DocumentBaseSerializer):
         help_text="Number of documents to return per page. Max 1000."
     )
 
+    stream = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text=(
+            "Stream the JSON page batch by batch (pagination is written last). A failure after "
+            "the first byte ends the body with pagination null and a stream_error object."
+        )
+    )
+
     def validate_filters(self, value):
         if not isinstance(value, dict):
             raise serializers.ValidationError("Filters must be a valid JSON object/dictionary.")
@@ -28,10 +28,10 @@ from api.presentation.serializers import (
 )
 
 # Analytics tasks
-from analytics.tasks import (
-    log_db_operation_task,
-    log_mongo_detail_task,
-    log_slow_query_task,
+from analytics.telemetry import (
+    record_db_operation,
+    record_mongo_detail,
+    record_slow_query,
 )
 
 
@@ -66,13 +66,13 @@ class ListDatabasesView(BaseAPIView):
             "document_count": total,
             "query_complexity": "simple",
         }
-        log_db_operation_task.delay(db_op_data) # type: ignore
+        record_db_operation(db_op_data) # type: ignore
         
         detail_data = {
             "user_id": user_id,
             "returned_documents": total,
         }
-        log_mongo_detail_task.delay(detail_data) # type: ignore
+        record_mongo_detail(detail_data) # type: ignore
         
         if duration_ms > 1000:
             slow_data = {
@@ -83,7 +83,7 @@ class ListDatabasesView(BaseAPIView):
                 "collection": "system",
                 "db_id": None,
             }
-            log_slow_query_task.delay(slow_data) # type: ignore
+            record_slow_query(slow_data) # type: ignore
 
         return Response({
             "success": True,
@@ -124,10 +124,10 @@ class ListCollectionsView(BaseAPIView):
             "document_count": len(cols),
             "query_complexity": "simple",
         }
-        log_db_operation_task.delay(db_op_data) # type: ignore
+        record_db_operation(db_op_data) # type: ignore
         
         detail_data = {"user_id": user_id, "returned_documents": len(cols)}
-        log_mongo_detail_task.delay(detail_data) # type: ignore
+        record_mongo_detail(detail_data) # type: ignore
         
         if duration_ms > 1000:
             slow_data = {
@@ -138,7 +138,7 @@ class ListCollectionsView(BaseAPIView):
                 "collection": "system",
                 "db_id": db_id,
             }
-            log_slow_query_task.delay(slow_data) # type: ignore
+            record_slow_query(slow_data) # type: ignore
 
         return Response({"success": True, "collections": cols}, status=200)
 
@@ -177,10 +177,10 @@ class DropDatabaseView(BaseAPIView):
             "document_count": 1,  # one database dropped
             "query_complexity": "simple",
         }
-        log_db_operation_task.delay(db_op_data) # type: ignore
+        record_db_operation(db_op_data) # type: ignore
         
         detail_data = {"user_id": user_id, "deleted_count": 1}
-        log_mongo_detail_task.delay(detail_data) # type: ignore
+        record_mongo_detail(detail_data) # type: ignore
         
         if duration_ms > 2000:
             slow_data = {
@@ -191,7 +191,7 @@ class DropDatabaseView(BaseAPIView):
                 "collection": "system",
                 "db_id": db_id,
             }
-            log_slow_query_task.delay(slow_data) # type: ignore
+            record_slow_query(slow_data) # type: ignore
 
         return Response({"success": True, "message": "Dropped."}, status=200)
 
@@ -228,10 +228,10 @@ class DropCollectionsView(BaseAPIView):
                 "document_count": 1,
                 "query_complexity": "simple",
             }
-            log_db_operation_task.delay(db_op_data) # type: ignore
+            record_db_operation(db_op_data) # type: ignore
         
         detail_data = {"user_id": user_id, "deleted_count": len(dropped_names)}
-        log_mongo_detail_task.delay(detail_data) # type: ignore
+        record_mongo_detail(detail_data) # type: ignore
         
         if duration_ms > 1500:
             slow_data = {
@@ -242,7 +242,7 @@ class DropCollectionsView(BaseAPIView):
                 "collection": "system",
                 "db_id": db_id,
             }
-            log_slow_query_task.delay(slow_data) # type: ignore
+            record_slow_query(slow_data) # type: ignore
 
         return Response({"success": True, "dropped": dropped_names}, status=200)
 
@@ -280,7 +280,7 @@ class GetMetadataView(BaseAPIView):
             "document_count": 1,
             "query_complexity": "simple",
         }
-        log_db_operation_task.delay(db_op_data) # type: ignore
+        record_db_operation(db_op_data) # type: ignore
         
         if duration_ms > 500:
             slow_data = {
@@ -291,7 +291,7 @@ class GetMetadataView(BaseAPIView):
                 "collection": "system",
                 "db_id": db_id,
             }
-            log_slow_query_task.delay(slow_data) # type: ignore
+            record_slow_query(slow_data) # type: ignore
 
         return Response({
             "success": True, 
@@ -359,10 +359,10 @@ class ImportDataView(BaseAPIView):
             "document_count": inserted_count,
             "query_complexity": "simple",
         }
-        log_db_operation_task.delay(db_op_data) # type: ignore
+        record_db_operation(db_op_data) # type: ignore
         
         detail_data = {"user_id": user_id, "inserted_count": inserted_count}
-        log_mongo_detail_task.delay(detail_data) # type: ignore
+        record_mongo_detail(detail_data) # type: ignore
         
         if duration_ms > 5000:
             slow_data = {
@@ -373,7 +373,7 @@ class ImportDataView(BaseAPIView):
                 "collection": coll_name,
                 "db_id": db_id,
             }
-            log_slow_query_task.delay(slow_data) # type: ignore
+            record_slow_query(slow_data) # type: ignore
 
         return Response({
             "success": True,
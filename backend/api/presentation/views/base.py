@@ -2,10 +2,9 @@ import time
 import inspect
 from functools import wraps
 from typing import Any, Callable, Type, Dict
-from datetime import datetime, timezone
 
 from django.conf import settings
-from django.http import Http404, RawPostDataException
+from django.http import Http404
 
 from adrf.views import APIView as AsyncAPIView
 from rest_framework.response import Response
@@ -16,15 +15,17 @@ from rest_framework.exceptions import APIException, PermissionDenied
 from api.application.metadata_service import MetadataService
 from api.application.gridfs_service import GridFSService
 from api.infrastructure.rbac import ReadOnlyRoleError
+from project.mongo_monitoring import db_telemetry_fields
 
-# Import analytics tasks
-from analytics.tasks import (
-    log_http_request_task,
-    log_db_operation_task,
-    log_performance_task,
-    log_client_info_task,
-    log_error_task,
-    log_slow_query_task,
+# Buffered analytics telemetry
+from analytics.request_events import new_request_id
+from analytics.sampling import categorize_endpoint, sample_weight
+from analytics.telemetry import (
+    current_request_event,
+    record_request_event,
+    record_slow_query,
+    request_event_fields,
+    request_size_bytes,
 )
 
 class BaseAPIView(AsyncAPIView):
@@ -166,7 +167,7 @@ class BaseAPIView(AsyncAPIView):
 
     @staticmethod
     def _track(request, response, start_time, error=None):
-        """Send analytics data to Celery tasks asynchronously."""
+        """Add the view's telemetry to the request event (or record one without the middleware)."""
         if not request.user or not request.user.is_authenticated:
             return
         if getattr(settings, "ANALYTICS_DISABLE_VIEW_TELEMETRY_FOR_API_V2", False) and request.path.startswith(
@@ -179,65 +180,31 @@ class BaseAPIView(AsyncAPIView):
         method = request.method
         path = request.path
         status_code = response.status_code if response else (getattr(error, 'status_code', 500) if error else 500)
-        success = error is None and 200 <= status_code < 300
+        request_size = request_size_bytes(request)
 
-        # 1. HTTP Request log
-        http_data = {
-            "user_id": user_id,
-            "method": method,
-            "path": path,
-            "status_code": status_code,
-            "duration_ms": round(duration_ms, 2),
-            "timestamp": datetime.now(timezone.utc),
-            "success": success,
-        }
-        log_http_request_task.delay(http_data) # type: ignore
-
-        # 2. Client info
-        client_data = {
-            "user_id": user_id,
-            "client_ip": request.META.get('REMOTE_ADDR', ''),
-            "user_agent": request.META.get('HTTP_USER_AGENT', '')[:200],
-            "content_type": request.content_type,
-        }
-        log_client_info_task.delay(client_data) # type: ignore
-
-        # 3. Performance metrics (request/response sizes)
-        request_size = 0
-        try:
-            request_size = len(request.body) if hasattr(request, 'body') and request.body else 0
-        except RawPostDataException:
-            request_size = int(request.META.get('CONTENT_LENGTH', 0))
-        response_size = len(response.content) if response and hasattr(response, 'content') else 0
-        throughput = round((response_size / (duration_ms / 1000)) if duration_ms > 0 else 0, 2)
-        warning = None
-        if duration_ms > 1000:
-            warning = "slow_request"
-        elif request_size > 1024 * 1024:
-            warning = "large_request"
-
-        perf_data = {
-            "user_id": user_id,
-            "request_size_bytes": request_size,
-            "response_size_bytes": response_size,
-            "throughput_bytes_per_sec": throughput,
-            "warning": warning,
-        }
-        log_performance_task.delay(perf_data) # type: ignore
-
-        # 4. Error log (if any)
-        if error or status_code >= 400:
-            error_type = 'server_error' if status_code >= 500 else 'client_error'
-            error_message = str(error) if error else None
-            error_data = {
-                "user_id": user_id,
-                "status_code": status_code,
-                "error_type": error_type,
-                "error_message": error_message,
+        # 1. Request event: the observability middleware owns it and writes it
+        # when the response leaves; the view only adds what it alone knows.
+        event = current_request_event()
+        if event is not None:
+            if error is not None:
+                event["error_message"] = str(error)
+        else:
+            response_size = len(response.content) if response and hasattr(response, 'content') else 0
+            event = {
+                "request_id": new_request_id(),
+                "db_operations": [],
+                **request_event_fields(
+                    request,
+                    user_id=user_id,
+                    status_code=status_code,
+                    duration_ms=duration_ms,
+                    response_size=response_size,
+                    db_fields=db_telemetry_fields(),
+                    error_message=str(error) if error is not None else None,
+                ),
             }
-            log_error_task.delay(error_data) # type: ignore
 
-        # 5. Database context (try to extract db_id and collection from request data)
+        # 2. Database context (try to extract db_id and collection from request data)
         db_id = None
         collection = "unknown"
         operation_type = "unknown"
@@ -257,6 +224,8 @@ class BaseAPIView(AsyncAPIView):
                 except (AttributeError, TypeError):
                     body_data = {}
             db_id = body_data.get('database_id') or request.GET.get('database_id')
+            if db_id is not None:
+                db_id = str(db_id)  # BSON bodies carry a native ObjectId
             collection = body_data.get('collection_name') or request.GET.get('collection_name', 'unknown')
             # Infer operation type from method and endpoint
             if 'crud' in path:
@@ -298,9 +267,21 @@ class BaseAPIView(AsyncAPIView):
                 "document_count": document_count,
                 "query_complexity": query_complexity,
             }
-            log_db_operation_task.delay(db_data) # type: ignore
+            event["db_operations"].append(db_data)
+        if current_request_event() is not event:
+            weight = sample_weight(
+                request_id=event["request_id"],
+                user_id=user_id,
+                operation_type=categorize_endpoint(path, method),
+                status_code=status_code,
+                duration_ms=duration_ms,
+                error=event.get("error") is not None,
+            )
+            if weight:
+                event["sample_weight"] = weight
+                record_request_event(event)
 
-        # 6. Slow query detection (if duration exceeds threshold)
+        # 3. Slow query detection (if duration exceeds threshold)
         # Simple threshold: 1000ms for most, but you can use a more sophisticated mapping
         threshold = 1000
         if 'import' in path:
@@ -324,4 +305,4 @@ class BaseAPIView(AsyncAPIView):
                 "collection": collection,
                 "db_id": db_id,
             }
-            log_slow_query_task.delay(slow_data) # type: ignore
+            record_slow_query(slow_data) # type: ignore
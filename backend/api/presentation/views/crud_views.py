@@ -3,7 +3,11 @@ Modernized CRUD operations for MongoDB documents with Integrated Analytics.
 Optimized for Django 6.0+ and DRF 3.15+ standards.
 """
 
+import logging
 import time
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
 from api.application.metadata_service import MetadataService
 from rest_framework import status
 from rest_framework.response import Response
@@ -24,16 +28,24 @@ from api.infrastructure.mongodb import (
     jsonify_object_ids,
     normalize_id_filter,
 )
+from api.infrastructure.bson_json import encode_batch_items, encode_value, render_envelope
 from api.infrastructure.query_safety import validate_filter
+from api.presentation.wire_formats import (
+    CRUD_PARSER_CLASSES,
+    CRUD_RENDERER_CLASSES,
+    wants_native_types,
+)
 from api.application.document_service import DocumentService
 
 # Analytics tasks
-from analytics.tasks import (
-    log_db_operation_task,
-    log_mongo_detail_task,
-    log_slow_query_task,
+from analytics.telemetry import (
+    record_db_operation,
+    record_mongo_detail,
+    record_slow_query,
 )
 
+logger = logging.getLogger(__name__)
+
 
 class DataCrudView(BaseAPIView):
     """
@@ -41,6 +53,9 @@ class DataCrudView(BaseAPIView):
     Includes automated telemetry and quota enforcement.
     """
     permission_classes = [IsAuthenticated, BlockAnalystOnUnsafeMethods]
+    # JSON by default; application/bson and application/msgpack on request.
+    renderer_classes = CRUD_RENDERER_CLASSES
+    parser_classes = CRUD_PARSER_CLASSES
     
     @property
     def doc_svc(self):
@@ -72,7 +87,7 @@ class DataCrudView(BaseAPIView):
             "document_count": document_count,
             "query_complexity": "simple",  # Can be enhanced based on query depth
         }
-        log_db_operation_task.delay(db_data) # type: ignore
+        record_db_operation(db_data) # type: ignore
         
         # 2. Detailed counts (if result object available)
         if result:
@@ -85,7 +100,7 @@ class DataCrudView(BaseAPIView):
             }
             # Only send if any count is present
             if any(v is not None for v in detail_data.values()):
-                log_mongo_detail_task.delay(detail_data) # type: ignore
+                record_mongo_detail(detail_data) # type: ignore
         
         # 3. Slow query detection (if start_time provided)
         if start_time:
@@ -114,7 +129,7 @@ class DataCrudView(BaseAPIView):
                     "collection": collection,
                     "db_id": db_id,
                 }
-                log_slow_query_task.delay(slow_data) # type: ignore
+                record_slow_query(slow_data) # type: ignore
 
     @BaseAPIView.handle_errors
     async def post(self, request):
@@ -146,9 +161,12 @@ class DataCrudView(BaseAPIView):
             start_time=op_start
         )
 
+        inserted_ids = list(result.inserted_ids) if result else []
+        if not wants_native_types(request):
+            inserted_ids = [str(_id) for _id in inserted_ids]
         return Response({
             "success": True,
-            "inserted_ids": [str(_id) for _id in result.inserted_ids] if result else []
+            "inserted_ids": inserted_ids
         }, status=status.HTTP_201_CREATED)
 
     @BaseAPIView.handle_errors
@@ -166,35 +184,144 @@ class DataCrudView(BaseAPIView):
         if filt:
             validate_filter(filt)
 
+        if params.get("stream") and self._use_streaming(request):
+            return await self._get_streaming(request, params, filt, op_start)
+
+        if self._use_fast_json(request, page_size):
+            return await self._get_fast_json(request, params, filt, op_start)
+
         total, docs = await self.doc_svc.list_docs(
             db_id, coll_name, filt, page, page_size
         )
-        
-        # Capture analytics
+        self._log_query_analytics(request, db_id, coll_name, len(docs), op_start)
+
+        return Response({
+            "success": True,
+            # Binary formats carry ObjectId/datetime natively.
+            "data": docs if wants_native_types(request) else jsonify_object_ids(docs),
+            "pagination": self._pagination(page, page_size, total),
+        }, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _pagination(page: int, page_size: int, total: int) -> dict:
+        return {
+            "page": page,
+            "page_size": page_size,
+            "total_items": total,
+            "total_pages": (total + page_size - 1) // page_size if page_size > 0 else 0
+        }
+
+    @staticmethod
+    def _use_fast_json(request, page_size: int) -> bool:
+        """Large JSON pages skip DRF rendering (browsable API keeps the normal path)."""
+        threshold = getattr(settings, "CRUD_FAST_JSON_MIN_PAGE_SIZE", 200)
+        if threshold <= 0 or page_size < threshold:
+            return False
+        renderer = getattr(request, "accepted_renderer", None)
+        return getattr(renderer, "format", "json") == "json"
+
+    async def _get_fast_json(self, request, params, filt, op_start):
+        """Encode raw BSON batches straight into the response body."""
+        db_id = params["database_id"]
+        coll_name = params["collection_name"]
+        page = params.get("page", 1)
+        page_size = params.get("page_size", 50)
+
+        total, batches = await self.doc_svc.list_docs_raw(
+            db_id, coll_name, filt, page, page_size
+        )
+        pagination = self._pagination(page, page_size, total)
+        body, returned = render_envelope(
+            batches, {"success": True, "data": None, "pagination": pagination}
+        )
+        self._log_query_analytics(request, db_id, coll_name, returned, op_start)
+
+        response = HttpResponse(body, status=status.HTTP_200_OK, content_type="application/json")
+        # Lets the observability middleware read the envelope without re-parsing the body.
+        response.data = {"success": True, "returned_documents": returned, "pagination": pagination}
+        return response
+
+    @staticmethod
+    def _use_streaming(request) -> bool:
+        """
+        Streaming needs the ASGI handler: under WSGI the async cursor would be
+        drained on a different event loop, so those requests use the buffered path.
+        """
+        renderer = getattr(request, "accepted_renderer", None)
+        if getattr(renderer, "format", "json") != "json":
+            return False
+        return isinstance(getattr(request, "_request", request), ASGIRequest)
+
+    async def _get_streaming(self, request, params, filt, op_start):
+        """Write the envelope incrementally; memory is bounded by the cursor batch size."""
+        db_id = params["database_id"]
+        coll_name = params["collection_name"]
+        page = params.get("page", 1)
+        page_size = params.get("page_size", 50)
+
+        # Resolve access before the first byte so permission errors keep their status codes.
+        cursor, count_total = await self.doc_svc.stream_docs_raw(
+            db_id, coll_name, filt, page, page_size,
+            batch_size=getattr(settings, "CRUD_STREAM_BATCH_SIZE", 100),
+        )
+        body = self._stream_envelope(
+            cursor, count_total,
+            on_complete=lambda returned: self._log_query_analytics(
+                request, db_id, coll_name, returned, op_start
+            ),
+            page=page, page_size=page_size,
+        )
+        response = StreamingHttpResponse(body, status=status.HTTP_200_OK, content_type="application/json")
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    @classmethod
+    async def _stream_envelope(cls, cursor, count_total, *, on_complete, page, page_size):
+        """
+        Yield ``{"success":true,"data":[...],"pagination":{...}}`` one batch at a time,
+        byte for byte what the fast-JSON path renders for the same page.
+
+        The status line and ``"success":true`` are already sent, so a mid-stream
+        failure closes the array and ends the object with ``"pagination":null``
+        and a ``stream_error`` object (``{"error", "detail"}``) instead of a 500.
+        Clients of ``stream=true`` treat a body with ``stream_error`` as failed.
+        """
+        yield b'{"success":true,"data":['
+        returned = 0
+        try:
+            async for batch in cursor:
+                chunk, count = encode_batch_items(batch)
+                if not count:
+                    continue
+                yield (b"," + chunk) if returned else chunk
+                returned += count
+            total = await count_total()
+        except Exception:
+            logger.exception("Streaming CRUD read failed after %d documents", returned)
+            yield b'],"pagination":null,"stream_error":{"error":"InternalServerError","detail":"Stream interrupted."}}'
+            return
+        finally:
+            close = getattr(cursor, "close", None)
+            if close is not None:
+                await close()
+
+        yield b'],"pagination":' + encode_value(cls._pagination(page, page_size, total)) + b"}"
+        on_complete(returned)
+
+    def _log_query_analytics(self, request, db_id, coll_name, returned, op_start):
         self._capture_mongo_analytics(
             request, db_id, coll_name,
             operation_type="document_query",
-            document_count=len(docs),
+            document_count=returned,
             result=None,  # No result object for queries
             start_time=op_start
         )
         # Also log returned document count via mongo_detail
         detail_data = {
             "user_id": str(request.user.pk),
-            "returned_documents": len(docs),
+            "returned_documents": returned,
         }
-        log_mongo_detail_task.delay(detail_data) # type: ignore
-
-        return Response({
-            "success": True,
-            "data": jsonify_object_ids(docs),
-            "pagination": {
-                "page": page,
-                "page_size": page_size,
-                "total_items": total,
-                "total_pages": (total + page_size - 1) // page_size if page_size > 0 else 0
-            }
-        }, status=status.HTTP_200_OK)
+        record_mongo_detail(detail_data) # type: ignore
 
     @BaseAPIView.handle_errors
     async def put(self, request):
@@ -15,7 +15,7 @@ from api.application.database_service import DatabaseService
 from api.application.metadata_service import MetadataService
 
 # Analytics tasks
-from analytics.tasks import log_db_operation_task, log_mongo_detail_task, log_slow_query_task
+from analytics.telemetry import record_db_operation, record_mongo_detail, record_slow_query
 
 
 class CreateDatabaseView(BaseAPIView):
@@ -92,7 +92,7 @@ class CreateDatabaseView(BaseAPIView):
             "document_count": 0,
             "query_complexity": "simple",
         }
-        log_db_operation_task.delay(db_op_data) # type: ignore
+        record_db_operation(db_op_data) # type: ignore
         
         # 2. Collection creation details (optional)
         for coll_name in coll_info:
@@ -104,14 +104,14 @@ class CreateDatabaseView(BaseAPIView):
                 "document_count": 0,
                 "query_complexity": "simple",
             }
-            log_db_operation_task.delay(coll_op_data) # type: ignore
+            record_db_operation(coll_op_data) # type: ignore
         
         # 3. Mongo detail: number of collections created
         detail_data = {
             "user_id": user_id,
             "modified_count": len(coll_info),  # collections created
         }
-        log_mongo_detail_task.delay(detail_data) # type: ignore
+        record_mongo_detail(detail_data) # type: ignore
         
         # 4. Slow query detection (threshold 2000ms for DB creation)
         if duration_ms > 2000:
@@ -128,7 +128,7 @@ class CreateDatabaseView(BaseAPIView):
                 "collection": "system",
                 "db_id": db_id,
             }
-            log_slow_query_task.delay(slow_data) # type: ignore
+            record_slow_query(slow_data) # type: ignore
 
         return Response({
             "success": True,
@@ -189,7 +189,7 @@ class AddCollectionView(BaseAPIView):
                     "document_count": 0,
                     "query_complexity": "simple",
                 }
-                log_db_operation_task.delay(coll_op_data) # type: ignore
+                record_db_operation(coll_op_data) # type: ignore
             
             # 2. Mongo detail: number of collections added
             if collections_created > 0:
@@ -197,7 +197,7 @@ class AddCollectionView(BaseAPIView):
                     "user_id": user_id,
                     "modified_count": collections_created,
                 }
-                log_mongo_detail_task.delay(detail_data) # type: ignore
+                record_mongo_detail(detail_data) # type: ignore
             
             # 3. Slow query detection (threshold 1000ms for adding collections)
             if duration_ms > 1000:
@@ -214,7 +214,7 @@ class AddCollectionView(BaseAPIView):
                     "collection": "system",
                     "db_id": db_id,
                 }
-                log_slow_query_task.delay(slow_data)  # type: ignore
+                record_slow_query(slow_data)  # type: ignore
             
             return Response({
                 "success": True,
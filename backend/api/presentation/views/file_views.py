@@ -21,10 +21,10 @@ from api.infrastructure.signed_file_access import (
 )
 
 # Analytics tasks
-from analytics.tasks import (
-    log_db_operation_task, 
-    log_mongo_detail_task, 
-    log_slow_query_task
+from analytics.telemetry import (
+    record_db_operation, 
+    record_mongo_detail, 
+    record_slow_query
 )
 
 
@@ -48,7 +48,7 @@ class FileListView(BaseAPIView):
             "document_count": total_files,
             "query_complexity": "simple",
         }
-        log_db_operation_task.delay(db_op_data) # type: ignore
+        record_db_operation(db_op_data) # type: ignore
 
         detail_data = {
             "user_id": user_id,
@@ -56,7 +56,7 @@ class FileListView(BaseAPIView):
             "total_files": stats.get("total_count", total_files),
             "total_storage_bytes": stats.get("total_size_bytes", 0),
         }
-        log_mongo_detail_task.delay(detail_data) # type: ignore
+        record_mongo_detail(detail_data) # type: ignore
 
         if duration_ms > 500:
             slow_data = {
@@ -71,7 +71,7 @@ class FileListView(BaseAPIView):
                 "collection": "fs.files",
                 "db_id": None,
             }
-            log_slow_query_task.delay(slow_data) # type: ignore
+            record_slow_query(slow_data) # type: ignore
 
     def _send_file_upload_analytics(self, request, filename, file_size, file_id, start_time):
         user_id = str(request.user.pk)
@@ -85,14 +85,14 @@ class FileListView(BaseAPIView):
             "document_count": 1,
             "query_complexity": "simple",
         }
-        log_db_operation_task.delay(db_op_data) # type: ignore
+        record_db_operation(db_op_data) # type: ignore
 
         detail_data = {
             "user_id": user_id,
             "inserted_count": 1,
             "file_size_bytes": file_size,
         }
-        log_mongo_detail_task.delay(detail_data) # type: ignore
+        record_mongo_detail(detail_data) # type: ignore
 
         if duration_ms > 2000:
             slow_data = {
@@ -108,7 +108,7 @@ class FileListView(BaseAPIView):
                 "collection": "fs.files",
                 "db_id": None,
             }
-            log_slow_query_task.delay(slow_data) # type: ignore
+            record_slow_query(slow_data) # type: ignore
 
     @BaseAPIView.handle_errors
     async def get(self, request):
@@ -218,7 +218,7 @@ class FileDetailView(BaseAPIView):
             "document_count": 1,
             "query_complexity": "simple",
         }
-        log_db_operation_task.delay(db_op_data) # type: ignore
+        record_db_operation(db_op_data) # type: ignore
 
         if duration_ms > 500:
             slow_data = {
@@ -233,7 +233,7 @@ class FileDetailView(BaseAPIView):
                 "collection": "fs.files",
                 "db_id": None,
             }
-            log_slow_query_task.delay(slow_data) # type: ignore
+            record_slow_query(slow_data) # type: ignore
 
     def _send_file_delete_analytics(self, request, file_id, success, start_time):
         user_id = str(request.user.pk)
@@ -247,13 +247,13 @@ class FileDetailView(BaseAPIView):
             "document_count": 1 if success else 0,
             "query_complexity": "simple",
         }
-        log_db_operation_task.delay(db_op_data) # type: ignore
+        record_db_operation(db_op_data) # type: ignore
 
         detail_data = {
             "user_id": user_id,
             "deleted_count": 1 if success else 0,
         }
-        log_mongo_detail_task.delay(detail_data) # type: ignore
+        record_mongo_detail(detail_data) # type: ignore
 
         if duration_ms > 1000:
             slow_data = {
@@ -268,7 +268,7 @@ class FileDetailView(BaseAPIView):
                 "collection": "fs.files",
                 "db_id": None,
             }
-            log_slow_query_task.delay(slow_data) # type: ignore
+            record_slow_query(slow_data) # type: ignore
 
     @BaseAPIView.handle_errors
     async def get(self, request, file_id):
@@ -333,7 +333,7 @@ class FileStreamView(BaseAPIView):
             "document_count": 1,
             "query_complexity": "simple",
         }
-        log_db_operation_task.delay(db_op_data) # type: ignore
+        record_db_operation(db_op_data) # type: ignore
 
         detail_data = {
             "user_id": user_id,
@@ -341,7 +341,7 @@ class FileStreamView(BaseAPIView):
             "file_size_bytes": file_size,
             "bytes_sent": bytes_sent if bytes_sent else file_size,
         }
-        log_mongo_detail_task.delay(detail_data) # type: ignore
+        record_mongo_detail(detail_data) # type: ignore
 
         if duration_ms > 3000:
             slow_data = {
@@ -358,7 +358,7 @@ class FileStreamView(BaseAPIView):
                 "collection": "fs.files",
                 "db_id": None,
             }
-            log_slow_query_task.delay(slow_data) # type: ignore
+            record_slow_query(slow_data) # type: ignore
 
     @BaseAPIView.handle_errors
     async def get(self, request, file_id):
@@ -499,14 +499,14 @@ class FileDownloadView(BaseAPIView):
             "document_count": 1,
             "query_complexity": "simple",
         }
-        log_db_operation_task.delay(db_op_data)  # type: ignore
+        record_db_operation(db_op_data)  # type: ignore
 
         detail_data = {
             "user_id": user_id,
             "returned_documents": 1,
             "file_size_bytes": file_size,
         }
-        log_mongo_detail_task.delay(detail_data) # type: ignore  
+        record_mongo_detail(detail_data) # type: ignore  
 
         if duration_ms > 3000:
             slow_data = {
@@ -522,7 +522,7 @@ class FileDownloadView(BaseAPIView):
                 "collection": "fs.files",
                 "db_id": None,
             }
-            log_slow_query_task.delay(slow_data)  # type: ignore 
+            record_slow_query(slow_data)  # type: ignore 
 
     @BaseAPIView.handle_errors
     async def get(self, request, file_id):
@@ -0,0 +1,119 @@
+"""
+Binary wire formats for the CRUD endpoints: ``application/bson`` and
+``application/msgpack``.
+
+Both keep ObjectId and datetime values as native types end to end, so batch
+clients skip the JSON encode/decode and the string conversion done by
+``jsonify_object_ids``. BSON uses the ``bson`` C extension that ships with
+pymongo, MessagePack the ``msgpack`` package. In MessagePack, ObjectIds travel
+as ext type 7 (the BSON type number, 12 raw bytes) and datetimes as the msgpack
+timestamp ext type.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import bson  # pyright: ignore[reportMissingImports]
+import msgpack
+from bson import ObjectId
+from bson.codec_options import CodecOptions
+from bson.decimal128 import Decimal128
+from bson.errors import BSONError
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+# Same decoding as the shared client (naive UTC datetimes).
+BSON_CODEC_OPTIONS = CodecOptions()
+MSGPACK_OBJECTID_EXT = 7
+
+
+def _as_document(data) -> dict:
+    # BSON (and our envelope convention) needs a mapping at the top level.
+    if data is None:
+        return {}
+    if isinstance(data, dict):
+        return data
+    return {"data": data}
+
+
+class BSONRenderer(BaseRenderer):
+    media_type = "application/bson"
+    format = "bson"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return bson.encode(_as_document(data), codec_options=BSON_CODEC_OPTIONS)
+
+
+class BSONParser(BaseParser):
+    media_type = "application/bson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return bson.decode(stream.read(), codec_options=BSON_CODEC_OPTIONS)
+        except (BSONError, ValueError) as exc:
+            raise ParseError(f"BSON parse error - {exc}")
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, ObjectId):
+        return msgpack.ExtType(MSGPACK_OBJECTID_EXT, obj.binary)
+    if isinstance(obj, datetime):
+        # Aware datetimes are packed natively; pymongo hands back naive UTC.
+        return msgpack.Timestamp.from_datetime(obj.replace(tzinfo=timezone.utc))
+    if isinstance(obj, Decimal128):
+        return str(obj)
+    raise TypeError(f"Cannot serialize {type(obj).__name__} to MessagePack")
+
+
+def _msgpack_ext_hook(code, data):
+    if code == MSGPACK_OBJECTID_EXT:
+        return ObjectId(data)
+    return msgpack.ExtType(code, data)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True, datetime=True)
+
+
+class MessagePackParser(BaseParser):
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            data = msgpack.unpackb(
+                stream.read(), raw=False, ext_hook=_msgpack_ext_hook, timestamp=3
+            )
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
+        if not isinstance(data, dict):
+            raise ParseError("MessagePack body must be a map.")
+        # Timestamps decode as aware UTC datetimes; pymongo stores those as-is.
+        return data
+
+
+BINARY_RENDERER_FORMATS = frozenset({BSONRenderer.format, MessagePackRenderer.format})
+
+# JSON stays first so clients without an Accept header keep getting JSON.
+CRUD_RENDERER_CLASSES = list(api_settings.DEFAULT_RENDERER_CLASSES) + [BSONRenderer, MessagePackRenderer]
+CRUD_PARSER_CLASSES = list(api_settings.DEFAULT_PARSER_CLASSES) + [BSONParser, MessagePackParser]
+
+
+def wants_native_types(request) -> bool:
+    """True when the negotiated renderer keeps ObjectId/datetime as native types."""
+    renderer = getattr(request, "accepted_renderer", None)
+    return getattr(renderer, "format", None) in BINARY_RENDERER_FORMATS
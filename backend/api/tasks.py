@@ -0,0 +1,28 @@
+"""Celery tasks for the data API (usage meter flush, storage accounting)."""
+
+import logging
+
+from celery import shared_task
+
+from api.application.storage_accounting import measure_all_storage
+from api.infrastructure.usage_meter import flush_usage_counters, usage_meter
+from core.infrastructure.managers import user_manager
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name="api.tasks.flush_usage_counters", ignore_result=True)
+def flush_usage_counters_task() -> int:
+    if not usage_meter.enabled:
+        return 0
+    flushed = flush_usage_counters(user_manager.users_collection)
+    if flushed:
+        logger.debug("Flushed usage counters for %s user(s)", flushed)
+    return flushed
+
+
+@shared_task(name="api.tasks.measure_storage_usage", ignore_result=True)
+def measure_storage_usage_task() -> int:
+    measured = measure_all_storage()
+    logger.info("Measured storage usage for %s user(s)", measured)
+    return measured
@@ -74,6 +74,8 @@ def mock_mongo_client(mocker):
 def mock_metadata_collection(mocker):
     """Mock the metadata collection for databases."""
     mock_coll = AsyncMock()
+    # Routed reads re-wrap the collection with a read preference.
+    mock_coll.with_options = MagicMock(return_value=mock_coll)
     mocker.patch("django.conf.settings.METADATA_COLLECTION", mock_coll)
     return mock_coll
 
@@ -84,6 +86,7 @@ def mock_file_metadata_collection(mocker):
     File metadata collection: Motor-style async methods, sync find() cursor chain.
     """
     coll = MagicMock()
+    coll.with_options.return_value = coll
     coll.insert_one = AsyncMock()
     coll.delete_one = AsyncMock()
     coll.find_one = AsyncMock()
@@ -115,15 +118,15 @@ def gridfs_service(user_id, mock_mongo_client, mocker):
 
 
 @pytest.fixture(autouse=True)
-def _stub_analytics_task_delay(mocker):
-    """Avoid Redis/Celery brokers during API tests."""
-    for name in (
-        "log_http_request_task",
-        "log_db_operation_task",
-        "log_mongo_detail_task",
-        "log_performance_task",
-        "log_client_info_task",
-        "log_error_task",
-        "log_slow_query_task",
-    ):
-        mocker.patch(f"analytics.tasks.{name}.delay", return_value=None)
+def _stub_telemetry_buffer(mocker):
+    """Keep request telemetry in memory during API tests (no flusher thread, no Mongo)."""
+    mocker.patch("analytics.telemetry.telemetry_buffer.add", return_value=True)
+
+
+@pytest.fixture(autouse=True)
+def _stub_storage_deltas(mocker):
+    """Write paths account storage deltas in platform_ops; tests use mocked clients."""
+    mocker.patch(
+        "api.application.storage_accounting.storage_quota.record_delta",
+        new=AsyncMock(return_value=None),
+    )
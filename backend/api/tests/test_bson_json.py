@@ -0,0 +1,182 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import bson
+import pytest
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from unittest.mock import AsyncMock
+from rest_framework.renderers import JSONRenderer
+
+from api.infrastructure.bson_json import encode_documents, render_envelope
+from api.infrastructure.mongodb import jsonify_object_ids
+
+
+def _batch(docs):
+    return b"".join(bson.encode(doc) for doc in docs)
+
+
+def _sample_docs(n=3):
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"user-{i}",
+            "created_at": datetime(2024, 5, 1, 12, 30, 15, 123000),
+            "profile": {"owner_id": ObjectId(), "tags": ["a", "b"]},
+            "orders": [{"order_id": ObjectId(), "qty": i}],
+        }
+        for i in range(n)
+    ]
+
+
+def test_encode_documents_matches_drf_rendering():
+    docs = _sample_docs()
+    batch = _batch(docs)
+
+    expected = JSONRenderer().render(jsonify_object_ids(bson.decode_all(batch)))
+    body, count = encode_documents([batch])
+
+    assert count == 3
+    assert body == expected
+
+
+def test_encode_documents_handles_bson_only_types():
+    oid = ObjectId()
+    batch = _batch([{"_id": oid, "price": Decimal128("19.99"), "refs": [oid]}])
+
+    body, _ = encode_documents([batch])
+    doc = json.loads(body)[0]
+
+    assert doc["_id"] == str(oid)
+    assert Decimal(doc["price"]) == Decimal("19.99")
+    assert doc["refs"] == [str(oid)]
+
+
+def test_render_envelope_keeps_key_order_across_batches():
+    first, second = _sample_docs(2), _sample_docs(1)
+    envelope = {"success": True, "data": None, "pagination": {"page": 1}}
+
+    body, count = render_envelope([_batch(first), _batch(second)], envelope)
+
+    assert count == 3
+    assert list(json.loads(body)) == ["success", "data", "pagination"]
+
+
+@pytest.mark.django_db
+def test_crud_get_large_page_uses_fast_json(authenticated_api_client, mocker, settings):
+    settings.CRUD_FAST_JSON_MIN_PAGE_SIZE = 100
+    docs = _sample_docs(2)
+    mocker.patch(
+        "api.application.document_service.DocumentService.list_docs_raw",
+        new=AsyncMock(return_value=(2, [_batch(docs)])),
+    )
+    list_docs = mocker.patch(
+        "api.application.document_service.DocumentService.list_docs",
+        new=AsyncMock(),
+    )
+
+    response = authenticated_api_client.get(
+        "/api/v2/crud/",
+        {"database_id": str(ObjectId()), "collection_name": "users", "page_size": 500},
+    )
+
+    assert response.status_code == 200
+    body = json.loads(response.content)
+    assert body["success"] is True
+    assert body["data"][0]["_id"] == str(docs[0]["_id"])
+    assert body["pagination"]["total_items"] == 2
+    list_docs.assert_not_called()
+
+
+class _FakeRawCursor:
+    def __init__(self, batches, fail_after=None):
+        self._batches = list(batches)
+        self._fail_after = fail_after
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for index, batch in enumerate(self._batches):
+            if self._fail_after is not None and index >= self._fail_after:
+                raise RuntimeError("cursor died")
+            yield batch
+
+    async def close(self):
+        self.closed = True
+
+
+async def _drain(stream):
+    return b"".join([chunk async for chunk in stream])
+
+
+@pytest.mark.asyncio
+async def test_stream_envelope_writes_batches_then_pagination():
+    from api.presentation.views.crud_views import DataCrudView
+
+    first, second = _sample_docs(2), _sample_docs(1)
+    cursor = _FakeRawCursor([_batch(first), b"", _batch(second)])
+    completed = []
+
+    body = await _drain(DataCrudView._stream_envelope(
+        cursor, AsyncMock(return_value=7),
+        on_complete=completed.append, page=1, page_size=3,
+    ))
+
+    parsed = json.loads(body)
+    assert [d["_id"] for d in parsed["data"]] == [str(d["_id"]) for d in first + second]
+    assert parsed["success"] is True
+    assert parsed["pagination"] == {"page": 1, "page_size": 3, "total_items": 7, "total_pages": 3}
+    # Same envelope, byte for byte, as the buffered fast-JSON path.
+    expected, _ = render_envelope(
+        [_batch(first), _batch(second)],
+        {"success": True, "data": None, "pagination": DataCrudView._pagination(1, 3, 7)},
+    )
+    assert body == expected
+    assert completed == [3]
+    assert cursor.closed
+
+
+@pytest.mark.asyncio
+async def test_stream_envelope_reports_failure_in_trailer():
+    from api.presentation.views.crud_views import DataCrudView
+
+    cursor = _FakeRawCursor([_batch(_sample_docs(2)), _batch(_sample_docs(2))], fail_after=1)
+    completed = []
+
+    body = await _drain(DataCrudView._stream_envelope(
+        cursor, AsyncMock(return_value=4),
+        on_complete=completed.append, page=1, page_size=4,
+    ))
+
+    parsed = json.loads(body)
+    assert parsed["stream_error"] == {"error": "InternalServerError", "detail": "Stream interrupted."}
+    assert parsed["pagination"] is None
+    assert len(parsed["data"]) == 2
+    # Every key appears once; no parser-dependent duplicate "success".
+    assert json.loads(body, object_pairs_hook=lambda pairs: len(pairs) == len(dict(pairs))) is True
+    assert completed == []
+    assert cursor.closed
+
+
+@pytest.mark.django_db
+def test_crud_get_stream_falls_back_to_buffered_under_wsgi(authenticated_api_client, mocker):
+    stream = mocker.patch(
+        "api.application.document_service.DocumentService.stream_docs_raw",
+        new=AsyncMock(),
+    )
+    mocker.patch(
+        "api.application.document_service.DocumentService.list_docs",
+        new=AsyncMock(return_value=(0, [])),
+    )
+
+    response = authenticated_api_client.get(
+        "/api/v2/crud/",
+        {"database_id": str(ObjectId()), "collection_name": "users", "stream": "true"},
+    )
+
+    assert response.status_code == 200
+    assert json.loads(response.content)["data"] == []
+    stream.assert_not_called()
@@ -0,0 +1,117 @@
+import gzip
+import json
+
+import brotli
+import pytest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+
+from api.infrastructure.compression import negotiate_encoding
+from api.middleware import ResponseCompressionMiddleware
+
+CLASSES = [
+    {"prefix": "/core/", "brotli_quality": 0, "gzip_level": 0},
+    {"prefix": "/api/v2/crud", "brotli_quality": 4, "gzip_level": 5},
+    {"prefix": "/api/v2/", "brotli_quality": 0, "gzip_level": 6},
+]
+
+
+@pytest.fixture
+def compression_settings(settings):
+    settings.RESPONSE_COMPRESSION_MIN_BYTES = 256
+    settings.RESPONSE_COMPRESSION_CLASSES = CLASSES
+    return settings
+
+
+def _json_body(n=200):
+    return json.dumps({"data": [{"name": f"user-{i}", "tags": ["a", "b"]} for i in range(n)]}).encode()
+
+
+def _run(path, response, accept="br, gzip"):
+    request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING=accept)
+    return ResponseCompressionMiddleware(lambda _req: response)(request)
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, deflate, br", "br"),
+        ("gzip", "gzip"),
+        ("br;q=0, gzip", "gzip"),
+        ("gzip;q=0.5, br;q=0.2", "gzip"),
+        ("*", "br"),
+        ("identity", None),
+        ("", None),
+    ],
+)
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+def test_large_json_prefers_brotli(compression_settings):
+    body = _json_body()
+    response = _run("/api/v2/crud/", HttpResponse(body, content_type="application/json"))
+
+    assert response["Content-Encoding"] == "br"
+    assert "Accept-Encoding" in response["Vary"]
+    assert int(response["Content-Length"]) == len(response.content)
+    assert brotli.decompress(response.content) == body
+
+
+def test_endpoint_class_levels_and_opt_out(compression_settings):
+    body = _json_body()
+
+    metadata = _run("/api/v2/list_databases/", HttpResponse(body, content_type="application/json"))
+    assert metadata["Content-Encoding"] == "gzip"  # brotli disabled for this class
+    assert gzip.decompress(metadata.content) == body
+
+    auth = _run("/core/api/profile/", HttpResponse(body, content_type="application/json"))
+    assert not auth.has_header("Content-Encoding")
+
+
+def test_small_and_binary_responses_are_untouched(compression_settings):
+    small = _run("/api/v2/crud/", HttpResponse(b'{"success":true}', content_type="application/json"))
+    assert not small.has_header("Content-Encoding")
+
+    binary = _run("/api/v2/crud/", HttpResponse(b"\x89PNG" * 1000, content_type="image/png"))
+    assert not binary.has_header("Content-Encoding")
+
+
+def test_range_responses_are_untouched(compression_settings):
+    body = b"x" * 4096
+    partial = StreamingHttpResponse(iter([body]), status=206, content_type="text/plain")
+    partial["Content-Range"] = f"bytes 0-{len(body) - 1}/10000"
+    partial["Accept-Ranges"] = "bytes"
+    partial["Content-Length"] = str(len(body))
+
+    response = _run("/api/v2/files/stream/abc/", partial)
+
+    assert not response.has_header("Content-Encoding")
+    assert response["Content-Length"] == str(len(body))
+    assert b"".join(response.streaming_content) == body
+
+
+def test_streaming_response_is_compressed_incrementally(compression_settings):
+    chunks = [b'{"data":[', b'{"a":1},' * 100, b'{"a":2}', b"]}"]
+    response = _run("/api/v2/crud/", StreamingHttpResponse(iter(chunks), content_type="application/json"), accept="gzip")
+
+    assert response["Content-Encoding"] == "gzip"
+    assert not response.has_header("Content-Length")
+    parts = list(response.streaming_content)
+    # Every body chunk is flushed, so the client can decode before the stream ends.
+    assert len(parts) == len(chunks) + 1
+    assert gzip.decompress(b"".join(parts)) == b"".join(chunks)
+
+
+@pytest.mark.asyncio
+async def test_async_streaming_response_is_compressed(compression_settings):
+    async def body():
+        yield b'{"data":['
+        yield b'{"a":1},' * 100 + b'{"a":2}'
+        yield b"]}"
+
+    response = _run("/api/v2/crud/", StreamingHttpResponse(body(), content_type="application/json"))
+
+    assert response.is_async
+    compressed = b"".join([part async for part in response.streaming_content])
+    assert brotli.decompress(compressed) == b'{"data":[' + b'{"a":1},' * 100 + b'{"a":2}]}'
@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from asgiref.sync import iscoroutinefunction
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from analytics.middleware import DatacubeObservabilityMiddleware
+from api.middleware import ResponseCompressionMiddleware, TenantRateLimitMiddleware, UsageMeteringMiddleware
+from project.middleware import CommonMiddleware, HybridMiddleware, SecurityMiddleware, StaticFilesMiddleware
+
+MIDDLEWARE_CLASSES = [
+    DatacubeObservabilityMiddleware,
+    TenantRateLimitMiddleware,
+    UsageMeteringMiddleware,
+    ResponseCompressionMiddleware,
+    StaticFilesMiddleware,
+    SecurityMiddleware,
+    CommonMiddleware,
+]
+
+
+async def _async_view(request):
+    return HttpResponse(b"ok", content_type="text/plain")
+
+
+@pytest.mark.parametrize("middleware_class", MIDDLEWARE_CLASSES)
+def test_middleware_follows_get_response_mode(middleware_class):
+    assert middleware_class.sync_capable and middleware_class.async_capable
+    assert iscoroutinefunction(middleware_class(_async_view))
+    assert not iscoroutinefunction(middleware_class(lambda request: HttpResponse(b"ok")))
+
+
+
+def test_hybrid_middleware_requires_both_paths():
+    class SyncOnly(HybridMiddleware):
+        def process(self, request):
+            return self.get_response(request)
+
+    with pytest.raises(TypeError, match="__acall__"):
+        SyncOnly(_async_view)
+
+async def test_observability_async_path_records_request():
+    request = RequestFactory().get("/api/v2/crud/", HTTP_HOST="localhost")
+    request.user = SimpleNamespace(pk="u1", id="u1", is_authenticated=True)
+    with mock.patch("analytics.middleware.record_request_event") as record:
+        response = await DatacubeObservabilityMiddleware(_async_view)(request)
+    assert response.status_code == 200
+    record.assert_called_once()
+
+
+async def test_metering_async_path_skips_reads():
+    request = RequestFactory().get("/api/v2/crud/", HTTP_HOST="localhost")
+    with mock.patch("api.middleware.settings") as settings:
+        response = await UsageMeteringMiddleware(_async_view)(request)
+    assert response.content == b"ok"
+    assert not settings.MONGODB_CLIENT.__getitem__.called
+
+
+async def test_security_middleware_runs_inline_on_loop():
+    request = RequestFactory().get("/api/v2/crud/", HTTP_HOST="localhost")
+    with mock.patch("django.utils.deprecation.sync_to_async") as hop:
+        response = await SecurityMiddleware(_async_view)(request)
+    hop.assert_not_called()
+    assert response["X-Content-Type-Options"] == "nosniff"
@@ -1,6 +1,6 @@
 import pytest
 from bson import ObjectId
-from unittest.mock import AsyncMock, MagicMock
+from unittest.mock import ANY, AsyncMock, MagicMock
 
 pytestmark = pytest.mark.asyncio
 
@@ -44,7 +44,7 @@ class TestMetadataServiceFileMethods:
         assert result is True
         mock_file_metadata_collection.delete_one.assert_awaited_once_with(
             {"user_id": metadata_service.user_id, "file_id": file_id},
-            session=None,
+            session=ANY,
         )
 
     async def test_delete_file_entry_not_found(self, metadata_service, mock_file_metadata_collection, file_id):
@@ -94,10 +94,12 @@ class TestMetadataServiceFileMethods:
         assert docs[1]["_id"] == str(o2)
 
         mock_file_metadata_collection.count_documents.assert_awaited_once_with(
-            {"user_id": metadata_service.user_id, "filename": {"$regex": "test", "$options": "i"}}
+            {"user_id": metadata_service.user_id, "filename": {"$regex": "test", "$options": "i"}},
+            session=ANY,
         )
         mock_file_metadata_collection.find.assert_called_once_with(
-            {"user_id": metadata_service.user_id, "filename": {"$regex": "test", "$options": "i"}}
+            {"user_id": metadata_service.user_id, "filename": {"$regex": "test", "$options": "i"}},
+            session=ANY,
         )
         mock_cursor.sort.assert_called_once_with("uploaded_at", -1)
         mock_cursor.skip.assert_called_once_with(5)
@@ -0,0 +1,98 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock
+
+import pytest
+from asgiref.sync import async_to_sync
+from pymongo import AsyncMongoClient
+
+from project.event_loop import ProcessEventLoop
+from project.mongo import LazyMongoHandle, MongoConnectionManager, pool_options_from_env
+
+
+@pytest.fixture
+def manager():
+    mgr = MongoConnectionManager("mongodb://127.0.0.1:1", serverSelectionTimeoutMS=50, connect=False)
+    yield mgr
+    mgr.close()
+
+
+def test_pool_options_from_env():
+    options = pool_options_from_env({
+        "MONGODB_MAX_POOL_SIZE": "50",
+        "MONGODB_MIN_POOL_SIZE": "5",
+        "MONGODB_MAX_IDLE_TIME_MS": "60000",
+        "MONGODB_COMPRESSORS": "zlib",
+    })
+
+    assert options == {
+        "maxPoolSize": 50,
+        "minPoolSize": 5,
+        "maxIdleTimeMS": 60000,
+        "compressors": "zlib",
+        "appname": "datacube-backend",
+    }
+
+
+def test_async_clients_are_bound_per_event_loop(manager):
+    async def grab():
+        return manager.async_client(), manager.async_client()
+
+    first_a, first_b = asyncio.run(grab())
+    second, _ = asyncio.run(grab())
+
+    assert first_a is first_b
+    assert second is not first_a
+    assert first_a.options.pool_options.max_pool_size == manager.async_client().options.pool_options.max_pool_size
+
+
+def test_async_client_is_closed_when_its_loop_shuts_down(manager, mocker):
+    close = mocker.patch.object(AsyncMongoClient, "close", new=AsyncMock())
+
+    async def grab():
+        return manager.async_client()
+
+    asyncio.run(grab())
+    async_to_sync(grab)()
+
+    assert close.await_count == 2
+    assert not manager._async_clients
+
+
+def test_wsgi_threads_share_the_process_loop_client(manager):
+    process_loop = ProcessEventLoop()
+
+    async def grab():
+        return manager.async_client(), asyncio.get_running_loop()
+
+    def request(_):
+        process_loop.bind_thread()
+        return async_to_sync(grab)()
+
+    try:
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            results = list(pool.map(request, range(6)))
+        assert {id(client) for client, _ in results} == {id(results[0][0])}
+        assert {loop for _, loop in results} == {process_loop.get()}
+    finally:
+        manager.close()
+        process_loop.close()
+
+
+def test_sync_client_is_shared_and_reset_after_fork(manager):
+    client = manager.sync_client()
+    assert manager.sync_client() is client
+
+    manager._pid = -1  # as seen from a forked child
+    assert manager.sync_client() is not client
+    client.close()
+
+
+def test_lazy_handle_resolves_on_each_use(manager):
+    handle = manager.lazy(lambda m: m.sync_client()["auth"])
+
+    assert isinstance(handle, LazyMongoHandle)
+    assert handle["users"].full_name == "auth.users"
+    assert handle.name == "auth"
+    with pytest.raises(AttributeError):
+        handle.__deepcopy__
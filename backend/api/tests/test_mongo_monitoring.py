@@ -0,0 +1,84 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from analytics.middleware import DatacubeObservabilityMiddleware
+from project.mongo_monitoring import (
+    CommandAccountingListener,
+    PoolAccountingListener,
+    current_db_stats,
+    db_telemetry_fields,
+    start_request_accounting,
+    stop_request_accounting,
+)
+
+commands = CommandAccountingListener()
+pool = PoolAccountingListener()
+
+
+def _command(duration_ms):
+    return SimpleNamespace(duration_micros=int(duration_ms * 1000))
+
+
+def test_listeners_ignore_events_outside_a_request():
+    commands.succeeded(_command(5))
+    pool.connection_checked_out(SimpleNamespace(duration=0.01))
+    assert current_db_stats() is None
+    assert db_telemetry_fields() == {}
+
+
+def test_listeners_accumulate_into_active_request():
+    stats, token = start_request_accounting()
+    try:
+        commands.succeeded(_command(2.5))
+        commands.failed(_command(1.5))
+        pool.connection_checked_out(SimpleNamespace(duration=0.004))
+        pool.connection_check_out_failed(SimpleNamespace(duration=None))
+        fields = db_telemetry_fields()
+    finally:
+        stop_request_accounting(token)
+
+    assert fields == {
+        "db_commands": 2,
+        "db_failed_commands": 1,
+        "db_time_ms": 4.0,
+        "db_pool_wait_ms": 4.0,
+    }
+    assert stats.server_timing(10.0) == (
+        'db;dur=4.00;desc="2 cmds", db-wait;dur=4.00, app;dur=2.00, total;dur=10.00'
+    )
+
+
+async def test_concurrent_requests_are_accounted_separately():
+    async def request(n):
+        stats, token = start_request_accounting()
+        try:
+            for _ in range(n):
+                await asyncio.sleep(0)
+                commands.succeeded(_command(1))
+            return stats.commands
+        finally:
+            stop_request_accounting(token)
+
+    assert await asyncio.gather(request(3), request(7)) == [3, 7]
+
+
+async def test_observability_middleware_sets_server_timing_and_telemetry():
+    async def view(request):
+        commands.succeeded(_command(3))
+        return HttpResponse(b"ok", content_type="text/plain")
+
+    request = RequestFactory().get("/api/v2/crud/", HTTP_HOST="localhost")
+    request.user = SimpleNamespace(pk="u1", id="u1", is_authenticated=True)
+    with mock.patch("analytics.middleware.record_request_event") as record:
+        response = await DatacubeObservabilityMiddleware(view)(request)
+
+    assert response["Server-Timing"].startswith('db;dur=3.00;desc="1 cmds"')
+    event = record.call_args[0][0]
+    assert event["timing"]["db_commands"] == 1
+    assert event["timing"]["db_ms"] == 3.0
+    assert response["X-Request-ID"] == event["request_id"]
+    assert current_db_stats() is None
@@ -0,0 +1,172 @@
+from unittest import mock
+
+import pytest
+from bson import ObjectId
+from django.core.cache import cache
+from rest_framework import exceptions
+
+from core.infrastructure.api_keys import hash_api_key, lookup_prefix, verify_api_key
+from core.infrastructure.authentication import APIKeyAuthentication, CustomJWTAuthentication, api_key_manager
+from core.infrastructure.managers import user_manager
+from core.infrastructure.principal_cache import _LocalLRU, _MISSING, principal_cache
+
+
+@pytest.fixture(autouse=True)
+def clean_caches(settings):
+    settings.PRINCIPAL_CACHE_SHARED = False
+    principal_cache.clear_local()
+    cache.clear()
+    yield
+    principal_cache.clear_local()
+    cache.clear()
+
+
+@pytest.fixture
+def user_doc():
+    return {
+        "_id": ObjectId(),
+        "email": "a@example.com",
+        "firstName": "Ada",
+        "lastName": "L",
+        "role": "developer",
+        "is_email_verified": True,
+        "deleted_at": None,
+        "password": b"hash",
+        "otp_hash": "secret",
+    }
+
+
+def test_local_lru_expires_and_evicts(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("core.infrastructure.principal_cache.time.monotonic", lambda: clock[0])
+    lru = _LocalLRU(max_entries=2)
+    lru.set("a", 1, ttl=5)
+    lru.set("b", 2, ttl=5)
+    assert lru.get("a") == 1  # "a" is now most recent
+    lru.set("c", 3, ttl=5)
+    assert lru.get("b") is _MISSING
+    clock[0] += 6
+    assert lru.get("a") is _MISSING
+
+
+def test_jwt_get_user_hits_database_once(user_doc):
+    auth = CustomJWTAuthentication()
+    token = {"user_id": str(user_doc["_id"])}
+    with mock.patch.object(user_manager, "get_user_by_id", return_value=user_doc) as load:
+        first = auth.get_user(token)
+        second = auth.get_user(token)
+
+    assert load.call_count == 1
+    assert first.id == second.id == str(user_doc["_id"])
+    cached = principal_cache.get_user(user_doc["_id"], lambda: None)
+    assert "password" not in cached and "otp_hash" not in cached
+
+
+def test_role_change_invalidates_cached_principal(user_doc):
+    auth = CustomJWTAuthentication()
+    token = {"user_id": str(user_doc["_id"])}
+    with mock.patch.object(user_manager, "get_user_by_id", return_value=user_doc):
+        assert auth.get_user(token).role == "developer"
+
+    with mock.patch.object(user_manager, "users_collection"):
+        user_manager.set_role(user_doc["_id"], "admin")
+
+    promoted = {**user_doc, "role": "admin"}
+    with mock.patch.object(user_manager, "get_user_by_id", return_value=promoted) as load:
+        assert auth.get_user(token).role == "admin"
+    load.assert_called_once()
+
+
+def test_soft_delete_invalidates_cached_principal(user_doc):
+    auth = CustomJWTAuthentication()
+    token = {"user_id": str(user_doc["_id"])}
+    with mock.patch.object(user_manager, "get_user_by_id", return_value=user_doc):
+        auth.get_user(token)
+    with mock.patch.object(user_manager, "users_collection"):
+        user_manager.soft_delete_user(user_doc["_id"])
+
+    with mock.patch.object(user_manager, "get_user_by_id", return_value=None):
+        with pytest.raises(exceptions.AuthenticationFailed):
+            auth.get_user(token)
+
+
+def test_api_key_owner_cached_until_revoked(user_doc):
+    key = "sk_test_abcdefghijklmnop"
+    key_doc = {"_id": ObjectId(), "key_hash": hash_api_key(key), "user_id": user_doc["_id"]}
+    auth = APIKeyAuthentication()
+
+    with mock.patch.object(api_key_manager, "collection") as keys, \
+            mock.patch.object(api_key_manager, "_indexes_ready", True), \
+            mock.patch.object(user_manager, "get_user_by_id", return_value=user_doc):
+        keys.find.return_value.limit.return_value = [key_doc]
+        for _ in range(3):
+            user, _ = auth.authenticate_credentials(key)
+        assert user.id == str(user_doc["_id"])
+        keys.find.assert_called_once_with(
+            {"key_prefix": lookup_prefix(key), "is_active": True}, {"key_hash": 1, "user_id": 1}
+        )
+        keys.find_one.assert_not_called()
+
+        keys.find_one_and_delete.return_value = key_doc
+        assert api_key_manager.revoke_key(str(key_doc["_id"]), str(user_doc["_id"])) is True
+
+        keys.find.return_value.limit.return_value = []
+        keys.find_one.return_value = None
+        with pytest.raises(exceptions.AuthenticationFailed):
+            auth.authenticate_credentials(key)
+
+
+def test_generated_keys_are_stored_hashed():
+    with mock.patch.object(api_key_manager, "collection") as keys, \
+            mock.patch.object(api_key_manager, "_indexes_ready", True):
+        key = api_key_manager.generate_key(str(ObjectId()), "ci")
+    stored = keys.insert_one.call_args[0][0]
+    assert "key" not in stored and key not in stored.values()
+    assert stored["key_hash"] == hash_api_key(key)
+    assert stored["key_prefix"] == lookup_prefix(key) and key.startswith(stored["key_prefix"])
+    assert not verify_api_key(key + "x", stored["key_hash"])
+
+
+def test_legacy_plaintext_key_is_migrated_on_first_use(settings):
+    settings.API_KEY_LEGACY_LOOKUP = True
+    key = "sk_test_legacylegacylegacy"
+    legacy = {"_id": ObjectId(), "user_id": ObjectId()}
+    with mock.patch.object(api_key_manager, "collection") as keys, \
+            mock.patch.object(api_key_manager, "_indexes_ready", True):
+        keys.find.return_value.limit.return_value = []
+        keys.find_one.return_value = legacy
+        assert api_key_manager.find_active_owner(key) == str(legacy["user_id"])
+
+        keys.update_one.assert_called_once_with(
+            {"_id": legacy["_id"], "key": key},
+            {"$set": {"key_prefix": lookup_prefix(key), "key_hash": hash_api_key(key)}, "$unset": {"key": ""}},
+        )
+
+        settings.API_KEY_LEGACY_LOOKUP = False
+        keys.find_one.reset_mock()
+        assert api_key_manager.find_active_owner(key) is None
+        keys.find_one.assert_not_called()
+
+
+def test_revocation_reaches_other_workers_before_ttl(settings):
+    settings.PRINCIPAL_CACHE_SHARED = True
+    settings.PRINCIPAL_CACHE_REVOCATION_SYNC_SECONDS = 0
+    key_hash = hash_api_key("sk_test_revokedrevoked")
+    assert principal_cache.get_api_key_owner(key_hash, lambda: "u1") == "u1"
+
+    principal_cache.revoke_api_key(key_hash)
+    principal_cache.clear_local()  # another process: no local revocation state
+
+    assert principal_cache.get_api_key_owner(key_hash, lambda: "u1") is None
+
+
+def test_shared_tier_serves_other_workers(settings, user_doc):
+    settings.PRINCIPAL_CACHE_SHARED = True
+    principal_cache.get_user(user_doc["_id"], lambda: user_doc)
+    principal_cache.clear_local()  # as seen from another process
+
+    assert principal_cache.get_user(user_doc["_id"], lambda: None)["email"] == "a@example.com"
+
+    principal_cache.invalidate_user(user_doc["_id"])
+    principal_cache.clear_local()
+    assert principal_cache.get_user(user_doc["_id"], lambda: None) is None
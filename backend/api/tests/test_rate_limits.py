@@ -0,0 +1,196 @@
+import os
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from bson import ObjectId
+from django.core import signals
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.infrastructure.rate_limits import (
+    Identity,
+    LocalRateLimiter,
+    TenantLimits,
+    TenantRateLimiter,
+)
+from api.middleware import TenantRateLimitMiddleware
+
+LIMITS = TenantLimits(requests_per_second=2, burst=2, bytes_per_second=1000, bytes_burst=1000, max_in_flight=1)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("api.infrastructure.rate_limits.time.monotonic", lambda: now[0])
+    return now
+
+
+def test_request_bucket_refills_at_configured_rate(clock):
+    limiter = LocalRateLimiter()
+    tenant = Identity("user:a", TenantLimits(requests_per_second=2, burst=2))
+    assert limiter.admit([tenant], 0) is None
+    assert limiter.admit([tenant], 0) is None
+    rejection = limiter.admit([tenant], 0)
+    assert (rejection.reason, rejection.retry_after) == ("requests", 0.5)
+    assert rejection.retry_after_header == "1"
+
+    clock[0] += 0.5
+    assert limiter.admit([tenant], 0) is None
+    assert limiter.snapshot()["user:a"]["rejected_requests"] == 1
+
+
+def test_large_response_puts_tenant_into_byte_debt(clock):
+    limiter = LocalRateLimiter()
+    tenant = Identity("user:a", TenantLimits(bytes_per_second=1000, bytes_burst=1000))
+    assert limiter.admit([tenant], 200) is None
+    limiter.release([tenant], 3800)
+
+    rejection = limiter.admit([tenant], 0)
+    assert (rejection.reason, rejection.retry_after) == ("bytes", 3.0)
+    clock[0] += 3.0
+    assert limiter.admit([tenant], 0) is None
+
+
+def test_in_flight_cap_and_all_or_nothing_charging(clock):
+    limiter = LocalRateLimiter()
+    busy = Identity("user:a", TenantLimits(max_in_flight=1))
+    key = Identity("key:k", TenantLimits(requests_per_second=1, burst=1))
+    assert limiter.admit([busy], 0) is None
+
+    rejection = limiter.admit([key, busy], 0)
+    assert (rejection.identity, rejection.reason) == ("user:a", "concurrency")
+    # The key's token was not spent by the rejected request.
+    assert limiter.admit([key], 0) is None
+
+    limiter.release([busy], 0)
+    assert limiter.snapshot()["user:a"] == {"admitted": 1, "peak_in_flight": 1, "rejected_concurrency": 1, "in_flight": 0}
+
+
+def test_redis_outage_falls_back_to_process_limits(settings):
+    limiter = TenantRateLimiter(url="redis://limits")
+    script = mock.MagicMock(side_effect=RedisConnectionError("down"))
+    tenant = Identity("user:a", TenantLimits(max_in_flight=1))
+    with mock.patch.object(limiter.redis, "sync_script", return_value=script):
+        ticket, rejection = limiter.admit([tenant])
+        assert ticket.backend == "local" and rejection is None
+        assert limiter.admit([tenant])[1].reason == "concurrency"
+        limiter.release(ticket)
+    assert limiter.local.snapshot()["user:a"]["in_flight"] == 0
+
+
+def _request(**headers):
+    return RequestFactory().post("/api/v2/crud/", data=b"{}", content_type="application/json", HTTP_HOST="localhost", **headers)
+
+
+@pytest.fixture
+def limited(settings):
+    settings.RATE_LIMITS = {"user": {"max_in_flight": 1}, "api_key": {"requests_per_second": 1, "burst": 1}}
+    limiter = TenantRateLimiter(url="")
+    with mock.patch("api.middleware.tenant_rate_limiter", limiter):
+        yield limiter
+
+
+def test_middleware_limits_jwt_tenant_and_sets_retry_after(limited):
+    user_id = str(ObjectId())
+    token = str(AccessToken.for_user(SimpleNamespace(id=user_id)))
+    middleware = TenantRateLimitMiddleware(lambda request: second(request))
+
+    def second(request):
+        # A nested request of the same tenant while the first is in flight.
+        return inner(_request(HTTP_AUTHORIZATION=f"Bearer {token}"))
+
+    inner = TenantRateLimitMiddleware(lambda request: HttpResponse(b"ok"))
+    response = middleware(_request(HTTP_AUTHORIZATION=f"Bearer {token}"))
+    assert response.status_code == 429
+    assert response["Retry-After"] == "1"
+    assert limited.local.snapshot()[f"user:{user_id}"]["in_flight"] == 0
+
+
+def test_middleware_limits_api_keys_without_database_lookup(limited):
+    middleware = TenantRateLimitMiddleware(lambda request: HttpResponse(b"ok"))
+    with mock.patch("core.infrastructure.authentication.api_key_manager") as keys:
+        first = middleware(_request(HTTP_AUTHORIZATION="Api-Key sk_test_abcdefghijkl"))
+        second = middleware(_request(HTTP_AUTHORIZATION="Api-Key sk_test_abcdefghijkl"))
+    assert (first.status_code, second.status_code) == (200, 429)
+    assert not keys.method_calls
+
+
+def test_middleware_releases_slot_when_view_raises(limited):
+    token = str(AccessToken.for_user(SimpleNamespace(id=str(ObjectId()))))
+
+    def boom(request):
+        raise RuntimeError("view failed")
+
+    with pytest.raises(RuntimeError):
+        TenantRateLimitMiddleware(boom)(_request(HTTP_AUTHORIZATION=f"Bearer {token}"))
+    assert all(state["in_flight"] == 0 for state in limited.local.snapshot().values())
+
+
+def test_streaming_response_holds_slot_until_body_is_sent(limited):
+    token = str(AccessToken.for_user(SimpleNamespace(id=str(ObjectId()))))
+    chunks = [b"a" * 100, b"b" * 250]
+    middleware = TenantRateLimitMiddleware(lambda request: StreamingHttpResponse(iter(chunks)))
+
+    with mock.patch.object(limited, "release", wraps=limited.release) as release:
+        response = middleware(_request(HTTP_AUTHORIZATION=f"Bearer {token}"))
+        # The body has not been sent: the tenant is still at its in-flight cap.
+        assert middleware(_request(HTTP_AUTHORIZATION=f"Bearer {token}")).status_code == 429
+        assert b"".join(response.streaming_content) == b"".join(chunks)
+
+    release.assert_called_once_with(mock.ANY, 350)
+    assert all(state["in_flight"] == 0 for state in limited.local.snapshot().values())
+
+
+async def test_async_streaming_response_is_charged_when_closed_early(limited):
+    token = str(AccessToken.for_user(SimpleNamespace(id=str(ObjectId()))))
+
+    async def body():
+        yield b"x" * 10
+        yield b"y" * 10
+
+    async def view(request):
+        return StreamingHttpResponse(body())
+
+    with mock.patch.object(limited, "release", wraps=limited.release) as release:
+        response = await TenantRateLimitMiddleware(view)(_request(HTTP_AUTHORIZATION=f"Bearer {token}"))
+        assert any(state["in_flight"] for state in limited.local.snapshot().values())
+        # The client went away before reading the body; the server still closes the response.
+        with mock.patch.object(signals.request_finished, "send"):
+            response.close()
+
+    release.assert_called_once_with(mock.ANY, 0)
+    assert all(state["in_flight"] == 0 for state in limited.local.snapshot().values())
+
+
+async def test_async_path_passes_unidentified_requests(limited):
+    async def view(request):
+        return HttpResponse(b"ok")
+
+    request = _request()
+    request.user = SimpleNamespace(is_authenticated=False)
+    response = await TenantRateLimitMiddleware(view)(request)
+    assert response.status_code == 200
+    assert limited.local.snapshot() == {}
+
+
+REDIS_TEST_URL = os.getenv("RATE_LIMIT_TEST_REDIS_URL")
+
+
+@pytest.mark.skipif(not REDIS_TEST_URL, reason="RATE_LIMIT_TEST_REDIS_URL not set")
+def test_redis_script_enforces_limits_across_workers():
+    name = f"user:{ObjectId()}"
+    tenant = Identity(name, LIMITS)
+    worker_a, worker_b = TenantRateLimiter(url=REDIS_TEST_URL), TenantRateLimiter(url=REDIS_TEST_URL)
+
+    ticket, rejection = worker_a.admit([tenant], 10)
+    assert rejection is None and ticket.backend == "redis"
+    assert worker_b.admit([tenant], 10)[1].reason == "concurrency"
+    worker_a.release(ticket, 10)
+    ticket, rejection = worker_b.admit([tenant], 10)
+    assert rejection is None
+    worker_b.release(ticket, 5000)
+    assert worker_a.admit([tenant], 0)[1].reason in {"requests", "bytes"}
+    assert worker_a.saturation_snapshot()[name]["admitted"] == 2
@@ -0,0 +1,125 @@
+"""
+Read routing and causal tokens.
+
+The replica-set test runs only when MONGODB_REPLSET_TEST_URI points at a
+three-node replica set (``make dev-replset`` starts one on localhost).
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from bson.timestamp import Timestamp
+from django.core.cache import cache
+from pymongo.read_preferences import Primary, Secondary
+
+from api.infrastructure.read_routing import causal_session, remember_causal_token, routed
+from project.mongo import MongoConnectionManager, routed_read_preference_from_env
+
+REPLSET_URI = os.getenv("MONGODB_REPLSET_TEST_URI")
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(settings):
+    settings.MONGODB_CAUSAL_TOKENS_SHARED = True
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def _session(seconds):
+    ts = Timestamp(seconds, 1)
+    return SimpleNamespace(operation_time=ts, cluster_time={"clusterTime": ts, "signature": {}})
+
+
+def test_routed_read_preference_from_env():
+    default = routed_read_preference_from_env({})
+    assert default.mongos_mode == "secondaryPreferred"
+    assert default.max_staleness == 90
+
+    assert routed_read_preference_from_env({"MONGODB_ROUTED_READ_PREFERENCE": "primary"}).mongos_mode == "primary"
+    nearest = routed_read_preference_from_env({
+        "MONGODB_ROUTED_READ_PREFERENCE": "nearest",
+        "MONGODB_MAX_STALENESS_SECONDS": "-1",
+    })
+    assert nearest.max_staleness == -1
+
+    with pytest.raises(ValueError, match="MONGODB_ROUTED_READ_PREFERENCE"):
+        routed_read_preference_from_env({"MONGODB_ROUTED_READ_PREFERENCE": "secondaries"})
+
+
+def test_routed_applies_configured_preference(settings):
+    settings.MONGODB_ROUTED_READ_PREFERENCE = Secondary(max_staleness=120)
+    target = SimpleNamespace(with_options=lambda **kwargs: kwargs)
+
+    assert routed(target) == {"read_preference": Secondary(max_staleness=120)}
+
+
+def test_causal_reads_stay_on_primary_without_a_shared_cache(settings):
+    settings.MONGODB_ROUTED_READ_PREFERENCE = Secondary(max_staleness=120)
+    target = SimpleNamespace(with_options=lambda **kwargs: kwargs)
+
+    settings.MONGODB_CAUSAL_TOKENS_SHARED = False
+    assert routed(target, causal=True) is target
+    assert routed(target) == {"read_preference": Secondary(max_staleness=120)}
+
+    settings.MONGODB_CAUSAL_TOKENS_SHARED = True
+    assert routed(target, causal=True) == {"read_preference": Secondary(max_staleness=120)}
+
+
+@pytest.mark.parametrize("shared, preference", [(False, Secondary(max_staleness=120)), (True, Primary())])
+async def test_untracked_causal_session_skips_the_cache(settings, shared, preference):
+    settings.MONGODB_CAUSAL_TOKENS_SHARED = shared
+    settings.MONGODB_ROUTED_READ_PREFERENCE = preference
+    tenant = str(ObjectId())
+    write_session = _session(50)
+
+    async with causal_session(tenant, session=write_session, record=True) as session:
+        assert session is write_session
+    async with causal_session(tenant) as session:
+        assert session is None
+    assert await cache.aget(f"mongo:causal:{tenant}") is None
+
+
+async def test_causal_token_only_moves_forward():
+    tenant = str(ObjectId())
+    await remember_causal_token(tenant, _session(200))
+    await remember_causal_token(tenant, _session(100))
+    await remember_causal_token(tenant, SimpleNamespace(operation_time=None, cluster_time=None))
+
+    async with causal_session(tenant) as session:
+        assert session.operation_time == Timestamp(200, 1)
+
+
+async def test_read_session_does_not_record_token():
+    tenant = str(ObjectId())
+    async with causal_session(tenant, session=_session(50)):
+        pass
+    async with causal_session(tenant) as session:
+        assert session.operation_time is None
+
+    async with causal_session(tenant, session=_session(50), record=True):
+        pass
+    async with causal_session(tenant) as session:
+        assert session.operation_time == Timestamp(50, 1)
+
+
+@pytest.mark.skipif(not REPLSET_URI, reason="MONGODB_REPLSET_TEST_URI not set")
+async def test_secondary_read_observes_own_write(settings):
+    manager = MongoConnectionManager(REPLSET_URI, serverSelectionTimeoutMS=5000)
+    settings.MONGO_CONNECTIONS = manager
+    settings.MONGODB_ROUTED_READ_PREFERENCE = Secondary(max_staleness=90)
+    tenant = str(ObjectId())
+    coll = manager.async_client()["read_routing_test"]["items"]
+    try:
+        for i in range(20):
+            async with causal_session(tenant, record=True) as session:
+                await coll.insert_one({"tenant": tenant, "i": i}, session=session)
+            async with causal_session(tenant) as session:
+                seen = await routed(coll).count_documents({"tenant": tenant}, session=session)
+            assert seen == i + 1
+    finally:
+        await coll.drop()
+        await manager.aclose()
+        manager.close()
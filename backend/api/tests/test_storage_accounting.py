@@ -0,0 +1,95 @@
+from unittest import mock
+from unittest.mock import AsyncMock, MagicMock
+
+import bson
+import pytest
+from bson import ObjectId
+
+from api.application.storage_accounting import (
+    StorageQuota,
+    estimate_bson_size,
+    measure_user_storage,
+)
+
+USER_ID = ObjectId()
+
+
+def test_estimate_matches_encoded_bson_size():
+    docs = [{"_id": ObjectId(), "name": "x" * 40}, {"n": 1, "tags": ["a", "b"]}]
+    assert estimate_bson_size(docs) == sum(len(bson.encode(doc)) for doc in docs)
+
+
+@pytest.fixture
+def usage_collection(settings):
+    collection = MagicMock()
+    collection.find_one = AsyncMock(return_value={"measured_bytes": 900, "delta_bytes": 50})
+    collection.update_one = AsyncMock()
+    client = MagicMock()
+    client.__getitem__.return_value.__getitem__.return_value = collection
+    settings.MONGODB_CLIENT = client
+    settings.DATACUBE_FREE_TIER_MB = 1 / 1024  # 1 KiB
+    return collection
+
+
+async def test_quota_check_is_served_from_process_cache(usage_collection):
+    quota = StorageQuota()
+    assert await quota.usage_bytes(USER_ID) == 950
+    assert not await quota.is_exceeded(USER_ID)
+    usage_collection.find_one.assert_awaited_once()
+
+    await quota.record_delta(USER_ID, 100)
+    usage_collection.update_one.assert_awaited_once_with(
+        {"_id": USER_ID}, {"$inc": {"delta_bytes": 100}}, upsert=True
+    )
+    assert await quota.is_exceeded(USER_ID)
+    usage_collection.find_one.assert_awaited_once()
+
+
+async def test_expired_entry_reloads_shared_usage(usage_collection, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("api.application.storage_accounting.time.monotonic", lambda: clock[0])
+    quota = StorageQuota()
+    await quota.usage_bytes(USER_ID)
+    clock[0] += 31
+    usage_collection.find_one.return_value = {"measured_bytes": 2000}
+    assert await quota.is_exceeded(USER_ID)
+    assert usage_collection.find_one.await_count == 2
+
+
+def test_measurement_sums_db_stats_and_files_and_absorbs_delta(settings):
+    settings.MONGODB_DATABASE = "meta"
+    settings.MONGODB_COLLECTION = "databases"
+    dbs = {
+        "proj_a": MagicMock(command=MagicMock(return_value={"dataSize": 300})),
+        "proj_b": MagicMock(command=MagicMock(return_value={"dataSize": 200})),
+    }
+    ops, meta = MagicMock(), MagicMock()
+    ops["storage_usage"].find_one.return_value = {"delta_bytes": 70}
+    meta["databases"].find.return_value = [{"dbName": "proj_a"}, {"dbName": "proj_b"}]
+    meta["file_metadata"].aggregate.return_value = iter([{"_id": None, "total": 1000}])
+    client = MagicMock()
+    client.__getitem__.side_effect = lambda name: {"platform_ops": ops, "meta": meta, **dbs}[name]
+
+    usage = measure_user_storage(USER_ID, client)
+
+    assert (usage["db_bytes"], usage["file_bytes"], usage["measured_bytes"]) == (500, 1000, 1500)
+    (filter_, update), kwargs = ops["storage_usage"].update_one.call_args
+    assert filter_ == {"_id": USER_ID} and kwargs == {"upsert": True}
+    assert update["$inc"] == {"delta_bytes": -70}
+    assert ops["storage_snapshots"].insert_one.call_args[0][0]["total_size"] == 1500
+
+
+async def test_quota_block_is_recorded(mocker):
+    mocker.patch(
+        "api.application.storage_accounting.storage_quota.is_exceeded", new=AsyncMock(return_value=True)
+    )
+    mocker.patch(
+        "api.application.storage_accounting.storage_quota.usage_bytes", new=AsyncMock(return_value=10**9)
+    )
+    with mock.patch("api.application.metadata_service.settings") as settings_:
+        activity = settings_.MONGODB_CLIENT.__getitem__.return_value.__getitem__.return_value
+        activity.insert_one = AsyncMock()
+        from api.application.metadata_service import MetadataService
+
+        assert await MetadataService(str(USER_ID)).check_quota_is_exceeded() is True
+    assert activity.insert_one.await_args[0][0]["metadata"] == {"user_id": USER_ID, "type": "quota_block"}
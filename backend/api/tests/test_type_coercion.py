@@ -0,0 +1,131 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+
+from api.domain.type_coercion import (
+    build_field_coercers,
+    coerce_document,
+    coerce_filter,
+    coerce_update,
+)
+from api.domain.metadata_models import infer_field_type
+
+FIELDS = [
+    {"name": "created_at", "type": "datetime"},
+    {"name": "age", "type": "integer"},
+    {"name": "score", "type": "number"},
+    {"name": "price", "type": "decimal128"},
+    {"name": "seen", "type": "array<date>"},
+    {"name": "name", "type": "string"},
+    {"name": "mixed", "type": "datetime, string"},
+]
+
+
+def test_build_field_coercers_skips_strings_and_mixed_types():
+    assert set(build_field_coercers(FIELDS)) == {"created_at", "age", "score", "price", "seen"}
+
+
+def test_coerce_document_stores_bson_types():
+    doc = {
+        "created_at": "2024-05-01T12:30:00Z",
+        "age": "42",
+        "score": "9.5",
+        "price": "19.99",
+        "seen": ["2024-05-01", "2024-05-02"],
+        "name": "2024-05-01",
+        "mixed": "2024-05-01",
+    }
+
+    coerce_document(doc, build_field_coercers(FIELDS))
+
+    assert doc["created_at"] == datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    assert doc["age"] == 42
+    assert doc["score"] == 9.5
+    assert doc["price"] == Decimal128(Decimal("19.99"))
+    assert doc["seen"][1] == datetime(2024, 5, 2, tzinfo=timezone.utc)
+    assert doc["name"] == "2024-05-01"
+    assert doc["mixed"] == "2024-05-01"
+
+
+def test_unparseable_values_are_left_alone():
+    doc = {"created_at": "yesterday", "age": "4.2", "score": "nan"}
+
+    coerce_document(doc, build_field_coercers(FIELDS))
+
+    assert doc == {"created_at": "yesterday", "age": "4.2", "score": "nan"}
+
+
+def test_coerce_filter_turns_range_operands_into_dates():
+    filt = {
+        "$or": [
+            {"created_at": {"$gte": "2024-01-01", "$lt": "2024-02-01T00:00:00+02:00"}},
+            {"age": {"$in": ["1", "2"]}},
+        ],
+        "name": {"$gte": "2024"},
+    }
+
+    out = coerce_filter(filt, build_field_coercers(FIELDS))
+
+    created = out["$or"][0]["created_at"]
+    assert created["$gte"] == datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert created["$lt"] == datetime(2024, 1, 31, 22, 0, tzinfo=timezone.utc)
+    assert out["$or"][1]["age"] == {"$in": [1, 2]}
+    assert out["name"] == {"$gte": "2024"}
+    assert filt["$or"][0]["created_at"]["$gte"] == "2024-01-01"  # input not mutated
+
+
+def test_coerce_update_handles_plain_and_operator_updates():
+    coercers = build_field_coercers(FIELDS)
+
+    assert coerce_update({"age": "7"}, coercers) == {"age": 7}
+    out = coerce_update({"$set": {"score": "1.5"}, "$inc": {"age": 1}}, coercers)
+    assert out == {"$set": {"score": 1.5}, "$inc": {"age": 1}}
+
+
+def test_merged_equivalent_types_keep_their_coercer():
+    fields = [
+        {"name": "a", "type": "date, datetime"},
+        {"name": "b", "type": "integer, number"},
+        {"name": "c", "type": "timestamp"},
+        {"name": "d", "type": "array<date>, array<datetime>"},
+    ]
+    coercers = build_field_coercers(fields)
+
+    assert set(coercers) == {"a", "b", "d"}
+    assert coercers["b"]("2.5") == 2.5
+    assert infer_field_type(Decimal128("1.5")) == "decimal128"
+
+
+async def test_second_insert_is_still_coerced(metadata_service, mock_metadata_collection):
+    fields = [
+        {"name": "on", "type": "date"},
+        {"name": "at", "type": "datetime"},
+        {"name": "count", "type": "integer"},
+        {"name": "score", "type": "number"},
+        {"name": "ratio", "type": "double"},
+        {"name": "price", "type": "decimal128"},
+        {"name": "seen", "type": "array<date>"},
+    ]
+    db_id = str(ObjectId())
+    meta = {"_id": ObjectId(db_id), "collections": [{"name": "events", "fields": fields}]}
+    mock_metadata_collection.find_one.return_value = meta
+
+    async def update_one(query, update, **kwargs):
+        if "collections.$.fields" in update.get("$set", {}):
+            meta["collections"][0]["fields"] = update["$set"]["collections.$.fields"]
+
+    mock_metadata_collection.update_one.side_effect = update_one
+
+    for _ in range(2):
+        doc = {"on": "2024-05-01", "at": "2024-05-01T10:00:00Z", "count": "3", "score": "7",
+               "ratio": "0.5", "price": "9.99", "seen": ["2024-05-02"]}
+        coerce_document(doc, build_field_coercers(meta["collections"][0]["fields"]))
+        await metadata_service.update_collection_schema_inference(db_id, "events", [doc])
+
+    assert doc["on"] == datetime(2024, 5, 1, tzinfo=timezone.utc)
+    assert doc["count"] == 3 and doc["score"] == 7 and doc["ratio"] == 0.5
+    assert doc["price"] == Decimal128(Decimal("9.99"))
+    assert doc["seen"] == [datetime(2024, 5, 2, tzinfo=timezone.utc)]
+    assert meta["collections"][0]["fields"] == fields
@@ -0,0 +1,157 @@
+import os
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from bson import ObjectId
+from django.http import HttpResponse
+from django.test import RequestFactory
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from api.infrastructure.usage_meter import (
+    COUNTER_KEY,
+    DIRTY_KEY,
+    PLAN_KEY,
+    MeterDecision,
+    UsageMeter,
+    flush_usage_counters,
+    seed_from_user,
+)
+from api.middleware import UsageMeteringMiddleware
+
+USER_ID = str(ObjectId())
+
+
+def _view(request):
+    return HttpResponse(b"ok", content_type="text/plain")
+
+
+def _post():
+    request = RequestFactory().post("/api/v2/crud/", HTTP_HOST="localhost")
+    request.user = SimpleNamespace(id=USER_ID, pk=USER_ID, is_authenticated=True)
+    return request
+
+
+def _user_doc(calls=0, plan="free", last_reset="2026-10-01T00:00:00+00:00"):
+    return {
+        "_id": ObjectId(USER_ID),
+        "subscription_plan": plan,
+        "usage": {"api_calls_current_month": calls, "last_reset_date": last_reset},
+    }
+
+
+@pytest.fixture
+def meter():
+    with mock.patch("api.middleware.usage_meter") as meter:
+        meter.enabled = True
+        yield meter
+
+
+def test_allowed_call_costs_no_mongo_round_trip(meter):
+    meter.hit.return_value = MeterDecision(allowed=True, calls=5, plan="free")
+    with mock.patch("api.middleware.user_manager") as users:
+        response = UsageMeteringMiddleware(_view)(_post())
+    assert response.content == b"ok"
+    meter.hit.assert_called_once()
+    assert not users.method_calls
+
+
+def test_unseeded_counter_is_seeded_from_user_document(meter):
+    meter.hit.side_effect = [
+        MeterDecision(allowed=False, calls=0, plan="", needs_seed=True),
+        MeterDecision(allowed=True, calls=8, plan="pro"),
+    ]
+    with mock.patch("api.middleware.user_manager") as users:
+        users.get_user_by_id.return_value = _user_doc(calls=7, plan="pro")
+        response = UsageMeteringMiddleware(_view)(_post())
+    assert response.status_code == 200
+    seed = meter.hit.call_args_list[1][0][2]
+    assert (seed.plan, seed.limit, seed.month, seed.calls) == ("pro", 50000, "2026-10", 7)
+
+
+def test_limit_reached_returns_429(meter):
+    meter.hit.return_value = MeterDecision(allowed=False, calls=1000, plan="free")
+    response = UsageMeteringMiddleware(_view)(_post())
+    assert response.status_code == 429
+    assert b"1000 for the free plan" in response.content
+
+
+def test_redis_outage_falls_back_to_mongo(meter):
+    meter.hit.side_effect = RedisConnectionError("down")
+    now_month = datetime.now(timezone.utc).isoformat()
+    with mock.patch("api.middleware.user_manager") as users:
+        users.get_user_by_id.return_value = _user_doc(calls=1, last_reset=now_month)
+        response = UsageMeteringMiddleware(_view)(_post())
+    assert response.status_code == 200
+    users.users_collection.update_one.assert_called_once_with(
+        {"_id": ObjectId(USER_ID)}, {"$inc": {"usage.api_calls_current_month": 1}}
+    )
+
+
+def test_seed_defaults_for_documents_without_usage():
+    now = datetime(2026, 10, 19, tzinfo=timezone.utc)
+    seed = seed_from_user({"_id": ObjectId()}, UsageMeteringMiddleware(_view).plan_limits, now)
+    assert (seed.plan, seed.limit, seed.month, seed.calls) == ("free", 1000, "2026-10", 0)
+
+
+def test_flush_writes_dirty_counters_in_one_bulk_write():
+    other = str(ObjectId())
+    client = mock.MagicMock()
+    client.spop.side_effect = [[USER_ID.encode(), other.encode()], []]
+    client.pipeline.return_value.execute.return_value = [[b"2026-10", b"12"], [None, None]]
+    users = mock.MagicMock()
+
+    with mock.patch.object(UsageMeter, "sync_client", return_value=client):
+        flushed = flush_usage_counters(users, UsageMeter(url="redis://meter"), batch_size=2)
+
+    assert flushed == 1
+    client.spop.assert_any_call(DIRTY_KEY, 2)
+    (ops,), kwargs = users.bulk_write.call_args
+    assert kwargs == {"ordered": False}
+    assert ops[0]._filter == {"_id": ObjectId(USER_ID)}
+
+
+def test_failed_flush_requeues_users():
+    client = mock.MagicMock()
+    client.spop.side_effect = [[USER_ID.encode()], []]
+    client.pipeline.return_value.execute.return_value = [[b"2026-10", b"3"]]
+    users = mock.MagicMock()
+    users.bulk_write.side_effect = RuntimeError("primary stepped down")
+
+    with mock.patch.object(UsageMeter, "sync_client", return_value=client), pytest.raises(RuntimeError):
+        flush_usage_counters(users, UsageMeter(url="redis://meter"))
+    client.sadd.assert_called_once_with(DIRTY_KEY, USER_ID)
+
+
+REDIS_TEST_URL = os.getenv("USAGE_METER_TEST_REDIS_URL")
+
+
+@pytest.mark.skipif(not REDIS_TEST_URL, reason="USAGE_METER_TEST_REDIS_URL not set")
+def test_script_never_overshoots_and_rolls_over_monthly():
+    meter = UsageMeter(url=REDIS_TEST_URL)
+    client = meter.sync_client()
+    user_id = str(ObjectId())
+    client.delete(COUNTER_KEY.format(user_id=user_id), PLAN_KEY.format(user_id=user_id))
+    october = datetime(2026, 10, 19, tzinfo=timezone.utc)
+    seed = seed_from_user(_user_doc(calls=90), {"free": {"api_calls": 100}}, october)
+    assert meter.hit(user_id, october).needs_seed
+
+    meter.hit(user_id, october, seed)
+    allowed = []
+
+    def worker():
+        for _ in range(10):
+            allowed.append(meter.hit(user_id, october).allowed)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert allowed.count(True) == 9  # 91 after seeding, capped at 100
+    assert client.sismember(DIRTY_KEY, user_id)
+
+    november = meter.hit(user_id, datetime(2026, 11, 1, tzinfo=timezone.utc))
+    assert november.allowed and november.calls == 1
@@ -0,0 +1,114 @@
+import io
+from datetime import datetime
+from types import SimpleNamespace
+
+import bson
+import msgpack
+import pytest
+from bson import ObjectId
+from unittest.mock import AsyncMock
+
+from api.presentation.wire_formats import (
+    MSGPACK_OBJECTID_EXT,
+    BSONParser,
+    BSONRenderer,
+    MessagePackParser,
+    MessagePackRenderer,
+)
+
+
+def test_bson_renderer_and_parser_round_trip_native_types():
+    doc = {"_id": ObjectId(), "created_at": datetime(2024, 5, 1, 12, 30), "tags": ["a"]}
+
+    rendered = BSONRenderer().render({"success": True, "data": [doc]})
+    parsed = BSONParser().parse(io.BytesIO(rendered))
+
+    assert parsed["data"][0] == doc
+    assert isinstance(parsed["data"][0]["_id"], ObjectId)
+
+
+@pytest.mark.django_db
+def test_crud_post_bson_body_keeps_object_ids(authenticated_api_client, mocker):
+    owner_id = ObjectId()
+    mocker.patch(
+        "api.application.metadata_service.MetadataService.check_quota_is_exceeded",
+        new=AsyncMock(return_value=False),
+    )
+    inserted = ObjectId()
+    create_docs = mocker.patch(
+        "api.application.document_service.DocumentService.create_docs",
+        new=AsyncMock(return_value=SimpleNamespace(inserted_ids=[inserted])),
+    )
+    body = bson.encode({
+        "database_id": ObjectId(),
+        "collection_name": "users",
+        "documents": [{"owner_id": owner_id, "joined": datetime(2024, 1, 2)}],
+    })
+
+    response = authenticated_api_client.post(
+        "/api/v2/crud/", data=body, content_type="application/bson",
+        HTTP_ACCEPT="application/bson",
+    )
+
+    assert response.status_code == 201
+    assert response["Content-Type"] == "application/bson"
+    assert bson.decode(response.content)["inserted_ids"] == [inserted]
+    doc = create_docs.await_args.kwargs["docs"][0]
+    assert doc["owner_id"] == owner_id
+    assert doc["joined"] == datetime(2024, 1, 2)
+
+
+@pytest.mark.django_db
+def test_crud_get_bson_skips_string_conversion(authenticated_api_client, mocker):
+    doc = {"_id": ObjectId(), "created_at": datetime(2024, 5, 1)}
+    mocker.patch(
+        "api.application.document_service.DocumentService.list_docs",
+        new=AsyncMock(return_value=(1, [dict(doc)])),
+    )
+
+    response = authenticated_api_client.get(
+        "/api/v2/crud/",
+        {"database_id": str(ObjectId()), "collection_name": "users"},
+        HTTP_ACCEPT="application/bson",
+    )
+
+    assert response.status_code == 200
+    assert bson.decode(response.content)["data"] == [doc]
+
+
+def test_msgpack_round_trip_native_types():
+    oid = ObjectId()
+    rendered = MessagePackRenderer().render({"data": [{"_id": oid, "at": datetime(2024, 5, 1)}]})
+    parsed = MessagePackParser().parse(io.BytesIO(rendered))
+
+    assert parsed["data"][0]["_id"] == oid
+    assert parsed["data"][0]["at"].replace(tzinfo=None) == datetime(2024, 5, 1)
+
+
+@pytest.mark.django_db
+def test_crud_post_msgpack_body_and_response(authenticated_api_client, mocker):
+    owner_id = ObjectId()
+    mocker.patch(
+        "api.application.metadata_service.MetadataService.check_quota_is_exceeded",
+        new=AsyncMock(return_value=False),
+    )
+    inserted = ObjectId()
+    create_docs = mocker.patch(
+        "api.application.document_service.DocumentService.create_docs",
+        new=AsyncMock(return_value=SimpleNamespace(inserted_ids=[inserted])),
+    )
+    body = msgpack.packb({
+        "database_id": str(ObjectId()),
+        "collection_name": "users",
+        "documents": [{"owner_id": msgpack.ExtType(MSGPACK_OBJECTID_EXT, owner_id.binary)}],
+    })
+
+    response = authenticated_api_client.post(
+        "/api/v2/crud/", data=body, content_type="application/msgpack",
+        HTTP_ACCEPT="application/msgpack",
+    )
+
+    assert response.status_code == 201
+    assert response["Content-Type"] == "application/msgpack"
+    assert MessagePackParser().parse(io.BytesIO(response.content))["inserted_ids"] == [inserted]
+    assert create_docs.await_args.kwargs["docs"][0]["owner_id"] == owner_id
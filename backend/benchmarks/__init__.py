@@ -0,0 +1 @@
+"""Standalone micro-benchmarks (not collected by pytest); run with ``python -m benchmarks.<name>``."""
@@ -0,0 +1,228 @@
+"""
+Compare CRUD request throughput and p99 latency under the WSGI and ASGI handlers.
+
+Both runs drive the real middleware stack and DataCrudView in-process:
+WSGI requests run on a thread pool (like gthread workers) and ASGI requests are
+interleaved on one event loop (like a uvicorn worker). Authentication and the
+telemetry buffer are stubbed.
+
+With ``--real-mongo`` the read goes through the real document service and the
+MongoDB at MONGODB_URI: a throwaway database of 50 documents is seeded for a
+fresh user and dropped afterwards. This includes the driver, the connection
+pools and the per-loop async clients, so use it for deployment decisions.
+Without it the document service is stubbed and awaits ``--db-latency-ms``,
+which only compares handler overhead.
+
+    cd backend && python -m benchmarks.asgi_wsgi_bench --real-mongo [--requests 2000] [--concurrency 32]
+
+Without ``--real-mongo`` the MONGODB_* variables are needed for settings import
+only; no server is contacted.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings.development")
+
+import django  # noqa: E402
+
+django.setup()
+
+from bson import ObjectId  # noqa: E402
+from django.core.asgi import get_asgi_application  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+
+from project.event_loop import bind_process_loop  # noqa: E402
+
+PATH = "/api/v2/crud/"
+COLLECTION = "users"
+QUERY = f"database_id={ObjectId()}&collection_name={COLLECTION}&page_size=50"
+
+
+def _documents(n=50):
+    return [{"_id": ObjectId(), "name": f"user-{i}", "score": i * 1.5} for i in range(n)]
+
+
+def _stubs(user_id: str, db_latency_s: float | None):
+    user = SimpleNamespace(pk=user_id, id=user_id, is_authenticated=True, role="developer")
+    docs = _documents()
+
+    async def list_docs(self, *args, **kwargs):
+        await asyncio.sleep(db_latency_s)
+        return len(docs), [dict(d) for d in docs]
+
+    patches = [
+        mock.patch(
+            "core.infrastructure.authentication.CustomJWTAuthentication.authenticate",
+            return_value=(user, None),
+        ),
+        mock.patch("analytics.telemetry.telemetry_buffer.add", return_value=True),
+    ]
+    if db_latency_s is not None:
+        patches.append(mock.patch("api.application.document_service.DocumentService.list_docs", new=list_docs))
+    return patches
+
+
+def _seed(user_id: str) -> tuple[str, str]:
+    """Create a metadata entry and a 50-document collection; returns ``(db_id, internal name)``."""
+    from django.conf import settings
+
+    from api.domain.metadata_models import new_database_metadata
+    from api.infrastructure.naming import generate_db_name
+
+    client = settings.SYNC_MONGODB_CLIENT
+    internal_db_name = generate_db_name("asgi_wsgi_bench", user_id)
+    client[internal_db_name][COLLECTION].insert_many(_documents())
+    meta = new_database_metadata(
+        user_id=ObjectId(user_id),
+        display_name="asgi_wsgi_bench",
+        internal_db_name=internal_db_name,
+        collections=[{"name": COLLECTION, "fields": [{"name": "name", "type": "string"},
+                                                     {"name": "score", "type": "number"}]}],
+    )
+    result = client[settings.MONGODB_DATABASE][settings.MONGODB_COLLECTION].insert_one(meta)
+    return str(result.inserted_id), internal_db_name
+
+
+def _drop_seed(db_id: str, internal_db_name: str) -> None:
+    from django.conf import settings
+
+    client = settings.SYNC_MONGODB_CLIENT
+    client.drop_database(internal_db_name)
+    client[settings.MONGODB_DATABASE][settings.MONGODB_COLLECTION].delete_one({"_id": ObjectId(db_id)})
+
+
+def _summary(latencies: list[float], elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return {
+        "rps": len(ordered) / elapsed,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p99_ms": p99 * 1000,
+    }
+
+
+def run_wsgi(total: int, concurrency: int) -> dict:
+    # As in project.wsgi: async views share the process event loop.
+    app = bind_process_loop(get_wsgi_application())
+
+    def one(_):
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": PATH,
+            "QUERY_STRING": QUERY,
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "HTTP_HOST": "localhost",
+            "HTTP_ACCEPT": "application/json",
+            "wsgi.input": io.BytesIO(b""),
+            "wsgi.url_scheme": "http",
+            "wsgi.errors": io.StringIO(),
+        }
+        status = []
+        start = time.perf_counter()
+        body = b"".join(app(environ, lambda s, h, exc_info=None: status.append(s)))
+        assert status[0].startswith("200"), (status, body[:200])
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(min(concurrency, total))))  # warm-up
+        start = time.perf_counter()
+        latencies = list(pool.map(one, range(total)))
+        elapsed = time.perf_counter() - start
+    return _summary(latencies, elapsed)
+
+
+def run_asgi(total: int, concurrency: int) -> dict:
+    app = get_asgi_application()
+
+    async def one():
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": PATH,
+            "raw_path": PATH.encode(),
+            "query_string": QUERY.encode(),
+            "headers": [(b"host", b"localhost"), (b"accept", b"application/json")],
+            "server": ("localhost", 80),
+            "client": ("127.0.0.1", 50000),
+        }
+        sent_request = False
+        never = asyncio.Event()
+
+        async def receive():
+            nonlocal sent_request
+            if not sent_request:
+                sent_request = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await never.wait()  # client stays connected
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        start = time.perf_counter()
+        await app(scope, receive, send)
+        assert messages[0]["status"] == 200, messages[:2]
+        return time.perf_counter() - start
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded():
+            async with semaphore:
+                return await one()
+
+        await asyncio.gather(*(bounded() for _ in range(min(concurrency, total))))  # warm-up
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(bounded() for _ in range(total)))
+        return _summary(list(latencies), time.perf_counter() - start)
+
+    return asyncio.run(main())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    parser.add_argument("--real-mongo", action="store_true", help="read from the MongoDB at MONGODB_URI")
+    args = parser.parse_args()
+
+    global QUERY
+    user_id = str(ObjectId())
+    seed = _seed(user_id) if args.real_mongo else None
+    if seed is not None:
+        QUERY = f"database_id={seed[0]}&collection_name={COLLECTION}&page_size=50"
+    patches = _stubs(user_id, None if args.real_mongo else args.db_latency_ms / 1000)
+    for patch in patches:
+        patch.start()
+    try:
+        backend = "real MongoDB" if args.real_mongo else f"stubbed db latency {args.db_latency_ms} ms"
+        print(f"GET {PATH} x{args.requests}, concurrency {args.concurrency}, {backend}")
+        print(f"{'handler':<8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+        for name, runner in (("wsgi", run_wsgi), ("asgi", run_asgi)):
+            result = runner(args.requests, args.concurrency)
+            print(f"{name:<8} {result['rps']:>10.0f} {result['p50_ms']:>10.2f} {result['p99_ms']:>10.2f}")
+    finally:
+        for patch in patches:
+            patch.stop()
+        if seed is not None:
+            _drop_seed(*seed)
+
+
+if __name__ == "__main__":
+    main()
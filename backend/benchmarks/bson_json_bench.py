@@ -0,0 +1,99 @@
+"""
+Compare the CRUD read rendering paths at page sizes 50, 500 and 1000.
+
+current: decode_all → pop is_deleted → jsonify_object_ids → DRF JSONRenderer
+fast:    raw batch → render_envelope (C decode + C encode, BSON types in default)
+
+    cd backend && python -m benchmarks.bson_json_bench [--repeat 20]
+
+No MongoDB or Django settings module is needed; batches are built in memory.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import timeit
+from datetime import datetime, timedelta
+
+import bson
+from bson import ObjectId
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from api.infrastructure.bson_json import RAW_CODEC_OPTIONS, render_envelope  # noqa: E402
+from api.infrastructure.mongodb import jsonify_object_ids  # noqa: E402
+
+PAGE_SIZES = (50, 500, 1000)
+
+
+def _document(i: int) -> dict:
+    """Typical tenant row: one ObjectId, one timestamp, mostly plain fields."""
+    base = datetime(2025, 1, 1)
+    return {
+        "_id": ObjectId(),
+        "is_deleted": False,
+        "name": f"customer-{i}",
+        "email": f"user{i}@example.com",
+        "status": random.choice(["active", "pending", "archived"]),
+        "plan": "pro",
+        "score": random.random() * 100,
+        "visits": random.randint(0, 10_000),
+        "verified": True,
+        "country": "SE",
+        "locale": "sv-SE",
+        "referrer": None,
+        "created_at": base + timedelta(minutes=i),
+        "address": {"street": "Drottninggatan 1", "city": "Stockholm", "zip": f"{10000 + i}", "geo": [18.06, 59.33]},
+        "tags": ["alpha", "beta", "gamma"],
+        "orders": [{"sku": f"SKU-{k}", "qty": k + 1, "total": 12.5 * k} for k in range(3)],
+        "preferences": {"newsletter": True, "theme": "dark", "notifications": {"email": True, "sms": False}},
+    }
+
+
+def _current_path(batch: bytes, pagination: dict) -> bytes:
+    docs = bson.decode_all(batch, RAW_CODEC_OPTIONS)
+    for doc in docs:
+        doc.pop("is_deleted", None)
+    return JSONRenderer().render(
+        {"success": True, "data": jsonify_object_ids(docs), "pagination": pagination}
+    )
+
+
+def _fast_path(batch: bytes, pagination: dict) -> bytes:
+    body, _ = render_envelope([batch], {"success": True, "data": None, "pagination": pagination})
+    return body
+
+
+def _time(fn, *args, repeat: int) -> float:
+    """Median wall time in ms (timeit disables GC while measuring)."""
+    samples = timeit.repeat(lambda: fn(*args), number=1, repeat=repeat)
+    return statistics.median(samples) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'page_size':>9} {'current_ms':>11} {'fast_ms':>8} {'speedup':>8} {'body_kb':>8}")
+    for size in PAGE_SIZES:
+        docs = [_document(i) for i in range(size)]
+        # The fast path projects is_deleted out server-side.
+        raw_current = b"".join(bson.encode(d) for d in docs)
+        raw_fast = b"".join(bson.encode({k: v for k, v in d.items() if k != "is_deleted"}) for d in docs)
+        pagination = {"page": 1, "page_size": size, "total_items": size, "total_pages": 1}
+
+        current = _time(_current_path, raw_current, pagination, repeat=args.repeat)
+        fast = _time(_fast_path, raw_fast, pagination, repeat=args.repeat)
+        body_kb = len(_fast_path(raw_fast, pagination)) / 1024
+        print(f"{size:>9} {current:>11.2f} {fast:>8.2f} {current / fast:>7.1f}x {body_kb:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Compare raw telemetry in a regular collection against a time-series collection.
+
+regular:    request_events as before, with the (user_id, timestamp), timestamp,
+            request_id, status_code and db_operations.db_id indexes plus the TTL index
+timeseries: the same events in a time-series collection (timeField timestamp,
+            metaField user_id, expireAfterSeconds) with the same secondary indexes
+
+For each layout the benchmark reports insert throughput (insert_many batches
+the size of a telemetry flush), storage (data plus indexes) and the median
+latency of the ``aggregate_http_summary`` query (one ``$facet`` scan, see
+``analytics.services.query``) for one user over 30 days.
+
+    cd backend && python -m benchmarks.telemetry_timeseries_bench [--events 200000] [--users 200]
+
+Needs a MongoDB server (5.0+); BENCH_MONGODB_URI defaults to
+mongodb://localhost:27017. The scratch database is dropped afterwards.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings.development")
+
+import django  # noqa: E402
+
+django.setup()
+
+from pymongo import ASCENDING, DESCENDING, MongoClient  # noqa: E402
+
+from analytics.services.query import HTTP_DAILY, HTTP_TOTALS, facet_pipeline  # noqa: E402
+
+BENCH_DB = "datacube_bench_telemetry"
+RETENTION_SECONDS = 30 * 86400
+INDEXES = (
+    [("user_id", ASCENDING), ("timestamp", DESCENDING)],
+    [("timestamp", DESCENDING)],
+    [("request_id", ASCENDING)],
+    [("status_code", ASCENDING)],
+    [("db_operations.db_id", ASCENDING)],
+)
+PATHS = ("/api/v2/crud/", "/api/v2/databases/", "/api/v2/files/", "/api/v2/import/")
+
+
+def _events(count: int, users: int, days: int = 30):
+    now = datetime.now(timezone.utc)
+    span = days * 86400
+    user_ids = [uuid.uuid4().hex[:24] for _ in range(users)]
+    for _ in range(count):
+        status = random.choices((200, 201, 400, 404, 500), weights=(80, 10, 5, 4, 1))[0]
+        duration = random.lognormvariate(3, 0.8)
+        db_ms = duration * random.random()
+        yield {
+            "request_id": uuid.uuid4().hex,
+            "user_id": random.choice(user_ids),
+            "timestamp": now - timedelta(seconds=random.random() * span),
+            "method": random.choice(("GET", "GET", "GET", "POST", "PUT", "DELETE")),
+            "path": random.choice(PATHS),
+            "status_code": status,
+            "success": status < 300,
+            "duration_ms": round(duration, 2),
+            "timing": {"db_ms": round(db_ms, 2), "db_pool_wait_ms": 0.1, "app_ms": round(duration - db_ms, 2),
+                       "db_commands": random.randint(1, 4), "db_failed_commands": 0},
+            "sizes": {"request_bytes": random.randint(0, 4000), "response_bytes": random.randint(200, 60_000),
+                      "throughput_bytes_per_sec": 0.0, "warning": None},
+            "client": {"ip": "10.0.0.1", "user_agent": "python-requests/2.32", "content_type": "application/json"},
+            "error": {"type": "client_error", "message": None} if 400 <= status < 500 else None,
+            "db_operations": [{"db_id": uuid.uuid4().hex[:24], "collection": "orders",
+                               "operation_type": "document_query", "document_count": 50,
+                               "query_complexity": "simple"}],
+        }
+
+
+def _create(db, name: str, timeseries: bool) -> None:
+    if timeseries:
+        db.create_collection(
+            name,
+            timeseries={"timeField": "timestamp", "metaField": "user_id", "granularity": "seconds"},
+            expireAfterSeconds=RETENTION_SECONDS,
+        )
+    else:
+        db.create_collection(name)
+        db[name].create_index([("timestamp", ASCENDING)], expireAfterSeconds=RETENTION_SECONDS)
+    for keys in INDEXES:
+        db[name].create_index(keys)
+
+
+def _insert(db, name: str, events: list, batch_size: int) -> float:
+    started = time.perf_counter()
+    for i in range(0, len(events), batch_size):
+        db[name].insert_many([dict(event) for event in events[i:i + batch_size]], ordered=False)
+    return len(events) / (time.perf_counter() - started)
+
+
+def _storage_mb(db, name: str) -> tuple[float, float]:
+    stats = db.command("collStats", name)
+    return stats.get("storageSize", 0) / 2**20, stats.get("totalIndexSize", 0) / 2**20
+
+
+def _summary_ms(db, name: str, user_ids: list, repeat: int) -> float:
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=30)
+    samples = []
+    for i in range(repeat):
+        pipeline = facet_pipeline(user_ids[i % len(user_ids)], start, end, (HTTP_TOTALS, HTTP_DAILY))
+        began = time.perf_counter()
+        list(db[name].aggregate(pipeline))
+        samples.append(time.perf_counter() - began)
+    return statistics.median(samples) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv("BENCH_MONGODB_URI", "mongodb://localhost:27017"))
+    client.drop_database(BENCH_DB)
+    db = client[BENCH_DB]
+    events = list(_events(args.events, args.users))
+    user_ids = sorted({event["user_id"] for event in events})
+    try:
+        print(f"{'layout':>10} {'inserts/s':>10} {'data_mb':>8} {'index_mb':>9} {'summary_ms':>11}")
+        for layout, timeseries in (("regular", False), ("timeseries", True)):
+            _create(db, layout, timeseries)
+            rate = _insert(db, layout, events, args.batch_size)
+            data_mb, index_mb = _storage_mb(db, layout)
+            summary = _summary_ms(db, layout, user_ids, args.repeat)
+            print(f"{layout:>10} {rate:>10.0f} {data_mb:>8.1f} {index_mb:>9.1f} {summary:>11.2f}")
+    finally:
+        client.drop_database(BENCH_DB)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,10 @@
 
 Design notes
 ------------
-* Session start runs inside an async adrf view, so seeding uses the existing
-  async services (``DatabaseService`` / ``DocumentService``) with ``await`` —
-  the same event loop as every other API view. No ``asyncio.run`` /
-  ``async_to_sync`` (those spawn a second loop and break the global
-  ``AsyncMongoClient``).
+* Session start runs in a sync DRF view, and seeding writes through the sync
+  PyMongo client (``SYNC_MONGODB_CLIENT``).
+* Limit enforcement is async and runs inside the async API services, on the
+  per-loop client from ``MongoConnectionManager.async_client()``.
 * Cleanup runs in a Celery worker and is fully synchronous (sync PyMongo
   client + sync ``user_manager``), so it never depends on an event loop.
 """
@@ -151,15 +150,10 @@ def start_or_resume_playground(
     return user_doc, False
 
 
-# --- Seeding (sync — must not touch AsyncMongoClient) -----------------------
+# --- Seeding (sync PyMongo) -------------------------------------------------
 
 def seed_playground_database_sync(user_id: str) -> None:
-    """Provision demo_store using SYNC_MONGODB_CLIENT only.
-
-    Playground start runs in an async adrf view, but seeding must stay on the
-    sync PyMongo client. Calling async Mongo from per-request event loops binds
-    the global AsyncMongoClient to the wrong loop and breaks analytics/dashboard.
-    """
+    """Provision demo_store using SYNC_MONGODB_CLIENT only (called from the sync start view)."""
     from api.domain.metadata_models import new_database_metadata
     from api.infrastructure.naming import generate_db_name
 
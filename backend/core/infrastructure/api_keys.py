@@ -0,0 +1,40 @@
+"""
+API-key hashing (HMAC with API_KEY_PEPPER) and lookup-prefix helpers.
+
+Keys are never stored: a document keeps ``key_prefix`` (the public scheme tag
+plus the first ``API_KEY_PREFIX_CHARS`` random characters, indexed) and
+``key_hash`` (HMAC-SHA256 of the full key). Authentication is one indexed read
+by prefix followed by a constant-time comparison against each candidate's hash.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+
+from django.conf import settings
+
+API_KEY_SCHEME = "sk_test_"
+
+
+def _pepper() -> bytes:
+    pepper = getattr(settings, "API_KEY_PEPPER", "") or ""
+    return str(pepper).encode("utf-8")
+
+
+def hash_api_key(key: str) -> str:
+    return hmac.new(_pepper(), key.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def lookup_prefix(key: str) -> str:
+    """Indexed lookup prefix; unknown schemes fall back to the leading characters."""
+    chars = int(getattr(settings, "API_KEY_PREFIX_CHARS", 12))
+    if key.startswith(API_KEY_SCHEME):
+        return key[: len(API_KEY_SCHEME) + chars]
+    return key[:chars]
+
+
+def verify_api_key(key: str, key_hash: str | None) -> bool:
+    if not key_hash:
+        return False
+    return hmac.compare_digest(hash_api_key(key), key_hash)
@@ -1,15 +1,22 @@
+import logging
 import secrets
 from datetime import datetime
 from bson import ObjectId
+from django.conf import settings
+from pymongo.errors import PyMongoError
 from rest_framework.authentication import BaseAuthentication, get_authorization_header
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework import exceptions
+from core.infrastructure.api_keys import API_KEY_SCHEME, hash_api_key, lookup_prefix, verify_api_key
 from core.infrastructure.managers import user_manager
 from core.infrastructure.db import mongo_conn
 from core.infrastructure.roles import normalize_role
 from core.infrastructure.playground import is_playground_user, playground_is_live
+from core.infrastructure.principal_cache import principal_cache
 from core.infrastructure.user_access import effective_email_verified
 
+logger = logging.getLogger(__name__)
+
 
 class MongoUser:
     """A proxy class for the user data retrieved from MongoDB."""
@@ -33,14 +40,14 @@ class MongoUser:
 class CustomJWTAuthentication(JWTAuthentication):
     """
     Custom JWT authentication backend.
-    It overrides the `get_user` method to fetch user from MongoDB.
-    Only verified, non-deleted users may authenticate.
+    It overrides the `get_user` method to fetch user from MongoDB (through the
+    principal cache). Only verified, non-deleted users may authenticate.
     """
 
     def get_user(self, validated_token):
         try:
             user_id = validated_token["user_id"]
-            user_doc = user_manager.get_user_by_id(user_id)
+            user_doc = principal_cache.get_user(user_id, lambda: user_manager.get_user_by_id(user_id))
             if not user_doc:
                 raise exceptions.AuthenticationFailed("User not found for the given token.")
             if is_playground_user(user_doc) and not playground_is_live(user_doc):
@@ -84,13 +91,13 @@ class APIKeyAuthentication(BaseAuthentication):
         return self.authenticate_credentials(key)
 
     def authenticate_credentials(self, key):
-        api_keys_collection = mongo_conn.get_collection("api_keys")
-        api_key_doc = api_keys_collection.find_one({"key": key, "is_active": True})
-
-        if not api_key_doc:
+        owner_id = principal_cache.get_api_key_owner(
+            hash_api_key(key), lambda: api_key_manager.find_active_owner(key)
+        )
+        if not owner_id:
             raise exceptions.AuthenticationFailed("Invalid API Key.")
 
-        user_doc = user_manager.get_user_by_id(api_key_doc["user_id"])
+        user_doc = principal_cache.get_user(owner_id, lambda: user_manager.get_user_by_id(owner_id))
         if not user_doc:
             raise exceptions.AuthenticationFailed("User associated with this API Key not found.")
         if not effective_email_verified(user_doc):
@@ -100,16 +107,37 @@ class APIKeyAuthentication(BaseAuthentication):
 
 
 class APIKeyManager:
-    """Manager class for handling API Key creation, retrieval, and revocation."""
+    """
+    Manager class for handling API Key creation, retrieval, and revocation.
+    Keys are stored as ``key_prefix`` + ``key_hash`` (see core.infrastructure.api_keys);
+    documents from before hashing still carry ``key`` and are migrated on first use.
+    """
 
     def __init__(self):
         self.collection = mongo_conn.get_collection("api_keys")
+        self._indexes_ready = False
+
+    def ensure_indexes(self):
+        """Create lookup indexes once per process."""
+        if self._indexes_ready:
+            return
+        try:
+            self.collection.create_index([("key_prefix", 1)], name="key_prefix_1", sparse=True)
+            # Legacy plaintext keys until every document is migrated.
+            self.collection.create_index([("key", 1)], name="key_1", sparse=True)
+            self.collection.create_index([("user_id", 1)], name="user_id_1")
+        except PyMongoError as exc:
+            logger.warning("API key indexes not created: %s", exc)
+            return
+        self._indexes_ready = True
 
     def generate_key(self, user_id, name):
-        key = f"sk_test_{secrets.token_urlsafe(32)}"
+        self.ensure_indexes()
+        key = f"{API_KEY_SCHEME}{secrets.token_urlsafe(32)}"
 
         key_data = {
-            "key": key,
+            "key_prefix": lookup_prefix(key),
+            "key_hash": hash_api_key(key),
             "user_id": ObjectId(user_id),
             "name": name,
             "is_active": True,
@@ -120,12 +148,46 @@ class APIKeyManager:
 
         return key
 
+    def find_active_owner(self, key):
+        """Owner id (str) of the active key, or None. One indexed read by prefix."""
+        self.ensure_indexes()
+        candidates = self.collection.find(
+            {"key_prefix": lookup_prefix(key), "is_active": True},
+            {"key_hash": 1, "user_id": 1},
+        ).limit(8)
+        for doc in candidates:
+            if verify_api_key(key, doc.get("key_hash")):
+                return str(doc["user_id"])
+
+        if not getattr(settings, "API_KEY_LEGACY_LOOKUP", True):
+            return None
+        legacy = self.collection.find_one({"key": key, "is_active": True}, {"user_id": 1})
+        if legacy is None:
+            return None
+        self._migrate_legacy_key(legacy["_id"], key)
+        return str(legacy["user_id"])
+
+    def _migrate_legacy_key(self, doc_id, key):
+        self.collection.update_one(
+            {"_id": doc_id, "key": key},
+            {
+                "$set": {"key_prefix": lookup_prefix(key), "key_hash": hash_api_key(key)},
+                "$unset": {"key": ""},
+            },
+        )
+
     def get_keys_for_user(self, user_id):
-        return list(self.collection.find({"user_id": ObjectId(user_id)}, {"key": 0}))
+        return list(self.collection.find({"user_id": ObjectId(user_id)}, {"key": 0, "key_hash": 0}))
 
     def revoke_key(self, key_id, user_id):
-        result = self.collection.delete_one({"_id": ObjectId(key_id), "user_id": ObjectId(user_id)})
-        return result.deleted_count > 0
+        doc = self.collection.find_one_and_delete(
+            {"_id": ObjectId(key_id), "user_id": ObjectId(user_id)},
+            projection={"key_hash": 1, "key": 1},
+        )
+        if doc is None:
+            return False
+        principal_cache.revoke_api_key(doc.get("key_hash") or hash_api_key(doc["key"]))
+        return True
 
 
 api_key_manager = APIKeyManager()
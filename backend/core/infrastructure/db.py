@@ -1,17 +1,21 @@
-import os
 from django.conf import settings
-from pymongo import MongoClient
 
 
 AUTH_DB_NAME = "datacube_V2_auth"
 
 class MongoConnection:
-    def __init__(self):
-        self.client = MongoClient(settings.MONGODB_URI)
-        self.db = self.client[AUTH_DB_NAME]
+    """Auth database handle on the process-wide sync client (see project.mongo)."""
+
+    @property
+    def client(self):
+        return settings.MONGO_CONNECTIONS.sync_client()
+
+    @property
+    def db(self):
+        return self.client[AUTH_DB_NAME]
 
     def get_collection(self, collection_name):
         return self.db[collection_name]
 
 # Instantiate the connection
-mongo_conn = MongoConnection()
\ No newline at end of file
+mongo_conn = MongoConnection()
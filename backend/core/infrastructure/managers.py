@@ -6,6 +6,7 @@ from gridfs import GridFSBucket
 from gridfs.errors import NoFile
 
 from core.infrastructure.db import mongo_conn
+from core.infrastructure.principal_cache import principal_cache
 from core.infrastructure.roles import DEFAULT_ROLE, normalize_role
 
 
@@ -131,6 +132,7 @@ class UserManager:
                     },
                 },
             )
+            principal_cache.invalidate_user(existing["_id"])
             return self.users_collection.find_one({"_id": existing["_id"]})
         user_data = {
             "email": email,
@@ -161,6 +163,14 @@ class UserManager:
             {"_id": user_id},
             {"$set": {"is_email_verified": verified, "updated_at": datetime.now(timezone.utc)}},
         )
+        principal_cache.invalidate_user(user_id)
+
+    def set_role(self, user_id: ObjectId, role: str):
+        self.users_collection.update_one(
+            {"_id": user_id},
+            {"$set": {"role": normalize_role(role), "updated_at": datetime.now(timezone.utc)}},
+        )
+        principal_cache.invalidate_user(user_id)
 
     def update_profile(self, user_id: ObjectId, *, first_name=None, last_name=None):
         patch = {"updated_at": datetime.now(timezone.utc)}
@@ -169,6 +179,7 @@ class UserManager:
         if last_name is not None:
             patch["lastName"] = last_name
         self.users_collection.update_one({"_id": user_id}, {"$set": patch})
+        principal_cache.invalidate_user(user_id)
 
     def set_avatar(self, user_id: ObjectId, file_id: ObjectId):
         self.users_collection.update_one(
@@ -198,6 +209,7 @@ class UserManager:
                 },
             },
         )
+        principal_cache.invalidate_user(user_id)
 
     def remove_avatar_file(self, user_id: ObjectId):
         doc = self.users_collection.find_one({"_id": user_id})
@@ -243,6 +255,7 @@ class UserManager:
                 "$unset": {"email_verification_token": "", "email_token_expiry": ""},
             },
         )
+        principal_cache.invalidate_user(user_doc["_id"])
         return user_doc
 
     def get_user_by_email(self, email):
@@ -423,6 +436,7 @@ class UserManager:
     def hard_delete_user(self, user_id: ObjectId):
         """Permanently remove a user document (used by playground cleanup)."""
         self.users_collection.delete_one({"_id": user_id})
+        principal_cache.invalidate_user(user_id)
 
 
 user_manager = UserManager()
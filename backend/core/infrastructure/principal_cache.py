@@ -0,0 +1,248 @@
+"""
+Short-TTL cache of authenticated principals (user documents and API-key owners).
+
+Authentication runs on every request and used to cost one or two synchronous
+MongoDB queries. Entries live in two tiers:
+
+- an in-process LRU (``PRINCIPAL_CACHE_LOCAL_TTL_SECONDS``, a few seconds), so
+  a warm worker authenticates with no network round trip at all;
+- the shared Django cache when ``PRINCIPAL_CACHE_SHARED`` is on (Redis via
+  ``REDIS_CACHE_URL``), with the longer ``PRINCIPAL_CACHE_TTL_SECONDS``.
+
+Writers that change what authentication depends on (role, profile, deletion,
+email verification) call ``invalidate_user``. That clears this process and the
+shared tier; other workers drop their local copy within the local TTL.
+
+API-key revocation must not wait for that: ``revoke_api_key`` also appends the
+key hash to a revocation list in the shared cache (an atomic sequence counter
+plus one slot per entry). Every process pulls new entries into an in-process
+set at most every ``PRINCIPAL_CACHE_REVOCATION_SYNC_SECONDS`` and refuses
+cached owners of revoked keys.
+
+Only the fields authentication needs are cached (no password hash, tokens or
+OTP state); misses are never cached.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Fields MongoUser, playground checks and effective_email_verified read.
+PRINCIPAL_FIELDS = (
+    "_id",
+    "email",
+    "firstName",
+    "lastName",
+    "role",
+    "is_email_verified",
+    "deleted_at",
+    "is_playground",
+    "playground_expires_at",
+)
+
+_MISSING = object()
+
+
+def principal_view(user_doc: dict) -> dict:
+    """Copy of ``user_doc`` restricted to PRINCIPAL_FIELDS (absent keys stay absent)."""
+    return {field: user_doc[field] for field in PRINCIPAL_FIELDS if field in user_doc}
+
+
+class _LocalLRU:
+    """Thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+REVOCATION_SEQ_KEY = "principal:revoked:seq"
+REVOCATION_SLOT_KEY = "principal:revoked:{n}"
+REVOCATION_SYNC_MAX_SLOTS = 1000
+
+
+class PrincipalCache:
+    def __init__(self):
+        self._local = _LocalLRU(getattr(settings, "PRINCIPAL_CACHE_MAX_ENTRIES", 10_000))
+        self._revoked: dict[str, float] = {}  # key hash -> monotonic expiry
+        self._revocation_seq = 0
+        self._revocation_synced_at = float("-inf")
+        self._revocation_lock = threading.Lock()
+
+    @property
+    def local_ttl(self) -> float:
+        return getattr(settings, "PRINCIPAL_CACHE_LOCAL_TTL_SECONDS", 5)
+
+    @property
+    def shared_ttl(self) -> float:
+        return getattr(settings, "PRINCIPAL_CACHE_TTL_SECONDS", 60)
+
+    @property
+    def shared_enabled(self) -> bool:
+        return getattr(settings, "PRINCIPAL_CACHE_SHARED", False)
+
+    @staticmethod
+    def _user_key(user_id: Any) -> str:
+        return f"principal:user:{user_id}"
+
+    @staticmethod
+    def _api_key_key(key_hash: str) -> str:
+        return f"principal:apikey:{key_hash}"
+
+    @property
+    def _revocation_ttl(self) -> float:
+        # Long enough to outlive every cached owner entry in every tier.
+        return self.shared_ttl + self.local_ttl
+
+    def _get(self, key: str, load: Callable[[], Optional[Any]]) -> Optional[Any]:
+        value = self._local.get(key)
+        if value is not _MISSING:
+            return value
+        if self.shared_enabled:
+            try:
+                value = cache.get(key, _MISSING)
+            except Exception:  # shared tier down: fall through to the database
+                logger.warning("Principal cache read failed", exc_info=True)
+                value = _MISSING
+            if value is not _MISSING:
+                self._local.set(key, value, self.local_ttl)
+                return value
+        value = load()
+        if value is not None:
+            self._local.set(key, value, self.local_ttl)
+            if self.shared_enabled:
+                try:
+                    cache.set(key, value, self.shared_ttl)
+                except Exception:
+                    logger.warning("Principal cache write failed", exc_info=True)
+        return value
+
+    def _delete(self, key: str) -> None:
+        self._local.delete(key)
+        if self.shared_enabled:
+            try:
+                cache.delete(key)
+            except Exception:
+                logger.warning("Principal cache invalidation failed for %s", key, exc_info=True)
+
+    def get_user(self, user_id: Any, load: Callable[[], Optional[dict]]) -> Optional[dict]:
+        """Principal view of the user, loading with ``load()`` (full user doc or None) on a miss."""
+        def load_view():
+            doc = load()
+            return principal_view(doc) if doc else None
+        return self._get(self._user_key(str(user_id)), load_view)
+
+    def get_api_key_owner(self, key_hash: str, load: Callable[[], Optional[str]]) -> Optional[str]:
+        """Owner user id (str) of the active API key with this hash, or None."""
+        if self.is_revoked(key_hash):
+            return None
+        return self._get(self._api_key_key(key_hash), load)
+
+    def peek_api_key_owner(self, key_hash: str) -> Optional[str]:
+        """Owner cached in this process, without touching Redis or MongoDB (may lag a revocation)."""
+        owner = self._local.get(self._api_key_key(key_hash))
+        return None if owner is _MISSING else owner
+
+    def invalidate_user(self, user_id: Any) -> None:
+        self._delete(self._user_key(str(user_id)))
+
+    def revoke_api_key(self, key_hash: str) -> None:
+        """Evict the key everywhere and publish it on the revocation list."""
+        self._delete(self._api_key_key(key_hash))
+        expires_at = time.monotonic() + self._revocation_ttl
+        with self._revocation_lock:
+            self._revoked[key_hash] = expires_at
+        if not self.shared_enabled:
+            return
+        try:
+            cache.add(REVOCATION_SEQ_KEY, 0, None)
+            n = cache.incr(REVOCATION_SEQ_KEY)
+            cache.set(REVOCATION_SLOT_KEY.format(n=n), key_hash, self._revocation_ttl)
+        except Exception:
+            logger.warning("Could not publish API key revocation", exc_info=True)
+
+    def is_revoked(self, key_hash: str) -> bool:
+        self._sync_revocations()
+        with self._revocation_lock:
+            expires_at = self._revoked.get(key_hash)
+            if expires_at is None:
+                return False
+            if expires_at <= time.monotonic():
+                del self._revoked[key_hash]
+                return False
+            return True
+
+    def _sync_revocations(self) -> None:
+        if not self.shared_enabled:
+            return
+        now = time.monotonic()
+        interval = getattr(settings, "PRINCIPAL_CACHE_REVOCATION_SYNC_SECONDS", 1)
+        with self._revocation_lock:
+            if now - self._revocation_synced_at < interval:
+                return
+            self._revocation_synced_at = now
+            last_seen = self._revocation_seq
+        try:
+            seq = int(cache.get(REVOCATION_SEQ_KEY) or 0)
+            if seq <= last_seen:
+                return
+            # Older slots have expired anyway; bound the catch-up of a fresh process.
+            first = max(last_seen + 1, seq - REVOCATION_SYNC_MAX_SLOTS + 1, 1)
+            slots = cache.get_many([REVOCATION_SLOT_KEY.format(n=n) for n in range(first, seq + 1)])
+        except Exception:
+            logger.warning("Could not sync API key revocations", exc_info=True)
+            return
+        expires_at = now + self._revocation_ttl
+        with self._revocation_lock:
+            for key_hash in slots.values():
+                self._revoked[key_hash] = expires_at
+            self._revocation_seq = max(self._revocation_seq, seq)
+
+    def clear_local(self) -> None:
+        self._local.clear()
+        with self._revocation_lock:
+            self._revoked.clear()
+            self._revocation_seq = 0
+            self._revocation_synced_at = float("-inf")
+
+
+principal_cache = PrincipalCache()
@@ -4,6 +4,8 @@ from .views.api_views import (
     UserStatsAPIView,
     APIKeyAPIView,
     DatabaseDetailAPIView,
+    RateLimitSaturationAPIView,
+    TelemetryBufferStatsAPIView,
 )
 
 from .views.auth_views import (
@@ -58,6 +60,8 @@ urlpatterns = [
     re_path(r"^password-reset/request/?$", PasswordResetRequestView.as_view(), name="password_reset_request"),
     re_path(r"^password-reset/confirm/?$", PasswordResetConfirmView.as_view(), name="password_reset_confirm"),
     re_path(r"^admin/users/role/?$", AdminSetUserRoleView.as_view(), name="admin_set_user_role"),
+    re_path(r"^admin/rate-limits/?$", RateLimitSaturationAPIView.as_view(), name="admin_rate_limits"),
+    re_path(r"^admin/telemetry/?$", TelemetryBufferStatsAPIView.as_view(), name="admin_telemetry"),
 ]
 
 urlpatterns += [
@@ -4,10 +4,13 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 
+from analytics.telemetry import telemetry_stats
+from api.infrastructure.rate_limits import tenant_rate_limiter
 from api.permissions import IsDeveloperOrAdmin
 
 from core.infrastructure.managers import user_manager
 from core.infrastructure.authentication import api_key_manager
+from core.infrastructure.permissions import IsRoleAdmin
 from api.application.metadata_service import MetadataService
 from bson import ObjectId
 from datetime import datetime
@@ -168,4 +171,28 @@ class DatabaseDetailAPIView(BaseAPIView):
             'stats': stats
         }
         
-        return Response(response_data)
\ No newline at end of file
+        return Response(response_data)
+
+
+class RateLimitSaturationAPIView(APIView):
+    """
+    Admin view of per-tenant rate limit saturation: admissions, rejections by
+    reason, current and peak in-flight requests for the most recently active
+    tenants.
+    """
+    permission_classes = [IsAuthenticated, IsRoleAdmin]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get("limit", 100)), 1), 1000)
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"tenants": tenant_rate_limiter.saturation_snapshot(limit)})
+
+
+class TelemetryBufferStatsAPIView(APIView):
+    """Admin view of this worker's telemetry buffer: queue depth, drops, flush latency."""
+    permission_classes = [IsAuthenticated, IsRoleAdmin]
+
+    def get(self, request):
+        return Response(telemetry_stats())
@@ -3,7 +3,6 @@
 from __future__ import annotations
 
 import logging
-from datetime import datetime, timezone
 from bson import ObjectId
 from bson.errors import InvalidId
 from django.conf import settings
@@ -440,8 +439,5 @@ class AdminSetUserRoleView(APIView):
         doc = user_manager.get_user_by_email(email)
         if not doc:
             return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
-        user_manager.users_collection.update_one(
-            {"_id": doc["_id"]},
-            {"$set": {"role": role, "updated_at": datetime.now(timezone.utc)}},
-        )
+        user_manager.set_role(doc["_id"], role)
         return Response({"message": "Role updated.", "email": email, "role": role})
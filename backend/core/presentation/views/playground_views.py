@@ -1,9 +1,7 @@
 """Ephemeral playground session endpoint.
 
 Sync DRF view: session start and seeding use only sync PyMongo (auth DB +
-SYNC_MONGODB_CLIENT). This endpoint never touches AsyncMongoClient, so it
-cannot bind the global async client to a per-request event loop and break
-analytics / dashboard async views afterward.
+SYNC_MONGODB_CLIENT), so the endpoint needs no event loop.
 """
 
 import logging
@@ -0,0 +1,49 @@
+"""
+Gunicorn profile for production: ASGI with uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py
+
+Every knob can be overridden from the environment (GUNICORN_*) or the command
+line. A WSGI profile (gthread workers, project.wsgi:application) is opt-in:
+
+    GUNICORN_WORKER_CLASS=gthread GUNICORN_THREADS=8 gunicorn -c gunicorn.conf.py
+
+Compare the two with ``python -m benchmarks.asgi_wsgi_bench --real-mongo``;
+the stubbed mode leaves out the driver and the connection pools.
+"""
+
+import multiprocessing
+import os
+
+
+def _int_env(name, default):
+    return int(os.getenv(name, str(default)))
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "uvicorn_worker.UvicornWorker")
+_asgi = "uvicorn" in worker_class.lower()
+wsgi_app = "project.asgi:application" if _asgi else "project.wsgi:application"
+# Async workers multiplex requests on one loop; ~1 per core is enough.
+workers = _int_env("GUNICORN_WORKERS", min(multiprocessing.cpu_count(), 4))
+# Only used by the gthread profile: requests block on Mongo, threads overlap that wait.
+threads = _int_env("GUNICORN_THREADS", 8)
+keepalive = _int_env("GUNICORN_KEEPALIVE", 5)
+timeout = _int_env("GUNICORN_TIMEOUT", 60)
+graceful_timeout = _int_env("GUNICORN_GRACEFUL_TIMEOUT", 30)
+# Recycle workers periodically; jitter keeps them from restarting together.
+max_requests = _int_env("GUNICORN_MAX_REQUESTS", 10000)
+max_requests_jitter = _int_env("GUNICORN_MAX_REQUESTS_JITTER", 1000)
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+# Do not preload: each worker builds its own Mongo clients after fork.
+preload_app = False
+
+
+def worker_exit(server, worker):
+    try:
+        from django.conf import settings
+
+        settings.MONGO_CONNECTIONS.close()
+    except Exception:  # settings never loaded in this worker
+        pass
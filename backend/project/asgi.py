@@ -1,16 +1,16 @@
 """
-ASGI config for project project.
+ASGI config for the DataCube project (production entry point).
 
-It exposes the ASGI callable as a module-level variable named ``application``.
-
-For more information on this file, see
-https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+Served by gunicorn with uvicorn workers (see ``gunicorn.conf.py``). The adrf
+views and the hybrid middlewares run on the worker's event loop without
+sync/async thread hops, and each worker's loop gets its own AsyncMongoClient
+(``project.mongo``).
 """
 
 import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings.production')
 
 application = get_asgi_application()
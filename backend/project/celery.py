@@ -1,8 +1,10 @@
 import logging
 import os
+from datetime import timedelta
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_shutdown
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +24,7 @@ app.conf.update(
     task_time_limit=300,
     task_soft_time_limit=240,
     task_routes={
+        "analytics.tasks.ingest_telemetry_batch": {"queue": "analytics"},
         "analytics.tasks.log_http_request_task": {"queue": "analytics"},
         "analytics.tasks.log_db_operation_task": {"queue": "analytics"},
         "analytics.tasks.log_performance_task": {"queue": "analytics"},
@@ -30,28 +33,47 @@ app.conf.update(
         "analytics.tasks.log_mongo_detail_task": {"queue": "analytics"},
         "analytics.tasks.log_slow_query_task": {"queue": "analytics"},
         "analytics.tasks.aggregate_daily_usage": {"queue": "analytics"},
+        "analytics.tasks.compact_daily_usage_partition": {"queue": "analytics"},
         "analytics.tasks.cleanup_old_analytics": {"queue": "maintenance"},
         "core.tasks.cleanup_expired_playground_sessions": {"queue": "maintenance"},
+        "api.tasks.flush_usage_counters": {"queue": "maintenance"},
+        "api.tasks.measure_storage_usage": {"queue": "maintenance"},
     },
 )
 
 app.autodiscover_tasks()
 
 
+@worker_process_shutdown.connect
+def close_mongo_clients(**_kwargs):
+    # Prefork children exit without running atexit hooks.
+    from django.conf import settings
+
+    settings.MONGO_CONNECTIONS.close()
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     logger.debug("Datacube Celery heartbeat: %r", self.request)
 
 
 app.conf.beat_schedule = {
-    "daily-usage-compaction": {
+    "usage-counter-flush": {
+        "task": "api.tasks.flush_usage_counters",
+        "schedule": timedelta(seconds=float(os.getenv("USAGE_METER_FLUSH_SECONDS", "30"))),
+    },
+    "hourly-usage-compaction": {
         "task": "analytics.tasks.aggregate_daily_usage",
-        "schedule": crontab(hour=2, minute=30),
+        "schedule": crontab(minute=5),
     },
     "weekly-analytics-prune": {
         "task": "analytics.tasks.cleanup_old_analytics",
         "schedule": crontab(hour=3, minute=0, day_of_week=0),
     },
+    "storage-accounting": {
+        "task": "api.tasks.measure_storage_usage",
+        "schedule": timedelta(seconds=float(os.getenv("STORAGE_ACCOUNTING_INTERVAL_SECONDS", "900"))),
+    },
     "hourly-playground-cleanup": {
         "task": "core.tasks.cleanup_expired_playground_sessions",
         "schedule": crontab(minute=0),
@@ -0,0 +1,115 @@
+"""
+One long-lived event loop per process for async code reached from sync servers.
+
+Under WSGI, Django runs async views and middleware through ``async_to_sync``,
+which builds a new event loop for every call. Anything bound to a loop
+(``AsyncMongoClient`` and ``redis.asyncio`` pools, background tasks such as
+the dashboard cache refresh) would be rebuilt per request and torn down with
+that loop. ``ProcessEventLoop`` runs one loop in a daemon thread. After
+``bind_thread()``, ``async_to_sync`` calls from that thread run on it, the
+same way sync code called from an ASGI server's loop calls back into it.
+Per-loop clients are then built once per process. The loop is rebuilt after
+fork.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+from typing import Any, Coroutine, Optional
+
+from asgiref.sync import SyncToAsync
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessEventLoop:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._atexit_registered = False
+
+    def get(self) -> asyncio.AbstractEventLoop:
+        """The running process loop, started on first use."""
+        if os.getpid() != self._pid:
+            # The loop thread did not survive fork(); the child starts its own.
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._loop = self._thread = None
+        loop = self._loop
+        if loop is not None:
+            return loop
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                thread = threading.Thread(
+                    target=self._run, args=(loop, ready), name="process-event-loop", daemon=True
+                )
+                thread.start()
+                ready.wait()
+                self._loop, self._thread = loop, thread
+                if not self._atexit_registered:
+                    atexit.register(self.close)
+                    self._atexit_registered = True
+            return self._loop
+
+    @staticmethod
+    def _run(loop: asyncio.AbstractEventLoop, ready: threading.Event) -> None:
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        loop.run_forever()
+
+    def bind_thread(self) -> None:
+        """Make ``async_to_sync`` in the calling thread run on the process loop."""
+        # The thread-local asgiref itself sets for sync code running under an event loop.
+        SyncToAsync.threadlocal.main_event_loop = self.get()
+        SyncToAsync.threadlocal.main_event_loop_pid = os.getpid()
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        """Run ``coro`` on the process loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.get())
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Cancel the loop's tasks (running their cleanup), then stop it; safe to call more than once."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or os.getpid() != self._pid:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout)
+        except Exception:  # pragma: no cover - best effort on shutdown
+            logger.debug("Process event loop did not shut down cleanly", exc_info=True)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not thread.is_alive():
+            loop.close()
+
+    @staticmethod
+    async def _shutdown() -> None:
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.get_running_loop().shutdown_asyncgens()
+
+
+PROCESS_LOOP = ProcessEventLoop()
+
+
+def bind_process_loop(application):
+    """Wrap a WSGI application so its async views run on ``PROCESS_LOOP``."""
+
+    def wsgi(environ, start_response):
+        PROCESS_LOOP.bind_thread()
+        return application(environ, start_response)
+
+    return wsgi
@@ -0,0 +1,127 @@
+"""
+Base for middleware that runs natively under both WSGI and ASGI.
+
+Django wraps sync-only middleware in ``sync_to_async`` under ASGI, which costs a
+thread hop per request per middleware. Subclasses set ``get_response`` handling
+through ``async_mode`` and implement ``__acall__`` so the async chain stays on
+the event loop.
+"""
+
+from abc import ABC, abstractmethod
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import middleware as auth_middleware
+from django.middleware import clickjacking, common, security
+from django.utils.functional import LazyObject, empty
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class HybridMiddleware(ABC):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process(request)
+
+    @abstractmethod
+    def process(self, request):
+        """Handle ``request`` in the sync chain (WSGI, or sync ``get_response``)."""
+
+    @abstractmethod
+    async def __acall__(self, request):
+        """Handle ``request`` on the event loop, awaiting ``get_response``."""
+
+
+async def resolve_lazy_user(request):
+    """
+    Evaluate ``request.user`` without sync DB access on the event loop.
+
+    DRF views replace it with the authenticated principal; for other routes it
+    is still AuthenticationMiddleware's lazy session user, which must be
+    loaded through ``request.auser()`` in async code.
+    """
+    user = getattr(request, "user", None)
+    if isinstance(user, LazyObject) and user._wrapped is empty and hasattr(request, "auser"):
+        request.user = await request.auser()
+    return getattr(request, "user", None)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise without the sync-only penalty under ASGI.
+
+    Non-static requests (almost all API traffic) only need a dict lookup, so
+    they pass straight to the async chain; serving a file (or, with
+    autorefresh, probing the filesystem) still runs in a worker thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class LoopSafeMiddlewareMixin:
+    """
+    ``MiddlewareMixin.__acall__`` without the thread hops.
+
+    Django runs every ``process_request``/``process_response`` of a
+    ``MiddlewareMixin`` through ``sync_to_async`` under ASGI because it cannot
+    know whether they block. For stock middleware that only inspects headers
+    or sets lazy attributes that is two wasted hops per request each, so the
+    subclasses below call them inline on the event loop. Middleware that may
+    touch the database (sessions, messages, CSRF) keeps Django's behaviour.
+    """
+
+    async def __acall__(self, request):
+        response = None
+        if hasattr(self, "process_request"):
+            response = self.process_request(request)
+        response = response or await self.get_response(request)
+        if hasattr(self, "process_response"):
+            response = self.process_response(request, response)
+        return response
+
+
+class SecurityMiddleware(LoopSafeMiddlewareMixin, security.SecurityMiddleware):
+    pass
+
+
+class CommonMiddleware(LoopSafeMiddlewareMixin, common.CommonMiddleware):
+    pass
+
+
+class AuthenticationMiddleware(LoopSafeMiddlewareMixin, auth_middleware.AuthenticationMiddleware):
+    # Only installs the lazy ``request.user``/``request.auser``; nothing is loaded here.
+    pass
+
+
+class XFrameOptionsMiddleware(LoopSafeMiddlewareMixin, clickjacking.XFrameOptionsMiddleware):
+    pass
@@ -0,0 +1,227 @@
+"""
+Process-wide MongoDB connection manager.
+
+An ``AsyncMongoClient`` is bound to the event loop it first runs on, so one
+global async client breaks as soon as code runs on a different loop (Celery
+tasks calling ``asyncio.run``, scripts). ``MongoConnectionManager`` hands out
+one async client per running event loop and one shared sync ``MongoClient``,
+all built from the same pool options, and drops every client after ``fork()``
+so pre-fork servers and Celery's prefork pool never inherit sockets.
+
+Each async client is closed on its own loop when that loop shuts down
+(``asyncio.run`` and ``async_to_sync`` cancel leftover tasks first), so
+short-lived loops do not leak sockets or monitor tasks. Under WSGI, async
+views share one loop per process (``project.event_loop``), so requests do not
+each build a client.
+
+``settings.MONGODB_CLIENT`` / ``SYNC_MONGODB_CLIENT`` and the metadata
+collection settings are lazy handles over the manager, so existing
+``settings.MONGODB_CLIENT[db][coll]`` call sites resolve to the client of the
+loop they run on.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Callable
+
+from pymongo import AsyncMongoClient, MongoClient  # type: ignore
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+
+logger = logging.getLogger(__name__)
+
+# Strong references to the close-with-loop tasks (the loop only keeps weak ones).
+_CLOSE_GUARDS: set[asyncio.Task] = set()
+
+
+def pool_options_from_env(environ=os.environ) -> dict[str, Any]:
+    """Client keyword options from MONGODB_* environment variables (unset → driver default)."""
+    options: dict[str, Any] = {}
+    int_options = {
+        "MONGODB_MAX_POOL_SIZE": "maxPoolSize",
+        "MONGODB_MIN_POOL_SIZE": "minPoolSize",
+        "MONGODB_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+        "MONGODB_MAX_CONNECTING": "maxConnecting",
+        "MONGODB_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+        "MONGODB_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+    }
+    for env_name, option in int_options.items():
+        value = environ.get(env_name, "").strip()
+        if value:
+            options[option] = int(value)
+    # e.g. "zstd,snappy,zlib"; zstd/snappy need their optional driver extras.
+    compressors = environ.get("MONGODB_COMPRESSORS", "").strip()
+    if compressors:
+        options["compressors"] = compressors
+    app_name = environ.get("MONGODB_APP_NAME", "datacube-backend").strip()
+    if app_name:
+        options["appname"] = app_name
+    return options
+
+
+def routed_read_preference_from_env(environ=os.environ):
+    """
+    Read preference for routed (analytics / listing) reads.
+
+    MONGODB_ROUTED_READ_PREFERENCE takes a driver mode name (default
+    ``secondaryPreferred``); MONGODB_MAX_STALENESS_SECONDS bounds secondary lag
+    (default 90, the driver minimum; ``-1`` means no bound). Both are ignored
+    by standalone servers.
+    """
+    name = environ.get("MONGODB_ROUTED_READ_PREFERENCE", "secondaryPreferred").strip() or "secondaryPreferred"
+    try:
+        mode = read_pref_mode_from_name(name)
+    except ValueError:
+        raise ValueError(f"Unknown MONGODB_ROUTED_READ_PREFERENCE: {name!r}") from None
+    staleness = int(environ.get("MONGODB_MAX_STALENESS_SECONDS", "90").strip() or -1)
+    if mode == 0:  # primary: staleness does not apply
+        return make_read_preference(mode, None)
+    return make_read_preference(mode, None, max_staleness=staleness)
+
+
+class MongoConnectionManager:
+    """Owns every MongoClient in the process: one sync client, one async client per loop."""
+
+    def __init__(self, uri: str | None, **client_options: Any):
+        self.uri = uri
+        self.client_options = client_options
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._sync_client: MongoClient | None = None
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncMongoClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        # Used when no loop is running (import time, sync code building handles).
+        self._unbound_async_client: AsyncMongoClient | None = None
+
+    def _check_fork(self) -> None:
+        # Clients must not cross fork(); the child starts with a clean slate.
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._sync_client = None
+            self._async_clients = weakref.WeakKeyDictionary()
+            self._unbound_async_client = None
+
+    def sync_client(self) -> MongoClient:
+        self._check_fork()
+        client = self._sync_client
+        if client is None:
+            with self._lock:
+                if self._sync_client is None:
+                    self._sync_client = MongoClient(self.uri, **self.client_options)
+                client = self._sync_client
+        return client
+
+    def async_client(self) -> AsyncMongoClient:
+        """Client bound to the running event loop (created on first use in that loop)."""
+        self._check_fork()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        with self._lock:
+            if loop is None:
+                if self._unbound_async_client is None:
+                    self._unbound_async_client = AsyncMongoClient(self.uri, **self.client_options)
+                return self._unbound_async_client
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = AsyncMongoClient(self.uri, **self.client_options)
+                self._async_clients[loop] = client
+                guard = loop.create_task(self._close_with_loop(loop, client))
+                _CLOSE_GUARDS.add(guard)
+                guard.add_done_callback(_CLOSE_GUARDS.discard)
+            return client
+
+    async def _close_with_loop(self, loop: asyncio.AbstractEventLoop, client: AsyncMongoClient) -> None:
+        """Wait until the loop shuts down (cancelling its tasks), then close ``client`` on it."""
+        try:
+            await asyncio.Event().wait()
+        finally:
+            with self._lock:
+                if self._async_clients.get(loop) is client:
+                    del self._async_clients[loop]
+            await client.close()
+
+    async def aclose(self) -> None:
+        """Close the async client of the running loop (call from that loop on shutdown)."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.pop(loop, None)
+        if client is not None:
+            await client.close()
+
+    def close(self) -> None:
+        """Close the sync client and forget async clients; safe to call more than once."""
+        with self._lock:
+            sync_client, self._sync_client = self._sync_client, None
+            async_clients = list(self._async_clients.items())
+            self._async_clients = weakref.WeakKeyDictionary()
+            unbound, self._unbound_async_client = self._unbound_async_client, None
+        if sync_client is not None:
+            sync_client.close()
+        for loop, client in async_clients:
+            # An async client can only be closed on its own loop.
+            if loop.is_closed():
+                continue
+            if not loop.is_running():
+                self._close_quietly(lambda: loop.run_until_complete(client.close()))
+            elif not self._on_loop_thread(loop):
+                self._close_quietly(lambda: asyncio.run_coroutine_threadsafe(client.close(), loop).result(5))
+        if unbound is not None:
+            self._close_quietly(lambda: asyncio.run(unbound.close()))
+
+    @staticmethod
+    def _on_loop_thread(loop: asyncio.AbstractEventLoop) -> bool:
+        try:
+            return asyncio.get_running_loop() is loop
+        except RuntimeError:
+            return False
+
+    @staticmethod
+    def _close_quietly(close: Callable[[], Any]) -> None:
+        try:
+            close()
+        except Exception:  # pragma: no cover - best effort on shutdown
+            logger.debug("Could not close async MongoDB client", exc_info=True)
+
+    def lazy(self, resolve: Callable[["MongoConnectionManager"], Any]) -> "LazyMongoHandle":
+        return LazyMongoHandle(lambda: resolve(self))
+
+
+class LazyMongoHandle:
+    """
+    Settings-level stand-in for a client, database or collection.
+
+    Attribute access and ``[...]`` resolve against the manager on every use,
+    returning real pymongo objects bound to the current loop (or the shared
+    sync client).
+    """
+
+    __slots__ = ("_resolve",)
+
+    def __init__(self, resolve: Callable[[], Any]):
+        self._resolve = resolve
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            # copy/pickle/inspect probes should not open a client.
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._resolve()[key]
+
+    def __repr__(self) -> str:
+        return f"LazyMongoHandle({self._resolve()!r})"
+
+
+def register_shutdown(manager: MongoConnectionManager) -> None:
+    atexit.register(manager.close)
@@ -0,0 +1,139 @@
+"""
+Per-request MongoDB time accounting from driver events.
+
+``CommandAccountingListener`` and ``PoolAccountingListener`` are registered on
+every client built by ``MongoConnectionManager``. Driver events are published
+in the task/thread that issued the command, so they can be attributed to the
+request whose ``RequestDbStats`` is active in a contextvar. The observability
+middleware starts accounting for each request, reports the totals in a
+``Server-Timing`` header and adds them to the HTTP telemetry record.
+
+Outside a request (Celery tasks, management commands) no stats object is
+active and the listeners return immediately.
+"""
+
+from __future__ import annotations
+
+import contextvars
+from typing import Optional
+
+from pymongo import monitoring  # type: ignore
+
+
+class RequestDbStats:
+    """Running totals for one request; mutated in place by the listeners."""
+
+    __slots__ = ("commands", "failed_commands", "db_ms", "pool_wait_ms")
+
+    def __init__(self) -> None:
+        self.commands = 0
+        self.failed_commands = 0
+        self.db_ms = 0.0
+        self.pool_wait_ms = 0.0
+
+    def as_telemetry(self) -> dict:
+        return {
+            "db_commands": self.commands,
+            "db_failed_commands": self.failed_commands,
+            "db_time_ms": round(self.db_ms, 2),
+            "db_pool_wait_ms": round(self.pool_wait_ms, 2),
+        }
+
+    def server_timing(self, total_ms: Optional[float] = None) -> str:
+        """``Server-Timing`` value: db round trips, pool wait and the remaining app time."""
+        parts = [
+            f'db;dur={self.db_ms:.2f};desc="{self.commands} cmds"',
+            f"db-wait;dur={self.pool_wait_ms:.2f}",
+        ]
+        if total_ms is not None:
+            parts.append(f"app;dur={max(total_ms - self.db_ms - self.pool_wait_ms, 0.0):.2f}")
+            parts.append(f"total;dur={total_ms:.2f}")
+        return ", ".join(parts)
+
+
+_current: contextvars.ContextVar[Optional[RequestDbStats]] = contextvars.ContextVar(
+    "request_db_stats", default=None
+)
+
+
+def start_request_accounting() -> tuple[RequestDbStats, contextvars.Token]:
+    stats = RequestDbStats()
+    return stats, _current.set(stats)
+
+
+def stop_request_accounting(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+
+def current_db_stats() -> Optional[RequestDbStats]:
+    return _current.get()
+
+
+def db_telemetry_fields() -> dict:
+    """Telemetry fields for the active request ({} when accounting is off)."""
+    stats = _current.get()
+    return stats.as_telemetry() if stats is not None else {}
+
+
+class CommandAccountingListener(monitoring.CommandListener):
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        stats = _current.get()
+        if stats is not None:
+            stats.commands += 1
+            stats.db_ms += event.duration_micros / 1000
+
+    def failed(self, event) -> None:
+        stats = _current.get()
+        if stats is not None:
+            stats.commands += 1
+            stats.failed_commands += 1
+            stats.db_ms += event.duration_micros / 1000
+
+
+class PoolAccountingListener(monitoring.ConnectionPoolListener):
+    """Adds connection checkout wait (pool contention, new connections) to the request."""
+
+    def _add_wait(self, event) -> None:
+        stats = _current.get()
+        if stats is not None and event.duration:
+            stats.pool_wait_ms += event.duration * 1000
+
+    def connection_checked_out(self, event) -> None:
+        self._add_wait(event)
+
+    def connection_check_out_failed(self, event) -> None:
+        self._add_wait(event)
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        pass
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_checked_in(self, event) -> None:
+        pass
+
+
+def accounting_listeners() -> list:
+    return [CommandAccountingListener(), PoolAccountingListener()]
@@ -0,0 +1,90 @@
+"""
+Redis clients for request-path Lua scripts (usage meter, tenant rate limits).
+
+Like ``MongoConnectionManager``: one sync client per process and one
+``redis.asyncio`` client per running event loop (an asyncio connection pool
+is bound to the loop that created it), rebuilt after fork. Scripts are
+registered once per client so calls go out as ``EVALSHA``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import weakref
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+
+
+class RedisScripts:
+    def __init__(self, url_setting: str, url: Optional[str] = None):
+        self.url_setting = url_setting
+        self._url = url
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._sync: Optional[tuple[Any, dict]] = None
+        self._async: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple[Any, dict]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def url(self) -> str:
+        if self._url is not None:
+            return self._url
+        return getattr(settings, self.url_setting, "")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    def _check_fork(self) -> None:
+        # Connection pools must not cross fork(); the child starts with a clean slate.
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._sync = None
+            self._async = weakref.WeakKeyDictionary()
+
+    def _entry(self) -> tuple[Any, dict]:
+        self._check_fork()
+        with self._lock:
+            if self._sync is None:
+                import redis
+
+                self._sync = (redis.Redis.from_url(self.url), {})
+            return self._sync
+
+    def _async_entry(self) -> tuple[Any, dict]:
+        self._check_fork()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._async.get(loop)
+            if entry is None:
+                import redis.asyncio
+
+                entry = (redis.asyncio.Redis.from_url(self.url), {})
+                self._async[loop] = entry
+            return entry
+
+    @staticmethod
+    def _script(entry: tuple[Any, dict], source: str) -> Callable:
+        client, scripts = entry
+        script = scripts.get(source)
+        if script is None:
+            script = scripts[source] = client.register_script(source)
+        return script
+
+    def sync_client(self):
+        return self._entry()[0]
+
+    def async_client(self):
+        """Client bound to the running event loop."""
+        return self._async_entry()[0]
+
+    def sync_script(self, source: str) -> Callable:
+        return self._script(self._entry(), source)
+
+    def async_script(self, source: str) -> Callable:
+        return self._script(self._async_entry(), source)
@@ -4,7 +4,13 @@ Django settings for the DataCube project that are common to all environments.
 import os
 from pathlib import Path
 from datetime import timedelta
-from pymongo import AsyncMongoClient, MongoClient  # type: ignore
+from project.mongo import (
+    MongoConnectionManager,
+    pool_options_from_env,
+    register_shutdown,
+    routed_read_preference_from_env,
+)
+from project.mongo_monitoring import accounting_listeners
 # from celery.schedules import crontab
 from dotenv import load_dotenv # type: ignore
 
@@ -16,6 +22,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
 
 DATACUBE_FREE_TIER_MB = 500
+# Per-process cache of each user's storage usage for the write-time quota check
+# (api.application.storage_accounting); measured every STORAGE_ACCOUNTING_INTERVAL_SECONDS.
+STORAGE_QUOTA_CACHE_SECONDS = float(os.getenv("STORAGE_QUOTA_CACHE_SECONDS", "30"))
 
 # Paths
 # CONFIG_PATH = BASE_DIR / 'config.json'
@@ -51,21 +60,24 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware', # For serving static files in production
+    'project.middleware.SecurityMiddleware',
+    'project.middleware.StaticFilesMiddleware', # WhiteNoise static files, async-capable for ASGI
+    'api.middleware.ResponseCompressionMiddleware', # Outside observability so it logs uncompressed sizes
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
-    'django.middleware.common.CommonMiddleware',
+    'project.middleware.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'project.middleware.AuthenticationMiddleware',
+    'api.middleware.TenantRateLimitMiddleware', # Before metering: rejected requests are not billed
     'api.middleware.UsageMeteringMiddleware',
     'analytics.middleware.DatacubeObservabilityMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'project.middleware.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'project.urls'
 WSGI_APPLICATION = 'project.wsgi.application'
+ASGI_APPLICATION = 'project.asgi.application'
 SITE_ID = 1
 
 # --- Templates ---
@@ -105,11 +117,90 @@ FILE_STORAGE_DB_NAME = os.getenv("FILE_STORAGE_DB_NAME")
 if not all([MONGODB_URI, MONGODB_DATABASE, MONGODB_COLLECTION, DATACUBE_V2_AUTH_DB, FILE_STORAGE_DB_NAME]):
     raise ValueError("MongoDB settings missing. Please set them in environment.")
 
-MONGODB_CLIENT = AsyncMongoClient(MONGODB_URI)
-SYNC_MONGODB_CLIENT = MongoClient(MONGODB_URI)
-METADATA_DB = MONGODB_CLIENT[MONGODB_DATABASE] # type: ignore
-METADATA_COLLECTION = METADATA_DB[MONGODB_COLLECTION] # type: ignore
-FILE_METADATA_COLLECTION = METADATA_DB["file_metadata"]
+# One manager owns every client: a shared sync client plus one async client per
+# event loop. Pool tuning: MONGODB_MAX_POOL_SIZE, MONGODB_MIN_POOL_SIZE,
+# MONGODB_MAX_IDLE_TIME_MS, MONGODB_MAX_CONNECTING, MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+# MONGODB_SERVER_SELECTION_TIMEOUT_MS, MONGODB_COMPRESSORS, MONGODB_APP_NAME.
+# MONGODB_REQUEST_ACCOUNTING attributes command/pool-wait time to the current
+# request (Server-Timing header + HTTP telemetry; project.mongo_monitoring).
+MONGODB_REQUEST_ACCOUNTING = os.getenv("MONGODB_REQUEST_ACCOUNTING", "true").lower() in ("1", "true", "yes")
+MONGO_CONNECTIONS = MongoConnectionManager(
+    MONGODB_URI,
+    event_listeners=accounting_listeners() if MONGODB_REQUEST_ACCOUNTING else [],
+    **pool_options_from_env(),
+)
+register_shutdown(MONGO_CONNECTIONS)
+
+# Lazy handles: resolved per use, so async code always gets its own loop's client.
+MONGODB_CLIENT = MONGO_CONNECTIONS.lazy(lambda m: m.async_client())
+SYNC_MONGODB_CLIENT = MONGO_CONNECTIONS.lazy(lambda m: m.sync_client())
+METADATA_DB = MONGO_CONNECTIONS.lazy(lambda m: m.async_client()[MONGODB_DATABASE])
+METADATA_COLLECTION = MONGO_CONNECTIONS.lazy(
+    lambda m: m.async_client()[MONGODB_DATABASE][MONGODB_COLLECTION]
+)
+FILE_METADATA_COLLECTION = MONGO_CONNECTIONS.lazy(
+    lambda m: m.async_client()[MONGODB_DATABASE]["file_metadata"]
+)
+
+# Analytics aggregations and inventory listings read through this preference
+# (api.infrastructure.read_routing). Tenant-visible listings also carry a causal
+# token so a tenant reads its own writes; tokens live in the default cache and
+# need it shared (MONGODB_CAUSAL_TOKENS_SHARED below), else listings read primary.
+MONGODB_ROUTED_READ_PREFERENCE = routed_read_preference_from_env()
+MONGODB_CAUSAL_TOKEN_TTL = int(os.getenv("MONGODB_CAUSAL_TOKEN_TTL", "300"))
+
+
+# --- Cache ---
+# Shared cache (causal read tokens, principal cache tier 2). Without
+# REDIS_CACHE_URL Django's per-process local-memory cache is used.
+REDIS_CACHE_URL = os.getenv("REDIS_CACHE_URL", "")
+if REDIS_CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": REDIS_CACHE_URL,
+            "KEY_PREFIX": "datacube",
+            # A Redis outage degrades to cache misses instead of failing requests.
+            "OPTIONS": {"IGNORE_EXCEPTIONS": True},
+        }
+    }
+# Causal tokens in a per-process cache would not reach the other workers.
+MONGODB_CAUSAL_TOKENS_SHARED = bool(REDIS_CACHE_URL)
+
+# Authenticated principal cache (core.infrastructure.principal_cache).
+PRINCIPAL_CACHE_LOCAL_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_LOCAL_TTL_SECONDS", "5"))
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+PRINCIPAL_CACHE_SHARED = bool(REDIS_CACHE_URL) and os.getenv(
+    "PRINCIPAL_CACHE_SHARED", "true"
+).lower() in ("1", "true", "yes")
+
+# Monthly API-call metering (api.infrastructure.usage_meter). Counters live in
+# Redis and are flushed to the user documents every USAGE_METER_FLUSH_SECONDS
+# (project.celery beat); without a Redis URL the middleware meters in MongoDB.
+USAGE_METER_REDIS_URL = os.getenv("USAGE_METER_REDIS_URL", REDIS_CACHE_URL)
+USAGE_METER_PLAN_TTL_SECONDS = int(os.getenv("USAGE_METER_PLAN_TTL_SECONDS", "300"))
+USAGE_METER_COUNTER_TTL_SECONDS = int(os.getenv("USAGE_METER_COUNTER_TTL_SECONDS", str(7 * 24 * 3600)))
+USAGE_METER_FLUSH_BATCH_SIZE = int(os.getenv("USAGE_METER_FLUSH_BATCH_SIZE", "500"))
+
+# Per-tenant token buckets and in-flight caps (api.infrastructure.rate_limits).
+# Shared across workers through Redis when available, per process otherwise.
+# A 0 disables that dimension; limits apply to both the API key and its owner.
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", REDIS_CACHE_URL)
+RATE_LIMITS = {
+    kind: {
+        "requests_per_second": float(os.getenv(f"RATE_LIMIT_{prefix}_RPS", "50")),
+        "burst": float(os.getenv(f"RATE_LIMIT_{prefix}_BURST", "100")),
+        "bytes_per_second": float(os.getenv(f"RATE_LIMIT_{prefix}_BYTES_PER_SECOND", str(10 * 1024 * 1024))),
+        "bytes_burst": float(os.getenv(f"RATE_LIMIT_{prefix}_BYTES_BURST", str(50 * 1024 * 1024))),
+        "max_in_flight": int(os.getenv(f"RATE_LIMIT_{prefix}_MAX_IN_FLIGHT", "16")),
+    }
+    for kind, prefix in (("user", "USER"), ("api_key", "API_KEY"))
+}
+# In-flight slots expire after this long even if a worker dies mid-request.
+RATE_LIMIT_LEASE_SECONDS = float(os.getenv("RATE_LIMIT_LEASE_SECONDS", "120"))
+RATE_LIMIT_CONCURRENCY_RETRY_SECONDS = float(os.getenv("RATE_LIMIT_CONCURRENCY_RETRY_SECONDS", "1"))
+RATE_LIMIT_STATS_TTL_SECONDS = int(os.getenv("RATE_LIMIT_STATS_TTL_SECONDS", "3600"))
 
 
 # --- Password Validation ---
@@ -178,6 +269,16 @@ OTP_PEPPER = os.getenv(
     "dev-only-otp-pepper-change-me-please-change-me-please",
 )
 
+# --- API keys (HMAC-hashed at rest with API_KEY_PEPPER; rotating it invalidates keys) ---
+API_KEY_PEPPER = os.getenv(
+    "API_KEY_PEPPER",
+    "dev-only-api-key-pepper-change-me-please-change-me",
+)
+API_KEY_PREFIX_CHARS = int(os.getenv("API_KEY_PREFIX_CHARS", "12"))
+# Fall back to plaintext lookups (and migrate on hit) for keys issued before hashing.
+API_KEY_LEGACY_LOOKUP = os.getenv("API_KEY_LEGACY_LOOKUP", "true").lower() in ("1", "true", "yes")
+PRINCIPAL_CACHE_REVOCATION_SYNC_SECONDS = float(os.getenv("PRINCIPAL_CACHE_REVOCATION_SYNC_SECONDS", "1"))
+
 # --- Email (SMTP) & OAuth (server-side PKCE code exchange) ---
 EMAIL_BACKEND = os.getenv(
     "EMAIL_BACKEND",
@@ -201,12 +302,107 @@ GITHUB_OAUTH_CLIENT_SECRET = os.getenv("GITHUB_OAUTH_CLIENT_SECRET", "")
 DEMO_LOGIN_EMAIL = os.getenv("DEMO_LOGIN_EMAIL", "samanta@dowellresearch.se")
 DEMO_AUTO_ENSURE_USER = os.getenv("DEMO_AUTO_ENSURE_USER", "").lower() in ("1", "true", "yes")
 
-# When True, BaseAPIView._track skips telemetry for /api/v2/* (middleware already logs).
+# Raw telemetry (request_events, mongo_details, slow_queries) lives in MongoDB
+# time-series collections (analytics.timeseries); retention is expireAfterSeconds.
+# Existing regular collections are converted by `manage.py migrate_telemetry_timeseries`.
+TELEMETRY_TIMESERIES = os.getenv("TELEMETRY_TIMESERIES", "true").lower() in ("1", "true", "yes")
+TELEMETRY_TIMESERIES_GRANULARITY = os.getenv("TELEMETRY_TIMESERIES_GRANULARITY", "seconds")
+TELEMETRY_RETENTION_DAYS = int(
+    os.getenv("TELEMETRY_RETENTION_DAYS", os.getenv("ANALYTICS_TTL_DAYS_TELEMETRY", "30"))
+)
+
+# Dashboard rollups (analytics.rollups): request events are folded into per-user
+# minute and hour buckets as they are written; windows longer than
+# ROLLUP_RAW_MAX_MINUTES are answered from the buckets instead of raw events.
+ROLLUPS_ENABLED = os.getenv("ROLLUPS_ENABLED", "true").lower() in ("1", "true", "yes")
+ROLLUP_MINUTE_RETENTION_HOURS = int(os.getenv("ROLLUP_MINUTE_RETENTION_HOURS", "48"))
+ROLLUP_HOUR_RETENTION_DAYS = int(os.getenv("ROLLUP_HOUR_RETENTION_DAYS", "400"))
+ROLLUP_RAW_MAX_MINUTES = int(os.getenv("ROLLUP_RAW_MAX_MINUTES", "15"))
+
+# daily_aggregates are recompacted hourly from the hour rollups, one Celery subtask
+# per user-id hash partition (analytics.daily_usage); history via `manage.py backfill_daily_usage`.
+DAILY_USAGE_PARTITIONS = int(os.getenv("DAILY_USAGE_PARTITIONS", "16"))
+
+# Dashboard overview (analytics.dashboard_cache): queries run concurrently, at most
+# DASHBOARD_QUERY_CONCURRENCY at a time; the payload is cached per (user, period),
+# served fresh for DASHBOARD_CACHE_FRESH_SECONDS and then stale (while one rebuild
+# runs) for DASHBOARD_CACHE_STALE_SECONDS.
+DASHBOARD_QUERY_CONCURRENCY = int(os.getenv("DASHBOARD_QUERY_CONCURRENCY", "4"))
+DASHBOARD_CACHE_FRESH_SECONDS = float(os.getenv("DASHBOARD_CACHE_FRESH_SECONDS", "30"))
+DASHBOARD_CACHE_STALE_SECONDS = float(os.getenv("DASHBOARD_CACHE_STALE_SECONDS", "300"))
+DASHBOARD_CACHE_LOCK_SECONDS = float(os.getenv("DASHBOARD_CACHE_LOCK_SECONDS", "10"))
+
+# When True, BaseAPIView._track skips telemetry for /api/v2/* (the middleware writes the request event).
 ANALYTICS_DISABLE_VIEW_TELEMETRY_FOR_API_V2 = (
     os.getenv("ANALYTICS_DISABLE_VIEW_TELEMETRY_FOR_API_V2", "true").lower()
     in ("1", "true", "yes")
 )
 
+# Request telemetry is buffered in process and written in batches (analytics.telemetry).
+# TELEMETRY_SINK: "mongo" (flusher thread inserts directly) or "celery" (one task per batch).
+TELEMETRY_SINK = os.getenv("TELEMETRY_SINK", "mongo")
+TELEMETRY_BUFFER_CAPACITY = int(os.getenv("TELEMETRY_BUFFER_CAPACITY", "10000"))
+TELEMETRY_BATCH_SIZE = int(os.getenv("TELEMETRY_BATCH_SIZE", "500"))
+TELEMETRY_FLUSH_INTERVAL_SECONDS = float(os.getenv("TELEMETRY_FLUSH_INTERVAL_SECONDS", "1"))
+# Client-side timeout for each direct batch write, server selection included (pymongo.timeout).
+TELEMETRY_WRITE_TIMEOUT_SECONDS = float(os.getenv("TELEMETRY_WRITE_TIMEOUT_SECONDS", "5"))
+# Batches the sink rejects are spooled here and replayed on recovery (analytics.spool); "" disables.
+# Segments rotate at TELEMETRY_SPOOL_SEGMENT_BYTES; the oldest are evicted past TELEMETRY_SPOOL_MAX_BYTES.
+TELEMETRY_SPOOL_DIR = os.getenv("TELEMETRY_SPOOL_DIR", str(BASE_DIR / "var" / "telemetry-spool"))
+TELEMETRY_SPOOL_SEGMENT_BYTES = int(os.getenv("TELEMETRY_SPOOL_SEGMENT_BYTES", str(4 * 1024 * 1024)))
+TELEMETRY_SPOOL_MAX_BYTES = int(os.getenv("TELEMETRY_SPOOL_MAX_BYTES", str(256 * 1024 * 1024)))
+# Load shedding (analytics.load_shedding): thresholds for the client_info, performance and http
+# levels, by smoothed batch write latency (ms) and by queue depth (fraction of capacity).
+TELEMETRY_SHED_WRITE_MS = [float(v) for v in os.getenv("TELEMETRY_SHED_WRITE_MS", "250,1000,5000").split(",")]
+TELEMETRY_SHED_QUEUE_FRACTION = [float(v) for v in os.getenv("TELEMETRY_SHED_QUEUE_FRACTION", "0.5,0.7,0.9").split(",")]
+# A level is left once both signals stay below this fraction of its thresholds for the cooldown.
+TELEMETRY_SHED_RECOVERY_FACTOR = float(os.getenv("TELEMETRY_SHED_RECOVERY_FACTOR", "0.5"))
+TELEMETRY_SHED_COOLDOWN_SECONDS = float(os.getenv("TELEMETRY_SHED_COOLDOWN_SECONDS", "30"))
+# Fraction of request events kept (analytics.sampling); errors and slow requests are always kept.
+# Overrides are "name=rate,name=rate": tenants by user id, operations by endpoint family.
+TELEMETRY_SAMPLE_RATE = float(os.getenv("TELEMETRY_SAMPLE_RATE", "1.0"))
+TELEMETRY_SAMPLE_RATES_BY_OPERATION = {
+    name.strip(): float(rate)
+    for name, _, rate in (
+        item.partition("=") for item in os.getenv("TELEMETRY_SAMPLE_RATES_BY_OPERATION", "").split(",") if item.strip()
+    )
+}
+TELEMETRY_SAMPLE_RATES_BY_TENANT = {
+    name.strip(): float(rate)
+    for name, _, rate in (
+        item.partition("=") for item in os.getenv("TELEMETRY_SAMPLE_RATES_BY_TENANT", "").split(",") if item.strip()
+    )
+}
+
+# GET /api/v2/crud/ pages at or above this size encode raw BSON straight to JSON
+# (skips jsonify_object_ids + DRF rendering). Set to 0 to always use DRF.
+CRUD_FAST_JSON_MIN_PAGE_SIZE = int(os.getenv("CRUD_FAST_JSON_MIN_PAGE_SIZE", "200"))
+# Documents per cursor batch for GET /api/v2/crud/?stream=true (bounds peak memory).
+CRUD_STREAM_BATCH_SIZE = int(os.getenv("CRUD_STREAM_BATCH_SIZE", "100"))
+
+# --- Response compression (Brotli/gzip, negotiated via Accept-Encoding) ---
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+# First matching prefix wins; a level of 0 disables that coding for the class.
+# Auth/session endpoints stay uncompressed: they are small and carry secrets (BREACH).
+RESPONSE_COMPRESSION_CLASSES = [
+    {"prefix": "/core/", "brotli_quality": 0, "gzip_level": 0},
+    {
+        "prefix": "/api/v2/crud",
+        "brotli_quality": int(os.getenv("COMPRESSION_CRUD_BROTLI_QUALITY", "4")),
+        "gzip_level": int(os.getenv("COMPRESSION_CRUD_GZIP_LEVEL", "5")),
+    },
+    {
+        "prefix": "/analytics/",
+        "brotli_quality": int(os.getenv("COMPRESSION_ANALYTICS_BROTLI_QUALITY", "6")),
+        "gzip_level": int(os.getenv("COMPRESSION_ANALYTICS_GZIP_LEVEL", "6")),
+    },
+    {
+        "prefix": "/api/v2/",
+        "brotli_quality": int(os.getenv("COMPRESSION_API_BROTLI_QUALITY", "5")),
+        "gzip_level": int(os.getenv("COMPRESSION_API_GZIP_LEVEL", "6")),
+    },
+]
+
 DEMO_PLAYGROUND_SECRET = os.getenv("DEMO_PLAYGROUND_SECRET", "DEMO_PLAYGROUND_SECRET_DUMMY")
 
 # --- Ephemeral playground sessions (/try) ---
@@ -1,5 +1,8 @@
 """
 WSGI config for the DataCube project.
+
+Async views and middleware run on one long-lived event loop per process
+(``project.event_loop``), so loop-bound clients are not rebuilt per request.
 """
 import os
 from django.core.wsgi import get_wsgi_application
@@ -8,4 +11,6 @@ from django.core.wsgi import get_wsgi_application
 # Your hosting provider will use this file.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings.production')
 
-application = get_wsgi_application()
+from project.event_loop import bind_process_loop  # noqa: E402
+
+application = bind_process_loop(get_wsgi_application())